@@ -0,0 +1,27 @@
+"""rollup_updated_at
+
+Revision ID: an_001_rollup_updated_at
+Revises: ld_001_lead_capture_context
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'an_001_rollup_updated_at'
+down_revision = 'ld_001_lead_capture_context'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # High-water mark for analytics response caching (ETag / Last-Modified)
+    op.add_column(
+        'analytics_daily',
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('analytics_daily', 'updated_at')
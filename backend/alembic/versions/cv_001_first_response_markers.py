@@ -0,0 +1,50 @@
+"""first_response_markers
+
+Revision ID: cv_001_first_response_markers
+Revises: msg_001_typed_message_metrics
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'cv_001_first_response_markers'
+down_revision = 'msg_001_typed_message_metrics'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('conversations', sa.Column('first_ai_response_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('conversations', sa.Column('first_staff_response_at', sa.DateTime(timezone=True), nullable=True))
+
+    # One-off backfill: a single aggregate pass over messages instead of the
+    # per-call global subquery analytics used to run.
+    op.execute("""
+        UPDATE conversations c
+        SET first_ai_response_at = m.first_ai,
+            first_staff_response_at = m.first_staff
+        FROM (
+            SELECT conversation_id,
+                   MIN(sent_at) FILTER (WHERE role = 'ai') AS first_ai,
+                   MIN(sent_at) FILTER (WHERE role = 'staff') AS first_staff
+            FROM messages
+            WHERE role IN ('ai', 'staff')
+            GROUP BY conversation_id
+        ) m
+        WHERE c.id = m.conversation_id
+    """)
+
+    op.create_index(
+        'ix_conversations_property_started',
+        'conversations',
+        ['property_id', 'started_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversations_property_started', table_name='conversations')
+    op.drop_column('conversations', 'first_staff_response_at')
+    op.drop_column('conversations', 'first_ai_response_at')
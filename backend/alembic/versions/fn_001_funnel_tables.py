@@ -0,0 +1,105 @@
+"""funnel_tables
+
+Revision ID: fn_001_funnel_tables
+Revises: an_001_rollup_updated_at
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.config import get_settings
+
+# revision identifiers, used by Alembic.
+revision = 'fn_001_funnel_tables'
+down_revision = 'an_001_rollup_updated_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'lead_events',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('lead_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('property_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('from_status', sa.String(length=20), nullable=True),
+        sa.Column('to_status', sa.String(length=20), nullable=False),
+        sa.Column('changed_by', sa.String(length=255), nullable=True),
+        sa.Column('occurred_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['lead_id'], ['leads.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['property_id'], ['properties.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_lead_events_lead_occurred', 'lead_events', ['lead_id', 'occurred_at'], unique=False)
+    op.create_index('ix_lead_events_property_occurred', 'lead_events', ['property_id', 'occurred_at'], unique=False)
+
+    op.create_table(
+        'funnel_daily',
+        sa.Column('id', postgresql.UUID(as_uuid=True), server_default=sa.text('gen_random_uuid()'), nullable=False),
+        sa.Column('property_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('report_date', sa.Date(), nullable=False),
+        sa.Column('channel', sa.String(length=20), nullable=False),
+        sa.Column('intent', sa.String(length=30), nullable=False),
+        sa.Column('inquiries', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('leads_captured', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('leads_contacted', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('leads_converted', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('leads_lost', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['property_id'], ['properties.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_funnel_property_date_channel_intent',
+        'funnel_daily',
+        ['property_id', 'report_date', 'channel', 'intent'],
+        unique=True,
+    )
+
+    # Same tenant isolation as the other property-scoped tables
+    for table in ['lead_events', 'funnel_daily']:
+        op.execute(f"ALTER TABLE {table} ENABLE ROW LEVEL SECURITY")
+        op.execute(f"""
+            CREATE POLICY tenant_isolation_policy ON {table}
+            USING (property_id = current_setting('app.current_property_id', true)::uuid)
+            WITH CHECK (property_id = current_setting('app.current_property_id', true)::uuid)
+        """)
+
+    # Seed the funnel from existing data; incremental upserts take over from here.
+    # Cohorts are the property-local start day, like app.services.funnel
+    # (unknown or missing timezones fall back to settings.timezone).
+    op.execute(sa.text("""
+        INSERT INTO funnel_daily (
+            property_id, report_date, channel, intent,
+            inquiries, leads_captured, leads_contacted, leads_converted, leads_lost
+        )
+        SELECT
+            c.property_id,
+            CAST(timezone(
+                CASE WHEN p.timezone IN (SELECT name FROM pg_timezone_names) THEN p.timezone ELSE :default_zone END,
+                c.started_at
+            ) AS date),
+            c.channel,
+            COALESCE(l.intent, 'unqualified'),
+            count(c.id),
+            count(l.id),
+            count(l.id) FILTER (WHERE l.status IN ('contacted', 'converted')),
+            count(l.id) FILTER (WHERE l.status = 'converted'),
+            count(l.id) FILTER (WHERE l.status = 'lost')
+        FROM conversations c
+        JOIN properties p ON p.id = c.property_id
+        LEFT JOIN leads l ON l.conversation_id = c.id
+        GROUP BY 1, 2, 3, 4
+    """).bindparams(default_zone=get_settings().timezone))
+
+
+def downgrade() -> None:
+    for table in ['lead_events', 'funnel_daily']:
+        op.execute(f"DROP POLICY IF EXISTS tenant_isolation_policy ON {table}")
+    op.drop_index('ix_funnel_property_date_channel_intent', table_name='funnel_daily')
+    op.drop_table('funnel_daily')
+    op.drop_index('ix_lead_events_property_occurred', table_name='lead_events')
+    op.drop_index('ix_lead_events_lead_occurred', table_name='lead_events')
+    op.drop_table('lead_events')
@@ -0,0 +1,37 @@
+"""inbound_receipts
+
+Revision ID: ir_001_inbound_receipts
+Revises: pt_001_partition_messages
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'ir_001_inbound_receipts'
+down_revision = 'pt_001_partition_messages'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'inbound_receipts',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('channel', sa.String(length=20), nullable=False),
+        sa.Column('provider_message_id', sa.String(length=255), nullable=False),
+        sa.Column('received_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_inbound_receipts_channel_message', 'inbound_receipts', ['channel', 'provider_message_id'], unique=True
+    )
+    op.create_index('ix_inbound_receipts_received', 'inbound_receipts', ['received_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_inbound_receipts_received', table_name='inbound_receipts')
+    op.drop_index('ix_inbound_receipts_channel_message', table_name='inbound_receipts')
+    op.drop_table('inbound_receipts')
@@ -0,0 +1,41 @@
+"""job_runs
+
+Revision ID: jr_001_job_runs
+Revises: rp_001_report_branding
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'jr_001_job_runs'
+down_revision = 'rp_001_report_branding'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'job_runs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('job_name', sa.String(length=100), nullable=False),
+        sa.Column('scheduled_for', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='running'),
+        sa.Column('owner', sa.String(length=255), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('duration_ms', sa.Integer(), nullable=True),
+        sa.Column('rows_affected', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_job_runs_job_scheduled', 'job_runs', ['job_name', 'scheduled_for'], unique=True)
+    op.create_index('ix_job_runs_started', 'job_runs', ['started_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_job_runs_started', table_name='job_runs')
+    op.drop_index('ix_job_runs_job_scheduled', table_name='job_runs')
+    op.drop_table('job_runs')
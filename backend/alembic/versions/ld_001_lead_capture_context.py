@@ -0,0 +1,38 @@
+"""lead_capture_context
+
+Revision ID: ld_001_lead_capture_context
+Revises: cv_001_first_response_markers
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'ld_001_lead_capture_context'
+down_revision = 'cv_001_first_response_markers'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Leads created before capture-time stamping inherit their conversation's context
+    op.execute("""
+        UPDATE leads l
+        SET is_after_hours = COALESCE(l.is_after_hours, c.is_after_hours),
+            source_channel = COALESCE(l.source_channel, c.channel)
+        FROM conversations c
+        WHERE c.id = l.conversation_id
+          AND (l.is_after_hours IS NULL OR l.source_channel IS NULL)
+    """)
+
+    op.create_index(
+        'ix_leads_property_after_hours_date',
+        'leads',
+        ['property_id', 'is_after_hours', 'captured_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_leads_property_after_hours_date', table_name='leads')
@@ -0,0 +1,87 @@
+"""typed_message_metrics
+
+Revision ID: msg_001_typed_message_metrics
+Revises: rt_001_response_time_histogram
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'msg_001_typed_message_metrics'
+down_revision = 'rt_001_response_time_histogram'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('response_time_ms', sa.Integer(), nullable=True))
+    op.add_column('messages', sa.Column('prompt_tokens', sa.Integer(), nullable=True))
+    op.add_column('messages', sa.Column('completion_tokens', sa.Integer(), nullable=True))
+    op.add_column('messages', sa.Column('total_tokens', sa.Integer(), nullable=True))
+    op.add_column('messages', sa.Column('model', sa.String(length=50), nullable=True))
+
+    # metadata stays json here. ALTER COLUMN ... TYPE jsonb rewrites the whole
+    # table under an ACCESS EXCLUSIVE lock (no reads or writes for the
+    # duration); pt_001_partition_messages copies every row into the new
+    # partitioned table anyway and converts the column to jsonb during that copy.
+
+    # Backfill from the JSON metadata in keyset-ordered batches, committing each
+    # batch so we never hold a table-wide lock. Legacy rows only recorded the
+    # total token count: it goes to total_tokens and prompt/completion stay NULL.
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        last_id = None
+        while True:
+            ids = conn.execute(
+                sa.text(
+                    "SELECT id FROM messages "
+                    "WHERE role = 'ai' AND (CAST(:last_id AS uuid) IS NULL OR id > CAST(:last_id AS uuid)) "
+                    "ORDER BY id LIMIT :batch"
+                ),
+                {"last_id": last_id, "batch": BACKFILL_BATCH_SIZE},
+            ).scalars().all()
+            if not ids:
+                break
+            conn.execute(
+                sa.text(
+                    "UPDATE messages SET "
+                    "response_time_ms = (metadata->>'response_time_ms')::numeric::int, "
+                    "total_tokens = (metadata->>'llm_tokens_used')::numeric::int, "
+                    "model = metadata->>'model', "
+                    "metadata = (metadata::jsonb - 'response_time_ms' - 'llm_tokens_used' - 'model')::json "
+                    "WHERE id = ANY(:ids)"
+                ),
+                {"ids": ids},
+            )
+            last_id = str(ids[-1])
+
+    op.create_index(
+        'ix_messages_ai_conversation_sent',
+        'messages',
+        ['conversation_id', 'sent_at'],
+        unique=False,
+        postgresql_where=sa.text("role = 'ai'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_ai_conversation_sent', table_name='messages')
+    # Rows written since the upgrade have no total_tokens only when the
+    # provider returned no usage; fall back to the split counts.
+    op.execute(
+        "UPDATE messages SET metadata = (COALESCE(metadata::jsonb, '{}'::jsonb) "
+        "|| jsonb_strip_nulls(jsonb_build_object("
+        "'response_time_ms', response_time_ms, "
+        "'llm_tokens_used', COALESCE(total_tokens, prompt_tokens + completion_tokens), "
+        "'model', model)))::json "
+        "WHERE role = 'ai'"
+    )
+    op.drop_column('messages', 'model')
+    op.drop_column('messages', 'total_tokens')
+    op.drop_column('messages', 'completion_tokens')
+    op.drop_column('messages', 'prompt_tokens')
+    op.drop_column('messages', 'response_time_ms')
@@ -0,0 +1,85 @@
+"""outbound_messages outbox and delivery status events
+
+Revision ID: ob_001_outbound_messages
+Revises: ir_001_inbound_receipts
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'ob_001_outbound_messages'
+down_revision = 'ir_001_inbound_receipts'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'outbound_messages',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('property_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('conversation_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('message_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('channel', sa.String(length=20), nullable=False),
+        sa.Column('recipient', sa.String(length=255), nullable=False),
+        sa.Column('sender_id', sa.String(length=100), nullable=True),
+        sa.Column('subject', sa.String(length=500), nullable=True),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('provider_message_id', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('delivered_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('read_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['property_id'], ['properties.id']),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_outbound_messages_due', 'outbound_messages', ['next_attempt_at'],
+        unique=False, postgresql_where=sa.text("status IN ('pending', 'sending')"),
+    )
+    op.create_index('ix_outbound_messages_provider_id', 'outbound_messages', ['provider_message_id'], unique=True)
+    op.create_index('ix_outbound_messages_conversation', 'outbound_messages', ['conversation_id'], unique=False)
+    op.create_index('ix_outbound_messages_created', 'outbound_messages', ['created_at'], unique=False)
+
+    # Same tenant isolation as the other property-scoped tables
+    op.execute("ALTER TABLE outbound_messages ENABLE ROW LEVEL SECURITY")
+    op.execute("""
+        CREATE POLICY tenant_isolation_policy ON outbound_messages
+        USING (property_id = current_setting('app.current_property_id', true)::uuid)
+        WITH CHECK (property_id = current_setting('app.current_property_id', true)::uuid)
+    """)
+
+    op.create_table(
+        'outbound_status_events',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('provider_message_id', sa.String(length=255), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('occurred_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('received_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_outbound_status_events_provider_id', 'outbound_status_events', ['provider_message_id'], unique=False
+    )
+    op.create_index('ix_outbound_status_events_received', 'outbound_status_events', ['received_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbound_status_events_received', table_name='outbound_status_events')
+    op.drop_index('ix_outbound_status_events_provider_id', table_name='outbound_status_events')
+    op.drop_table('outbound_status_events')
+    op.execute("DROP POLICY IF EXISTS tenant_isolation_policy ON outbound_messages")
+    op.drop_index('ix_outbound_messages_created', table_name='outbound_messages')
+    op.drop_index('ix_outbound_messages_conversation', table_name='outbound_messages')
+    op.drop_index('ix_outbound_messages_provider_id', table_name='outbound_messages')
+    op.drop_index('ix_outbound_messages_due', table_name='outbound_messages')
+    op.drop_table('outbound_messages')
@@ -0,0 +1,111 @@
+"""partition messages by month on sent_at
+
+Revision ID: pt_001_partition_messages
+Revises: jr_001_job_runs
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'pt_001_partition_messages'
+down_revision = 'jr_001_job_runs'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    "id, conversation_id, role, content, metadata, response_time_ms, "
+    "prompt_tokens, completion_tokens, total_tokens, model, sent_at, deleted_at"
+)
+MONTHS_AHEAD = 3
+
+
+def _create_indexes() -> None:
+    op.execute(
+        "ALTER TABLE messages ADD CONSTRAINT messages_conversation_id_fkey "
+        "FOREIGN KEY (conversation_id) REFERENCES conversations (id)"
+    )
+    op.create_index('ix_messages_conversation', 'messages', ['conversation_id', 'sent_at'], unique=False)
+    op.execute(
+        "CREATE INDEX ix_messages_ai_conversation_sent ON messages (conversation_id, sent_at) "
+        "WHERE role = 'ai'"
+    )
+
+
+def _enable_rls() -> None:
+    op.execute("ALTER TABLE messages ENABLE ROW LEVEL SECURITY")
+    op.execute("""
+        CREATE POLICY tenant_isolation_policy ON messages
+        USING (conversation_id IN (SELECT id FROM conversations))
+        WITH CHECK (conversation_id IN (SELECT id FROM conversations))
+    """)
+
+
+def _copy(source: str, metadata_type: str) -> None:
+    """Copy every row from `source`, converting metadata on the way."""
+    op.execute(f"ALTER TABLE messages ALTER COLUMN metadata TYPE {metadata_type} USING metadata::{metadata_type}")
+    select_columns = COLUMNS.replace("metadata", f"metadata::{metadata_type}")
+    op.execute(f"INSERT INTO messages ({COLUMNS}) SELECT {select_columns} FROM {source}")
+
+
+def _retire(table: str, old: str) -> None:
+    """Rename the current table out of the way so its index names are free."""
+    op.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    op.execute(f"ALTER TABLE {old} RENAME CONSTRAINT messages_pkey TO {old}_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_messages_conversation")
+    op.execute("DROP INDEX IF EXISTS ix_messages_ai_conversation_sent")
+
+
+def upgrade() -> None:
+    _retire('messages', 'messages_unpartitioned')
+
+    op.execute(
+        "CREATE TABLE messages (LIKE messages_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (sent_at)"
+    )
+
+    # One partition per month from the oldest message through MONTHS_AHEAD
+    # months from now; the scheduler keeps extending it (app.services.partitions).
+    op.execute(f"""
+        DO $$
+        DECLARE
+            m date;
+            last_m date;
+        BEGIN
+            SELECT date_trunc('month', COALESCE(min(sent_at), now()) AT TIME ZONE 'UTC')::date
+              INTO m FROM messages_unpartitioned;
+            last_m := (date_trunc('month', now() AT TIME ZONE 'UTC') + interval '{MONTHS_AHEAD} months')::date;
+            WHILE m <= last_m LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+                    'messages_p' || to_char(m, 'YYYY_MM'),
+                    m::text || ' 00:00:00+00',
+                    (m + interval '1 month')::date::text || ' 00:00:00+00'
+                );
+                m := (m + interval '1 month')::date;
+            END LOOP;
+        END $$;
+    """)
+
+    # Load before building keys and indexes: one sort per partition instead of
+    # per-row index maintenance. metadata becomes jsonb here (still json after
+    # msg_001_typed_message_metrics): the new table is empty, so the type
+    # change is free and the conversion rides on the copy we make anyway.
+    _copy('messages_unpartitioned', 'jsonb')
+    op.execute("ALTER TABLE messages ADD CONSTRAINT messages_pkey PRIMARY KEY (id, sent_at)")
+    _create_indexes()
+
+    op.execute("DROP TABLE messages_unpartitioned")
+    _enable_rls()
+
+
+def downgrade() -> None:
+    _retire('messages', 'messages_partitioned')
+
+    op.execute("CREATE TABLE messages (LIKE messages_partitioned INCLUDING DEFAULTS)")
+    _copy('messages_partitioned', 'json')
+    op.execute("ALTER TABLE messages ADD CONSTRAINT messages_pkey PRIMARY KEY (id)")
+    _create_indexes()
+
+    op.execute("DROP TABLE messages_partitioned")  # Drops its partitions
+    _enable_rls()
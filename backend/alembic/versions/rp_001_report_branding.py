@@ -0,0 +1,25 @@
+"""report_branding
+
+Revision ID: rp_001_report_branding
+Revises: fn_001_funnel_tables
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'rp_001_report_branding'
+down_revision = 'fn_001_funnel_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('properties', sa.Column('report_locale', sa.String(length=5), server_default='en', nullable=False))
+    op.add_column('properties', sa.Column('report_branding', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('properties', 'report_branding')
+    op.drop_column('properties', 'report_locale')
@@ -0,0 +1,26 @@
+"""response_time_histogram
+
+Revision ID: rt_001_response_time_histogram
+Revises: sd_001_add_soft_delete
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'rt_001_response_time_histogram'
+down_revision = 'sd_001_add_soft_delete'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Mergeable latency sketch per rollup row. Existing rows stay NULL; range
+    # queries fall back to their avg_response_time_sec until
+    # `python -m scripts.backfill_analytics` recomputes them from messages.
+    op.add_column('analytics_daily', sa.Column('response_time_histogram', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('analytics_daily', 'response_time_histogram')
@@ -5,11 +5,13 @@ Handles JWT verification for staff, API keys for widgets, and webhook signature
 
 import hmac
 import hashlib
+import uuid
 from typing import Optional
 
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer, APIKeyHeader
 from jose import JWTError, jwt
+import orjson
 import structlog
 
 from app.config import get_settings
@@ -77,10 +79,38 @@ async def check_property_access(
     return token
 
 
-async def verify_sendgrid_signature(request: Request):
+async def require_admin(token: dict = Depends(verify_jwt)) -> dict:
+    """Dependency for operator-only routes."""
+    if not token.get("is_admin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return token
+
+
+def accessible_property_ids(token: dict) -> list[uuid.UUID] | None:
     """
-    Verify SendGrid Signed Webhook.
-    Requires Ed25519 verification.
+    Properties the token may read, for portfolio-wide views.
+    Returns None for super admins (every property); malformed ids are ignored.
+    """
+    allowed_props = token.get("property_ids", [])
+    if token.get("is_admin") and "*" in allowed_props:
+        return None
+
+    property_ids = []
+    for pid in allowed_props:
+        try:
+            property_ids.append(uuid.UUID(str(pid)))
+        except ValueError:
+            logger.warning("Ignoring malformed property id in token", user=token.get("sub"), property_id=pid)
+    return property_ids
+
+
+def check_sendgrid_signature(body: bytes, signature: str | None, timestamp: str | None):
+    """
+    Verify a SendGrid Signed Webhook (Ed25519 over timestamp + raw body).
+    No-op when no public key is configured.
     """
     if not settings.sendgrid_webhook_public_key:
         if settings.is_production:
@@ -90,9 +120,6 @@ async def verify_sendgrid_signature(request: Request):
     from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
     import base64
 
-    signature = request.headers.get("X-Twilio-Email-Event-Webhook-Signature")
-    timestamp = request.headers.get("X-Twilio-Email-Event-Webhook-Timestamp")
-
     if not signature or not timestamp:
         logger.warning("Missing SendGrid signature headers")
         # For now, allowing it if key is missing/empty, but if key is present, we enforce it.
@@ -100,7 +127,6 @@ async def verify_sendgrid_signature(request: Request):
         raise HTTPException(status_code=403, detail="Missing signature")
 
     # Construct payload: timestamp + raw body
-    body = await request.body()
     payload = timestamp.encode() + body
 
     try:
@@ -114,6 +140,15 @@ async def verify_sendgrid_signature(request: Request):
         raise HTTPException(status_code=403, detail="Invalid signature")
 
 
+async def verify_sendgrid_signature(request: Request):
+    """Verify SendGrid Signed Webhook. Prefer sendgrid_webhook_form for handlers."""
+    check_sendgrid_signature(
+        await request.body(),
+        request.headers.get("X-Twilio-Email-Event-Webhook-Signature"),
+        request.headers.get("X-Twilio-Email-Event-Webhook-Timestamp"),
+    )
+
+
 async def verify_api_key(
     request: Request,
     api_key: Optional[str] = Depends(api_key_header)
@@ -129,7 +164,7 @@ async def verify_api_key(
     return api_key
 
 
-async def verify_whatsapp_signature(request: Request):
+def check_whatsapp_signature(body: bytes, signature: str | None):
     """
     Verify WhatsApp Cloud API webhook signature (X-Hub-Signature-256).
     Prevents forged requests from attackers.
@@ -141,7 +176,6 @@ async def verify_whatsapp_signature(request: Request):
             raise HTTPException(status_code=500, detail="Server misconfiguration")
         return
 
-    signature = request.headers.get("X-Hub-Signature-256")
     if not signature:
         logger.warning("Missing WhatsApp signature")
         raise HTTPException(status_code=403, detail="Missing signature")
@@ -152,9 +186,6 @@ async def verify_whatsapp_signature(request: Request):
         
     sig_hash = signature.split("=")[1]
     
-    # Read raw body
-    body = await request.body()
-    
     # Calculate expected HMAC
     expected_hash = hmac.new(
         settings.whatsapp_app_secret.encode(),
@@ -166,3 +197,42 @@ async def verify_whatsapp_signature(request: Request):
         logger.warning("Invalid WhatsApp signature", signature=signature)
         raise HTTPException(status_code=403, detail="Invalid signature")
 
+
+async def verify_whatsapp_signature(request: Request):
+    """Verify WhatsApp webhook signature. Prefer whatsapp_webhook_payload for handlers."""
+    check_whatsapp_signature(await request.body(), request.headers.get("X-Hub-Signature-256"))
+
+
+# ── Webhook ingress ──────────────────────────────────────────────────
+# Each webhook body is read from the socket once, verified over those
+# buffered bytes, and parsed once; handlers get the parsed payload.
+
+async def whatsapp_webhook_payload(request: Request) -> dict:
+    """Signed WhatsApp webhook body, parsed with orjson straight from the buffered bytes."""
+    body = await request.body()
+    check_whatsapp_signature(body, request.headers.get("X-Hub-Signature-256"))
+    try:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Invalid payload")
+    return payload
+
+
+async def sendgrid_webhook_form(request: Request):
+    """
+    Signed SendGrid Inbound Parse form. The multipart parser runs over the
+    same buffered body the signature was checked against.
+    """
+    body = await request.body()
+    check_sendgrid_signature(
+        body,
+        request.headers.get("X-Twilio-Email-Event-Webhook-Signature"),
+        request.headers.get("X-Twilio-Email-Event-Webhook-Timestamp"),
+    )
+    form = await request.form()  # Starlette streams the cached body
+    try:
+        yield dict(form)
+    finally:
+        await form.close()
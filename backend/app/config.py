@@ -24,12 +24,31 @@ class Settings(BaseSettings):
     sendgrid_from_email: str = "reports@yourdomain.com"
     staff_notification_email: str = "reservations@vivatel.com.my"  # Default for pilot
     sendgrid_webhook_public_key: str = "" # Ed25519 public key for signature verification
+    email_transport: str = ""  # "sendgrid" | "memory" | "console"; empty = auto
+    email_timeout_sec: float = 10.0
+    email_max_connections: int = 20
+    email_max_retries: int = 3
+    email_backoff_base_sec: float = 0.5
+    # Inbound email preprocessing (app.core.email_body)
+    email_body_max_chars: int = 2000  # New text kept per email; matches the sanitizer's cap
+    email_body_scan_chars: int = 512 * 1024  # Never read further into a body than this
 
     # WhatsApp
     whatsapp_verify_token: str = "sheerssoft_verify_token"
     whatsapp_api_token: str = ""
     whatsapp_phone_number_id: str = ""
     whatsapp_app_secret: str = ""  # For webhook signature verification
+    whatsapp_api_base_url: str = "https://graph.facebook.com"  # Point at scripts/mock_graph_api.py for load tests
+    whatsapp_api_version: str = "v18.0"
+    whatsapp_timeout_sec: float = 10.0
+    whatsapp_http2: bool = True
+    whatsapp_max_connections: int = 20
+    whatsapp_rate_per_sec: float = 70.0  # Per phone_number_id, cluster-wide (Redis); rate + burst <= Meta's 80 msg/s tier
+    whatsapp_rate_burst: float = 10.0
+    whatsapp_sender_processes: int = 4  # Sending processes; the local fallback bucket gets rate / this when Redis is down
+    whatsapp_max_retries: int = 3  # Only for failures Meta cannot have accepted
+    whatsapp_backoff_base_sec: float = 0.5
+    whatsapp_max_retry_after_sec: float = 30.0  # Cap on a server-supplied Retry-After
 
     # Auth
     jwt_secret: str = "dev_jwt_secret_change_in_production"
@@ -45,9 +64,54 @@ class Settings(BaseSettings):
     allowed_origins: str = "http://localhost:3000"
 
     # Report scheduling
-    daily_report_hour: int = 7
+    daily_report_hour: int = 7  # Property-local time
     daily_report_minute: int = 30
-    timezone: str = "Asia/Kuala_Lumpur"
+    timezone: str = "Asia/Kuala_Lumpur"  # Fallback for properties without a valid timezone
+    report_compute_concurrency: int = 8  # Concurrent DB sessions for report rollups
+    report_dispatch_interval_min: int = 15  # Report slots; must divide 60 and exceed the fire-time grace
+    dashboard_url: str = ""  # Link in report emails (falls back to the property website)
+    job_fire_time_grace_sec: int = 300  # Max scheduler wake-up skew between nodes
+
+    # Data retention (PDPA/GDPR)
+    retention_days: int = 730
+    retention_batch_size: int = 5000  # Rows per delete transaction
+    retention_batch_sleep_sec: float = 0.5  # Pause between batches
+    partition_months_ahead: int = 3  # Monthly message partitions kept created in advance
+
+    # Analytics response cache (seconds)
+    analytics_cache_ttl_today: int = 60
+    analytics_cache_ttl_historical: int = 86400
+    analytics_live_cache_ttl: int = 15
+
+    # Bulk export (Parquet / Arrow IPC)
+    export_dir: str = "/tmp/sheerssoft-exports"  # Local staging; finished files are kept in Redis
+    export_batch_size: int = 10000  # Rows per record batch / row group
+    export_job_ttl: int = 86400  # Seconds job status and files are kept in Redis
+    export_max_bytes: int = 200 * 1024 * 1024  # Largest downloadable job (Redis memory); the CLI has no limit
+
+    # Inbound message queue (Redis Streams, consumed by `python -m app.worker`)
+    inbound_stream: str = "inbound:messages"
+    inbound_group: str = "inbound-workers"
+    inbound_stream_maxlen: int = 1_000_000  # Safety cap; acked entries are deleted
+    inbound_worker_concurrency: int = 16  # Messages processed at once per worker
+    inbound_max_attempts: int = 5  # Then the job goes to the dead-letter stream
+    inbound_retry_base_sec: float = 2.0  # Backoff: base * 2^(attempt-1)
+    inbound_claim_idle_ms: int = 300_000  # Reclaim jobs a crashed worker left pending
+    inbound_dedupe_ttl_sec: int = 7 * 86400  # Redis claim on a provider message id; Meta retries for up to 7 days
+    inbound_receipt_days: int = 30  # inbound_receipts rows (DB dedupe backstop) kept this long
+
+    # Guest WebSockets (app.services.ws_registry)
+    ws_heartbeat_sec: float = 25.0  # Server ping interval; below common proxy idle timeouts (60s)
+    ws_heartbeat_timeout_sec: float = 75.0  # No frame from the client this long: connection is dead
+    ws_idle_timeout_sec: float = 30 * 60  # No guest message this long: close the socket
+    ws_send_timeout_sec: float = 5.0  # A client this slow to accept a frame is dropped
+
+    # Outbound reply outbox (drained by the dispatcher in `python -m app.worker`)
+    outbox_batch_size: int = 50  # Rows claimed per dispatcher round
+    outbox_poll_interval_sec: float = 0.5  # Idle wait between rounds
+    outbox_max_attempts: int = 6  # Then the reply is marked failed
+    outbox_retry_base_sec: float = 5.0  # Backoff: base * 2^(attempt-1)
+    outbox_lease_sec: int = 120  # A row stuck in "sending" this long (dispatcher crash) is retried
 
     @property
     def is_production(self) -> bool:
@@ -0,0 +1,240 @@
+"""
+Reduce an inbound email to the guest's new text.
+
+SendGrid Inbound Parse hands us the whole message: the reply plus the quoted
+thread, signature, mobile footer and legal disclaimer. Only the new text is
+worth sending to the LLM (the sanitizer truncates at 2000 chars, so quoted
+history used to push the actual question out). extract_reply():
+
+- uses the `text` part, or converts the `html` part when `text` is empty;
+- stops at the first reply boundary ("On ... wrote:", Outlook's From:/Sent:
+  header block, "-----Original Message-----", forwarded-message markers,
+  Gmail/Outlook/Yahoo quote containers in HTML);
+- drops ">"-quoted lines, the "-- " signature and everything after it,
+  mobile footers, disclaimers and a trailing sign-off with its name block.
+
+Bodies are consumed as a stream: lines are read lazily and HTML is fed to the
+parser in chunks, both stopping at the first boundary, at settings-sized
+output (max_chars) or after scan_limit characters. A multi-megabyte quoted
+thread therefore costs no more than its first reply.
+"""
+
+import re
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Iterator
+
+HTML_CHUNK_CHARS = 64 * 1024
+
+ON_WROTE = re.compile(r"^\s*On\b.{0,300}\bwrote:\s*$", re.IGNORECASE | re.DOTALL)
+BOUNDARY = re.compile(
+    r"^\s*("
+    r"-{2,}\s*Original Message\s*-{2,}"
+    r"|-{2,}\s*Forwarded message\s*-{2,}"
+    r"|Begin forwarded message:"
+    r"|_{20,}"  # Outlook's separator above the quoted header
+    r")\s*$",
+    re.IGNORECASE,
+)
+OUTLOOK_FROM = re.compile(r"^\s*\*?From:\*?\s+\S", re.IGNORECASE)
+OUTLOOK_HEADER = re.compile(r"^\s*\*?(Sent|Date|To|Subject):\*?\s", re.IGNORECASE)
+SIGNATURE = re.compile(
+    r"^("
+    r"-- ?"  # RFC 3676 signature delimiter
+    r"|Sent from my \w+.*"
+    r"|Sent from (Mail|Yahoo Mail|Outlook) for .*"
+    r"|Get Outlook for .*"
+    r"|(CONFIDENTIALITY|DISCLAIMER|PRIVILEGED)\b.*"
+    r"|This e-?mail (and any (files|attachments) .*)?(is|may be|contains) (confidential|privileged).*"
+    r")$",
+    re.IGNORECASE,
+)
+SIGN_OFF = re.compile(
+    r"^((best|kind|warm|warmest|many)\s+)?(regards|wishes|thanks|thank you|cheers|sincerely|yours truly)[,.!]?$",
+    re.IGNORECASE,
+)
+MAX_SIGN_OFF_LINES = 4  # Name, title, company, phone
+MAX_SIGN_OFF_LINE_CHARS = 60
+
+# HTML elements whose content is never guest text
+SKIP_TAGS = {"head", "script", "style", "title"}
+BLOCK_TAGS = {"p", "div", "br", "li", "tr", "table", "h1", "h2", "h3", "h4", "h5", "h6", "hr"}
+QUOTE_CLASSES = ("gmail_quote", "yahoo_quoted", "moz-cite-prefix", "protonmail_quote")
+QUOTE_IDS = ("divrplyfwdmsg", "appendonsend", "mail-editor-reference-message-container")
+
+
+@dataclass
+class EmailBody:
+    text: str
+    source: str  # "text" | "html" | "empty"
+    original_chars: int
+    stopped_at: str | None = None  # What ended the scan: "boundary", "signature", "max_chars", "scan_limit"
+
+    @property
+    def reduction(self) -> float:
+        """Share of the original body dropped, 0..1."""
+        if not self.original_chars:
+            return 0.0
+        return round(1 - len(self.text) / self.original_chars, 3)
+
+
+def _iter_lines(text: str, limit: int) -> Iterator[str]:
+    """Lines of text[:limit], without splitting the whole body up front."""
+    start, end = 0, min(len(text), limit)
+    while start < end:
+        newline = text.find("\n", start, end)
+        if newline == -1:
+            newline = end
+        yield text[start:newline]
+        start = newline + 1
+
+
+class _ReplyCollector:
+    """Keeps new text line by line; feed() returns False once the rest can be skipped."""
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.lines: list[str] = []
+        self.size = 0
+        self.held: list[str] = []  # Lines that may be a reply header or sign-off, pending the next ones
+        self.held_kind: str | None = None
+        self.stopped_at: str | None = None
+
+    def _keep(self, line: str) -> bool:
+        self.lines.append(line)
+        self.size += len(line) + 1
+        if self.size >= self.max_chars:
+            self.stopped_at = "max_chars"
+            return False
+        return True
+
+    def _release_held(self) -> bool:
+        held, self.held, self.held_kind = self.held, [], None
+        return all(self._keep(line) for line in held)
+
+    def _stop(self, reason: str) -> bool:
+        if self.held_kind == "sign_off":
+            self.held, self.held_kind = [], None
+        self.stopped_at = reason
+        return False
+
+    def feed(self, line: str) -> bool:
+        line = line.rstrip().replace("\xa0", " ")
+        stripped = line.strip()
+
+        if self.held_kind == "header":
+            self.held.append(stripped)
+            if ON_WROTE.match(" ".join(self.held)) or any(OUTLOOK_HEADER.match(h) for h in self.held[1:]):
+                self.held = []
+                return self._stop("boundary")
+            if len(self.held) < 4:
+                return True
+            return self._release_held()  # Just text that started like a header
+
+        if self.held_kind == "sign_off":
+            if BOUNDARY.match(line) or ON_WROTE.match(stripped) or SIGNATURE.match(stripped):
+                return self._stop("signature")
+            self.held.append(line)
+            if len(self.held) > MAX_SIGN_OFF_LINES + 1 or len(stripped) > MAX_SIGN_OFF_LINE_CHARS:
+                return self._release_held()  # More text follows; it was not a sign-off
+            return True
+
+        if stripped.startswith(">"):
+            return True
+        if BOUNDARY.match(line) or ON_WROTE.match(stripped):
+            return self._stop("boundary")
+        if SIGNATURE.match(stripped):
+            return self._stop("signature")
+        if stripped.startswith("On ") or OUTLOOK_FROM.match(stripped):
+            # "On <date>, <name> <addr> wrote:" is often wrapped over two lines
+            self.held, self.held_kind = [stripped], "header"
+            return True
+        if SIGN_OFF.match(stripped):
+            self.held, self.held_kind = [line], "sign_off"
+            return True
+        return self._keep(line)
+
+    def finish(self) -> str:
+        if self.held_kind == "header":
+            self._release_held()
+        self.held = []
+        text = re.sub(r"\n\s*\n+", "\n\n", "\n".join(self.lines)).strip()
+        return text[: self.max_chars]
+
+
+class _HtmlText(HTMLParser):
+    """Text of an HTML body up to the first quoted-reply container."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+        self.skip_depth = 0
+        self.quoted = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.quoted:
+            return
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").lower()
+        element_id = (attrs.get("id") or "").lower()
+        if (
+            tag == "blockquote"
+            or any(name in classes for name in QUOTE_CLASSES)
+            or any(element_id.startswith(name) for name in QUOTE_IDS)
+        ):
+            self.quoted = True
+            return
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+        elif tag in BLOCK_TAGS and not self.quoted:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.quoted and not self.skip_depth:
+            self.parts.append(re.sub(r"[ \t\r\f\v]+", " ", data))
+
+
+def html_to_text(html: str, scan_limit: int) -> tuple[str, bool]:
+    """(text, quoted) for html[:scan_limit], fed in chunks and stopping at the first quote container."""
+    parser = _HtmlText()
+    end = min(len(html), scan_limit)
+    for start in range(0, end, HTML_CHUNK_CHARS):
+        parser.feed(html[start:min(start + HTML_CHUNK_CHARS, end)])
+        if parser.quoted:
+            break
+    parser.close()
+    # Block tags open and close with a newline; one line break per block is enough
+    return re.sub(r"\s*\n\s*", "\n", "".join(parser.parts)), parser.quoted
+
+
+def extract_reply(text: str | None, html: str | None, max_chars: int, scan_limit: int) -> EmailBody:
+    """The guest's new text from an inbound email's text and html parts."""
+    if text and text.strip():
+        source, original_chars, body, html_quoted = "text", len(text), text, False
+    elif html and html.strip():
+        source, original_chars = "html", len(html)
+        body, html_quoted = html_to_text(html, scan_limit)
+    else:
+        return EmailBody(text="", source="empty", original_chars=0)
+
+    collector = _ReplyCollector(max_chars)
+    for line in _iter_lines(body, scan_limit):
+        if not collector.feed(line):
+            break
+    else:
+        if html_quoted:
+            collector.stopped_at = "boundary"
+        elif len(body) > scan_limit:
+            collector.stopped_at = "scan_limit"
+    return EmailBody(
+        text=collector.finish(), source=source, original_chars=original_chars, stopped_at=collector.stopped_at,
+    )
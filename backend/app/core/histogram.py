@@ -0,0 +1,144 @@
+"""
+Mergeable latency histogram for response-time percentiles.
+
+HDR-style fixed buckets: every power of two between 1ms and ~17min is split
+into SUB_BUCKETS linear sub-buckets, so any reported quantile is within
+1/SUB_BUCKETS (12.5%) of the true value. Because the bucket layout is fixed,
+two histograms merge by adding counts, which lets us store one sketch per
+AnalyticsDaily row and answer p50/p95/p99 for any date range without going
+back to raw messages.
+"""
+
+import math
+from bisect import bisect_right
+
+SUB_BUCKETS = 8
+MAX_EXPONENT = 20  # 2^20 ms ≈ 17.5 minutes; anything slower lands in the overflow bucket
+
+PERCENTILES = {"p50": 0.50, "p90": 0.90, "p95": 0.95, "p99": 0.99}
+
+
+def _build_bounds() -> list[int]:
+    bounds = set()
+    for exponent in range(MAX_EXPONENT + 1):
+        base = 2 ** exponent
+        for sub in range(SUB_BUCKETS):
+            bounds.add(int(base + base * sub / SUB_BUCKETS))
+    return sorted(bounds)
+
+
+# Bucket i holds values in [BUCKET_BOUNDS[i-1], BUCKET_BOUNDS[i]).
+# Bucket 0 is (<1ms), bucket len(BUCKET_BOUNDS) is the overflow bucket.
+# Matches Postgres width_bucket(value, BUCKET_BOUNDS), so buckets can be computed in SQL.
+BUCKET_BOUNDS: list[int] = _build_bounds()
+
+
+def bucket_index(value_ms: float) -> int:
+    """Return the bucket index for a latency in milliseconds."""
+    return bisect_right(BUCKET_BOUNDS, value_ms)
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram (milliseconds).
+    Serialized sparsely as {"count", "sum_ms", "max_ms", "buckets": {index: count}}.
+    """
+
+    def __init__(self):
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, value_ms: float, count: int = 1):
+        """Record one (or `count`) observations of `value_ms`."""
+        if value_ms is None or count <= 0:
+            return
+        value_ms = max(float(value_ms), 0.0)
+        idx = bucket_index(value_ms)
+        self.buckets[idx] = self.buckets.get(idx, 0) + count
+        self.count += count
+        self.sum_ms += value_ms * count
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """Add another histogram's counts into this one (in place)."""
+        for idx, c in other.buckets.items():
+            self.buckets[idx] = self.buckets.get(idx, 0) + c
+        self.count += other.count
+        self.sum_ms += other.sum_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+        return self
+
+    @property
+    def mean_ms(self) -> float:
+        return self.sum_ms / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate the q-th quantile (0..1) in milliseconds.
+        Returns the upper bound of the bucket holding the target rank,
+        capped at the largest observed value.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if seen >= rank:
+                if idx >= len(BUCKET_BOUNDS):
+                    return self.max_ms
+                return float(min(BUCKET_BOUNDS[idx], self.max_ms))
+        return self.max_ms
+
+    def percentiles_sec(self) -> dict:
+        """p50/p90/p95/p99 in seconds, rounded for API responses."""
+        return {
+            name: round(self.quantile(q) / 1000.0, 2)
+            for name, q in PERCENTILES.items()
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+            "buckets": {str(idx): c for idx, c in sorted(self.buckets.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "LatencyHistogram":
+        hist = cls()
+        if not data:
+            return hist
+        hist.buckets = {int(idx): int(c) for idx, c in (data.get("buckets") or {}).items()}
+        hist.count = int(data.get("count") or 0)
+        hist.sum_ms = float(data.get("sum_ms") or 0)
+        hist.max_ms = float(data.get("max_ms") or 0)
+        return hist
+
+    @classmethod
+    def from_bucket_rows(cls, rows) -> "LatencyHistogram":
+        """
+        Build a sketch from pre-aggregated (bucket, count, sum_ms, max_ms) rows,
+        e.g. a SQL GROUP BY width_bucket(...) over raw latencies.
+        """
+        hist = cls()
+        for idx, c, sum_ms, max_ms in rows:
+            if not c:
+                continue
+            hist.buckets[int(idx)] = hist.buckets.get(int(idx), 0) + int(c)
+            hist.count += int(c)
+            hist.sum_ms += float(sum_ms or 0)
+            hist.max_ms = max(hist.max_ms, float(max_ms or 0))
+        return hist
+
+    @classmethod
+    def merge_all(cls, sketches) -> "LatencyHistogram":
+        """Merge an iterable of serialized sketches (None entries are skipped)."""
+        merged = cls()
+        for data in sketches:
+            if data:
+                merged.merge(cls.from_dict(data))
+        return merged
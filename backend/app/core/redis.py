@@ -8,6 +8,7 @@ class RedisClient:
     def __init__(self):
         self.redis_url = settings.redis_url
         self.client = None
+        self.binary_client = None
 
     async def connect(self):
         if not self.client:
@@ -21,6 +22,9 @@ class RedisClient:
         if self.client:
             await self.client.close()
             self.client = None
+        if self.binary_client:
+            await self.binary_client.close()
+            self.binary_client = None
 
     async def get(self, key: str):
         if not self.client:
@@ -32,16 +36,159 @@ class RedisClient:
             await self.connect()
         return await self.client.set(key, value, ex=expire)
         
-    async def delete(self, key: str):
+    async def delete(self, *keys: str):
         if not self.client:
             await self.connect()
-        return await self.client.delete(key)
+        return await self.client.delete(*keys)
+
+    async def exists(self, *keys: str):
+        if not self.client:
+            await self.connect()
+        return await self.client.exists(*keys)
+
+    # Binary values (app.services.export files); the main client decodes replies as UTF-8
+
+    def _binary(self):
+        if not self.binary_client:
+            self.binary_client = redis.from_url(self.redis_url, decode_responses=False)
+        return self.binary_client
+
+    async def set_bytes(self, key: str, value: bytes, expire: int = None):
+        return await self._binary().set(key, value, ex=expire)
+
+    async def get_bytes(self, key: str) -> bytes | None:
+        return await self._binary().get(key)
+
+    async def set_many_nx(self, keys: list[str], expire: int, value: str = "1"):
+        """SET NX EX for each key in one round trip; True where the key was newly set."""
+        if not self.client:
+            await self.connect()
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(key, value, ex=expire, nx=True)
+            return [bool(ok) for ok in await pipe.execute()]
+
+    async def set_nx(self, key: str, value: str, expire: int = None) -> bool:
+        if not self.client:
+            await self.connect()
+        return bool(await self.client.set(key, value, ex=expire, nx=True))
+
+    async def incr(self, key: str) -> int:
+        if not self.client:
+            await self.connect()
+        return await self.client.incr(key)
+
+    async def hincrby(self, key: str, field: str, amount: int = 1):
+        if not self.client:
+            await self.connect()
+        return await self.client.hincrby(key, field, amount)
+
+    async def hgetall(self, key: str):
+        if not self.client:
+            await self.connect()
+        return await self.client.hgetall(key)
         
     async def publish(self, channel: str, message: str):
         if not self.client:
             await self.connect()
         return await self.client.publish(channel, message)
 
+    # Streams (app.services.inbound_queue)
+
+    async def xadd(self, stream: str, fields: dict, maxlen: int | None = None):
+        if not self.client:
+            await self.connect()
+        return await self.client.xadd(stream, fields, maxlen=maxlen, approximate=True)
+
+    async def xadd_many(self, stream: str, entries: list[dict], maxlen: int | None = None):
+        """Append several entries in one round trip; returns their ids in order."""
+        if not self.client:
+            await self.connect()
+        async with self.client.pipeline(transaction=False) as pipe:
+            for fields in entries:
+                pipe.xadd(stream, fields, maxlen=maxlen, approximate=True)
+            return await pipe.execute()
+
+    async def xgroup_create(self, stream: str, group: str, id: str = "0"):
+        if not self.client:
+            await self.connect()
+        return await self.client.xgroup_create(stream, group, id=id, mkstream=True)
+
+    async def xreadgroup(self, group: str, consumer: str, streams: dict, count: int, block: int):
+        if not self.client:
+            await self.connect()
+        return await self.client.xreadgroup(group, consumer, streams, count=count, block=block)
+
+    async def xautoclaim(self, stream: str, group: str, consumer: str, min_idle_time: int, count: int):
+        if not self.client:
+            await self.connect()
+        return await self.client.xautoclaim(stream, group, consumer, min_idle_time, start_id="0-0", count=count)
+
+    async def xack_del(self, stream: str, group: str, entry_id: str):
+        """Acknowledge and remove an entry in one round trip."""
+        if not self.client:
+            await self.connect()
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.xack(stream, group, entry_id)
+            pipe.xdel(stream, entry_id)
+            return await pipe.execute()
+
+    async def xlen(self, stream: str):
+        if not self.client:
+            await self.connect()
+        return await self.client.xlen(stream)
+
+    async def xrange(self, stream: str, min: str = "-", max: str = "+", count: int | None = None):
+        if not self.client:
+            await self.connect()
+        return await self.client.xrange(stream, min=min, max=max, count=count)
+
+    async def xpending(self, stream: str, group: str):
+        if not self.client:
+            await self.connect()
+        return await self.client.xpending(stream, group)
+
+    async def xinfo_groups(self, stream: str):
+        if not self.client:
+            await self.connect()
+        return await self.client.xinfo_groups(stream)
+
+    async def eval(self, script: str, keys: list[str], args: list):
+        if not self.client:
+            await self.connect()
+        return await self.client.eval(script, len(keys), *keys, *args)
+
+    async def zadd(self, key: str, mapping: dict):
+        if not self.client:
+            await self.connect()
+        return await self.client.zadd(key, mapping)
+
+    async def zrangebyscore(self, key: str, min: float, max: float, count: int | None = None):
+        if not self.client:
+            await self.connect()
+        return await self.client.zrangebyscore(key, min, max, start=0 if count else None, num=count)
+
+    async def zrem(self, key: str, *members):
+        if not self.client:
+            await self.connect()
+        return await self.client.zrem(key, *members)
+
+    async def zcard(self, key: str):
+        if not self.client:
+            await self.connect()
+        return await self.client.zcard(key)
+
+    async def zcount(self, key: str, min: float, max: float):
+        if not self.client:
+            await self.connect()
+        return await self.client.zcount(key, min, max)
+
+    async def pubsub(self):
+        """A PubSub with no subscriptions yet (app.services.ws_registry adds them as sockets come and go)."""
+        if not self.client:
+            await self.connect()
+        return self.client.pubsub()
+
     async def subscribe(self, channel: str):
         if not self.client:
             await self.connect()
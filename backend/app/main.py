@@ -25,7 +25,11 @@ print(f"DEBUG: DATABASE_URL value (masked): {safe_url}")
 
 from app.routes import router
 from app.websockets import router as ws_router
+from app.services.ws_registry import connection_registry
 from app.services.scheduler import start_scheduler, shutdown_scheduler
+from app.services.email_transport import close_email_transport
+from app.services.whatsapp_sender import close_whatsapp_sender
+from app.services.report_templates import load_report_templates
 from app.limiter import limiter
 
 from slowapi import _rate_limit_exceeded_handler
@@ -54,17 +58,28 @@ async def lifespan(app: FastAPI):
     # Create tables if they don't exist (for development)
     if not settings.is_production:
         from app.models import Base
+        from app.services.partitions import ensure_partitions
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await ensure_partitions(conn)
             logger.info("Database tables created (dev mode)")
 
+    # Compile report templates once, before the scheduler can use them
+    load_report_templates()
+
     # Start scheduler
     await start_scheduler()
 
+    # Deliver cross-process pushes to guest sockets held by this process
+    await connection_registry.start()
+
     yield
 
     # Shutdown scheduler
     await shutdown_scheduler()
+    await connection_registry.stop()
+    await close_email_transport()
+    await close_whatsapp_sender()
     logger.info("Shutting down SheersSoft AI Engine")
 
 
@@ -19,8 +19,9 @@ from sqlalchemy import (
     Index,
     JSON,
     func,
+    text,
 )
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from pgvector.sqlalchemy import Vector
 
@@ -73,6 +74,9 @@ class Property(Base):
     plan_tier: Mapped[str] = mapped_column(String(20), default="pilot", server_default="pilot")
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, server_default="true")
     deleted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    report_locale: Mapped[str] = mapped_column(String(5), default="en", server_default="en")  # "en" | "ms"
+    report_branding: Mapped[dict | None] = mapped_column(JSON)
+    # Example: {"primary_color": "#7c2d12", "logo_url": "https://...", "footer": "..."}
 
     # Relationships
     conversations: Mapped[list["Conversation"]] = relationship(
@@ -124,6 +128,9 @@ class Conversation(Base):
     )
     ended_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     deleted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    # Denormalized first-reply markers, set when the first AI/staff message is written
+    first_ai_response_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    first_staff_response_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     message_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
     # Relationships
@@ -141,6 +148,7 @@ class Conversation(Base):
         Index("ix_conversations_property_status", "property_id", "status"),
         Index("ix_conversations_property_after_hours", "property_id", "is_after_hours"),
         Index("ix_conversations_guest", "property_id", "guest_identifier"),
+        Index("ix_conversations_property_started", "property_id", "started_at"),
     )
 
 
@@ -148,6 +156,9 @@ class Message(Base):
     """
     A single message within a conversation.
     role: 'guest' | 'ai' | 'staff'
+    Range-partitioned by month on sent_at (see app.services.partitions), so
+    sent_at is part of the primary key and is always the database clock:
+    a message is never stamped earlier than its conversation's started_at.
     """
     __tablename__ = "messages"
 
@@ -161,10 +172,16 @@ class Message(Base):
         String(10), nullable=False
     )  # "guest" | "ai" | "staff"
     content: Mapped[str] = mapped_column(Text, nullable=False)
-    metadata_: Mapped[dict | None] = mapped_column("metadata", JSON)
-    # Metadata can include: response_time_ms, llm_tokens_used, confidence_score
+    metadata_: Mapped[dict | None] = mapped_column("metadata", JSONB)
+    # Free-form context (channel, ai mode, confidence_score). Anything we aggregate on
+    # gets a typed column below instead.
+    response_time_ms: Mapped[int | None] = mapped_column(Integer)
+    prompt_tokens: Mapped[int | None] = mapped_column(Integer)
+    completion_tokens: Mapped[int | None] = mapped_column(Integer)
+    total_tokens: Mapped[int | None] = mapped_column(Integer)  # Only count kept for pre-split rows
+    model: Mapped[str | None] = mapped_column(String(50))
     sent_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now()
+        DateTime(timezone=True), primary_key=True, server_default=func.now()
     )
     deleted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
 
@@ -173,6 +190,13 @@ class Message(Base):
 
     __table_args__ = (
         Index("ix_messages_conversation", "conversation_id", "sent_at"),
+        Index(
+            "ix_messages_ai_conversation_sent",
+            "conversation_id",
+            "sent_at",
+            postgresql_where=text("role = 'ai'"),
+        ),
+        {"postgresql_partition_by": "RANGE (sent_at)"},
     )
 
 
@@ -221,6 +245,12 @@ class Lead(Base):
     __table_args__ = (
         Index("ix_leads_property_status", "property_id", "status"),
         Index("ix_leads_property_date", "property_id", "captured_at"),
+        Index(
+            "ix_leads_property_after_hours_date",
+            "property_id",
+            "is_after_hours",
+            "captured_at",
+        ),
     )
 
 
@@ -285,6 +315,11 @@ class AnalyticsDaily(Base):
     )
     channel_breakdown: Mapped[dict | None] = mapped_column(JSON)
     # Example: {"whatsapp": 29, "web": 14, "email": 4}
+    response_time_histogram: Mapped[dict | None] = mapped_column(JSON)
+    # Mergeable latency sketch (see app.core.histogram.LatencyHistogram)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )  # When the rollup row was last written
 
     # Relationships
     property: Mapped["Property"] = relationship(back_populates="analytics_daily")
@@ -297,3 +332,204 @@ class AnalyticsDaily(Base):
             unique=True,
         ),
     )
+
+
+class LeadEvent(Base):
+    """
+    A lead status transition (append-only history).
+    Written when a lead is captured and on every status change.
+    """
+    __tablename__ = "lead_events"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    lead_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("leads.id", ondelete="CASCADE"), nullable=False
+    )
+    property_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("properties.id"), nullable=False
+    )
+    from_status: Mapped[str | None] = mapped_column(String(20))  # None on capture
+    to_status: Mapped[str] = mapped_column(String(20), nullable=False)
+    changed_by: Mapped[str | None] = mapped_column(String(255))  # JWT subject, None for the AI
+    occurred_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+    __table_args__ = (
+        Index("ix_lead_events_lead_occurred", "lead_id", "occurred_at"),
+        Index("ix_lead_events_property_occurred", "property_id", "occurred_at"),
+    )
+
+
+class FunnelDaily(Base):
+    """
+    Inquiry → lead → contacted → converted funnel per property/day/channel/intent.
+    Maintained incrementally (see app.services.funnel); report_date is the day
+    the conversation started, so later status changes land in the inquiry's cohort.
+    """
+    __tablename__ = "funnel_daily"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
+        server_default=text("gen_random_uuid()"),  # rebuilds insert from SELECT
+    )
+    property_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("properties.id"), nullable=False
+    )
+    report_date: Mapped[date] = mapped_column(Date, nullable=False)
+    channel: Mapped[str] = mapped_column(String(20), nullable=False)
+    intent: Mapped[str] = mapped_column(String(30), nullable=False)
+    # "unqualified" until the conversation produces a lead
+    inquiries: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    leads_captured: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    leads_contacted: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    leads_converted: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    leads_lost: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    __table_args__ = (
+        Index(
+            "ix_funnel_property_date_channel_intent",
+            "property_id",
+            "report_date",
+            "channel",
+            "intent",
+            unique=True,
+        ),
+    )
+
+
+class JobRun(Base):
+    """
+    One execution of a scheduled job. The unique (job_name, scheduled_for)
+    row is the cluster-wide claim on a fire time: only the process that
+    inserts it runs the job (see app.services.job_runs).
+    """
+    __tablename__ = "job_runs"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    job_name: Mapped[str] = mapped_column(String(100), nullable=False)
+    scheduled_for: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    status: Mapped[str] = mapped_column(
+        String(20), default="running"
+    )  # "running" | "succeeded" | "failed"
+    owner: Mapped[str | None] = mapped_column(String(255))  # host:pid that holds the lease
+    started_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    duration_ms: Mapped[int | None] = mapped_column(Integer)
+    rows_affected: Mapped[int | None] = mapped_column(Integer)
+    error: Mapped[str | None] = mapped_column(Text)
+
+    __table_args__ = (
+        Index("ix_job_runs_job_scheduled", "job_name", "scheduled_for", unique=True),
+        Index("ix_job_runs_started", "started_at"),
+    )
+
+
+class InboundReceipt(Base):
+    """
+    One provider message id (WhatsApp wamid, email Message-ID) the worker has
+    processed. Inserted in the same transaction as the guest message; the
+    unique (channel, provider_message_id) index is the backstop behind the
+    Redis claim in app.services.idempotency.
+    """
+    __tablename__ = "inbound_receipts"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    channel: Mapped[str] = mapped_column(String(20), nullable=False)  # "whatsapp" | "email"
+    provider_message_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    received_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+    __table_args__ = (
+        Index("ix_inbound_receipts_channel_message", "channel", "provider_message_id", unique=True),
+        Index("ix_inbound_receipts_received", "received_at"),
+    )
+
+
+class OutboundMessage(Base):
+    """
+    Transactional outbox: one reply to deliver to a guest. Written in the same
+    commit as the AI Message it carries, then sent by the outbox dispatcher
+    (app.services.outbox), which also records provider delivery statuses here.
+    status: pending -> sending -> sent -> delivered -> read, or failed, or
+    unknown (the provider may have accepted it; not retried).
+    """
+    __tablename__ = "outbound_messages"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    property_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("properties.id"), nullable=False
+    )
+    conversation_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("conversations.id"), nullable=False
+    )
+    message_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True))  # messages.id (partitioned, no FK)
+    channel: Mapped[str] = mapped_column(String(20), nullable=False)  # "whatsapp" | "email"
+    recipient: Mapped[str] = mapped_column(String(255), nullable=False)
+    sender_id: Mapped[str | None] = mapped_column(String(100))  # WhatsApp phone_number_id to send from
+    subject: Mapped[str | None] = mapped_column(String(500))
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )  # Due time while pending; lease expiry while sending
+    last_error: Mapped[str | None] = mapped_column(Text)
+    provider_message_id: Mapped[str | None] = mapped_column(String(255))  # WhatsApp wamid
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    delivered_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    read_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index(
+            "ix_outbound_messages_due",
+            "next_attempt_at",
+            postgresql_where=text("status IN ('pending', 'sending')"),
+        ),
+        Index("ix_outbound_messages_provider_id", "provider_message_id", unique=True),
+        Index("ix_outbound_messages_conversation", "conversation_id"),
+        Index("ix_outbound_messages_created", "created_at"),
+    )
+
+
+class OutboundStatusEvent(Base):
+    """
+    A delivery status webhook (sent / delivered / read / failed) for an
+    outbound message, kept as received. Statuses can beat the dispatcher's
+    own commit of the provider id, so they are folded into
+    OutboundMessage.status from here rather than applied on arrival only.
+    """
+    __tablename__ = "outbound_status_events"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    provider_message_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False)
+    occurred_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    error: Mapped[str | None] = mapped_column(Text)
+    received_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+    __table_args__ = (
+        Index("ix_outbound_status_events_provider_id", "provider_message_id"),
+        Index("ix_outbound_status_events_received", "received_at"),
+    )
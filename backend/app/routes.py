@@ -9,10 +9,12 @@ Organized by the three user experiences:
 
 import json
 import uuid
+from collections import Counter
 from datetime import date, datetime, timedelta, timezone
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, BackgroundTasks, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, BackgroundTasks
+from fastapi.responses import StreamingResponse
 import structlog
 from sqlalchemy import select, func, case
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -31,17 +33,45 @@ from app.schemas import (
     KBIngestRequest,
     KBIngestResponse,
     AnalyticsSummaryResponse,
+    ExportRequest,
+    StaffReplyRequest,
 )
-from app.services.conversation import process_guest_message
+from app.services.conversation import add_staff_message, history_query, process_guest_message
 from app.services import ingest_knowledge_base
 from app.services.whatsapp import send_whatsapp_message
 from app.services.email import send_email, notify_staff_handoff
 from app.services.email import send_email, notify_staff_handoff, notify_staff_handoff_enhanced, normalize_email_message
 from app.limiter import limiter
-from app.auth import verify_jwt, verify_whatsapp_signature, verify_sendgrid_signature, check_property_access
+from app.auth import (
+    verify_jwt,
+    whatsapp_webhook_payload,
+    sendgrid_webhook_form,
+    check_property_access,
+    accessible_property_ids,
+    require_admin,
+)
 from app.core.normalization import NormalizedMessage
-from app.services.whatsapp import send_whatsapp_message, normalize_whatsapp_message
-from app.services.analytics import get_realtime_stats
+from app.services.whatsapp import send_whatsapp_message, iter_whatsapp_events
+from app.services import analytics as analytics_service
+from app.services.analytics import get_realtime_stats, get_analytics_range
+from app.services.funnel import get_funnel, record_lead_status_change
+from app.services.job_runs import list_job_runs
+from app.services.inbound_queue import InboundJob, inbound_queue
+from app.services.idempotency import inbound_dedupe
+from app.services.outbox import enqueue_reply, outbox_stats, record_status_events
+from app.services.ws_registry import guest_online, push_to_conversation
+from app.services.export import (
+    EXPORT_TABLES,
+    FORMATS as EXPORT_FORMATS,
+    create_export_job,
+    export_files,
+    export_jobs,
+    run_export_job,
+)
+from app.services.analytics_cache import cached_rollup_response, cached_live_response, range_ttl, portfolio_scope
+from app.config import get_settings
+
+settings = get_settings()
 
 logger = structlog.get_logger()
 router = APIRouter(prefix="/api/v1")
@@ -73,210 +103,128 @@ async def list_properties(
 @limiter.limit("3000/minute")
 async def whatsapp_webhook(
     request: Request,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
-    # Signature verification
-    _: None = Depends(verify_whatsapp_signature)
+    # Body read once, signature-checked and parsed
+    body: dict = Depends(whatsapp_webhook_payload),
 ):
     """
     WhatsApp Cloud API webhook receiver.
     Handles verification (GET) and incoming messages (POST).
     """
-    body = await request.json()
 
-    # 1. Normalize payload
-    normalized_data = normalize_whatsapp_message(body)
-    
-    if not normalized_data:
-        # Not a valid message (could be a status update or other event we don't handle yet)
-        return {"status": "ignored"}
+    # 1. Normalize every event in the delivery (Meta batches them under load)
+    events = list(iter_whatsapp_events(body))
+    messages = [e for e in events if e["kind"] == "text"]
+    skipped = Counter(e["kind"] for e in events if e["kind"] != "text")
+    if skipped:
+        logger.info("WhatsApp webhook: events not queued", **skipped)
 
-    # 2. Find property by WhatsApp Phone Number ID
-    phone_number_id = normalized_data["metadata"].get("phone_number_id")
-    
-    prop_result = await db.execute(
-        select(Property).where(Property.whatsapp_number == phone_number_id)
-    )
-    prop = prop_result.scalar_one_or_none()
+    # Delivery receipts for replies sent from the outbox
+    statuses = [e for e in events if e["kind"] == "status"]
+    if statuses:
+        await record_status_events(db, statuses)
 
-    if not prop:
-        logger.warning("WhatsApp webhook: Property not found", phone_id=phone_number_id)
-        return {"status": "property_not_found"}
-
-    # 3. Process in background
-    background_tasks.add_task(
-        _handle_whatsapp_message_async,
-        property_id=prop.id,
-        from_number=normalized_data["guest_identifier"],
-        text=normalized_data["content"],
-        guest_name=normalized_data["guest_name"]
-    )
-
-    return {"status": "processing"}
+    if not messages:
+        # Only status receipts / media we don't answer yet
+        return {"status": "ignored"}
 
+    # Drop Meta's retries of messages we already have, before any other work
+    fresh = await inbound_dedupe.claim("whatsapp", [m["metadata"]["whatsapp_message_id"] for m in messages])
+    messages = [m for m, is_new in zip(messages, fresh) if is_new]
+    if not messages:
+        return {"status": "duplicate"}
 
-async def _handle_whatsapp_message_async(
-    property_id: uuid.UUID,
-    from_number: str,
-    text: str,
-    guest_name: str | None
-):
-    """
-    Background task to process WhatsApp message and send reply.
-    """
-    # Create a new DB session for the background task
-    from app.database import async_session, set_db_context
-    
-    async with async_session() as db:
-        try:
-            # Set RLS context for this property
-            await set_db_context(db, str(property_id))
-
-            result = await process_guest_message(
-                db=db,
-                property_id=property_id,
-                guest_identifier=from_number,
-                channel="whatsapp",
-                message_text=text,
-                guest_name=guest_name,
-            )
-            
-            await db.commit()
-            
-            # Send response back via WhatsApp API
-            response_text = result["response"]
-            await send_whatsapp_message(to_number=from_number, message_text=response_text)
-            
-            # Notify staff if handoff triggered
-            if result.get("mode") == "handoff":
-                await notify_staff_handoff_enhanced(
-                    property_id=str(property_id),
-                    conversation_id=result["conversation_id"],
-                    guest_identifier=from_number,
-                    channel="whatsapp",
-                    guest_name=guest_name,
-                    conversation_summary=f"Last message: {text}\nAI Reply: {response_text}"
-                )
-            
-        except Exception as e:
-            logger.error(
-                "Error processing WhatsApp message",
-                error=str(e),
-                property_id=str(property_id),
-                from_number=from_number
+    try:
+        # 2. Resolve properties for the whole batch by WhatsApp Phone Number ID
+        phone_number_ids = {m["metadata"]["phone_number_id"] for m in messages}
+        prop_result = await db.execute(
+            select(Property.whatsapp_number, Property.id).where(Property.whatsapp_number.in_(phone_number_ids))
+        )
+        property_ids = {number: str(pid) for number, pid in prop_result.all()}
+
+        unknown = phone_number_ids - property_ids.keys()
+        if unknown:
+            logger.warning("WhatsApp webhook: Property not found", phone_ids=sorted(unknown, key=str))
+
+        # 3. Queue for the inbound worker (app.worker), one round trip
+        jobs = [
+            InboundJob(
+                kind="whatsapp",
+                property_id=property_ids[m["metadata"]["phone_number_id"]],
+                guest_identifier=m["guest_identifier"],
+                content=m["content"],
+                guest_name=m["guest_name"],
+                message_id=m["metadata"]["whatsapp_message_id"],
+                phone_number_id=m["metadata"]["phone_number_id"],
             )
+            for m in messages
+            if m["metadata"]["phone_number_id"] in property_ids
+        ]
+        if not jobs:
+            return {"status": "property_not_found"}
+
+        await inbound_queue.enqueue_many(jobs)
+    except Exception:
+        # Not queued (lookup or enqueue failed): let Meta's retry through
+        await inbound_dedupe.release("whatsapp", [m["metadata"]["whatsapp_message_id"] for m in messages])
+        raise
+    return {"status": "processing"}
 
 
 @router.post("/webhook/email", response_model=None)
 @limiter.limit("100/minute")
 async def email_webhook(
-    background_tasks: BackgroundTasks,
-    subject: str = Form(None),
-    text: str = Form(None),
-    html: str = Form(None),
-    to: str = Form(None),
-    sender: str = Form(None),  # SendGrid sends 'from' as 'sender' or 'from' depending on config due to Python keyword? No, it sends 'from'.
-    # But 'from' is a reserved keyword in Python.
-    # FastAPI handles this via alias? No.
-    # We need to access via request.form() because 'from' is a keyword.
-    request: Request = None,
-    # Verification (Optional but recommended)
-    _ = Depends(verify_sendgrid_signature),
+    request: Request,
+    # Body read once, signature-checked, then parsed as multipart.
+    # ('from' is a Python keyword, so fields are read from the dict.)
+    form_data: dict = Depends(sendgrid_webhook_form),
     db: AsyncSession = Depends(get_db)
 ):
     """
     SendGrid Inbound Parse webhook receiver.
     Parses multipart/form-data.
     """
-    form_data = await request.form()
-    
     # 1. Normalize
-    normalized_data = normalize_email_message(dict(form_data))
+    normalized_data = normalize_email_message(form_data)
     
     if not normalized_data:
         return {"status": "ignored"}
-        
-    # 2. Find property by To address
-    # In normalized data, we put to_address in metadata
-    to_address = normalized_data["metadata"].get("to_address")
-    
-    prop_result = await db.execute(
-        select(Property).where(Property.notification_email == to_address)
-    )
-    prop = prop_result.scalar_one_or_none()
-    
-    if not prop:
-        logger.warning("Email webhook: Property not found", to_address=to_address)
-        return {"status": "no_property"}
-
-    # 3. Process
-    background_tasks.add_task(
-        _handle_email_message_async,
-        property_id=prop.id,
-        from_address=normalized_data["guest_identifier"],
-        subject=normalized_data["metadata"].get("subject"),
-        text=normalized_data["content"], # content includes subject preamble
-        guest_name=normalized_data["guest_name"]
-    )
 
-    return {"status": "processing"}
+    # Drop SendGrid's retries of a message we already have
+    message_id = normalized_data["metadata"].get("message_id")
+    if not (await inbound_dedupe.claim("email", [message_id]))[0]:
+        return {"status": "duplicate"}
 
+    try:
+        # 2. Find property by To address
+        # In normalized data, we put to_address in metadata
+        to_address = normalized_data["metadata"].get("to_address")
 
-async def _handle_email_message_async(
-    property_id: uuid.UUID,
-    from_address: str, # renamed from guest_email to match usage
-    subject: str,
-    text: str, # this is now the full content
-    guest_name: str | None
-):
-    """
-    Background task to process inbound email and send reply.
-    """
-    from app.database import async_session, set_db_context
-    
-    async with async_session() as db:
-        try:
-            # Set RLS context
-            await set_db_context(db, str(property_id))
-            
-            result = await process_guest_message(
-                db=db,
-                property_id=property_id,
-                guest_identifier=from_address,
-                channel="email",
-                message_text=text,
-                guest_name=guest_name,
-            )
-            
-            await db.commit()
-            
-            response_text = result["response"]
-            
-            # Send reply
-            await send_email(
-                to_email=from_address,
-                subject=f"Re: {subject}",
-                content=response_text
-            )
+        prop_result = await db.execute(
+            select(Property).where(Property.notification_email == to_address)
+        )
+        prop = prop_result.scalar_one_or_none()
+
+        if not prop:
+            logger.warning("Email webhook: Property not found", to_address=to_address)
+            return {"status": "no_property"}
+
+        # 3. Queue for the inbound worker (app.worker)
+        await inbound_queue.enqueue(InboundJob(
+            kind="email",
+            property_id=str(prop.id),
+            guest_identifier=normalized_data["guest_identifier"],
+            subject=normalized_data["metadata"].get("subject"),
+            content=normalized_data["content"],  # content includes subject preamble
+            guest_name=normalized_data["guest_name"],
+            message_id=message_id,
+        ))
+    except Exception:
+        # Not queued (lookup or enqueue failed): let SendGrid's retry through
+        await inbound_dedupe.release("email", [message_id])
+        raise
 
-            # Notify staff if handoff triggered
-            if result.get("mode") == "handoff":
-                await notify_staff_handoff_enhanced(
-                    property_id=str(property_id),
-                    conversation_id=result["conversation_id"],
-                    guest_identifier=from_address,
-                    channel="email",
-                    guest_name=guest_name,
-                    conversation_summary=f"Message: {text}\n\nAI Reply: {response_text}"
-                )
-            
-        except Exception as e:
-            logger.error(
-                "Error processing email message",
-                error=str(e),
-                property_id=str(property_id),
-                guest_email=from_address
-            )
+    return {"status": "processing"}
 
 
 @router.get("/webhook/whatsapp")
@@ -434,6 +382,11 @@ async def get_conversation(
                 "content": m.content,
                 "sent_at": m.sent_at.isoformat(),
                 "metadata": m.metadata_,
+                "response_time_ms": m.response_time_ms,
+                "prompt_tokens": m.prompt_tokens,
+                "completion_tokens": m.completion_tokens,
+                "total_tokens": m.total_tokens,
+                "model": m.model,
             }
             for m in conv.messages
         ],
@@ -489,6 +442,25 @@ async def get_dashboard_stats(
     return stats
 
 
+@router.get("/analytics/portfolio")
+async def get_portfolio_stats(
+    request: Request,
+    user: dict = Depends(verify_jwt),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Live stats for today across every property in the caller's token.
+    Returns per-property stats plus combined portfolio totals; super admins
+    ("*") see all active properties.
+    """
+    property_ids = accessible_property_ids(user)
+
+    async def build():
+        return await analytics_service.get_portfolio_stats(db, property_ids)
+
+    return await cached_live_response(request, portfolio_scope(property_ids), build)
+
+
 # ─────────────────────────────────────────────────────────────
 # GM: Leads
 # ─────────────────────────────────────────────────────────────
@@ -555,7 +527,8 @@ async def update_lead(
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
 
-    if body.status:
+    if body.status and body.status != lead.status:
+        await record_lead_status_change(db, lead, lead.status, body.status, changed_by=token.get("sub"))
         lead.status = body.status
     if body.notes is not None:
         lead.notes = body.notes
@@ -579,15 +552,18 @@ async def update_lead(
 
 @router.get("/properties/{property_id}/analytics")
 async def get_analytics(
+    request: Request,
     property_id: str,
     from_date: date = Query(None),
     to_date: date = Query(None),
+    granularity: str = Query("day", pattern="^(day|week|month)$"),
     db: AsyncSession = Depends(get_db),
     token: dict = Depends(check_property_access),
 ):
     """
     Get analytics for a property over a date range.
     Used by the GM dashboard Money View and Operations View.
+    Supports conditional GET (ETag).
     """
     pid = uuid.UUID(property_id)
 
@@ -596,63 +572,22 @@ async def get_analytics(
     if not to_date:
         to_date = date.today()
 
-    # Get daily analytics
-    result = await db.execute(
-        select(AnalyticsDaily)
-        .where(
-            AnalyticsDaily.property_id == pid,
-            AnalyticsDaily.report_date >= from_date,
-            AnalyticsDaily.report_date <= to_date,
-        )
-        .order_by(AnalyticsDaily.report_date)
-    )
-    daily_records = result.scalars().all()
-
-    # Aggregate totals
-    totals = {
-        "total_inquiries": sum(r.total_inquiries for r in daily_records),
-        "after_hours_inquiries": sum(r.after_hours_inquiries for r in daily_records),
-        "after_hours_responded": sum(r.after_hours_responded for r in daily_records),
-        "leads_captured": sum(r.leads_captured for r in daily_records),
-        "handoffs": sum(r.handoffs for r in daily_records),
-        "estimated_revenue_recovered": float(
-            sum(r.estimated_revenue_recovered for r in daily_records)
-        ),
-    }
-    total_response_times = [
-        float(r.avg_response_time_sec)
-        for r in daily_records
-        if r.avg_response_time_sec > 0
-    ]
-    totals["avg_response_time_sec"] = (
-        sum(total_response_times) / len(total_response_times)
-        if total_response_times
-        else 0
-    )
-
-    # Daily breakdown for charts
-    daily = [
-        {
-            "date": r.report_date.isoformat(),
-            "total_inquiries": r.total_inquiries,
-            "after_hours_inquiries": r.after_hours_inquiries,
-            "leads_captured": r.leads_captured,
-            "estimated_revenue_recovered": float(r.estimated_revenue_recovered),
-            "channel_breakdown": r.channel_breakdown,
-        }
-        for r in daily_records
-    ]
+    async def build():
+        return await get_analytics_range(db, pid, from_date, to_date, granularity)
 
-    return {
-        "property_id": property_id,
-        "period": {"from": from_date.isoformat(), "to": to_date.isoformat()},
-        "totals": totals,
-        "daily": daily,
-    }
+    return await cached_rollup_response(
+        request,
+        pid,
+        endpoint="range",
+        range_key=f"{from_date.isoformat()}:{to_date.isoformat()}:{granularity}",
+        ttl=range_ttl(to_date),
+        build=build,
+    )
 
 
 @router.get("/properties/{property_id}/analytics/live")
 async def get_analytics_live(
+    request: Request,
     property_id: str,
     db: AsyncSession = Depends(get_db),
     token: dict = Depends(verify_jwt),
@@ -660,9 +595,155 @@ async def get_analytics_live(
     """
     Get real-time analytics for the current day.
     """
-    from app.services.analytics import get_realtime_stats
-    stats = await get_realtime_stats(db, uuid.UUID(property_id))
-    return stats
+    pid = uuid.UUID(property_id)
+
+    async def build():
+        return await get_realtime_stats(db, pid)
+
+    return await cached_live_response(request, pid, build)
+
+
+@router.get("/properties/{property_id}/analytics/funnel")
+async def get_analytics_funnel(
+    property_id: str,
+    from_date: date = Query(None),
+    to_date: date = Query(None),
+    db: AsyncSession = Depends(get_db),
+    token: dict = Depends(check_property_access),
+):
+    """
+    Inquiry → lead → contacted → converted funnel by channel and intent.
+    Reads the precomputed funnel_daily rollup (cohorted by inquiry date).
+    """
+    if not from_date:
+        from_date = date.today() - timedelta(days=30)
+    if not to_date:
+        to_date = date.today()
+
+    return await get_funnel(db, uuid.UUID(property_id), from_date, to_date)
+
+
+# ─────────────────────────────────────────────────────────────
+# Data Export
+# ─────────────────────────────────────────────────────────────
+
+@router.post("/properties/{property_id}/exports", status_code=202)
+async def create_export(
+    property_id: str,
+    body: ExportRequest,
+    background_tasks: BackgroundTasks,
+    token: dict = Depends(check_property_access),
+):
+    """
+    Start a bulk columnar export (Parquet or Arrow IPC) for a date range.
+    Poll the returned job and download each table once it completes.
+    """
+    if body.to_date < body.from_date:
+        raise HTTPException(status_code=422, detail="to_date must not be before from_date")
+    unknown = set(body.tables or []) - set(EXPORT_TABLES)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown export tables: {sorted(unknown)}")
+
+    job = await create_export_job(
+        uuid.UUID(property_id), body.from_date, body.to_date, body.tables, body.format
+    )
+    background_tasks.add_task(run_export_job, job["id"])
+    return _export_job_view(job)
+
+
+async def _get_export_job(property_id: str, job_id: str) -> dict:
+    job = await export_jobs.get(job_id)
+    if not job or job["property_id"] != str(uuid.UUID(property_id)):
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
+
+
+def _export_job_view(job: dict) -> dict:
+    """Job status for the API: file paths are replaced by download URLs."""
+    view = {k: v for k, v in job.items() if k != "manifest"}
+    if job.get("manifest"):
+        view["files"] = {
+            table: {
+                "rows": entry["rows"],
+                "bytes": entry["bytes"],
+                "download_url": f"/api/v1/properties/{job['property_id']}/exports/{job['id']}/files/{table}",
+            }
+            for table, entry in job["manifest"].items()
+        }
+    return view
+
+
+@router.get("/properties/{property_id}/exports/{job_id}")
+async def get_export(
+    property_id: str,
+    job_id: str,
+    token: dict = Depends(check_property_access),
+):
+    """Export job status (queued | running | completed | failed)."""
+    return _export_job_view(await _get_export_job(property_id, job_id))
+
+
+@router.get("/properties/{property_id}/exports/{job_id}/files/{table}")
+async def download_export_file(
+    property_id: str,
+    job_id: str,
+    table: str,
+    token: dict = Depends(check_property_access),
+):
+    """Download one exported table file (streamed from Redis, so any node can serve it)."""
+    job = await _get_export_job(property_id, job_id)
+    entry = (job.get("manifest") or {}).get(table)
+    if (
+        job["status"] != "completed"
+        or not entry
+        or not await export_files.exists(job["id"], table, entry["chunks"])
+    ):
+        raise HTTPException(status_code=404, detail="Export file not available")
+
+    extension, media_type = EXPORT_FORMATS[job["format"]]
+    return StreamingResponse(
+        export_files.stream(job["id"], table, entry["chunks"]),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{table}{extension}"',
+            "Content-Length": str(entry["bytes"]),
+        },
+    )
+
+
+# ─────────────────────────────────────────────────────────────
+# Admin: Scheduled Jobs and Queues
+# ─────────────────────────────────────────────────────────────
+
+@router.get("/admin/jobs/runs")
+async def get_job_runs(
+    job_name: str = Query(None),
+    limit: int = Query(50, le=500),
+    db: AsyncSession = Depends(get_db),
+    token: dict = Depends(require_admin),
+):
+    """Scheduled job run history (start, end, duration, rows affected), newest first."""
+    return await list_job_runs(db, job_name=job_name, limit=limit)
+
+
+@router.get("/admin/queue/stats")
+async def get_inbound_queue_stats(
+    token: dict = Depends(require_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Inbound queue depth, pending (in-flight) jobs, lag, retries, dead letters
+    and suppressed duplicates, plus outbound reply outbox status counts.
+    """
+    try:
+        return {
+            **(await inbound_queue.stats()),
+            "duplicates_suppressed": await inbound_dedupe.counters(),
+            "outbox": await outbox_stats(db),
+        }
+    except Exception as e:
+        logger.error("Inbound queue stats unavailable", error=str(e))
+        raise HTTPException(status_code=503, detail="Queue unavailable")
 
 
 # ─────────────────────────────────────────────────────────────
@@ -739,6 +820,8 @@ async def create_property(
         operating_hours=body.operating_hours,
         adr=Decimal(str(body.adr)),
         ota_commission_pct=Decimal(str(body.ota_commission_pct)),
+        report_locale=body.report_locale,
+        report_branding=body.report_branding,
     )
     db.add(prop)
     await db.flush()
@@ -860,7 +943,79 @@ async def takeover_conversation(
     conv.ai_mode = "staff"
     conv.status = "active"
     await db.flush()
-    return {"status": "staff_takeover", "conversation_id": conversation_id}
+
+    # Tell the guest's widget, on whichever node holds the socket
+    if conv.channel == "web":
+        await push_to_conversation(conversation_id, {"type": "staff_joined"})
+    return {
+        "status": "staff_takeover",
+        "conversation_id": conversation_id,
+        "guest_online": conv.channel == "web" and await guest_online(conversation_id),
+    }
+
+
+async def _email_reply_subject(db: AsyncSession, conv: Conversation) -> str:
+    """Reply on the guest's thread: the subject of their latest email."""
+    result = await db.execute(
+        history_query(conv).where(Message.role == "guest").limit(1)
+    )
+    last = result.scalars().first()
+    if last and last.content.startswith("Subject: "):
+        subject = last.content.partition("\n")[0].removeprefix("Subject: ")
+        return f"Re: {subject}"
+    return "Re: Your enquiry"
+
+
+@router.post("/conversations/{conversation_id}/reply", status_code=201)
+async def staff_reply(
+    conversation_id: str,
+    body: StaffReplyRequest,
+    db: AsyncSession = Depends(get_db),
+    token: dict = Depends(verify_jwt),
+):
+    """
+    Staff sends a message to the guest. Stored as a staff message (which
+    records the conversation's first staff response); web guests get it on
+    their socket, WhatsApp and email replies go through the outbox.
+    """
+    result = await db.execute(
+        select(Conversation).where(Conversation.id == uuid.UUID(conversation_id))
+    )
+    conv = result.scalar_one_or_none()
+    if not conv:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    # Same rule as the property-scoped routes; the property comes from the conversation
+    await check_property_access(str(conv.property_id), token)
+    if conv.status == "resolved":
+        raise HTTPException(status_code=409, detail="Conversation is resolved")
+
+    msg = await add_staff_message(db, conv, body.message, sender=token.get("sub"))
+    if conv.channel in ("whatsapp", "email"):
+        enqueue_reply(
+            db,
+            property_id=conv.property_id,
+            conversation_id=conv.id,
+            message_id=msg.id,
+            channel=conv.channel,
+            recipient=conv.guest_identifier,
+            body=body.message,
+            subject=await _email_reply_subject(db, conv) if conv.channel == "email" else None,
+        )
+    # Commit before pushing, so the guest never sees a reply we failed to store
+    await db.commit()
+
+    delivery = "queued"
+    if conv.channel == "web":
+        pushed = await push_to_conversation(
+            conversation_id, {"type": "message", "text": body.message, "sender": "staff"}
+        )
+        delivery = "pushed" if pushed else "guest_offline"
+    return {
+        "message_id": str(msg.id),
+        "conversation_id": conversation_id,
+        "sent_at": msg.sent_at.isoformat(),
+        "delivery": delivery,
+    }
 
 
 @router.get("/leads/{lead_id}", response_model=LeadResponse)
@@ -892,6 +1047,7 @@ async def get_lead(
 
 @router.get("/properties/{property_id}/analytics/summary", response_model=AnalyticsSummaryResponse)
 async def get_analytics_summary(
+    request: Request,
     property_id: str,
     db: AsyncSession = Depends(get_db),
     token: dict = Depends(check_property_access),
@@ -899,31 +1055,18 @@ async def get_analytics_summary(
     """Get aggregated analytics summary (hero stats)."""
     pid = uuid.UUID(property_id)
     from_date = date.today() - timedelta(days=30)
-    
-    result = await db.execute(
-        select(AnalyticsDaily)
-        .where(
-            AnalyticsDaily.property_id == pid,
-            AnalyticsDaily.report_date >= from_date
-        )
-    )
-    daily_records = result.scalars().all()
-    
-    avg_resp = 0
-    if daily_records:
-        resps = [float(r.avg_response_time_sec) for r in daily_records if r.avg_response_time_sec > 0]
-        if resps:
-            avg_resp = sum(resps) / len(resps)
-            
-    return AnalyticsSummaryResponse(
-        total_inquiries=sum(r.total_inquiries for r in daily_records),
-        after_hours_inquiries=sum(r.after_hours_inquiries for r in daily_records),
-        after_hours_responded=sum(r.after_hours_responded for r in daily_records),
-        leads_captured=sum(r.leads_captured for r in daily_records),
-        handoffs=sum(r.handoffs for r in daily_records),
-        avg_response_time_sec=avg_resp,
-        estimated_revenue_recovered=float(sum(r.estimated_revenue_recovered for r in daily_records)),
-        channel_breakdown={}
+
+    async def build():
+        summary = await analytics_service.get_analytics_summary(db, pid, from_date)
+        return AnalyticsSummaryResponse(**summary).model_dump()
+
+    return await cached_rollup_response(
+        request,
+        pid,
+        endpoint="summary",
+        range_key=from_date.isoformat(),
+        ttl=settings.analytics_cache_ttl_today,
+        build=build,
     )
 
 
@@ -3,7 +3,7 @@ API route schemas — Pydantic models for request/response validation.
 """
 
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 from pydantic import BaseModel, Field
 
@@ -25,6 +25,11 @@ class ConversationResponse(BaseModel):
     lead_created: bool
 
 
+class StaffReplyRequest(BaseModel):
+    """Staff reply to a guest from the dashboard."""
+    message: str = Field(..., min_length=1, max_length=4000)
+
+
 class WebChatStartRequest(BaseModel):
     """Start a new web chat conversation."""
     property_id: str
@@ -83,6 +88,8 @@ class PropertyCreateRequest(BaseModel):
     operating_hours: dict | None = None
     adr: float = 230.00
     ota_commission_pct: float = 20.00
+    report_locale: str = Field("en", pattern="^(en|ms)$")
+    report_branding: dict | None = None
 
 
 # ─── Knowledge Base ───
@@ -111,10 +118,23 @@ class AnalyticsSummaryResponse(BaseModel):
     leads_captured: int
     handoffs: int
     avg_response_time_sec: float
+    p50_response_time_sec: float = 0
+    p90_response_time_sec: float = 0
+    p95_response_time_sec: float = 0
+    p99_response_time_sec: float = 0
     estimated_revenue_recovered: float
     channel_breakdown: dict | None
 
 
+# ─── Export ───
+
+class ExportRequest(BaseModel):
+    from_date: date
+    to_date: date
+    tables: list[str] | None = None  # Default: conversations, messages, leads, analytics_daily
+    format: str = Field("parquet", pattern="^(parquet|arrow)$")
+
+
 # ─── Auth ───
 
 class LoginRequest(BaseModel):
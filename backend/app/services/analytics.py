@@ -7,10 +7,14 @@ Populates the analytics_daily table for dashboard and email reports.
 import uuid
 from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from sqlalchemy import select, func, case, and_, text
+from sqlalchemy import select, func, case, and_, or_, text, literal, cast, true, Integer, Date
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import get_settings
+from app.core.histogram import LatencyHistogram, BUCKET_BOUNDS
 from app.models import (
     Property,
     Conversation,
@@ -20,25 +24,145 @@ from app.models import (
 )
 
 
+settings = get_settings()
+
+
+# ─────────────────────────────────────────────────────────────
+# Property-local days
+# ─────────────────────────────────────────────────────────────
+# A property's "day" is midnight-to-midnight in Property.timezone. Windows are
+# converted to UTC instants in Python so the SQL stays a plain
+# `started_at >= :start AND started_at < :end` range on the indexed column
+# (no AT TIME ZONE on the column side). DST days are 23 or 25 hours long.
+
+def property_zone(tz_name: str | None) -> ZoneInfo:
+    """ZoneInfo for a property, falling back to settings.timezone for unknown names."""
+    try:
+        return ZoneInfo(tz_name or settings.timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(settings.timezone)
+
+
+def local_today(tz_name: str | None, now: datetime | None = None) -> date:
+    return (now or datetime.now(timezone.utc)).astimezone(property_zone(tz_name)).date()
+
+
+def local_day_window(report_date: date, tz_name: str | None) -> tuple[datetime, datetime]:
+    """[start, end) of a local calendar day, as UTC datetimes."""
+    zone = property_zone(tz_name)
+    start = datetime.combine(report_date, datetime.min.time(), tzinfo=zone)
+    end = datetime.combine(report_date + timedelta(days=1), datetime.min.time(), tzinfo=zone)
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+
+
+async def _property_timezone(db: AsyncSession, property_id: uuid.UUID) -> str | None:
+    result = await db.execute(select(Property.timezone).where(Property.id == property_id))
+    return result.scalar()
+
+
+def _response_time_histogram_query(
+    property_id: uuid.UUID,
+    window_start: datetime,
+    window_end: datetime | None = None,
+):
+    bucket = func.width_bucket(
+        Message.response_time_ms, literal(BUCKET_BOUNDS, ARRAY(Integer))
+    )
+    conditions = [
+        Conversation.property_id == property_id,
+        Conversation.started_at >= window_start,
+        # A message is never older than its conversation, so this is implied by
+        # the line above; spelling it out lets Postgres prune message partitions.
+        Message.sent_at >= window_start,
+        Message.role == "ai",
+        Message.response_time_ms.isnot(None),
+    ]
+    if window_end is not None:
+        conditions.append(Conversation.started_at < window_end)
+
+    return (
+        select(
+            bucket,
+            func.count(),
+            func.sum(Message.response_time_ms),
+            func.max(Message.response_time_ms),
+        )
+        .join(Conversation, Conversation.id == Message.conversation_id)
+        .where(*conditions)
+        .group_by(bucket)
+    )
+
+
+async def _response_time_histogram(
+    db: AsyncSession,
+    property_id: uuid.UUID,
+    window_start: datetime,
+    window_end: datetime | None = None,
+) -> LatencyHistogram:
+    """
+    Build the latency sketch for AI replies in conversations started within the window.
+    Bucketing happens in Postgres (width_bucket over the same bounds as the Python
+    sketch), so only one row per non-empty bucket comes back.
+    """
+    result = await db.execute(_response_time_histogram_query(property_id, window_start, window_end))
+    return LatencyHistogram.from_bucket_rows(result.fetchall())
+
+
+async def _after_hours_revenue(
+    db: AsyncSession,
+    property_id: uuid.UUID,
+    window_start: datetime,
+    window_end: datetime | None = None,
+) -> Decimal:
+    """
+    Estimated revenue recovered from after-hours leads captured in the window:
+    SUM(COALESCE(estimated_value, ADR)) x conversion rate.
+    Lead.is_after_hours is stamped at capture time, so this is a single
+    aggregate over ix_leads_property_after_hours_date with no conversation join.
+    """
+    prop_result = await db.execute(
+        select(Property.adr, Property.conversion_rate).where(Property.id == property_id)
+    )
+    prop_row = prop_result.first()
+    adr = (prop_row.adr if prop_row else None) or Decimal("230")
+    conversion_rate = (prop_row.conversion_rate if prop_row else None) or Decimal("0.20")
+
+    conditions = [
+        Lead.property_id == property_id,
+        Lead.is_after_hours == True,
+        Lead.captured_at >= window_start,
+    ]
+    if window_end is not None:
+        conditions.append(Lead.captured_at < window_end)
+
+    revenue_result = await db.execute(
+        select(
+            func.coalesce(func.sum(func.coalesce(Lead.estimated_value, adr)), 0)
+        ).where(*conditions)
+    )
+    total_revenue = Decimal(revenue_result.scalar() or 0)
+    return total_revenue * conversion_rate
+
+
 async def compute_daily_analytics(
     db: AsyncSession,
     property_id: uuid.UUID,
     report_date: date,
+    tz_name: str | None = None,
 ) -> AnalyticsDaily:
     """
     Compute analytics for a single property for a single day.
     Uses raw conversation and lead data to build aggregates.
 
+    report_date is a calendar day in the property's timezone (tz_name, looked
+    up from the property when not given).
+
     This is called by the daily cron job and can also be called
     retroactively to backfill analytics.
     """
-    # Date range for the report day
-    day_start = datetime.combine(report_date, datetime.min.time()).replace(
-        tzinfo=timezone.utc
-    )
-    day_end = datetime.combine(report_date + timedelta(days=1), datetime.min.time()).replace(
-        tzinfo=timezone.utc
-    )
+    if tz_name is None:
+        tz_name = await _property_timezone(db, property_id)
+    day_start, day_end = local_day_window(report_date, tz_name)
 
     # 1. Total inquiries (conversations started on this day)
     total_result = await db.execute(
@@ -61,16 +185,14 @@ async def compute_daily_analytics(
     )
     after_hours_inquiries = after_hours_result.scalar() or 0
 
-    # 3. After-hours responded (conversations that have at least one AI message)
+    # 3. After-hours responded (conversations the AI has replied to)
     after_hours_responded_result = await db.execute(
-        select(func.count(Conversation.id.distinct())).where(
+        select(func.count(Conversation.id)).where(
             Conversation.property_id == property_id,
             Conversation.started_at >= day_start,
             Conversation.started_at < day_end,
             Conversation.is_after_hours == True,
-            Conversation.id.in_(
-                select(Message.conversation_id).where(Message.role == "ai")
-            ),
+            Conversation.first_ai_response_at.isnot(None),
         )
     )
     after_hours_responded = after_hours_responded_result.scalar() or 0
@@ -96,31 +218,9 @@ async def compute_daily_analytics(
     )
     handoffs = handoffs_result.scalar() or 0
 
-    # 6. Average response time (from AI messages metadata)
-    # We stored response_time_ms in message metadata
-    response_times_result = await db.execute(
-        select(Message.metadata_["response_time_ms"]).where(
-            Message.conversation_id.in_(
-                select(Conversation.id).where(
-                    Conversation.property_id == property_id,
-                    Conversation.started_at >= day_start,
-                    Conversation.started_at < day_end,
-                )
-            ),
-            Message.role == "ai",
-            Message.metadata_["response_time_ms"].isnot(None),
-        )
-    )
-    response_times = [
-        float(r[0]) / 1000.0  # Convert ms to seconds
-        for r in response_times_result.fetchall()
-        if r[0] is not None
-    ]
-    avg_response_time = (
-        Decimal(str(sum(response_times) / len(response_times)))
-        if response_times
-        else Decimal("0")
-    )
+    # 6. Response time sketch (aggregated in SQL from typed message columns)
+    response_hist = await _response_time_histogram(db, property_id, day_start, day_end)
+    avg_response_time = Decimal(str(round(response_hist.mean_ms / 1000.0, 2)))  # ms -> seconds
 
     # 7. Channel breakdown
     channel_result = await db.execute(
@@ -138,35 +238,9 @@ async def compute_daily_analytics(
     channel_breakdown = {row[0]: row[1] for row in channel_result.fetchall()}
 
     # 8. Estimated revenue recovered
-    # Logic: Sum of (Lead.estimated_value OR Property.ADR) for all after-hours leads
-    prop_result = await db.execute(
-        select(Property.adr).where(Property.id == property_id)
-    )
-    adr = prop_result.scalar() or Decimal("230")
-
-    # Fetch after-hours leads with their values
-    leads_revenue_result = await db.execute(
-        select(Lead.estimated_value).where(
-            Lead.property_id == property_id,
-            Lead.captured_at >= day_start,
-            Lead.captured_at < day_end,
-            Lead.conversation_id.in_(
-                select(Conversation.id).where(
-                    Conversation.is_after_hours == True
-                )
-            ),
-        )
-    )
-    
-    total_revenue = Decimal("0")
-    for row in leads_revenue_result.fetchall():
-        val = row[0]
-        if val is not None:
-            total_revenue += val
-        else:
-            total_revenue += adr
-
-    estimated_revenue = total_revenue * Decimal("0.20") # Apply default conversion rate 20%
+    # Logic: Sum of (Lead.estimated_value OR Property.ADR) for all after-hours leads,
+    # scaled by the property's assumed lead-to-booking conversion rate
+    estimated_revenue = await _after_hours_revenue(db, property_id, day_start, day_end)
 
     # 9. Upsert analytics record
     existing = await db.execute(
@@ -186,6 +260,7 @@ async def compute_daily_analytics(
         record.avg_response_time_sec = avg_response_time
         record.estimated_revenue_recovered = estimated_revenue
         record.channel_breakdown = channel_breakdown
+        record.response_time_histogram = response_hist.to_dict()
     else:
         record = AnalyticsDaily(
             property_id=property_id,
@@ -198,6 +273,7 @@ async def compute_daily_analytics(
             avg_response_time_sec=avg_response_time,
             estimated_revenue_recovered=estimated_revenue,
             channel_breakdown=channel_breakdown,
+            response_time_histogram=response_hist.to_dict(),
         )
         db.add(record)
 
@@ -205,27 +281,6 @@ async def compute_daily_analytics(
     return record
 
 
-async def compute_all_properties_daily(
-    db: AsyncSession,
-    report_date: date | None = None,
-):
-    """
-    Compute daily analytics for all properties.
-    Called by the daily cron job.
-    """
-    if report_date is None:
-        report_date = date.today() - timedelta(days=1)  # Yesterday
-
-    result = await db.execute(select(Property.id))
-    property_ids = [row[0] for row in result.fetchall()]
-
-    records = []
-    for pid in property_ids:
-        record = await compute_daily_analytics(db, pid, report_date)
-        records.append(record)
-
-    return records
-
 async def get_realtime_stats(
     db: AsyncSession,
     property_id: uuid.UUID
@@ -234,10 +289,10 @@ async def get_realtime_stats(
     Get real-time statistics for the current day (since midnight).
     Used for the live dashboard view.
     """
-    now = datetime.now(timezone.utc)
-    # Get start of day in property's timezone (using UTC for MVP simplicity, ideally property-aware)
-    # TODO: Use property timezone
-    today_start = datetime.combine(datetime.now(timezone.utc).date(), datetime.min.time()).replace(tzinfo=timezone.utc)
+    # Start of the property's local day, as a UTC instant
+    tz_name = await _property_timezone(db, property_id)
+    today = local_today(tz_name)
+    today_start, _ = local_day_window(today, tz_name)
     
     # Reuse logic from compute_daily_analytics but don't save to DB
     # 1. Total inquiries
@@ -261,13 +316,11 @@ async def get_realtime_stats(
     
     # 3. After-hours responded
     after_hours_responded_result = await db.execute(
-        select(func.count(Conversation.id.distinct())).where(
+        select(func.count(Conversation.id)).where(
             Conversation.property_id == property_id,
             Conversation.started_at >= today_start,
             Conversation.is_after_hours == True,
-            Conversation.id.in_(
-                select(Message.conversation_id).where(Message.role == "ai")
-            ),
+            Conversation.first_ai_response_at.isnot(None),
         )
     )
     after_hours_responded = after_hours_responded_result.scalar() or 0
@@ -282,54 +335,12 @@ async def get_realtime_stats(
     leads_captured = leads_result.scalar() or 0
     
     # 5. Estimated Revenue
-    # Get property ADR
-    prop_result = await db.execute(
-        select(Property.adr).where(Property.id == property_id)
-    )
-    adr = prop_result.scalar() or Decimal("230")
-    
-    # Sum after-hours leads value
-    leads_revenue_result = await db.execute(
-        select(Lead.estimated_value).where(
-            Lead.property_id == property_id,
-            Lead.captured_at >= today_start,
-            Lead.conversation_id.in_(
-                select(Conversation.id).where(Conversation.is_after_hours == True)
-            ),
-        )
-    )
-    
-    total_revenue = Decimal("0")
-    for row in leads_revenue_result.fetchall():
-        val = row[0]
-        if val is not None:
-            total_revenue += val
-        else:
-            total_revenue += adr
-
-    estimated_revenue = float(total_revenue * Decimal("0.20"))
+    estimated_revenue = float(await _after_hours_revenue(db, property_id, today_start))
     
     # 6. Response Time
-    response_times_result = await db.execute(
-        select(Message.metadata_["response_time_ms"]).where(
-            Message.conversation_id.in_(
-                select(Conversation.id).where(
-                    Conversation.property_id == property_id,
-                    Conversation.started_at >= today_start,
-                )
-            ),
-            Message.role == "ai",
-            Message.metadata_["response_time_ms"].isnot(None),
-        )
-    )
-    response_times = [
-        float(r[0]) / 1000.0
-        for r in response_times_result.fetchall()
-        if r[0] is not None
-    ]
-    avg_response_time = (
-        sum(response_times) / len(response_times) if response_times else 0
-    )
+    response_hist = await _response_time_histogram(db, property_id, today_start)
+    avg_response_time = response_hist.mean_ms / 1000.0
+    percentiles = response_hist.percentiles_sec()
     
     # 7. Status Breakdown (Active vs Handoff) for Ops View
     status_result = await db.execute(
@@ -345,13 +356,419 @@ async def get_realtime_stats(
     handed_off_conversations = status_counts.get("handed_off", 0)
     
     return {
-        "report_date": date.today().isoformat(),
+        "report_date": today.isoformat(),
         "total_inquiries": total_inquiries,
         "after_hours_inquiries": after_hours_inquiries,
         "after_hours_responded": after_hours_responded,
         "leads_captured": leads_captured,
         "avg_response_time_sec": avg_response_time,
+        "p50_response_time_sec": percentiles["p50"],
+        "p90_response_time_sec": percentiles["p90"],
+        "p95_response_time_sec": percentiles["p95"],
+        "p99_response_time_sec": percentiles["p99"],
         "estimated_revenue_recovered": estimated_revenue,
         "active_conversations": active_conversations,
         "handed_off_conversations": handed_off_conversations,
     }
+
+
+async def get_portfolio_stats(
+    db: AsyncSession,
+    property_ids: list[uuid.UUID] | None = None,
+) -> dict:
+    """
+    Live stats for today across a portfolio of properties (None = all active).
+    Every metric is one query grouped by property_id, so the number of round
+    trips is fixed no matter how many hotels the group runs. "Today" is each
+    property's own local day; the top-level report_date is in settings.timezone.
+    """
+    now = datetime.now(timezone.utc)
+
+    prop_query = select(
+        Property.id, Property.name, Property.adr, Property.conversion_rate, Property.timezone
+    ).where(Property.is_active == True, Property.deleted_at.is_(None))
+    if property_ids is not None:
+        prop_query = prop_query.where(Property.id.in_(property_ids))
+    prop_result = await db.execute(prop_query.order_by(Property.name))
+    properties = prop_result.fetchall()
+    ids = [p.id for p in properties]
+
+    # Properties whose local day starts at the same instant share one range predicate
+    local_days = {p.id: local_today(p.timezone, now) for p in properties}
+    ids_by_start: dict[datetime, list[uuid.UUID]] = {}
+    for p in properties:
+        start, _ = local_day_window(local_days[p.id], p.timezone)
+        ids_by_start.setdefault(start, []).append(p.id)
+
+    def since_local_midnight(property_col, ts_col):
+        return or_(*(
+            and_(property_col.in_(group), ts_col >= start)
+            for start, group in ids_by_start.items()
+        ))
+
+    stats = {
+        p.id: {
+            "property_id": str(p.id),
+            "property_name": p.name,
+            "report_date": local_days[p.id].isoformat(),
+            "total_inquiries": 0,
+            "after_hours_inquiries": 0,
+            "after_hours_responded": 0,
+            "leads_captured": 0,
+            "estimated_revenue_recovered": 0.0,
+            "active_conversations": 0,
+            "handed_off_conversations": 0,
+        }
+        for p in properties
+    }
+    if not ids:
+        return {
+            "report_date": local_today(settings.timezone, now).isoformat(),
+            "combined": _combine_portfolio([], LatencyHistogram()),
+            "properties": [],
+        }
+
+    # 1. Conversation counters
+    conv_result = await db.execute(
+        select(
+            Conversation.property_id,
+            func.count(Conversation.id),
+            func.count(Conversation.id).filter(Conversation.is_after_hours == True),
+            func.count(Conversation.id).filter(
+                Conversation.is_after_hours == True,
+                Conversation.first_ai_response_at.isnot(None),
+            ),
+            func.count(Conversation.id).filter(Conversation.status == "active"),
+            func.count(Conversation.id).filter(Conversation.status == "handed_off"),
+        )
+        .where(since_local_midnight(Conversation.property_id, Conversation.started_at))
+        .group_by(Conversation.property_id)
+    )
+    for pid, total, after_hours, responded, active, handed_off in conv_result.fetchall():
+        stats[pid].update(
+            total_inquiries=total,
+            after_hours_inquiries=after_hours,
+            after_hours_responded=responded,
+            active_conversations=active,
+            handed_off_conversations=handed_off,
+        )
+
+    # 2. Leads and after-hours revenue (same formula as _after_hours_revenue)
+    lead_result = await db.execute(
+        select(
+            Lead.property_id,
+            func.count(Lead.id),
+            func.coalesce(
+                func.sum(
+                    func.coalesce(Lead.estimated_value, Property.adr, Decimal("230"))
+                ).filter(Lead.is_after_hours == True),
+                0,
+            ),
+        )
+        .join(Property, Property.id == Lead.property_id)
+        .where(since_local_midnight(Lead.property_id, Lead.captured_at))
+        .group_by(Lead.property_id)
+    )
+    conversion_rates = {p.id: p.conversion_rate or Decimal("0.20") for p in properties}
+    for pid, leads, after_hours_value in lead_result.fetchall():
+        stats[pid]["leads_captured"] = leads
+        stats[pid]["estimated_revenue_recovered"] = float(Decimal(after_hours_value) * conversion_rates[pid])
+
+    # 3. Response time sketches, bucketed per property in Postgres
+    bucket = func.width_bucket(
+        Message.response_time_ms, literal(BUCKET_BOUNDS, ARRAY(Integer))
+    )
+    hist_result = await db.execute(
+        select(
+            Conversation.property_id,
+            bucket,
+            func.count(),
+            func.sum(Message.response_time_ms),
+            func.max(Message.response_time_ms),
+        )
+        .join(Conversation, Conversation.id == Message.conversation_id)
+        .where(
+            since_local_midnight(Conversation.property_id, Conversation.started_at),
+            Message.sent_at >= min(ids_by_start),  # Partition pruning
+            Message.role == "ai",
+            Message.response_time_ms.isnot(None),
+        )
+        .group_by(Conversation.property_id, bucket)
+    )
+    rows_by_property: dict = {}
+    for pid, *row in hist_result.fetchall():
+        rows_by_property.setdefault(pid, []).append(row)
+
+    combined_hist = LatencyHistogram()
+    for pid, entry in stats.items():
+        hist = LatencyHistogram.from_bucket_rows(rows_by_property.get(pid, []))
+        combined_hist.merge(hist)
+        _apply_response_times(entry, hist)
+
+    per_property = list(stats.values())
+    return {
+        "report_date": local_today(settings.timezone, now).isoformat(),
+        "combined": _combine_portfolio(per_property, combined_hist),
+        "properties": per_property,
+    }
+
+
+def _apply_response_times(entry: dict, hist: LatencyHistogram):
+    entry["avg_response_time_sec"] = round(hist.mean_ms / 1000.0, 2)
+    for name, value in hist.percentiles_sec().items():
+        entry[f"{name}_response_time_sec"] = value
+
+
+def _combine_portfolio(per_property: list[dict], hist: LatencyHistogram) -> dict:
+    """Portfolio totals; response times come from the merged sketch, not averaged averages."""
+    counters = (
+        "total_inquiries",
+        "after_hours_inquiries",
+        "after_hours_responded",
+        "leads_captured",
+        "active_conversations",
+        "handed_off_conversations",
+    )
+    combined = {name: sum(p[name] for p in per_property) for name in counters}
+    combined["estimated_revenue_recovered"] = round(
+        sum(p["estimated_revenue_recovered"] for p in per_property), 2
+    )
+    combined["property_count"] = len(per_property)
+    _apply_response_times(combined, hist)
+    return combined
+
+
+GRANULARITIES = ("day", "week", "month")
+
+
+def _rollup_conditions(property_id: uuid.UUID, from_date: date, to_date: date | None) -> list:
+    conditions = [
+        AnalyticsDaily.property_id == property_id,
+        AnalyticsDaily.report_date >= from_date,
+    ]
+    if to_date is not None:
+        conditions.append(AnalyticsDaily.report_date <= to_date)
+    return conditions
+
+
+def _legacy_response_weight():
+    """
+    Rows rolled up before response_time_histogram existed keep a NULL sketch
+    and only have avg_response_time_sec. They count as total_inquiries replies
+    at that mean, so old days read as their average rather than 0s (exact
+    percentiles come back once scripts.backfill_analytics recomputes them).
+    """
+    return case(
+        (
+            and_(
+                AnalyticsDaily.response_time_histogram["count"].as_integer().is_(None),
+                AnalyticsDaily.avg_response_time_sec > 0,
+                AnalyticsDaily.total_inquiries > 0,
+            ),
+            AnalyticsDaily.total_inquiries,
+        ),
+        else_=0,
+    )
+
+
+def _legacy_response_ms():
+    return cast(AnalyticsDaily.avg_response_time_sec * 1000, Integer)
+
+
+def _rollup_sums() -> list:
+    """Additive rollup columns plus the sketch's count/sum/max (or the legacy mean), summed in SQL."""
+    hist = AnalyticsDaily.response_time_histogram
+    legacy_weight = _legacy_response_weight()
+    return [
+        func.coalesce(func.sum(AnalyticsDaily.total_inquiries), 0).label("total_inquiries"),
+        func.coalesce(func.sum(AnalyticsDaily.after_hours_inquiries), 0).label("after_hours_inquiries"),
+        func.coalesce(func.sum(AnalyticsDaily.after_hours_responded), 0).label("after_hours_responded"),
+        func.coalesce(func.sum(AnalyticsDaily.leads_captured), 0).label("leads_captured"),
+        func.coalesce(func.sum(AnalyticsDaily.handoffs), 0).label("handoffs"),
+        func.coalesce(func.sum(AnalyticsDaily.estimated_revenue_recovered), 0).label("estimated_revenue_recovered"),
+        func.coalesce(
+            func.sum(func.coalesce(hist["count"].as_integer(), 0) + legacy_weight), 0
+        ).label("response_count"),
+        func.coalesce(
+            func.sum(func.coalesce(hist["sum_ms"].as_float(), 0) + legacy_weight * _legacy_response_ms()), 0
+        ).label("response_sum_ms"),
+        func.coalesce(
+            func.max(func.coalesce(
+                hist["max_ms"].as_float(), case((legacy_weight > 0, _legacy_response_ms()))
+            )), 0
+        ).label("response_max_ms"),
+    ]
+
+
+def _weighted_avg_sec(row) -> float:
+    """Mean response time weighted by reply count (not a mean of daily means)."""
+    if not row.response_count:
+        return 0.0
+    return round(float(row.response_sum_ms) / row.response_count / 1000.0, 2)
+
+
+async def _merged_rollup_histogram(db: AsyncSession, conditions: list, totals_row) -> LatencyHistogram:
+    """Merge the per-day sketches in SQL: one row per non-empty bucket comes back."""
+    buckets = (
+        func.json_each_text(AnalyticsDaily.response_time_histogram["buckets"])
+        .table_valued("key", "value")
+        .lateral("bucket")
+    )
+    result = await db.execute(
+        select(cast(buckets.c.key, Integer), func.sum(cast(buckets.c.value, Integer)))
+        .select_from(AnalyticsDaily)
+        .join(buckets, true())
+        .where(*conditions)
+        .group_by(buckets.c.key)
+    )
+    merged = {int(idx): int(c) for idx, c in result.fetchall()}
+
+    # Legacy rows without a sketch contribute their mean, bucketed the same way
+    legacy_weight = _legacy_response_weight()
+    legacy_bucket = func.width_bucket(_legacy_response_ms(), literal(BUCKET_BOUNDS, ARRAY(Integer)))
+    legacy = await db.execute(
+        select(legacy_bucket, func.sum(legacy_weight))
+        .where(*conditions, legacy_weight > 0)
+        .group_by(legacy_bucket)
+    )
+    for idx, c in legacy.fetchall():
+        merged[int(idx)] = merged.get(int(idx), 0) + int(c)
+
+    return LatencyHistogram.from_dict({
+        "count": totals_row.response_count,
+        "sum_ms": totals_row.response_sum_ms,
+        "max_ms": totals_row.response_max_ms,
+        "buckets": merged,
+    })
+
+
+async def _merged_channel_breakdown(db: AsyncSession, conditions: list, period=None) -> dict:
+    """
+    Sum the channel_breakdown JSON in SQL.
+    Returns {channel: count}, or {period: {channel: count}} when grouped by period.
+    """
+    channels = (
+        func.json_each_text(AnalyticsDaily.channel_breakdown)
+        .table_valued("key", "value")
+        .lateral("channel")
+    )
+    columns = [channels.c.key, func.sum(cast(channels.c.value, Integer))]
+    group_by = [channels.c.key]
+    if period is not None:
+        columns.insert(0, period)
+        group_by.insert(0, period)
+
+    result = await db.execute(
+        select(*columns)
+        .select_from(AnalyticsDaily)
+        .join(channels, true())
+        .where(*conditions)
+        .group_by(*group_by)
+    )
+    breakdown: dict = {}
+    for row in result.fetchall():
+        if period is None:
+            breakdown[row[0]] = int(row[1])
+        else:
+            breakdown.setdefault(row[0], {})[row[1]] = int(row[2])
+    return breakdown
+
+
+async def get_analytics_range(
+    db: AsyncSession,
+    property_id: uuid.UUID,
+    from_date: date,
+    to_date: date,
+    granularity: str = "day",
+) -> dict:
+    """
+    Range totals and a day/week/month series for the GM dashboard.
+    Everything is aggregated in Postgres over AnalyticsDaily; only the
+    aggregated rows (and merged sketch buckets) are returned.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}")
+
+    conditions = _rollup_conditions(property_id, from_date, to_date)
+
+    totals_result = await db.execute(select(*_rollup_sums()).where(*conditions))
+    totals_row = totals_result.one()
+    response_hist = await _merged_rollup_histogram(db, conditions, totals_row)
+
+    totals = {
+        "total_inquiries": int(totals_row.total_inquiries),
+        "after_hours_inquiries": int(totals_row.after_hours_inquiries),
+        "after_hours_responded": int(totals_row.after_hours_responded),
+        "leads_captured": int(totals_row.leads_captured),
+        "handoffs": int(totals_row.handoffs),
+        "estimated_revenue_recovered": float(totals_row.estimated_revenue_recovered),
+        "avg_response_time_sec": _weighted_avg_sec(totals_row),
+    }
+    for name, value in response_hist.percentiles_sec().items():
+        totals[f"{name}_response_time_sec"] = value
+
+    # Series for charts, bucketed with date_trunc
+    period = cast(
+        func.date_trunc(literal(granularity), AnalyticsDaily.report_date), Date
+    ).label("period")
+    series_result = await db.execute(
+        select(period, *_rollup_sums())
+        .where(*conditions)
+        .group_by(period)
+        .order_by(period)
+    )
+    channels_by_period = await _merged_channel_breakdown(db, conditions, period=period)
+
+    series = [
+        {
+            "date": row.period.isoformat(),
+            "total_inquiries": int(row.total_inquiries),
+            "after_hours_inquiries": int(row.after_hours_inquiries),
+            "leads_captured": int(row.leads_captured),
+            "handoffs": int(row.handoffs),
+            "estimated_revenue_recovered": float(row.estimated_revenue_recovered),
+            "avg_response_time_sec": _weighted_avg_sec(row),
+            "channel_breakdown": channels_by_period.get(row.period, {}),
+        }
+        for row in series_result.fetchall()
+    ]
+
+    response = {
+        "property_id": str(property_id),
+        "period": {"from": from_date.isoformat(), "to": to_date.isoformat()},
+        "granularity": granularity,
+        "totals": totals,
+        "series": series,
+    }
+    if granularity == "day":
+        response["daily"] = series  # Backwards-compatible key for the dashboard charts
+    return response
+
+
+async def get_analytics_summary(
+    db: AsyncSession,
+    property_id: uuid.UUID,
+    from_date: date,
+) -> dict:
+    """Hero stats since `from_date` (shape of AnalyticsSummaryResponse), aggregated in SQL."""
+    conditions = _rollup_conditions(property_id, from_date, None)
+
+    totals_result = await db.execute(select(*_rollup_sums()).where(*conditions))
+    totals_row = totals_result.one()
+    response_hist = await _merged_rollup_histogram(db, conditions, totals_row)
+    percentiles = response_hist.percentiles_sec()
+
+    return {
+        "total_inquiries": int(totals_row.total_inquiries),
+        "after_hours_inquiries": int(totals_row.after_hours_inquiries),
+        "after_hours_responded": int(totals_row.after_hours_responded),
+        "leads_captured": int(totals_row.leads_captured),
+        "handoffs": int(totals_row.handoffs),
+        "avg_response_time_sec": _weighted_avg_sec(totals_row),
+        "p50_response_time_sec": percentiles["p50"],
+        "p90_response_time_sec": percentiles["p90"],
+        "p95_response_time_sec": percentiles["p95"],
+        "p99_response_time_sec": percentiles["p99"],
+        "estimated_revenue_recovered": float(totals_row.estimated_revenue_recovered),
+        "channel_breakdown": await _merged_channel_breakdown(db, conditions),
+    }
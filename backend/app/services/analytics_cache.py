@@ -0,0 +1,182 @@
+"""
+Response cache for the analytics read endpoints.
+
+Dashboards poll the same (property, endpoint, range) repeatedly. Responses are
+cached in Redis and validated with an ETag derived from the property's rollup
+version, so a poll that finds nothing new is answered with 304 and no
+aggregation work.
+
+The version is a Redis counter per property that only writers move: writers
+of AnalyticsDaily call `invalidate(property_id)` after commit, which INCRs it,
+and every cached response for the property is superseded. (A timestamp such
+as max(updated_at) is not enough: now() is the transaction start, so a long
+backfill can commit rows older than the newest one already seen.) Redis
+errors never fail a request — we just compute uncached.
+"""
+
+import hashlib
+import json
+import time
+import uuid
+from datetime import date
+from typing import Awaitable, Callable
+
+import structlog
+from fastapi import Request, Response
+
+from app.config import get_settings
+from app.core.redis import get_redis
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+VERSION_KEY_PREFIX = "analytics:ver"
+RESPONSE_KEY_PREFIX = "analytics:resp"
+
+
+class AnalyticsCache:
+    def __init__(self):
+        self.redis = None
+
+    async def _get_redis(self):
+        if not self.redis:
+            self.redis = await get_redis()
+        return self.redis
+
+    async def _start_version(self, redis, key: str):
+        # Start a missing counter from the clock, not 0, so a lost key never
+        # brings back a version that cached responses were stored under
+        await redis.set_nx(key, str(time.time_ns()))
+
+    async def version(self, property_id: uuid.UUID) -> str | None:
+        """The property's rollup version, or None when Redis is unavailable."""
+        key = f"{VERSION_KEY_PREFIX}:{property_id}"
+        try:
+            redis = await self._get_redis()
+            value = await redis.get(key)
+            if value is None:
+                await self._start_version(redis, key)
+                value = await redis.get(key)
+            return value
+        except Exception as e:
+            logger.warning("Analytics cache unavailable", error=str(e))
+            return None
+
+    async def invalidate(self, property_id: uuid.UUID):
+        """Move the property's version so the next read picks up new rollups."""
+        key = f"{VERSION_KEY_PREFIX}:{property_id}"
+        try:
+            redis = await self._get_redis()
+            await self._start_version(redis, key)
+            await redis.incr(key)
+        except Exception as e:
+            logger.warning("Analytics cache invalidation failed", property_id=str(property_id), error=str(e))
+
+    async def get(self, key: str) -> str | None:
+        try:
+            redis = await self._get_redis()
+            return await redis.get(key)
+        except Exception as e:
+            logger.warning("Analytics cache unavailable", error=str(e))
+            return None
+
+    async def set(self, key: str, value: str, ttl: int):
+        try:
+            redis = await self._get_redis()
+            await redis.set(key, value, expire=ttl)
+        except Exception as e:
+            logger.warning("Analytics cache write failed", error=str(e))
+
+
+analytics_cache = AnalyticsCache()
+
+
+def _etag(*parts: str) -> str:
+    digest = hashlib.sha1(":".join(parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+
+
+def _cache_headers(etag: str, ttl: int) -> dict:
+    return {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={ttl}",
+    }
+
+
+def portfolio_scope(property_ids: list[uuid.UUID] | None) -> str:
+    """Stable cache scope for a set of properties (None = every active property)."""
+    if property_ids is None:
+        return "portfolio:all"
+    digest = hashlib.sha1(",".join(sorted(str(p) for p in property_ids)).encode()).hexdigest()[:20]
+    return f"portfolio:{digest}"
+
+
+def range_ttl(to_date: date | None) -> int:
+    """Ranges that end before today are immutable until a backfill; cache them longer."""
+    if to_date is not None and to_date < date.today():
+        return settings.analytics_cache_ttl_historical
+    return settings.analytics_cache_ttl_today
+
+
+async def cached_rollup_response(
+    request: Request,
+    property_id: uuid.UUID,
+    endpoint: str,
+    range_key: str,
+    ttl: int,
+    build: Callable[[], Awaitable[dict]],
+) -> Response:
+    """
+    Serve a rollup-backed analytics response with conditional GET support.
+    The ETag is derived from (property, endpoint, range, rollup version).
+    """
+    version = await analytics_cache.version(property_id)
+    if version is None:
+        # No version to validate against: compute, and don't let anything cache it
+        body = json.dumps(await build(), default=str)
+        return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-cache"})
+
+    etag = _etag(str(property_id), endpoint, range_key, version)
+    headers = _cache_headers(etag, ttl)
+
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    cache_key = f"{RESPONSE_KEY_PREFIX}:{property_id}:{endpoint}:{range_key}:{version}"
+    body = await analytics_cache.get(cache_key)
+    if body is None:
+        body = json.dumps(await build(), default=str)
+        await analytics_cache.set(cache_key, body, ttl)
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def cached_live_response(
+    request: Request,
+    property_id: uuid.UUID | str,
+    build: Callable[[], Awaitable[dict]],
+) -> Response:
+    """
+    Serve live (raw-table) stats from a short-lived cache shared by all pollers.
+    There is no rollup to validate against, so the ETag is a hash of the body.
+    `property_id` may also be a portfolio scope key (see portfolio_scope).
+    """
+    ttl = settings.analytics_live_cache_ttl
+    cache_key = f"{RESPONSE_KEY_PREFIX}:{property_id}:live"
+    body = await analytics_cache.get(cache_key)
+    if body is None:
+        body = json.dumps(await build(), default=str)
+        await analytics_cache.set(cache_key, body, ttl)
+
+    etag = _etag(str(property_id), "live", body)
+    headers = _cache_headers(etag, ttl)
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
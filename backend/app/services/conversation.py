@@ -12,7 +12,7 @@ import uuid
 from datetime import datetime, timezone
 from decimal import Decimal
 
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from openai import AsyncOpenAI
@@ -20,6 +20,7 @@ from openai import AsyncOpenAI
 from app.models import Conversation, Message, Lead, Property
 from app.services import search_knowledge_base
 from app.services.sanitizer import sanitize_guest_message
+from app.services.funnel import record_inquiry, record_lead_captured
 from app.config import get_settings
 
 settings = get_settings()
@@ -109,6 +110,74 @@ def _is_after_hours(property: Property) -> bool:
         return False
 
 
+async def record_first_response(
+    db: AsyncSession,
+    conversation_id: uuid.UUID,
+    role: str,
+    sent_at: datetime,
+):
+    """
+    Stamp first_ai_response_at / first_staff_response_at for a conversation.
+    Uses COALESCE in a single UPDATE so concurrent writers can't overwrite an
+    earlier marker; call it in the same transaction as the message insert.
+    """
+    column = {
+        "ai": Conversation.first_ai_response_at,
+        "staff": Conversation.first_staff_response_at,
+    }.get(role)
+    if column is None:
+        return
+
+    await db.execute(
+        update(Conversation)
+        .where(Conversation.id == conversation_id)
+        .values({column: func.coalesce(column, sent_at)})
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def add_staff_message(
+    db: AsyncSession,
+    conversation: Conversation,
+    text: str,
+    sender: str | None = None,
+) -> Message:
+    """
+    Store a staff reply and stamp first_staff_response_at with its sent_at.
+    Marks the conversation as staff-handled, like a takeover.
+    """
+    msg = Message(
+        conversation_id=conversation.id,
+        role="staff",
+        content=text,
+        metadata_={"sender": sender} if sender else None,
+    )
+    db.add(msg)
+    await db.flush()  # sent_at comes back from the insert (database clock)
+    conversation.ai_mode = "staff"
+    conversation.last_message_at = msg.sent_at
+    conversation.message_count = (conversation.message_count or 0) + 1
+    await record_first_response(db, conversation.id, "staff", msg.sent_at)
+    return msg
+
+
+def history_query(conversation: Conversation, limit: int | None = None):
+    """
+    A conversation's messages, newest first. Bounding sent_at by started_at
+    lets Postgres skip message partitions older than the conversation.
+    """
+    query = (
+        select(Message)
+        .where(Message.conversation_id == conversation.id)
+        .order_by(Message.sent_at.desc())
+    )
+    if conversation.started_at is not None:
+        query = query.where(Message.sent_at >= conversation.started_at)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
 async def get_or_create_conversation(
     db: AsyncSession,
     property_id: uuid.UUID,
@@ -152,8 +221,10 @@ async def get_or_create_conversation(
     )
     db.add(conversation)
     await db.flush()
-    # Refresh to ensure relationships (like lead) are loaded/mocked to avoid Greenlet error
-    await db.refresh(conversation, ["lead"])
+    # Refresh to ensure relationships (like lead) are loaded/mocked to avoid Greenlet error,
+    # and load the database-stamped started_at (the funnel cohort day)
+    await db.refresh(conversation, ["started_at", "lead"])
+    await record_inquiry(db, conversation, prop.timezone)
     return conversation
 
 
@@ -218,12 +289,7 @@ async def process_guest_message(
 
     # 6. Build conversation history for LLM context
     # Use explicit select to avoid MissingGreenlet / lazy load issues
-    msgs_result = await db.execute(
-        select(Message)
-        .where(Message.conversation_id == conversation.id)
-        .order_by(Message.sent_at.desc())  # Newest first
-        .limit(10)
-    )
+    msgs_result = await db.execute(history_query(conversation, limit=10))
     # Reverse to get chronological order
     recent_messages = list(msgs_result.scalars().all())[::-1]
 
@@ -234,7 +300,7 @@ async def process_guest_message(
         role = "user"
         if m.role == "guest":
             content = f"<guest_message>{content}</guest_message>"
-        elif m.role == "ai":
+        elif m.role in ("ai", "staff"):
             role = "assistant"
         history.append({"role": role, "content": content})
 
@@ -283,14 +349,16 @@ async def process_guest_message(
         conversation_id=conversation.id,
         role="ai",
         content=response_text,
-        metadata_={
-            "response_time_ms": response_time_ms,
-            "llm_tokens_used": llm_response.usage.total_tokens if llm_response.usage else 0,
-            "mode": conversation.ai_mode,
-            "model": settings.openai_model,
-        },
+        metadata_={"mode": conversation.ai_mode},
+        response_time_ms=response_time_ms,
+        prompt_tokens=llm_response.usage.prompt_tokens if llm_response.usage else None,
+        completion_tokens=llm_response.usage.completion_tokens if llm_response.usage else None,
+        total_tokens=llm_response.usage.total_tokens if llm_response.usage else None,
+        model=settings.openai_model,
     )
     db.add(ai_msg)
+    await db.flush()  # sent_at comes back from the insert (database clock)
+    await record_first_response(db, conversation.id, "ai", ai_msg.sent_at)
 
     # 10. Auto-extract lead info if in lead_capture mode
     lead_created = False
@@ -310,6 +378,7 @@ async def process_guest_message(
     return {
         "response": response_text,
         "conversation_id": str(conversation.id),
+        "message_id": str(ai_msg.id),
         "mode": conversation.ai_mode,
         "is_after_hours": conversation.is_after_hours,
         "response_time_ms": response_time_ms,
@@ -331,12 +400,8 @@ async def _try_extract_lead(
     """
     # Build the full conversation text
     # Explicitly fetch all messages
-    msgs_result = await db.execute(
-        select(Message)
-        .where(Message.conversation_id == conversation.id)
-        .order_by(Message.sent_at)
-    )
-    messages = msgs_result.scalars().all()
+    msgs_result = await db.execute(history_query(conversation))
+    messages = list(msgs_result.scalars().all())[::-1]  # Chronological
     
     full_conversation = "\n".join(
         f"{msg.role}: {msg.content}" for msg in messages
@@ -422,11 +487,15 @@ async def _try_extract_lead(
         guest_phone=guest_phone,
         guest_email=guest_email,
         intent=intent,
+        source_channel=conversation.channel,
+        is_after_hours=conversation.is_after_hours,
         estimated_value=estimated_value,
         priority=priority,
         flag_reason=flag_reason,
     )
     db.add(lead)
+    await db.flush()
+    await record_lead_captured(db, lead, conversation, prop.timezone)
     conversation.guest_name = guest_name or conversation.guest_name
 
     return lead
@@ -4,35 +4,39 @@ Handles sending emails (replies, daily reports).
 """
 
 import structlog
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content
 
 from app.config import get_settings
+from app.core.email_body import extract_reply
 from app.core.normalization import NormalizedMessage
 from app.services.realtime import realtime_service
+from app.services.email_transport import EmailMessage, get_email_transport
 
 settings = get_settings()
 logger = structlog.get_logger()
 
 
-async def send_email(to_email: str, subject: str, content: str, is_html: bool = False) -> dict:
+async def send_email(
+    to_email: str,
+    subject: str,
+    content: str,
+    is_html: bool = False,
+    text_content: str | None = None,
+) -> dict:
     """
-    Send an email via SendGrid.
-    
+    Send an email through the configured transport (see app.services.email_transport).
+
     Args:
         to_email: Recipient email address
         subject: Email subject
         content: Email body content
         is_html: Whether content is HTML (default False = text/plain)
-        
+        text_content: Optional plain-text alternative for HTML emails
+
     Returns:
-        API response status or error dict
+        Delivery status dict ("sent" | "mock_sent" | "skipped" | "error")
     """
-    if not settings.sendgrid_api_key:
-        if not settings.is_production:
-            print(f"\n🚀 [MOCK EMAIL] To: {to_email} | Subject: {subject} | Content: {content[:50]}...\n")
-            return {"status": "mock_sent"}
-            
+    transport = get_email_transport()
+    if transport is None:
         logger.warning(
             "SendGrid API key not configured, skipping email send",
             to_email=to_email,
@@ -40,39 +44,34 @@ async def send_email(to_email: str, subject: str, content: str, is_html: bool =
         )
         return {"status": "skipped", "reason": "not_configured"}
 
+    message = EmailMessage(
+        to=[to_email],
+        subject=subject,
+        html=content if is_html else None,
+        text=text_content if is_html else content,
+    )
     try:
-        sg = SendGridAPIClient(settings.sendgrid_api_key)
-        from_email = Email(settings.sendgrid_from_email)
-        to_email = To(to_email)
-        content_type = "text/html" if is_html else "text/plain"
-        content_obj = Content(content_type, content)
-        
-        mail = Mail(from_email, to_email, subject, content_obj)
-        
-        # SendGrid python client is synchronous, so ideally run in threadpool/executor if high volume
-        # For MVP Sprint 2 (low volume), sync call in async function is acceptable but blocking
-        # Better: run in executor
-        
-        import asyncio
-        loop = asyncio.get_running_loop()
-        response = await loop.run_in_executor(None, sg.send, mail)
-        
-        logger.info(
-            "Email sent",
-            to_email=to_email.email,
-            status_code=response.status_code
-        )
-        return {"status": "sent", "status_code": response.status_code}
-        
+        result = await transport.send(message)
+        logger.info("Email sent", to_email=to_email, status=result.get("status"))
+        return result
     except Exception as e:
-        logger.error(
-            "SendGrid email failed",
-            error=str(e),
-            to_email=to_email.email if 'to_email' in locals() else to_email
-        )
+        logger.error("Email send failed", error=str(e), to_email=to_email)
         return {"status": "error", "detail": str(e)}
 
 
+async def send_bulk_email(messages: list[EmailMessage]) -> list[dict]:
+    """
+    Send many emails in as few API requests as the transport allows
+    (SendGrid: identical content shares one request, one personalization per recipient).
+    Returns one result per message, in order.
+    """
+    transport = get_email_transport()
+    if transport is None:
+        logger.warning("SendGrid API key not configured, skipping bulk send", messages=len(messages))
+        return [{"status": "skipped", "reason": "not_configured"} for _ in messages]
+    return await transport.send_batch(messages)
+
+
 async def notify_staff_handoff(
     guest_identifier: str,
     channel: str,
@@ -142,25 +141,43 @@ def normalize_email_message(form_data: dict) -> NormalizedMessage:
         from_address = form_data.get("from")
         to_address = form_data.get("to")
         subject = form_data.get("subject", "No Subject")
-        text = form_data.get("text", "")
-        
-        if not text:
+
+        # Only the guest's new text: no quoted thread, signature or disclaimer
+        body = extract_reply(
+            form_data.get("text"),
+            form_data.get("html"),
+            max_chars=settings.email_body_max_chars,
+            scan_limit=settings.email_body_scan_chars,
+        )
+        logger.info(
+            "Inbound email body reduced",
+            source=body.source,
+            original_chars=body.original_chars,
+            kept_chars=len(body.text),
+            reduction=body.reduction,
+            stopped_at=body.stopped_at,
+        )
+        if not body.text:
             return None
-            
+
         # Parse Name <email>
         import re
         email_match = re.search(r'<([^>]+)>', from_address)
         guest_email = email_match.group(1) if email_match else from_address
         guest_name = from_address.split('<')[0].strip() if '<' in from_address else None
         
+        # Message-ID from the raw headers, for webhook dedupe
+        message_id_match = re.search(r'^Message-ID:\s*(\S+)', form_data.get("headers") or "", re.IGNORECASE | re.MULTILINE)
+
         return {
             "channel": "email",
             "guest_identifier": guest_email,
             "guest_name": guest_name,
-            "content": f"Subject: {subject}\n\n{text}",
+            "content": f"Subject: {subject}\n\n{body.text}",
             "metadata": {
                 "to_address": to_address,
-                "subject": subject
+                "subject": subject,
+                "message_id": message_id_match.group(1) if message_id_match else None,
             }
         }
     except Exception as e:
@@ -0,0 +1,250 @@
+"""
+Email transports.
+
+SendGridTransport talks to the SendGrid v3 Mail Send API over one shared,
+pooled httpx.AsyncClient (no per-email client, no blocking calls on the event
+loop) and retries 429/5xx/network errors with exponential backoff. Messages
+with identical content are batched into a single request with one
+personalization per recipient; per-message values travel as personalization
+substitutions, so templated mail with different values still shares a request.
+
+MemoryTransport keeps sent messages in an outbox (a local stand-in for tests
+and demos); ConsoleTransport logs them in development.
+"""
+
+import asyncio
+import random
+from dataclasses import dataclass, field
+
+import httpx
+import structlog
+
+from app.config import get_settings
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+SENDGRID_API_URL = "https://api.sendgrid.com"
+MAX_PERSONALIZATIONS = 1000  # SendGrid limit per request
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class EmailMessage:
+    to: list[str]
+    subject: str
+    text: str | None = None
+    html: str | None = None
+    from_email: str = field(default_factory=lambda: settings.sendgrid_from_email)
+    # Tag -> value, replaced in subject and body for this message's recipients
+    substitutions: dict[str, str] = field(default_factory=dict)
+
+    def content_key(self) -> tuple:
+        """Messages with the same key can share one request."""
+        return (self.from_email, self.subject, self.text, self.html)
+
+    def substituted(self) -> "EmailMessage":
+        """The message as delivered, with its substitutions applied."""
+        if not self.substitutions:
+            return self
+
+        def apply(value: str | None) -> str | None:
+            if value is None:
+                return None
+            for tag, replacement in self.substitutions.items():
+                value = value.replace(tag, replacement)
+            return value
+
+        return EmailMessage(
+            to=self.to, subject=apply(self.subject), text=apply(self.text),
+            html=apply(self.html), from_email=self.from_email,
+        )
+
+
+class EmailTransportError(Exception):
+    """Delivery failed after all retries."""
+
+
+class SendGridTransport:
+    def __init__(self, api_key: str, base_url: str = SENDGRID_API_URL):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.client: httpx.AsyncClient | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=settings.email_timeout_sec,
+                limits=httpx.Limits(
+                    max_connections=settings.email_max_connections,
+                    max_keepalive_connections=settings.email_max_connections,
+                ),
+            )
+        return self.client
+
+    @staticmethod
+    def build_payload(messages: list[EmailMessage]) -> dict:
+        """One Mail Send body for messages sharing content; one personalization per recipient."""
+        first = messages[0]
+        content = []
+        if first.text is not None:
+            content.append({"type": "text/plain", "value": first.text})  # text/plain must come first
+        if first.html is not None:
+            content.append({"type": "text/html", "value": first.html})
+        personalizations = []
+        for message in messages:
+            for recipient in message.to:
+                personalization = {"to": [{"email": recipient}]}
+                if message.substitutions:
+                    personalization["substitutions"] = message.substitutions
+                personalizations.append(personalization)
+        return {
+            "personalizations": personalizations,
+            "from": {"email": first.from_email},
+            "subject": first.subject,
+            "content": content,
+        }
+
+    async def _post(self, payload: dict) -> int:
+        """POST with retries on 429/5xx/network errors; returns the final status code."""
+        client = self._get_client()
+        attempts = settings.email_max_retries + 1
+        for attempt in range(attempts):
+            delay = settings.email_backoff_base_sec * (2 ** attempt) * (1 + random.random())
+            try:
+                response = await client.post("/v3/mail/send", json=payload)
+                if response.status_code not in RETRYABLE_STATUS:
+                    if response.status_code >= 400:
+                        raise EmailTransportError(
+                            f"SendGrid rejected the request ({response.status_code}): {response.text[:200]}"
+                        )
+                    return response.status_code
+                retry_after = response.headers.get("retry-after")
+                if retry_after and retry_after.isdigit():
+                    delay = float(retry_after)
+                reason = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                reason = str(e) or type(e).__name__
+
+            if attempt == attempts - 1:
+                raise EmailTransportError(f"SendGrid send failed after {attempts} attempts: {reason}")
+            logger.warning("SendGrid send retrying", attempt=attempt + 1, reason=reason, delay_sec=round(delay, 2))
+            await asyncio.sleep(delay)
+
+    async def send(self, message: EmailMessage) -> dict:
+        status_code = await self._post(self.build_payload([message]))
+        return {"status": "sent", "status_code": status_code}
+
+    async def send_batch(self, messages: list[EmailMessage]) -> list[dict]:
+        """
+        Send many messages with as few requests as possible: messages with the
+        same content are grouped and chunked into MAX_PERSONALIZATIONS recipients.
+        Groups are sent concurrently (bounded by the client's connection pool).
+        Returns one result per message, in order. When a shared request
+        fails, its messages are re-sent one per request, so one bad recipient
+        fails only its own message.
+        """
+        groups: dict[tuple, list[int]] = {}
+        for i, message in enumerate(messages):
+            groups.setdefault(message.content_key(), []).append(i)
+
+        requests = []
+        for group in groups.values():
+            chunk, recipients = [], 0
+            for i in group:
+                if chunk and recipients + len(messages[i].to) > MAX_PERSONALIZATIONS:
+                    requests.append(chunk)
+                    chunk, recipients = [], 0
+                chunk.append(i)
+                recipients += len(messages[i].to)
+            requests.append(chunk)
+
+        results: list[dict | None] = [None] * len(messages)
+
+        async def send_chunk(chunk):
+            try:
+                status_code = await self._post(self.build_payload([messages[i] for i in chunk]))
+                result = {"status": "sent", "status_code": status_code, "batch_size": len(chunk)}
+            except EmailTransportError as e:
+                if len(chunk) > 1:
+                    logger.warning("SendGrid batch failed, sending its messages one by one",
+                                   messages=len(chunk), error=str(e))
+                    await asyncio.gather(*(send_chunk([i]) for i in chunk))
+                    return
+                result = {"status": "error", "detail": str(e), "batch_size": len(chunk)}
+            for i in chunk:
+                results[i] = {**result, "recipients": len(messages[i].to)}
+
+        await asyncio.gather(*(send_chunk(chunk) for chunk in requests))
+        return results
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+class MemoryTransport:
+    """Keeps messages in `outbox` instead of delivering them."""
+
+    def __init__(self):
+        self.outbox: list[EmailMessage] = []
+
+    async def send(self, message: EmailMessage) -> dict:
+        self.outbox.append(message.substituted())
+        return {"status": "sent", "transport": "memory"}
+
+    async def send_batch(self, messages: list[EmailMessage]) -> list[dict]:
+        return [await self.send(message) for message in messages]
+
+    async def close(self):
+        pass
+
+
+class ConsoleTransport(MemoryTransport):
+    """Development transport: logs each message (and keeps it in the outbox)."""
+
+    async def send(self, message: EmailMessage) -> dict:
+        message = message.substituted()
+        preview = (message.text or message.html or "")[:50]
+        print(f"\n🚀 [MOCK EMAIL] To: {', '.join(message.to)} | Subject: {message.subject} | Content: {preview}...\n")
+        await super().send(message)
+        return {"status": "mock_sent"}
+
+
+_transport = None
+
+
+def get_email_transport():
+    """
+    Process-wide transport selected by settings.email_transport
+    ("sendgrid" | "memory" | "console"; empty = SendGrid if a key is configured,
+    console outside production). Returns None when email is not configured.
+    """
+    global _transport
+    if _transport is None:
+        name = settings.email_transport or (
+            "sendgrid" if settings.sendgrid_api_key else ("console" if not settings.is_production else "")
+        )
+        if name == "sendgrid" and settings.sendgrid_api_key:
+            _transport = SendGridTransport(settings.sendgrid_api_key)
+        elif name == "memory":
+            _transport = MemoryTransport()
+        elif name == "console":
+            _transport = ConsoleTransport()
+    return _transport
+
+
+def set_email_transport(transport):
+    """Override the process-wide transport (tests, scripts)."""
+    global _transport
+    _transport = transport
+
+
+async def close_email_transport():
+    global _transport
+    if _transport is not None:
+        await _transport.close()
+        _transport = None
@@ -0,0 +1,382 @@
+"""
+Columnar bulk export for the data team.
+
+Streams conversations, messages, leads and analytics_daily for a property and
+date range into compressed Parquet (or Arrow IPC) files. Rows are read through
+a server-side cursor (`db.stream` + `yield_per`) and written as fixed-size
+record batches, so memory stays flat no matter how many rows a table holds.
+
+Exports run from the CLI (scripts/export_data.py) or as a background job.
+A job writes its files to a local staging directory, then uploads them to
+Redis (ExportFileStore) next to its status (ExportJobStore), both expiring
+after settings.export_job_ttl. The download endpoint streams them from Redis,
+so any API process can serve a file whichever process ran the export. Local
+staging is removed when the job ends; directories left behind by a crashed
+process are swept once older than export_job_ttl.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncIterator, Callable
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import structlog
+from sqlalchemy import select, Boolean, Date, DateTime, Integer, JSON, Numeric, String, Text
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.core.redis import get_redis
+from app.models import Conversation, Message, Lead, AnalyticsDaily
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+FORMATS = {
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+}
+JOB_KEY_PREFIX = "export:job"
+FILE_KEY_PREFIX = "export:file"
+FILE_CHUNK_BYTES = 1024 * 1024  # One Redis value per MiB of file
+
+
+@dataclass(frozen=True)
+class ExportSpec:
+    model: type
+    time_column: object  # Column the date range applies to
+    scope: Callable[[uuid.UUID], list]  # Property filter (+ joins) for the select
+
+
+EXPORT_TABLES: dict[str, ExportSpec] = {
+    "conversations": ExportSpec(
+        Conversation,
+        Conversation.started_at,
+        lambda pid: [Conversation.property_id == pid],
+    ),
+    "messages": ExportSpec(
+        Message,
+        Message.sent_at,
+        lambda pid: [
+            Message.conversation_id.in_(
+                select(Conversation.id).where(Conversation.property_id == pid)
+            )
+        ],
+    ),
+    "leads": ExportSpec(
+        Lead,
+        Lead.captured_at,
+        lambda pid: [Lead.property_id == pid],
+    ),
+    "analytics_daily": ExportSpec(
+        AnalyticsDaily,
+        AnalyticsDaily.report_date,
+        lambda pid: [AnalyticsDaily.property_id == pid],
+    ),
+}
+
+
+def _arrow_field(column) -> tuple[pa.Field, Callable | None]:
+    """Arrow type for a SQLAlchemy column, plus a per-value converter if one is needed."""
+    col_type = column.type
+    if isinstance(col_type, PG_UUID):
+        arrow_type, convert = pa.string(), str
+    elif isinstance(col_type, (JSON, JSONB)):
+        arrow_type, convert = pa.string(), json.dumps
+    elif isinstance(col_type, DateTime):
+        arrow_type, convert = pa.timestamp("us", tz="UTC"), None
+    elif isinstance(col_type, Date):
+        arrow_type, convert = pa.date32(), None
+    elif isinstance(col_type, Boolean):
+        arrow_type, convert = pa.bool_(), None
+    elif isinstance(col_type, Integer):
+        arrow_type, convert = pa.int64(), None
+    elif isinstance(col_type, Numeric):
+        arrow_type, convert = pa.decimal128(col_type.precision or 18, col_type.scale or 2), None
+    elif isinstance(col_type, (String, Text)):
+        arrow_type, convert = pa.string(), None
+    else:
+        raise TypeError(f"No Arrow mapping for column {column.name} ({col_type!r})")
+    return pa.field(column.name, arrow_type), convert
+
+
+def export_schema(model) -> tuple[pa.Schema, list]:
+    """Arrow schema for a model's table and the matching value converters."""
+    fields, converters = [], []
+    for column in model.__table__.columns:
+        field, convert = _arrow_field(column)
+        fields.append(field)
+        converters.append(convert)
+    return pa.schema(fields), converters
+
+
+def rows_to_batch(rows, schema: pa.Schema, converters: list) -> pa.RecordBatch:
+    """Transpose a partition of row tuples into one Arrow record batch."""
+    arrays = []
+    for i, (field, convert) in enumerate(zip(schema, converters)):
+        values = [row[i] for row in rows]
+        if convert is not None:
+            values = [None if v is None else convert(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _BatchWriter:
+    """Parquet or Arrow IPC file writer with zstd compression."""
+
+    def __init__(self, path: str, schema: pa.Schema, fmt: str):
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(path, schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(
+                path, schema, options=pa.ipc.IpcWriteOptions(compression="zstd")
+            )
+        self._fmt = fmt
+
+    def write(self, batch: pa.RecordBatch):
+        if self._fmt == "parquet":
+            self._writer.write_batch(batch, row_group_size=batch.num_rows)
+        else:
+            self._writer.write_batch(batch)
+
+    def close(self):
+        self._writer.close()
+
+
+def _window(from_date: date, to_date: date, time_column) -> list:
+    if isinstance(time_column.type, Date):
+        return [time_column >= from_date, time_column <= to_date]
+    start = datetime.combine(from_date, datetime.min.time()).replace(tzinfo=timezone.utc)
+    end = datetime.combine(to_date + timedelta(days=1), datetime.min.time()).replace(tzinfo=timezone.utc)
+    return [time_column >= start, time_column < end]
+
+
+async def export_table(
+    db: AsyncSession,
+    table: str,
+    property_id: uuid.UUID,
+    from_date: date,
+    to_date: date,
+    path: str,
+    fmt: str = "parquet",
+    batch_size: int | None = None,
+) -> int:
+    """Stream one table for the property/range into `path`. Returns rows written."""
+    spec = EXPORT_TABLES[table]
+    batch_size = batch_size or settings.export_batch_size
+    schema, converters = export_schema(spec.model)
+
+    stmt = (
+        select(*spec.model.__table__.columns)
+        .where(*spec.scope(property_id), *_window(from_date, to_date, spec.time_column))
+        .order_by(spec.time_column)
+        .execution_options(yield_per=batch_size)
+    )
+
+    writer = _BatchWriter(path, schema, fmt)
+    rows_written = 0
+    try:
+        result = await db.stream(stmt)
+        async for partition in result.partitions(batch_size):
+            batch = rows_to_batch(partition, schema, converters)
+            # Encoding + compression is CPU-bound; keep it off the event loop
+            await asyncio.to_thread(writer.write, batch)
+            rows_written += batch.num_rows
+    finally:
+        await asyncio.to_thread(writer.close)
+    return rows_written
+
+
+async def export_property_data(
+    db: AsyncSession,
+    property_id: uuid.UUID,
+    from_date: date,
+    to_date: date,
+    output_dir: str,
+    tables: list[str] | None = None,
+    fmt: str = "parquet",
+    batch_size: int | None = None,
+) -> dict:
+    """
+    Export the requested tables (default: all) into `output_dir`.
+    Returns a manifest {table: {"path", "rows", "bytes"}}.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {tuple(FORMATS)}")
+    tables = tables or list(EXPORT_TABLES)
+    unknown = set(tables) - set(EXPORT_TABLES)
+    if unknown:
+        raise ValueError(f"Unknown export tables: {sorted(unknown)}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    extension, _ = FORMATS[fmt]
+    manifest = {}
+    for table in tables:
+        path = os.path.join(output_dir, f"{table}{extension}")
+        started = datetime.now(timezone.utc)
+        rows = await export_table(db, table, property_id, from_date, to_date, path, fmt, batch_size)
+        manifest[table] = {"path": path, "rows": rows, "bytes": os.path.getsize(path)}
+        logger.info(
+            "Export table written",
+            table=table,
+            property_id=str(property_id),
+            rows=rows,
+            bytes=manifest[table]["bytes"],
+            elapsed_sec=round((datetime.now(timezone.utc) - started).total_seconds(), 2),
+        )
+    return manifest
+
+
+class ExportJobStore:
+    """Export job status, kept in Redis for settings.export_job_ttl seconds."""
+
+    def __init__(self):
+        self.redis = None
+
+    async def _get_redis(self):
+        if not self.redis:
+            self.redis = await get_redis()
+        return self.redis
+
+    async def save(self, job: dict):
+        redis = await self._get_redis()
+        await redis.set(f"{JOB_KEY_PREFIX}:{job['id']}", json.dumps(job, default=str), expire=settings.export_job_ttl)
+
+    async def get(self, job_id: str) -> dict | None:
+        redis = await self._get_redis()
+        raw = await redis.get(f"{JOB_KEY_PREFIX}:{job_id}")
+        return json.loads(raw) if raw else None
+
+
+export_jobs = ExportJobStore()
+
+
+class ExportFileStore:
+    """Finished export files, split into FILE_CHUNK_BYTES Redis values with the job's TTL."""
+
+    def __init__(self):
+        self.redis = None
+
+    async def _get_redis(self):
+        if not self.redis:
+            self.redis = await get_redis()
+        return self.redis
+
+    @staticmethod
+    def _key(job_id: str, table: str, index: int) -> str:
+        return f"{FILE_KEY_PREFIX}:{job_id}:{table}:{index}"
+
+    async def put(self, job_id: str, table: str, path: str) -> int:
+        """Upload a file; returns the number of chunks written."""
+        redis = await self._get_redis()
+        chunks = 0
+        with open(path, "rb") as f:
+            while data := await asyncio.to_thread(f.read, FILE_CHUNK_BYTES):
+                await redis.set_bytes(self._key(job_id, table, chunks), data, expire=settings.export_job_ttl)
+                chunks += 1
+        return chunks
+
+    async def exists(self, job_id: str, table: str, chunks: int) -> bool:
+        redis = await self._get_redis()
+        keys = [self._key(job_id, table, i) for i in range(chunks)]
+        return bool(keys) and await redis.exists(*keys) == chunks
+
+    async def stream(self, job_id: str, table: str, chunks: int) -> AsyncIterator[bytes]:
+        """Yield the file one chunk at a time (memory stays at one chunk)."""
+        redis = await self._get_redis()
+        for i in range(chunks):
+            data = await redis.get_bytes(self._key(job_id, table, i))
+            if data is None:
+                # Expired mid-download; the client sees a short read against Content-Length
+                logger.warning("Export file chunk missing", job_id=job_id, table=table, chunk=i)
+                return
+            yield data
+
+
+export_files = ExportFileStore()
+
+
+def sweep_staging(now: float | None = None) -> int:
+    """Remove staging directories older than export_job_ttl (left by crashed jobs)."""
+    if not os.path.isdir(settings.export_dir):
+        return 0
+    cutoff = (now or time.time()) - settings.export_job_ttl
+    removed = 0
+    for entry in os.scandir(settings.export_dir):
+        if entry.is_dir() and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+async def create_export_job(
+    property_id: uuid.UUID,
+    from_date: date,
+    to_date: date,
+    tables: list[str] | None,
+    fmt: str,
+) -> dict:
+    job = {
+        "id": uuid.uuid4().hex,
+        "property_id": str(property_id),
+        "from_date": from_date.isoformat(),
+        "to_date": to_date.isoformat(),
+        "tables": tables or list(EXPORT_TABLES),
+        "format": fmt,
+        "status": "queued",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "manifest": None,
+        "error": None,
+    }
+    await export_jobs.save(job)
+    return job
+
+
+async def run_export_job(job_id: str):
+    """Background task: run a queued export in its own session and record the outcome."""
+    from app.database import async_session, set_db_context
+
+    job = await export_jobs.get(job_id)
+    if not job:
+        logger.warning("Export job expired before it ran", job_id=job_id)
+        return
+
+    job["status"] = "running"
+    await export_jobs.save(job)
+    staging_dir = os.path.join(settings.export_dir, job_id)
+    try:
+        await asyncio.to_thread(sweep_staging)
+        async with async_session() as db:
+            await set_db_context(db, job["property_id"])
+            manifest = await export_property_data(
+                db,
+                uuid.UUID(job["property_id"]),
+                date.fromisoformat(job["from_date"]),
+                date.fromisoformat(job["to_date"]),
+                output_dir=staging_dir,
+                tables=job["tables"],
+                fmt=job["format"],
+            )
+        total_bytes = sum(entry["bytes"] for entry in manifest.values())
+        if total_bytes > settings.export_max_bytes:
+            raise ValueError(
+                f"Export is {total_bytes} bytes, over the {settings.export_max_bytes} byte limit "
+                "for downloads; narrow the date range or use scripts/export_data.py"
+            )
+        for table, entry in manifest.items():
+            entry["chunks"] = await export_files.put(job_id, table, entry.pop("path"))
+        job.update(status="completed", manifest=manifest)
+    except Exception as e:
+        logger.error("Export job failed", job_id=job_id, error=str(e))
+        job.update(status="failed", error=str(e))
+    finally:
+        await asyncio.to_thread(shutil.rmtree, staging_dir, True)
+    job["finished_at"] = datetime.now(timezone.utc).isoformat()
+    await export_jobs.save(job)
@@ -0,0 +1,285 @@
+"""
+Inquiry → lead → conversion funnel.
+
+funnel_daily is maintained incrementally with INSERT ... ON CONFLICT DO UPDATE
+increments, so the funnel endpoint reads a handful of pre-aggregated rows
+instead of joining conversations and leads. Rows are keyed by the day the
+conversation started (in the property's timezone, like analytics_daily), its
+channel and the lead intent:
+
+- a new conversation counts one inquiry under intent "unqualified"
+- capturing a lead moves that inquiry to the lead's intent and counts the lead
+- a status change applies the stage delta (contacted/converted/lost) to the
+  lead's row, so each row always reflects the current state of its leads
+
+`rebuild_funnel` recomputes rows from the raw tables for repair and backfill.
+"""
+
+import uuid
+from datetime import date, datetime, timezone
+
+import structlog
+from sqlalchemy import select, func, delete, insert, cast, Date
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Conversation, Lead, LeadEvent, FunnelDaily, Property
+from app.services.analytics import local_day_window, property_zone
+
+logger = structlog.get_logger()
+
+UNQUALIFIED = "unqualified"
+STAGE_COLUMNS = ("leads_contacted", "leads_converted", "leads_lost")
+
+
+def _stage_flags(status: str | None) -> dict[str, int]:
+    """Which funnel stages a lead in `status` counts towards."""
+    return {
+        "leads_contacted": int(status in ("contacted", "converted")),
+        "leads_converted": int(status == "converted"),
+        "leads_lost": int(status == "lost"),
+    }
+
+
+def _cohort_date(started_at: datetime | None, tz_name: str | None) -> date:
+    """The property-local day a conversation started on."""
+    return (started_at or datetime.now(timezone.utc)).astimezone(property_zone(tz_name)).date()
+
+
+async def _bump(
+    db: AsyncSession,
+    property_id: uuid.UUID,
+    report_date: date,
+    channel: str,
+    intent: str,
+    **deltas: int,
+):
+    """Add `deltas` to one funnel row, creating it if needed (single round trip)."""
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas:
+        return
+    stmt = pg_insert(FunnelDaily).values(
+        property_id=property_id,
+        report_date=report_date,
+        channel=channel,
+        intent=intent,
+        **deltas,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["property_id", "report_date", "channel", "intent"],
+        set_={
+            **{name: getattr(FunnelDaily, name) + value for name, value in deltas.items()},
+            "updated_at": func.now(),
+        },
+    )
+    await db.execute(stmt)
+
+
+async def record_inquiry(db: AsyncSession, conversation: Conversation, tz_name: str | None = None):
+    """Count a newly created conversation as an unqualified inquiry (needs started_at loaded)."""
+    await _bump(
+        db,
+        conversation.property_id,
+        _cohort_date(conversation.started_at, tz_name),
+        conversation.channel,
+        UNQUALIFIED,
+        inquiries=1,
+    )
+
+
+async def record_lead_captured(
+    db: AsyncSession,
+    lead: Lead,
+    conversation: Conversation,
+    tz_name: str | None = None,
+):
+    """Reclassify the conversation's inquiry to the lead's intent and count the lead."""
+    report_date = _cohort_date(conversation.started_at, tz_name)
+    intent = lead.intent or UNQUALIFIED
+    status = lead.status or "new"
+
+    await _bump(db, conversation.property_id, report_date, conversation.channel, UNQUALIFIED, inquiries=-1)
+    await _bump(
+        db,
+        conversation.property_id,
+        report_date,
+        conversation.channel,
+        intent,
+        inquiries=1,
+        leads_captured=1,
+        **_stage_flags(status),
+    )
+    db.add(LeadEvent(
+        lead_id=lead.id,
+        property_id=lead.property_id,
+        from_status=None,
+        to_status=status,
+    ))
+
+
+async def record_lead_status_change(
+    db: AsyncSession,
+    lead: Lead,
+    from_status: str | None,
+    to_status: str,
+    changed_by: str | None = None,
+):
+    """Store the transition as a LeadEvent and move the lead between funnel stages."""
+    if from_status == to_status:
+        return
+
+    db.add(LeadEvent(
+        lead_id=lead.id,
+        property_id=lead.property_id,
+        from_status=from_status,
+        to_status=to_status,
+        changed_by=changed_by,
+    ))
+
+    conv_result = await db.execute(
+        select(Conversation.started_at, Conversation.channel, Property.timezone)
+        .join(Property, Property.id == Conversation.property_id)
+        .where(Conversation.id == lead.conversation_id)
+    )
+    conv = conv_result.first()
+    channel = (conv.channel if conv else None) or lead.source_channel or "web"
+
+    before, after = _stage_flags(from_status), _stage_flags(to_status)
+    await _bump(
+        db,
+        lead.property_id,
+        _cohort_date(conv.started_at if conv else lead.captured_at, conv.timezone if conv else None),
+        channel,
+        lead.intent or UNQUALIFIED,
+        **{name: after[name] - before[name] for name in STAGE_COLUMNS},
+    )
+
+
+async def rebuild_funnel(
+    db: AsyncSession,
+    property_id: uuid.UUID,
+    from_date: date,
+    to_date: date,
+) -> int:
+    """
+    Recompute funnel_daily for a property over [from_date, to_date] from the raw
+    conversations/leads tables (replaces existing rows). Returns rows written.
+    """
+    tz_result = await db.execute(select(Property.timezone).where(Property.id == property_id))
+    tz_name = tz_result.scalar()
+    report_date = cast(func.timezone(property_zone(tz_name).key, Conversation.started_at), Date)
+    intent = func.coalesce(Lead.intent, UNQUALIFIED)
+    window_start, _ = local_day_window(from_date, tz_name)
+    _, window_end = local_day_window(to_date, tz_name)
+
+    source = (
+        select(
+            Conversation.property_id,
+            report_date,
+            Conversation.channel,
+            intent,
+            func.count(Conversation.id),
+            func.count(Lead.id),
+            func.count(Lead.id).filter(Lead.status.in_(("contacted", "converted"))),
+            func.count(Lead.id).filter(Lead.status == "converted"),
+            func.count(Lead.id).filter(Lead.status == "lost"),
+        )
+        .outerjoin(Lead, Lead.conversation_id == Conversation.id)
+        .where(
+            Conversation.property_id == property_id,
+            Conversation.started_at >= window_start,
+            Conversation.started_at < window_end,
+        )
+        .group_by(Conversation.property_id, report_date, Conversation.channel, intent)
+    )
+
+    await db.execute(
+        delete(FunnelDaily).where(
+            FunnelDaily.property_id == property_id,
+            FunnelDaily.report_date >= from_date,
+            FunnelDaily.report_date <= to_date,
+        )
+    )
+    result = await db.execute(
+        insert(FunnelDaily).from_select(
+            [
+                "property_id",
+                "report_date",
+                "channel",
+                "intent",
+                "inquiries",
+                "leads_captured",
+                "leads_contacted",
+                "leads_converted",
+                "leads_lost",
+            ],
+            source,
+        )
+    )
+    logger.info(
+        "Funnel rebuilt",
+        property_id=str(property_id),
+        from_date=from_date.isoformat(),
+        to_date=to_date.isoformat(),
+        rows=result.rowcount,
+    )
+    return result.rowcount
+
+
+def _rates(row: dict) -> dict:
+    def ratio(numerator: int, denominator: int) -> float:
+        return round(numerator / denominator, 4) if denominator else 0.0
+
+    row["lead_rate"] = ratio(row["leads_captured"], row["inquiries"])
+    row["contact_rate"] = ratio(row["leads_contacted"], row["leads_captured"])
+    row["conversion_rate"] = ratio(row["leads_converted"], row["leads_captured"])
+    return row
+
+
+async def get_funnel(
+    db: AsyncSession,
+    property_id: uuid.UUID,
+    from_date: date,
+    to_date: date,
+) -> dict:
+    """Funnel totals plus breakdowns by channel and by intent, read from funnel_daily."""
+    counters = (
+        FunnelDaily.inquiries,
+        FunnelDaily.leads_captured,
+        FunnelDaily.leads_contacted,
+        FunnelDaily.leads_converted,
+        FunnelDaily.leads_lost,
+    )
+    result = await db.execute(
+        select(
+            FunnelDaily.channel,
+            FunnelDaily.intent,
+            *(func.sum(c).label(c.key) for c in counters),
+        )
+        .where(
+            FunnelDaily.property_id == property_id,
+            FunnelDaily.report_date >= from_date,
+            FunnelDaily.report_date <= to_date,
+        )
+        .group_by(FunnelDaily.channel, FunnelDaily.intent)
+    )
+    rows = result.fetchall()
+
+    def empty() -> dict:
+        return {c.key: 0 for c in counters}
+
+    totals, by_channel, by_intent = empty(), {}, {}
+    for row in rows:
+        for c in counters:
+            value = int(getattr(row, c.key) or 0)
+            totals[c.key] += value
+            by_channel.setdefault(row.channel, empty())[c.key] += value
+            by_intent.setdefault(row.intent, empty())[c.key] += value
+
+    return {
+        "property_id": str(property_id),
+        "period": {"from": from_date.isoformat(), "to": to_date.isoformat()},
+        "totals": _rates(totals),
+        "by_channel": {k: _rates(v) for k, v in sorted(by_channel.items())},
+        "by_intent": {k: _rates(v) for k, v in sorted(by_intent.items())},
+    }
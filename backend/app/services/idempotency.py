@@ -0,0 +1,125 @@
+"""
+Webhook idempotency on provider message ids.
+
+Meta and SendGrid retry a webhook when we are slow to answer, so the same
+guest message can arrive more than once. Two layers keep that to one stored
+message, one LLM call and one reply:
+
+1. Before queueing anything, the webhook claims each provider message id
+   (WhatsApp wamid, email Message-ID) with an atomic Redis SET NX EX that
+   lasts settings.inbound_dedupe_ttl_sec. Ids that are already claimed are
+   dropped.
+2. The worker inserts an inbound_receipts row in the same transaction as the
+   guest message. Its unique (channel, provider_message_id) index catches
+   what Redis cannot: a flushed or expired key, or a job redelivered after a
+   crash between the commit and the ack.
+
+If Redis is unavailable the webhook fails open and leaves deduping to layer
+2. Suppressed duplicates are counted per channel and layer, and the counts
+appear on /admin/queue/stats.
+"""
+
+import structlog
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.core.redis import get_redis
+from app.models import InboundReceipt
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+DEDUPE_KEY_PREFIX = "inbound:seen:"
+DUPLICATES_KEY = "inbound:duplicates"
+
+
+def dedupe_key(channel: str, message_id: str) -> str:
+    return f"{DEDUPE_KEY_PREFIX}{channel}:{message_id}"
+
+
+class InboundDedupe:
+    def __init__(self):
+        self.redis = None
+
+    async def _get_redis(self):
+        if not self.redis:
+            self.redis = await get_redis()
+        return self.redis
+
+    async def claim(self, channel: str, message_ids: list[str | None]) -> list[bool]:
+        """
+        Claim a webhook delivery's message ids. Returns one flag per input:
+        True to process it, False for a duplicate (already claimed, or
+        repeated earlier in the same delivery). Messages without an id can't
+        be deduped and are always processed.
+        """
+        unique = list(dict.fromkeys(mid for mid in message_ids if mid))
+        if not unique:
+            return [True] * len(message_ids)
+        try:
+            redis = await self._get_redis()
+            results = await redis.set_many_nx(
+                [dedupe_key(channel, mid) for mid in unique], settings.inbound_dedupe_ttl_sec
+            )
+            fresh = {mid for mid, ok in zip(unique, results) if ok}
+        except Exception as e:
+            logger.warning("Inbound dedupe unavailable, relying on receipts", channel=channel, error=str(e))
+            fresh = set(unique)
+
+        flags = []
+        for mid in message_ids:
+            if not mid:
+                flags.append(True)
+            elif mid in fresh:
+                fresh.discard(mid)  # First occurrence only
+                flags.append(True)
+            else:
+                flags.append(False)
+
+        duplicates = flags.count(False)
+        if duplicates:
+            await self.record_duplicates(channel, "redis", duplicates)
+            logger.info("Duplicate webhook messages suppressed", channel=channel, count=duplicates)
+        return flags
+
+    async def release(self, channel: str, message_ids: list[str | None]):
+        """Drop claims for messages that could not be queued, so the provider's retry is accepted."""
+        keys = [dedupe_key(channel, mid) for mid in dict.fromkeys(message_ids) if mid]
+        if not keys:
+            return
+        try:
+            redis = await self._get_redis()
+            await redis.delete(*keys)
+        except Exception as e:
+            logger.error("Inbound dedupe release failed", channel=channel, count=len(keys), error=str(e))
+
+    async def record_duplicates(self, channel: str, layer: str, count: int = 1):
+        try:
+            redis = await self._get_redis()
+            await redis.hincrby(DUPLICATES_KEY, f"{channel}:{layer}", count)
+        except Exception as e:
+            logger.warning("Duplicate counter update failed", channel=channel, layer=layer, error=str(e))
+
+    async def counters(self) -> dict:
+        """Duplicates suppressed so far, keyed "<channel>:<layer>" (layer is redis or db)."""
+        redis = await self._get_redis()
+        return {field: int(value) for field, value in (await redis.hgetall(DUPLICATES_KEY)).items()}
+
+
+async def claim_receipt(db: AsyncSession, channel: str, message_id: str) -> bool:
+    """
+    Record that this provider message is being processed, in the caller's
+    transaction. False if a committed (or concurrent) transaction already
+    holds it.
+    """
+    result = await db.execute(
+        pg_insert(InboundReceipt)
+        .values(channel=channel, provider_message_id=message_id)
+        .on_conflict_do_nothing(index_elements=["channel", "provider_message_id"])
+        .returning(InboundReceipt.id)
+    )
+    return result.scalar_one_or_none() is not None
+
+
+inbound_dedupe = InboundDedupe()
@@ -0,0 +1,208 @@
+"""
+Durable inbound message queue on Redis Streams.
+
+Webhooks append an InboundJob to settings.inbound_stream and return at once;
+`python -m app.worker` consumes it through the settings.inbound_group consumer
+group. A job is acknowledged (and deleted from the stream) only after the
+worker has committed its result, so a crash or deploy mid-job leaves it
+pending and another worker reclaims it after settings.inbound_claim_idle_ms.
+
+Failed jobs are retried with exponential backoff through a sorted set of due
+times (Streams have no delayed delivery), promoted back onto the stream by
+a Lua script so a crash can never leave a job in neither place. After
+settings.inbound_max_attempts they are moved to the dead-letter stream with
+the last error.
+"""
+
+import json
+import os
+import socket
+import time
+from dataclasses import asdict, dataclass, field
+
+import structlog
+
+from app.config import get_settings
+from app.core.redis import get_redis
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+RETRY_KEY_SUFFIX = ":retry"
+DEAD_KEY_SUFFIX = ":dead"
+
+# KEYS: retry set, stream. ARGV: now, limit, stream maxlen.
+# ZREM and XADD run as one atomic step, so a promoted job is always in exactly one of the two.
+PROMOTE_RETRIES_LUA = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], 0, ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, raw in ipairs(due) do
+    redis.call('ZREM', KEYS[1], raw)
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*', 'job', raw)
+end
+return #due
+"""
+
+
+@dataclass
+class InboundJob:
+    kind: str  # "whatsapp" | "email"
+    property_id: str
+    guest_identifier: str
+    content: str
+    guest_name: str | None = None
+    subject: str | None = None
+    message_id: str | None = None  # Provider id (wamid / Message-ID), for dedupe
+    phone_number_id: str | None = None  # WhatsApp business number the guest wrote to; the reply goes from it
+    attempt: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+
+    def dumps(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, raw: str) -> "InboundJob":
+        return cls(**json.loads(raw))
+
+
+def consumer_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def entry_age_sec(entry_id: str, now: float | None = None) -> float:
+    """Stream ids start with the append time in ms."""
+    appended_ms = int(entry_id.split("-", 1)[0])
+    return max(0.0, (now or time.time()) - appended_ms / 1000)
+
+
+def retry_delay_sec(attempt: int) -> float:
+    return settings.inbound_retry_base_sec * (2 ** (attempt - 1))
+
+
+class InboundQueue:
+    def __init__(self, stream: str | None = None, group: str | None = None):
+        self.stream = stream or settings.inbound_stream
+        self.group = group or settings.inbound_group
+        self.retry_key = self.stream + RETRY_KEY_SUFFIX
+        self.dead_stream = self.stream + DEAD_KEY_SUFFIX
+        self.redis = None
+
+    async def _get_redis(self):
+        if not self.redis:
+            self.redis = await get_redis()
+        return self.redis
+
+    async def ensure_group(self):
+        redis = await self._get_redis()
+        try:
+            await redis.xgroup_create(self.stream, self.group, id="0")
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def enqueue(self, job: InboundJob) -> str:
+        redis = await self._get_redis()
+        entry_id = await redis.xadd(
+            self.stream, {"job": job.dumps()}, maxlen=settings.inbound_stream_maxlen
+        )
+        logger.info("Inbound job queued", kind=job.kind, property_id=job.property_id, entry_id=entry_id)
+        return entry_id
+
+    async def enqueue_many(self, jobs: list[InboundJob]) -> list[str]:
+        """Queue a webhook delivery's worth of jobs with one Redis round trip."""
+        if not jobs:
+            return []
+        redis = await self._get_redis()
+        entry_ids = await redis.xadd_many(
+            self.stream, [{"job": job.dumps()} for job in jobs], maxlen=settings.inbound_stream_maxlen
+        )
+        logger.info("Inbound jobs queued", count=len(jobs), kinds=sorted({job.kind for job in jobs}))
+        return entry_ids
+
+    async def read(self, consumer: str, count: int, block_ms: int = 5000) -> list[tuple[str, InboundJob]]:
+        """
+        Jobs for this consumer: first any left pending by a dead worker for
+        longer than settings.inbound_claim_idle_ms, then new ones.
+        """
+        redis = await self._get_redis()
+        claimed = await redis.xautoclaim(
+            self.stream, self.group, consumer, settings.inbound_claim_idle_ms, count
+        )
+        entries = [entry for entry in claimed[1] if entry and entry[1]]
+        if not entries:
+            response = await redis.xreadgroup(
+                self.group, consumer, {self.stream: ">"}, count=count, block=block_ms
+            )
+            entries = [entry for _, stream_entries in (response or []) for entry in stream_entries]
+
+        jobs = []
+        for entry_id, fields in entries:
+            try:
+                jobs.append((entry_id, InboundJob.loads(fields["job"])))
+            except (KeyError, TypeError, ValueError) as e:
+                # Unparseable: nothing a retry can fix
+                await self._dead_letter(entry_id, fields.get("job", ""), f"malformed job: {e}")
+        return jobs
+
+    async def ack(self, entry_id: str):
+        redis = await self._get_redis()
+        await redis.xack_del(self.stream, self.group, entry_id)
+
+    async def fail(self, entry_id: str, job: InboundJob, error: str):
+        """Schedule a retry with backoff, or dead-letter the job when out of attempts."""
+        job.attempt += 1
+        if job.attempt >= settings.inbound_max_attempts:
+            await self._dead_letter(entry_id, job.dumps(), error)
+            return
+
+        redis = await self._get_redis()
+        delay = retry_delay_sec(job.attempt)
+        await redis.zadd(self.retry_key, {job.dumps(): time.time() + delay})
+        await redis.xack_del(self.stream, self.group, entry_id)
+        logger.warning(
+            "Inbound job failed, will retry",
+            kind=job.kind, property_id=job.property_id, attempt=job.attempt, retry_in_sec=delay, error=error,
+        )
+
+    async def _dead_letter(self, entry_id: str, raw_job: str, error: str):
+        redis = await self._get_redis()
+        await redis.xadd(
+            self.dead_stream,
+            {"job": raw_job, "error": error[:2000], "source_id": entry_id},
+            maxlen=settings.inbound_stream_maxlen,
+        )
+        await redis.xack_del(self.stream, self.group, entry_id)
+        logger.error("Inbound job dead-lettered", entry_id=entry_id, error=error)
+
+    async def promote_due_retries(self, limit: int = 100) -> int:
+        """Move retries whose backoff has elapsed back onto the stream."""
+        redis = await self._get_redis()
+        promoted = await redis.eval(
+            PROMOTE_RETRIES_LUA,
+            [self.retry_key, self.stream],
+            [time.time(), limit, settings.inbound_stream_maxlen],
+        )
+        return int(promoted)
+
+    async def stats(self) -> dict:
+        """Queue depth and lag, for the admin metrics endpoint and worker logs."""
+        await self.ensure_group()
+        redis = await self._get_redis()
+        depth = await redis.xlen(self.stream)
+        oldest = await redis.xrange(self.stream, count=1)
+        pending = await redis.xpending(self.stream, self.group)
+        group_lag = None
+        for group in await redis.xinfo_groups(self.stream):
+            if group.get("name") == self.group:
+                group_lag = group.get("lag")  # Redis 7+: entries never delivered
+        return {
+            "stream": self.stream,
+            "depth": depth,
+            "pending": pending.get("pending", 0) if pending else 0,
+            "undelivered": group_lag,
+            "oldest_age_sec": round(entry_age_sec(oldest[0][0]), 1) if oldest else 0.0,
+            "retry_scheduled": await redis.zcard(self.retry_key),
+            "dead_letter": await redis.xlen(self.dead_stream),
+        }
+
+
+inbound_queue = InboundQueue()
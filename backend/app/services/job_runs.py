@@ -0,0 +1,189 @@
+"""
+Cluster-safe execution of scheduled jobs.
+
+Every app process runs its own APScheduler, so each cron fire happens once
+per process. run_leased_job makes sure a fire runs once cluster-wide:
+
+1. A Postgres session advisory lock per (job name, fire time) keeps
+   processes from racing on the same fire. It is not per job name: a slow run
+   (a report slot taking longer than the 15-minute dispatch interval) must not
+   make the next fire skip, because a skipped fire is never caught up. The
+   lock is released automatically if the holder's connection dies.
+2. The run is claimed by inserting the (job_name, scheduled_for) row into
+   job_runs; the unique index means only one process wins a given fire time.
+   Every process derives the same scheduled_for from the trigger
+   (canonical_fire_time), so clock jitter between nodes does not matter.
+3. The run id is the fencing token: the finishing UPDATE only applies to the
+   row this process claimed while it is still "running".
+
+The job_runs rows double as run history (start, end, duration, rows affected).
+"""
+
+import hashlib
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+import structlog
+from sqlalchemy import select, update, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database import async_session, engine
+from app.models import JobRun
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def lock_key(job_name: str, scheduled_for: datetime) -> int:
+    """Stable signed 64-bit advisory lock key for one fire of a job."""
+    name = f"{job_name}:{scheduled_for.astimezone(timezone.utc).isoformat()}"
+    return int.from_bytes(hashlib.sha1(name.encode()).digest()[:8], "big", signed=True)
+
+
+def canonical_fire_time(trigger, now: datetime | None = None) -> datetime:
+    """
+    The trigger's most recent fire time at or before `now` (within
+    settings.job_fire_time_grace_sec), in UTC. All nodes agree on it even if
+    their schedulers wake up a little apart.
+    """
+    now = now or datetime.now(timezone.utc)
+    grace = timedelta(seconds=settings.job_fire_time_grace_sec)
+    fire_time = trigger.get_next_fire_time(None, now - grace)
+    if fire_time is None or fire_time > now:
+        # Manual / off-schedule run: key it to the minute
+        fire_time = now.replace(second=0, microsecond=0)
+    return fire_time.astimezone(timezone.utc)
+
+
+def _rows_affected(result) -> int | None:
+    if isinstance(result, bool) or result is None:
+        return None
+    if isinstance(result, int):
+        return result
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    return None
+
+
+async def _claim(job_name: str, scheduled_for: datetime) -> uuid.UUID | None:
+    async with async_session() as db:
+        result = await db.execute(
+            pg_insert(JobRun)
+            .values(
+                id=uuid.uuid4(),
+                job_name=job_name,
+                scheduled_for=scheduled_for,
+                status="running",
+                owner=OWNER,
+            )
+            .on_conflict_do_nothing(index_elements=["job_name", "scheduled_for"])
+            .returning(JobRun.id)
+        )
+        run_id = result.scalar()
+        await db.commit()
+        return run_id
+
+
+async def _finish(run_id: uuid.UUID, status: str, duration_ms: int, rows_affected: int | None = None, error: str | None = None):
+    async with async_session() as db:
+        result = await db.execute(
+            update(JobRun)
+            .where(JobRun.id == run_id, JobRun.status == "running", JobRun.owner == OWNER)
+            .values(
+                status=status,
+                finished_at=datetime.now(timezone.utc),
+                duration_ms=duration_ms,
+                rows_affected=rows_affected,
+                error=error,
+            )
+        )
+        await db.commit()
+        if result.rowcount == 0:
+            logger.warning("Job run lost its lease before finishing", run_id=str(run_id))
+
+
+async def run_leased_job(
+    job_name: str,
+    job: Callable[[], Awaitable],
+    scheduled_for: datetime,
+) -> uuid.UUID | None:
+    """
+    Run `job` if this process wins the lease for (job_name, scheduled_for).
+    Returns the JobRun id, or None when another process has it.
+    The job's return value is recorded as rows_affected (int, or len() of a list).
+    """
+    key = lock_key(job_name, scheduled_for)
+    async with engine.connect() as lock_conn:
+        acquired = (await lock_conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key})).scalar()
+        await lock_conn.commit()  # Session-level lock survives; don't sit idle in a transaction
+        if not acquired:
+            logger.info("Job fire already running elsewhere, skipping", job=job_name, scheduled_for=scheduled_for.isoformat())
+            return None
+
+        try:
+            run_id = await _claim(job_name, scheduled_for)
+            if run_id is None:
+                logger.info("Job fire already claimed, skipping", job=job_name, scheduled_for=scheduled_for.isoformat())
+                return None
+
+            logger.info("Job started", job=job_name, run_id=str(run_id), scheduled_for=scheduled_for.isoformat())
+            started = time.perf_counter()
+            try:
+                result = await job()
+            except Exception as e:
+                duration_ms = int((time.perf_counter() - started) * 1000)
+                await _finish(run_id, "failed", duration_ms, error=str(e)[:2000])
+                logger.error("Job failed", job=job_name, run_id=str(run_id), duration_ms=duration_ms, error=str(e))
+                return run_id
+
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            rows = _rows_affected(result)
+            await _finish(run_id, "succeeded", duration_ms, rows_affected=rows)
+            logger.info("Job finished", job=job_name, run_id=str(run_id), duration_ms=duration_ms, rows_affected=rows)
+            return run_id
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+            await lock_conn.commit()
+
+
+def leased(job_name: str, job: Callable[[], Awaitable], trigger) -> Callable[[], Awaitable]:
+    """Wrap a job for APScheduler so each fire runs once across the cluster."""
+    async def run():
+        return await run_leased_job(job_name, job, canonical_fire_time(trigger))
+    run.__name__ = f"leased_{job_name}"
+    return run
+
+
+async def list_job_runs(
+    db: AsyncSession,
+    job_name: str | None = None,
+    limit: int = 50,
+) -> list[dict]:
+    """Most recent runs first."""
+    query = select(JobRun).order_by(JobRun.started_at.desc()).limit(limit)
+    if job_name:
+        query = query.where(JobRun.job_name == job_name)
+    result = await db.execute(query)
+    return [
+        {
+            "id": str(run.id),
+            "job_name": run.job_name,
+            "scheduled_for": run.scheduled_for.isoformat(),
+            "status": run.status,
+            "owner": run.owner,
+            "started_at": run.started_at.isoformat() if run.started_at else None,
+            "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+            "duration_ms": run.duration_ms,
+            "rows_affected": run.rows_affected,
+            "error": run.error,
+        }
+        for run in result.scalars().all()
+    ]
@@ -0,0 +1,322 @@
+"""
+Transactional outbox for guest replies.
+
+The inbound worker stores the reply as an OutboundMessage in the same commit
+as the AI Message (enqueue_reply), so a reply can no longer be lost between
+the commit and the send: if the commit fails nothing is sent, and once it
+succeeds the row stays until the dispatcher is done with it.
+
+The dispatcher (run_outbox_dispatcher, started by `python -m app.worker`)
+claims due rows in batches of settings.outbox_batch_size with
+FOR UPDATE SKIP LOCKED, so any number of workers can drain the table, sends
+the batch concurrently (the WhatsApp sender does the rate limiting) and
+records the outcome:
+
+    sent      provider accepted it; WhatsApp's message id is kept for status webhooks
+    pending   transient failure; retried with exponential backoff until
+              settings.outbox_max_attempts, then failed
+    failed    rejected by the provider, or out of attempts
+    unknown   the provider may have accepted it (WhatsAppSendError.maybe_delivered);
+              not retried, because a retry could send the guest the reply twice
+
+A claimed row is leased for settings.outbox_lease_sec. If the dispatcher dies
+mid-batch the row is claimed again after the lease, so a crash between the
+provider accepting a message and the outcome being recorded can repeat that
+one reply (at-least-once).
+
+WhatsApp status webhooks (sent -> delivered -> read, or failed) are stored as
+OutboundStatusEvent rows (record_status_events) and folded into the row they
+belong to. A status can arrive before the dispatcher has recorded the message
+id; the dispatcher folds stored events in when it records the send, and
+sweeps recent events periodically to close the remaining race.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+
+import structlog
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database import async_session
+from app.models import OutboundMessage, OutboundStatusEvent
+from app.services.email import send_email
+from app.services.whatsapp import send_whatsapp_message
+from app.services.whatsapp_sender import WhatsAppSendError
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+# Provider statuses only move forward; "failed" is final
+STATUS_RANK = {"sending": 0, "unknown": 0, "sent": 1, "delivered": 2, "read": 3}
+STATUS_SWEEP_INTERVAL_SEC = 30
+
+
+def enqueue_reply(
+    db: AsyncSession,
+    property_id: uuid.UUID,
+    conversation_id: uuid.UUID,
+    message_id: uuid.UUID | None,
+    channel: str,
+    recipient: str,
+    body: str,
+    subject: str | None = None,
+    sender_id: str | None = None,
+) -> OutboundMessage:
+    """Add a reply to the outbox. Sent only once the caller's transaction commits."""
+    row = OutboundMessage(
+        property_id=property_id,
+        conversation_id=conversation_id,
+        message_id=message_id,
+        channel=channel,
+        recipient=recipient,
+        body=body,
+        subject=subject,
+        sender_id=sender_id,
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.now(timezone.utc),
+    )
+    db.add(row)
+    return row
+
+
+def retry_delay_sec(attempts: int) -> float:
+    return settings.outbox_retry_base_sec * (2 ** max(0, attempts - 1))
+
+
+def fold_status(row: OutboundMessage, events: Iterable[OutboundStatusEvent]) -> None:
+    """
+    Apply provider status events to an outbox row. Events may be repeated or
+    out of order; the result only depends on the set of events.
+    """
+    for event in sorted(events, key=lambda e: e.occurred_at):
+        if row.status == "failed":
+            return
+        if event.status == "failed":
+            row.status = "failed"
+            row.last_error = event.error or "Provider reported delivery failure"
+            return
+        rank = STATUS_RANK.get(event.status)
+        if rank is None:
+            continue
+        if event.status in ("delivered", "read") and row.delivered_at is None:
+            row.delivered_at = event.occurred_at  # Read implies delivered
+        if event.status == "read" and row.read_at is None:
+            row.read_at = event.occurred_at
+        if rank > STATUS_RANK.get(row.status, 0):
+            row.status = event.status
+
+
+async def apply_status_events(db: AsyncSession, provider_message_ids: Iterable[str]) -> int:
+    """Fold every stored event for these provider ids into their outbox rows; returns rows matched."""
+    ids = {pid for pid in provider_message_ids if pid}
+    if not ids:
+        return 0
+    rows = (await db.execute(
+        select(OutboundMessage).where(OutboundMessage.provider_message_id.in_(ids)).with_for_update()
+    )).scalars().all()
+    if not rows:
+        return 0
+    events = (await db.execute(
+        select(OutboundStatusEvent).where(
+            OutboundStatusEvent.provider_message_id.in_([row.provider_message_id for row in rows])
+        )
+    )).scalars().all()
+    by_id: dict[str, list[OutboundStatusEvent]] = defaultdict(list)
+    for event in events:
+        by_id[event.provider_message_id].append(event)
+    for row in rows:
+        fold_status(row, by_id[row.provider_message_id])
+    return len(rows)
+
+
+def _occurred_at(timestamp) -> datetime:
+    try:
+        return datetime.fromtimestamp(int(timestamp), tz=timezone.utc)
+    except (TypeError, ValueError, OverflowError):
+        return datetime.now(timezone.utc)
+
+
+async def record_status_events(db: AsyncSession, statuses: list[dict]) -> int:
+    """
+    Store WhatsApp status events (kind "status" from iter_whatsapp_events) and
+    fold them into their outbox rows. Runs in the caller's transaction.
+    """
+    events = [
+        OutboundStatusEvent(
+            provider_message_id=s["metadata"]["whatsapp_message_id"],
+            status=s["metadata"]["status"],
+            occurred_at=_occurred_at(s["metadata"].get("timestamp")),
+            error=s["metadata"].get("error"),
+        )
+        for s in statuses
+        if s["metadata"].get("whatsapp_message_id") and s["metadata"].get("status")
+    ]
+    if not events:
+        return 0
+    db.add_all(events)
+    await db.flush()
+    return await apply_status_events(db, {e.provider_message_id for e in events})
+
+
+async def claim_batch(limit: int | None = None) -> list[OutboundMessage]:
+    """Lease up to `limit` due rows (pending, or sending with an expired lease) to this dispatcher."""
+    limit = limit or settings.outbox_batch_size
+    async with async_session() as db:
+        result = await db.execute(
+            select(OutboundMessage)
+            .where(
+                OutboundMessage.status.in_(("pending", "sending")),
+                OutboundMessage.next_attempt_at <= func.now(),
+            )
+            .order_by(OutboundMessage.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        rows = result.scalars().all()
+        lease_until = datetime.now(timezone.utc) + timedelta(seconds=settings.outbox_lease_sec)
+        for row in rows:
+            if row.status == "sending":
+                logger.warning("Outbox lease expired, sending again", outbox_id=str(row.id), attempts=row.attempts)
+            row.status = "sending"
+            row.attempts += 1
+            row.next_attempt_at = lease_until
+        await db.commit()
+    return rows
+
+
+async def _send(row: OutboundMessage) -> tuple[str, str | None, str | None]:
+    """Send one row; returns (outcome, provider_message_id, error) with outcome sent | retry | failed | unknown."""
+    try:
+        if row.channel == "whatsapp":
+            result = await send_whatsapp_message(row.recipient, row.body, phone_number_id=row.sender_id)
+            if result.get("status") == "skipped":
+                return "failed", None, result.get("reason")
+            provider_id = ((result.get("messages") or [{}])[0]).get("id")
+            return "sent", provider_id, None
+
+        result = await send_email(to_email=row.recipient, subject=row.subject or "", content=row.body)
+        status = result.get("status")
+        if status == "skipped":
+            return "failed", None, result.get("reason")
+        if status == "error":
+            return "retry", None, result.get("detail")
+        return "sent", None, None
+    except WhatsAppSendError as e:
+        if e.maybe_delivered:
+            return "unknown", None, str(e)
+        return ("retry" if e.retryable else "failed"), None, str(e)
+    except Exception as e:
+        return "retry", None, str(e) or type(e).__name__
+
+
+async def _record(results: list[tuple[OutboundMessage, str, str | None, str | None]]) -> None:
+    """Store send outcomes in one transaction, skipping rows another dispatcher has re-leased since."""
+    now = datetime.now(timezone.utc)
+    async with async_session() as db:
+        rows = {
+            row.id: row
+            for row in (await db.execute(
+                select(OutboundMessage)
+                .where(OutboundMessage.id.in_([claimed.id for claimed, *_ in results]))
+                .with_for_update()
+            )).scalars()
+        }
+        for claimed, outcome, provider_id, error in results:
+            row = rows.get(claimed.id)
+            if row is None or row.status != "sending" or row.attempts != claimed.attempts:
+                continue
+            row.last_error = error
+            if outcome == "sent":
+                row.status = "sent"
+                row.sent_at = now
+                row.provider_message_id = provider_id
+            elif outcome == "retry" and row.attempts < settings.outbox_max_attempts:
+                row.status = "pending"
+                row.next_attempt_at = now + timedelta(seconds=retry_delay_sec(row.attempts))
+            elif outcome == "unknown":
+                row.status = "unknown"
+            else:
+                row.status = "failed"
+            if row.status in ("failed", "unknown"):
+                logger.error(
+                    "Outbound reply not delivered",
+                    outbox_id=str(row.id), channel=row.channel, status=row.status,
+                    attempts=row.attempts, error=error,
+                )
+        await db.flush()
+        # Statuses that arrived before the id was recorded
+        await apply_status_events(db, [provider_id for _, outcome, provider_id, _ in results if provider_id])
+        await db.commit()
+
+
+async def dispatch_once(limit: int | None = None) -> Counter:
+    """Claim, send and record one batch; returns outcome counts (empty when nothing was due)."""
+    rows = await claim_batch(limit)
+    if not rows:
+        return Counter()
+    outcomes = await asyncio.gather(*(_send(row) for row in rows))
+    results = [(row, *outcome) for row, outcome in zip(rows, outcomes)]
+    await _record(results)
+    counts = Counter(outcome for outcome, _, _ in outcomes)
+    logger.info("Outbox batch dispatched", rows=len(rows), **counts)
+    return counts
+
+
+async def sweep_recent_statuses(window_sec: float = 2 * STATUS_SWEEP_INTERVAL_SEC) -> int:
+    """Re-fold recently received status events, for ones that raced the dispatcher's commit."""
+    async with async_session() as db:
+        ids = (await db.execute(
+            select(OutboundStatusEvent.provider_message_id)
+            .where(OutboundStatusEvent.received_at >= func.now() - timedelta(seconds=window_sec))
+            .distinct()
+        )).scalars().all()
+        matched = await apply_status_events(db, ids)
+        await db.commit()
+    return matched
+
+
+async def run_outbox_dispatcher(stop: asyncio.Event | None = None):
+    """Drain the outbox until `stop` is set; polls every settings.outbox_poll_interval_sec when idle."""
+    stop = stop or asyncio.Event()
+    last_sweep = time.monotonic()
+    logger.info("Outbox dispatcher started", batch_size=settings.outbox_batch_size)
+    while not stop.is_set():
+        try:
+            counts = await dispatch_once()
+            if time.monotonic() - last_sweep >= STATUS_SWEEP_INTERVAL_SEC:
+                await sweep_recent_statuses()
+                last_sweep = time.monotonic()
+        except Exception as e:
+            logger.error("Outbox dispatch failed", error=str(e))
+            counts = None
+        if not counts:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.outbox_poll_interval_sec)
+            except asyncio.TimeoutError:
+                pass
+    logger.info("Outbox dispatcher stopped")
+
+
+async def outbox_stats(db: AsyncSession) -> dict:
+    """Outbox rows created in the last 24h by status, plus the age of the oldest due row."""
+    since = datetime.now(timezone.utc) - timedelta(days=1)
+    by_status = dict((await db.execute(
+        select(OutboundMessage.status, func.count())
+        .where(OutboundMessage.created_at >= since)
+        .group_by(OutboundMessage.status)
+    )).all())
+    oldest_due = (await db.execute(
+        select(func.min(OutboundMessage.next_attempt_at)).where(
+            OutboundMessage.status.in_(("pending", "sending")),
+            OutboundMessage.next_attempt_at <= func.now(),
+        )
+    )).scalar()
+    lag = (datetime.now(timezone.utc) - oldest_due).total_seconds() if oldest_due else 0.0
+    return {"last_24h": by_status, "oldest_due_sec": round(max(0.0, lag), 1)}
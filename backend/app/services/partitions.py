@@ -0,0 +1,165 @@
+"""
+Monthly range partitions for time-series tables (currently `messages`, on sent_at).
+
+Partitions are named <table>_pYYYY_MM and cover [first of month, first of next
+month) in UTC. The scheduler keeps settings.partition_months_ahead months
+created ahead of time (there is no DEFAULT partition, so an insert past the
+last partition fails loudly rather than piling rows into a catch-all).
+Retention removes whole months with DETACH ... CONCURRENTLY + DROP instead of
+row-by-row deletes. A detach that was interrupted leaves the partition
+"detach pending"; the next retention run finishes it with DETACH ... FINALIZE.
+"""
+
+import re
+from datetime import date, datetime, timezone
+
+import structlog
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import get_settings
+from app.database import engine
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+# table -> partition key column
+PARTITIONED_TABLES = {"messages": "sent_at"}
+
+_NAME_RE = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+def month_floor(value: date | datetime) -> date:
+    if isinstance(value, datetime):
+        value = value.astimezone(timezone.utc).date()
+    return value.replace(day=1)
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def partition_month(name: str) -> date | None:
+    """Month covered by one of our partitions, from its name."""
+    match = _NAME_RE.search(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def create_partition_sql(table: str, month: date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+    )
+
+
+async def list_partitions(conn: AsyncConnection, table: str) -> list[str]:
+    result = await conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table ORDER BY child.relname"
+        ),
+        {"table": table},
+    )
+    return [row[0] for row in result.fetchall()]
+
+
+async def list_detach_pending(conn: AsyncConnection, table: str) -> list[str]:
+    """Partitions left half-detached by an interrupted DETACH ... CONCURRENTLY (PostgreSQL 14+)."""
+    result = await conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table AND pg_inherits.inhdetachpending ORDER BY child.relname"
+        ),
+        {"table": table},
+    )
+    return [row[0] for row in result.fetchall()]
+
+
+async def is_partitioned(conn: AsyncConnection, table: str) -> bool:
+    result = await conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE relname = :table AND relkind IN ('r', 'p')"),
+        {"table": table},
+    )
+    return bool(result.scalar())
+
+
+async def ensure_partitions(
+    conn: AsyncConnection,
+    table: str = "messages",
+    months_ahead: int | None = None,
+    today: date | None = None,
+) -> list[str]:
+    """Create this month's and the next `months_ahead` partitions. Returns the names created."""
+    if not await is_partitioned(conn, table):
+        return []
+    months_ahead = settings.partition_months_ahead if months_ahead is None else months_ahead
+    current = month_floor(today or datetime.now(timezone.utc))
+    existing = set(await list_partitions(conn, table))
+
+    created = []
+    for n in range(months_ahead + 1):
+        month = add_months(current, n)
+        if partition_name(table, month) in existing:
+            continue
+        await conn.execute(text(create_partition_sql(table, month)))
+        created.append(partition_name(table, month))
+    if created:
+        logger.info("Partitions created", table=table, partitions=created)
+    return created
+
+
+async def maintain_partitions() -> int:
+    """Scheduled job: keep future partitions created for every partitioned table."""
+    created = 0
+    async with engine.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            created += len(await ensure_partitions(conn, table))
+    return created
+
+
+def expired_partitions(names: list[str], cutoff: datetime) -> list[str]:
+    """Partitions whose whole month ends at or before the cutoff."""
+    cutoff_month = month_floor(cutoff)
+    return [
+        name for name in names
+        if (month := partition_month(name)) is not None and add_months(month, 1) <= cutoff_month
+    ]
+
+
+async def drop_expired_partitions(table: str, cutoff: datetime, dry_run: bool = False) -> list[str]:
+    """
+    Detach and drop every partition entirely older than the cutoff, plus any
+    left detach-pending by an interrupted earlier run (only retention detaches
+    partitions, and they are already hidden from queries).
+    DETACH CONCURRENTLY / FINALIZE cannot run inside a transaction block, so
+    this uses an autocommit connection; the parent is never locked against inserts.
+    """
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        if not await is_partitioned(conn, table):
+            return []
+        pending = await list_detach_pending(conn, table)
+        expired = expired_partitions(await list_partitions(conn, table), cutoff)
+        expired = sorted(set(expired) | set(pending))
+        if dry_run:
+            return expired
+        for name in expired:
+            if name in pending:
+                logger.warning("Finishing interrupted partition detach", table=table, partition=name)
+                await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name} FINALIZE"))
+            else:
+                await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name} CONCURRENTLY"))
+            await conn.execute(text(f"DROP TABLE {name}"))
+            logger.info("Partition dropped", table=table, partition=name, cutoff=cutoff.isoformat())
+    return expired
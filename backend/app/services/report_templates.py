@@ -0,0 +1,215 @@
+"""
+Daily report templates (HTML + plain text).
+
+Templates are compiled once per process (load_report_templates, called at
+startup) and reused for every property. Everything that varies per property
+(numbers, branding, EN/BM strings) goes in through the render context, so a
+report fan-out never re-parses or recompiles a template.
+
+render_report_template renders the same report with each per-property value
+replaced by a SendGrid substitution tag ("-revenue-" in the text part,
+"-revenue:html-" escaped for HTML), plus the tag values. Properties sharing a
+locale, branding and handoff alert get an identical body, so the fan-out
+goes out as one request per group with one personalization per property.
+"""
+
+import os
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, Template
+from markupsafe import escape
+
+from app.config import get_settings
+
+settings = get_settings()
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates", "email")
+DEFAULT_BRANDING = {"primary_color": "#0f172a", "logo_url": None, "footer": None}
+
+LOCALES = {
+    "en": {
+        "title": "Daily Intelligence Report",
+        "subject": "📊 Daily Intelligence",
+        "action_required": "Action Required",
+        "handoffs_waiting_before": "You have",
+        "conversations": "conversation(s)",
+        "handoffs_waiting_after": "waiting for staff attention.",
+        "revenue_recovered": "Revenue Recovered",
+        "revenue_caption": "Est. Value (After Hours)",
+        "commission_saved_before": "Saved approx.",
+        "commission_saved_after": "in OTA commissions",
+        "conversion_note": "Estimated based on lead-to-booking conversion rate of",
+        "after_hours_inquiries": "After-Hours Inquiries",
+        "response_rate": "Auto-Response Rate",
+        "leads_captured": "Leads Captured",
+        "handoffs": "Staff Handoffs",
+        "channel_breakdown": "Channel Breakdown",
+        "view_dashboard": "View Full Dashboard",
+        "footer": "Generated by Nocturn AI Engine for",
+        "days": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"],
+        "months": ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"],
+    },
+    "ms": {
+        "title": "Laporan Harian",
+        "subject": "📊 Laporan Harian",
+        "action_required": "Tindakan Diperlukan",
+        "handoffs_waiting_before": "Anda mempunyai",
+        "conversations": "perbualan",
+        "handoffs_waiting_after": "yang menunggu perhatian kakitangan.",
+        "revenue_recovered": "Hasil Diperoleh Semula",
+        "revenue_caption": "Anggaran Nilai (Luar Waktu)",
+        "commission_saved_before": "Jimat kira-kira",
+        "commission_saved_after": "dalam komisen OTA",
+        "conversion_note": "Anggaran berdasarkan kadar penukaran petunjuk kepada tempahan sebanyak",
+        "after_hours_inquiries": "Pertanyaan Luar Waktu",
+        "response_rate": "Kadar Respons Automatik",
+        "leads_captured": "Petunjuk Diperoleh",
+        "handoffs": "Serahan kepada Staf",
+        "channel_breakdown": "Pecahan Saluran",
+        "view_dashboard": "Lihat Papan Pemuka",
+        "footer": "Dijana oleh Nocturn AI Engine untuk",
+        "days": ["Isnin", "Selasa", "Rabu", "Khamis", "Jumaat", "Sabtu", "Ahad"],
+        "months": ["Jan", "Feb", "Mac", "Apr", "Mei", "Jun", "Jul", "Ogo", "Sep", "Okt", "Nov", "Dis"],
+    },
+}
+
+CHANNELS = (("whatsapp", "WhatsApp"), ("web", "Web Chat"), ("email", "Email"))
+# Context values that differ between properties sharing a template body
+SUBSTITUTED = (
+    "property_name",
+    "report_date_label",
+    "handoffs",
+    "revenue",
+    "commission_saved",
+    "conversion_rate_pct",
+    "dashboard_url",
+)
+
+
+@dataclass(frozen=True)
+class RenderedReport:
+    subject: str
+    html: str
+    text: str
+
+
+_templates: dict[str, Template] = {}
+
+
+def load_report_templates() -> dict[str, Template]:
+    """Compile the report templates once; later calls return the cached objects."""
+    if not _templates:
+        html_env = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR),
+            autoescape=True,
+            auto_reload=False,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            undefined=StrictUndefined,
+        )
+        text_env = html_env.overlay(autoescape=False)
+        _templates["html"] = html_env.get_template("daily_report.html.j2")
+        _templates["text"] = text_env.get_template("daily_report.txt.j2")
+    return _templates
+
+
+def _money(amount: Decimal) -> str:
+    return f"RM {amount:,.2f}"
+
+
+def _date_label(report_date: date, t: dict) -> str:
+    return f"{t['days'][report_date.weekday()]}, {report_date.day:02d} {t['months'][report_date.month - 1]} {report_date.year}"
+
+
+def build_report_context(prop, stats) -> dict:
+    """Everything the templates need, pre-formatted, for one property."""
+    t = LOCALES.get(getattr(prop, "report_locale", None) or "en", LOCALES["en"])
+    brand = {**DEFAULT_BRANDING, **(getattr(prop, "report_branding", None) or {})}
+
+    revenue = Decimal(stats.estimated_revenue_recovered or 0)
+    commission_pct = Decimal(prop.ota_commission_pct or 0)
+    conversion_rate = Decimal(prop.conversion_rate if prop.conversion_rate is not None else "0.20")
+    response_rate = 0
+    if stats.after_hours_inquiries:
+        response_rate = int(stats.after_hours_responded / stats.after_hours_inquiries * 100)
+    channel_breakdown = stats.channel_breakdown or {}
+
+    return {
+        "t": t,
+        "brand": brand,
+        "property_name": prop.name,
+        "report_date_label": _date_label(stats.report_date, t),
+        "handoffs": stats.handoffs or 0,
+        "show_handoffs": (stats.handoffs or 0) > 0,
+        "revenue": _money(revenue),
+        "commission_saved": _money(revenue * commission_pct / 100),
+        "conversion_rate_pct": f"{conversion_rate * 100:.0f}",
+        "tiles": [
+            (stats.after_hours_inquiries or 0, t["after_hours_inquiries"]),
+            (f"{response_rate}%", t["response_rate"]),
+            (stats.leads_captured or 0, t["leads_captured"]),
+            (stats.handoffs or 0, t["handoffs"]),
+        ],
+        "channels": [(label, channel_breakdown.get(key, 0)) for key, label in CHANNELS],
+        "dashboard_url": settings.dashboard_url or prop.website_url or "#",
+    }
+
+
+def _subject(t: dict, property_name: str, subject_date: str) -> str:
+    return f"{t['subject']}: {property_name} - {subject_date}"
+
+
+def _subject_date(report_date: date, t: dict) -> str:
+    return f"{report_date.day:02d} {t['months'][report_date.month - 1]} {report_date.year}"
+
+
+def render_daily_report(prop, stats) -> RenderedReport:
+    """Render subject, HTML and plain-text parts from one shared context."""
+    templates = load_report_templates()
+    context = build_report_context(prop, stats)
+    t = context["t"]
+    return RenderedReport(
+        subject=_subject(t, prop.name, _subject_date(stats.report_date, t)),
+        html=templates["html"].render(context),
+        text=templates["text"].render(context),
+    )
+
+
+def _tagged(context: dict, suffix: str) -> dict:
+    """The context with every per-property value replaced by its substitution tag."""
+    def tag(name: str) -> str:
+        return f"-{name}{suffix}-"
+
+    return {
+        **context,
+        **{name: tag(name) for name in SUBSTITUTED},
+        "tiles": [(tag(f"tile_{i}"), label) for i, (_, label) in enumerate(context["tiles"])],
+        "channels": [(label, tag(f"channel_{i}")) for i, (label, _) in enumerate(context["channels"])],
+    }
+
+
+def render_report_template(prop, stats) -> tuple[RenderedReport, dict[str, str]]:
+    """
+    Subject, HTML and text with substitution tags instead of per-property
+    values, and the tag -> value map for this property. Applying the map
+    gives exactly what render_daily_report returns.
+    """
+    templates = load_report_templates()
+    context = build_report_context(prop, stats)
+    t = context["t"]
+
+    values = {name: str(context[name]) for name in SUBSTITUTED}
+    values.update({f"tile_{i}": str(value) for i, (value, _) in enumerate(context["tiles"])})
+    values.update({f"channel_{i}": str(count) for i, (_, count) in enumerate(context["channels"])})
+    values["subject_date"] = _subject_date(stats.report_date, t)
+
+    substitutions = {f"-{name}-": value for name, value in values.items()}
+    substitutions.update({f"-{name}:html-": str(escape(value)) for name, value in values.items()})
+    report = RenderedReport(
+        subject=_subject(t, "-property_name-", "-subject_date-"),
+        html=templates["html"].render(_tagged(context, ":html")),
+        text=templates["text"].render(_tagged(context, "")),
+    )
+    return report, substitutions
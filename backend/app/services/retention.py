@@ -0,0 +1,198 @@
+"""
+Data retention (PDPA/GDPR): hard-delete guest data older than the retention
+window without long table locks.
+
+Rows are deleted in keyset-ordered batches of settings.retention_batch_size,
+each batch in its own short transaction, with settings.retention_batch_sleep_sec
+between batches so replication and foreground traffic keep up. Children go
+first so no batch ever trips a foreign key:
+
+    messages (of expired conversations) -> leads -> outbound_messages -> conversations
+
+inbound_receipts (webhook dedupe, app.services.idempotency) are kept for
+settings.inbound_receipt_days rather than the full retention window;
+outbound_status_events (app.services.outbox) for the full window.
+
+Message partitions (app.services.partitions) whose whole month is past the
+cutoff are detached and dropped first, which removes the bulk of expired
+messages without touching rows; batches then only mop up messages of expired
+conversations that landed in a newer month. Lead events cascade with their
+lead. A dry run reports row counts, batch counts, the partitions that would be
+dropped and an estimated duration without deleting anything.
+"""
+
+import asyncio
+import math
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+import structlog
+from sqlalchemy import select, delete, func, and_, or_, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database import async_session
+from app.models import Conversation, Message, Lead, InboundReceipt, OutboundMessage, OutboundStatusEvent
+from app.services.partitions import add_months, drop_expired_partitions, partition_month
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+
+@dataclass
+class RetentionReport:
+    cutoff: datetime
+    dry_run: bool
+    counts: dict = field(default_factory=dict)  # rows deleted (or eligible, for a dry run)
+    batches: dict = field(default_factory=dict)
+    dropped_partitions: list = field(default_factory=list)
+    elapsed_sec: float = 0.0
+    estimated_sec: float | None = None
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+
+def _targets(cutoff: datetime) -> list[tuple[str, type, object]]:
+    """(name, model, eligibility predicate) in delete order."""
+    expired_conversations = select(Conversation.id).where(Conversation.started_at < cutoff)
+    return [
+        ("messages", Message, Message.conversation_id.in_(expired_conversations)),
+        (
+            "leads",
+            Lead,
+            or_(Lead.captured_at < cutoff, Lead.conversation_id.in_(expired_conversations)),
+        ),
+        (
+            "outbound_messages",
+            OutboundMessage,
+            or_(OutboundMessage.created_at < cutoff, OutboundMessage.conversation_id.in_(expired_conversations)),
+        ),
+        (
+            # Skip conversations that picked up a child since their batch ran;
+            # they are retried on the next run instead of failing the batch.
+            "conversations",
+            Conversation,
+            Conversation.started_at < cutoff,
+        ),
+        (
+            # Dedupe backstop rows only need to outlive provider retries
+            "inbound_receipts",
+            InboundReceipt,
+            InboundReceipt.received_at < datetime.now(timezone.utc) - timedelta(days=settings.inbound_receipt_days),
+        ),
+        ("outbound_status_events", OutboundStatusEvent, OutboundStatusEvent.received_at < cutoff),
+    ]
+
+
+def _batch_predicate(model, predicate):
+    if model is Conversation:
+        return [
+            predicate,
+            ~exists().where(Message.conversation_id == Conversation.id),
+            ~exists().where(Lead.conversation_id == Conversation.id),
+            ~exists().where(OutboundMessage.conversation_id == Conversation.id),
+        ]
+    return [predicate]
+
+
+async def _count(db: AsyncSession, model, predicate) -> int:
+    result = await db.execute(select(func.count()).select_from(model).where(predicate))
+    return result.scalar() or 0
+
+
+async def _delete_batches(name: str, model, predicate, batch_size: int, sleep_sec: float) -> tuple[int, int]:
+    """Delete matching rows in id order, one committed batch at a time."""
+    deleted = batches = 0
+    last_id: uuid.UUID | None = None
+    started = time.perf_counter()
+    while True:
+        conditions = _batch_predicate(model, predicate)
+        if last_id is not None:
+            conditions.append(model.id > last_id)
+        batch_ids = (
+            select(model.id).where(*conditions).order_by(model.id).limit(batch_size).scalar_subquery()
+        )
+        async with async_session() as db:
+            result = await db.execute(
+                delete(model).where(model.id.in_(batch_ids)).returning(model.id)
+            )
+            ids = result.scalars().all()
+            await db.commit()
+
+        if not ids:
+            break
+        deleted += len(ids)
+        batches += 1
+        last_id = max(ids)
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "Retention batch deleted",
+            table=name,
+            batch=batches,
+            rows=len(ids),
+            total=deleted,
+            rows_per_sec=round(deleted / elapsed, 1) if elapsed else None,
+        )
+        if len(ids) < batch_size:
+            break
+        await asyncio.sleep(sleep_sec)
+    return deleted, batches
+
+
+async def run_retention(
+    dry_run: bool = False,
+    retention_days: int | None = None,
+    batch_size: int | None = None,
+    sleep_sec: float | None = None,
+) -> RetentionReport:
+    """Delete (or, with dry_run, count) everything older than the retention window."""
+    retention_days = retention_days or settings.retention_days
+    batch_size = batch_size or settings.retention_batch_size
+    sleep_sec = settings.retention_batch_sleep_sec if sleep_sec is None else sleep_sec
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    report = RetentionReport(cutoff=cutoff, dry_run=dry_run)
+    started = time.perf_counter()
+
+    logger.info("Running data retention cleanup", cutoff_date=cutoff, dry_run=dry_run, batch_size=batch_size)
+
+    report.dropped_partitions = await drop_expired_partitions("messages", cutoff, dry_run=dry_run)
+
+    if dry_run:
+        # Time one batch-sized id scan per table as a proxy for per-batch cost
+        estimated = 0.0
+        async with async_session() as db:
+            for name, model, predicate in _targets(cutoff):
+                if model is Message and report.dropped_partitions:
+                    # Rows in partitions about to be dropped are not batch-deleted
+                    kept = add_months(max(map(partition_month, report.dropped_partitions)), 1)
+                    kept_from = datetime(kept.year, kept.month, 1, tzinfo=timezone.utc)
+                    predicate = and_(predicate, Message.sent_at >= kept_from)
+                count = await _count(db, model, predicate)
+                batches = math.ceil(count / batch_size)
+                probe_started = time.perf_counter()
+                await db.execute(select(model.id).where(predicate).order_by(model.id).limit(batch_size))
+                probe_sec = time.perf_counter() - probe_started
+                report.counts[name] = count
+                report.batches[name] = batches
+                estimated += batches * (probe_sec * 2 + sleep_sec)
+        report.estimated_sec = round(estimated, 1)
+    else:
+        for name, model, predicate in _targets(cutoff):
+            deleted, batches = await _delete_batches(name, model, predicate, batch_size, sleep_sec)
+            report.counts[name] = deleted
+            report.batches[name] = batches
+
+    report.elapsed_sec = round(time.perf_counter() - started, 2)
+    logger.info(
+        "Data retention cleanup complete" if not dry_run else "Data retention dry run",
+        counts=report.counts,
+        batches=report.batches,
+        dropped_partitions=report.dropped_partitions,
+        elapsed_sec=report.elapsed_sec,
+        estimated_sec=report.estimated_sec,
+    )
+    return report
@@ -4,20 +4,25 @@ Handles generating the email body and sending it to property stakeholders.
 """
 
 import asyncio
-from datetime import datetime, timedelta, date
-from decimal import Decimal
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, date, timezone
 
 import structlog
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from sqlalchemy import select, func, desc, delete
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_
 
 from app.config import get_settings
-from app.database import async_session
+from app.database import async_session, set_db_context
 from app.models import Property, AnalyticsDaily
-from app.services.analytics import compute_all_properties_daily, compute_daily_analytics
-from app.services.email import send_email
+from app.services.analytics import compute_daily_analytics, local_today, property_zone
+from app.services.email import send_bulk_email
+from app.services.email_transport import EmailMessage
+from app.services.report_templates import render_report_template
+from app.services.analytics_cache import analytics_cache
+from app.services.job_runs import canonical_fire_time, leased
+from app.services.partitions import maintain_partitions
 
 settings = get_settings()
 logger = structlog.get_logger()
@@ -25,208 +30,255 @@ logger = structlog.get_logger()
 scheduler = AsyncIOScheduler()
 
 
-def _format_daily_report_email(prop: Property, stats: AnalyticsDaily) -> str:
-    """Generate HTML email body for the daily report."""
-    
-    # Format currency
-    revenue = f"RM {stats.estimated_revenue_recovered:,.2f}"
-    commission_saved = f"RM {stats.estimated_revenue_recovered * (prop.ota_commission_pct / 100):,.2f}"
-    
-    # Calculate response rate
-    response_rate = 0
-    if stats.after_hours_inquiries > 0:
-        response_rate = (stats.after_hours_responded / stats.after_hours_inquiries) * 100
-    
-    # Simple HTML template
-    html = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <div style="max-width: 600px; margin: 0 auto; border: 1px solid #e0e0e0; border-radius: 8px; overflow: hidden;">
-            <div style="background-color: #0f172a; color: white; padding: 20px; text-align: center;">
-                <h2 style="margin: 0;">{prop.name}</h2>
-                <p style="margin: 5px 0 0; opacity: 0.8;">Daily Intelligence Report • {stats.report_date.strftime('%A, %d %b %Y')}</p>
-            </div>
-            
-            <div style="padding: 20px;">
-                {(lambda: f"""
-                <div style="background-color: #fef2f2; border-left: 4px solid #ef4444; padding: 15px; margin-bottom: 20px;">
-                    <h3 style="margin: 0 0 5px; color: #b91c1c;">⚠️ Action Required</h3>
-                    <p style="margin: 0; color: #7f1d1d;">
-                        You have <strong>{stats.handoffs} conversation(s)</strong> waiting for staff attention.
-                    </p>
-                </div>
-                """ if stats.handoffs > 0 else "")()}
-
-                <div style="background-color: #f0f9ff; border-left: 4px solid #0ea5e9; padding: 15px; margin-bottom: 20px;">
-                    <h3 style="margin: 0 0 10px; color: #0369a1;">💰 Revenue Recovered</h3>
-                    <div style="display: flex; justify-content: space-between; align-items: baseline;">
-                        <span style="font-size: 24px; font-weight: bold; color: #0f172a;">{revenue}</span>
-                        <span style="font-size: 14px; color: #64748b;">Est. Value (After Hours)</span>
-                    </div>
-                    <div style="margin-top: 5px; font-size: 13px; color: #0369a1;">
-                        Saved approx. <strong>{commission_saved}</strong> in OTA commissions
-                    </div>
-                    <div style="margin-top: 5px; font-size: 11px; color: #64748b;">
-                        *Estimated based on 20% lead-to-booking conversion rate
-                    </div>
-                </div>
-
-                <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 15px; margin-bottom: 20px;">
-                    <div style="background: #f8fafc; padding: 15px; border-radius: 8px; text-align: center;">
-                        <div style="font-size: 24px; font-weight: bold; color: #0f172a;">{stats.after_hours_inquiries}</div>
-                        <div style="font-size: 12px; color: #64748b; text-transform: uppercase; letter-spacing: 0.5px;">After-Hours Inquiries</div>
-                    </div>
-                    <div style="background: #f8fafc; padding: 15px; border-radius: 8px; text-align: center;">
-                        <div style="font-size: 24px; font-weight: bold; color: #0f172a;">{int(response_rate)}%</div>
-                        <div style="font-size: 12px; color: #64748b; text-transform: uppercase; letter-spacing: 0.5px;">Auto-Response Rate</div>
-                    </div>
-                    <div style="background: #f8fafc; padding: 15px; border-radius: 8px; text-align: center;">
-                        <div style="font-size: 24px; font-weight: bold; color: #0f172a;">{stats.leads_captured}</div>
-                        <div style="font-size: 12px; color: #64748b; text-transform: uppercase; letter-spacing: 0.5px;">Leads Captured</div>
-                    </div>
-                    <div style="background: #f8fafc; padding: 15px; border-radius: 8px; text-align: center;">
-                        <div style="font-size: 24px; font-weight: bold; color: #0f172a;">{stats.handoffs}</div>
-                        <div style="font-size: 12px; color: #64748b; text-transform: uppercase; letter-spacing: 0.5px;">Staff Handoffs</div>
-                    </div>
-                </div>
-
-                <h3 style="border-bottom: 1px solid #e2e8f0; padding-bottom: 10px; font-size: 16px;">📊 Channel Breakdown</h3>
-                <ul style="list-style: none; padding: 0;">
-                    <li style="display: flex; justify-content: space-between; padding: 8px 0; border-bottom: 1px solid #f1f5f9;">
-                        <span>WhatsApp</span>
-                        <strong>{stats.channel_breakdown.get('whatsapp', 0)}</strong>
-                    </li>
-                    <li style="display: flex; justify-content: space-between; padding: 8px 0; border-bottom: 1px solid #f1f5f9;">
-                        <span>Web Chat</span>
-                        <strong>{stats.channel_breakdown.get('web', 0)}</strong>
-                    </li>
-                    <li style="display: flex; justify-content: space-between; padding: 8px 0; border-bottom: 1px solid #f1f5f9;">
-                        <span>Email</span>
-                        <strong>{stats.channel_breakdown.get('email', 0)}</strong>
-                    </li>
-                </ul>
-
-                <div style="margin-top: 30px; text-align: center;">
-                    <a href="{settings.website_url if hasattr(settings, 'website_url') else '#'}" style="background-color: #0f172a; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; font-weight: bold;">View Full Dashboard</a>
-                </div>
-            </div>
-            
-            <div style="background-color: #f8fafc; padding: 15px; text-align: center; font-size: 12px; color: #94a3b8;">
-                <p>Generated by Nocturn AI Engine for {prop.name}</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    return html
-
-
-async def run_daily_reports(report_date: date | None = None):
-    """
-    Cron job: Generate and send daily reports for all properties.
-    Default: run for yesterday.
-    """
-    if report_date is None:
-        report_date = date.today() - timedelta(days=1)
-        
-    logger.info("Starting daily report generation", report_date=report_date)
-    
+@dataclass
+class ReportOutcome:
+    property_name: str
+    status: str = "pending"  # "sent" | "failed"
+    stage: str | None = None  # Stage that failed
+    timings_ms: dict = field(default_factory=dict)
+
+
+async def _compute_report_stats(prop: Property, report_date: date) -> AnalyticsDaily:
+    """Compute stage: rollup for one property in its own short-lived session."""
     async with async_session() as db:
-        # Compute analytics
-        analytics_records = await compute_all_properties_daily(db, report_date)
-        
-        # Send emails
-        for stats in analytics_records:
-            # Re-fetch property to get name/details (optimization: could be joined in analytics query)
-            from sqlalchemy import select
-            res = await db.execute(select(Property).where(Property.id == stats.property_id))
-            prop = res.scalar_one()
-            
-            # Generate email
-            email_body = _format_daily_report_email(prop, stats)
-            subject = f"📊 Daily Intelligence: {prop.name} - {report_date.strftime('%d %b %Y')}"
-            
-            # Send to property notification email (if configured) or staff email
-            recipient = prop.notification_email or settings.staff_notification_email
-            
-            await send_email(
-                to_email=recipient,
-                subject=subject,
-                content=email_body,
-                is_html=True
-            )
-            
-            logger.info("Daily report sent", property=prop.name, recipient=recipient)
-            
-
-async def delete_old_leads(db: AsyncSession = None):
-    """
-    Weekly job: Delete leads and conversations older than 2 years.
-    Complies with PDPA/GDPR data retention policies.
-    """
-    from app.database import async_session
-    from app.models import Lead, Conversation
-    from sqlalchemy import delete
-
-    # 2 years retention
-    cutoff_date = datetime.now(timezone.utc) - timedelta(days=730)
-    logger.info("Running data retention cleanup", cutoff_date=cutoff_date)
-
-    async with async_session() as session:
-        try:
-            # 1. Delete old leads
-            result_leads = await session.execute(
-                delete(Lead).where(Lead.captured_at < cutoff_date)
-            )
-            deleted_leads = result_leads.rowcount
-            
-            # 2. Delete old conversations (cascades to messages)
-            # define where clause for conversations
-            result_convs = await session.execute(
-                delete(Conversation).where(Conversation.started_at < cutoff_date)
-            )
-            deleted_convs = result_convs.rowcount
-            
-            await session.commit()
-            logger.info(
-                "Data retention cleanup complete",
-                deleted_leads=deleted_leads,
-                deleted_conversations=deleted_convs
-            )
-            
-        except Exception as e:
-            logger.error("Data retention job failed", error=str(e))
-            await session.rollback()
-            
+        await set_db_context(db, str(prop.id))
+        stats = await compute_daily_analytics(db, prop.id, report_date, prop.timezone)
+        await db.commit()
+    await analytics_cache.invalidate(prop.id)
+    return stats
 
-async def start_scheduler():
-    """Initialize and start the scheduler."""
-    # Schedule daily report at configured time (default 7:30 AM)
-    trigger = CronTrigger(
-        hour=settings.daily_report_hour,
-        minute=settings.daily_report_minute,
-        timezone=settings.timezone
+
+def _report_message(prop: Property, stats: AnalyticsDaily) -> EmailMessage:
+    """
+    Render stage: the report as a shared template plus this property's
+    substitutions, so reports with the same body batch into one request.
+    """
+    report, substitutions = render_report_template(prop, stats)
+    return EmailMessage(
+        to=[prop.notification_email or settings.staff_notification_email],
+        subject=report.subject,
+        text=report.text,
+        html=report.html,
+        substitutions=substitutions,
     )
-    
+
+
+async def _prepare_property_report(
+    prop: Property,
+    report_date: date,
+    compute_slots: asyncio.Semaphore,
+) -> tuple[ReportOutcome, EmailMessage | None]:
+    """
+    Compute -> render for one property. The compute stage holds a concurrency
+    slot only while it runs, and any failure is contained here.
+    """
+    outcome = ReportOutcome(property_name=prop.name)
+    try:
+        outcome.stage = "compute"
+        async with compute_slots:
+            started = time.perf_counter()
+            stats = await _compute_report_stats(prop, report_date)
+            outcome.timings_ms["compute"] = round((time.perf_counter() - started) * 1000, 1)
+
+        outcome.stage = "render"
+        started = time.perf_counter()
+        message = _report_message(prop, stats)
+        outcome.timings_ms["render"] = round((time.perf_counter() - started) * 1000, 1)
+        return outcome, message
+    except Exception as e:
+        outcome.status = "failed"
+        logger.error("Daily report failed", property=prop.name, stage=outcome.stage, error=str(e))
+        return outcome, None
+
+
+async def _send_reports(prepared: list[tuple[ReportOutcome, EmailMessage]]) -> float:
+    """
+    Send stage: every rendered report in one bulk send (one request per shared
+    body, one personalization per property). Returns the elapsed milliseconds.
+    """
+    started = time.perf_counter()
+    try:
+        results = await send_bulk_email([message for _, message in prepared])
+    except Exception as e:
+        results = [{"status": "error", "detail": str(e)}] * len(prepared)
+
+    for (outcome, _), result in zip(prepared, results):
+        if result.get("status") == "error":
+            outcome.status, outcome.stage = "failed", "send"
+            logger.error("Daily report failed", property=outcome.property_name, stage="send",
+                         error=result.get("detail") or "email delivery failed")
+        else:
+            outcome.status, outcome.stage = "sent", None
+            logger.info("Daily report sent", property=outcome.property_name,
+                        **{f"{k}_ms": v for k, v in outcome.timings_ms.items()})
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def due_timezones(timezones: list[str | None], fire_time: datetime) -> list[str | None]:
+    """
+    Timezones whose local report time (settings.daily_report_hour:minute) falls
+    in the dispatch slot starting at fire_time. Slots are
+    settings.report_dispatch_interval_min long and every UTC offset is a whole
+    multiple of 15 minutes, so each zone is due in exactly one slot per day.
+    """
+    interval = timedelta(minutes=settings.report_dispatch_interval_min)
+    due = []
+    for name in timezones:
+        local = fire_time.astimezone(property_zone(name))
+        report_at = local.replace(
+            hour=settings.daily_report_hour,
+            minute=settings.daily_report_minute,
+            second=0,
+            microsecond=0,
+        )
+        if report_at <= local < report_at + interval:
+            due.append(name)
+    return due
+
+
+async def run_daily_reports(
+    report_date: date | None = None,
+    timezones: list[str | None] | None = None,
+) -> list[ReportOutcome]:
+    """
+    Generate and send daily reports for all properties (or only those in `timezones`).
+    Default: each property's own local yesterday.
+    Rollups are fanned out with bounded concurrency (settings.report_compute_concurrency
+    DB sessions); the rendered reports then go out in a single bulk send.
+    """
+    logger.info("Starting daily report generation", report_date=report_date, timezones=timezones)
+    run_started = time.perf_counter()
+
+    query = select(Property).where(Property.is_active == True, Property.deleted_at.is_(None))
+    if timezones is not None:
+        names = [name for name in timezones if name is not None]
+        zone_filter = Property.timezone.in_(names)
+        if None in timezones:
+            zone_filter = or_(zone_filter, Property.timezone.is_(None))
+        query = query.where(zone_filter)
+    async with async_session() as db:
+        result = await db.execute(query)
+        properties = result.scalars().all()
+
+    now = datetime.now(timezone.utc)
+    compute_slots = asyncio.Semaphore(settings.report_compute_concurrency)
+    rendered = await asyncio.gather(*(
+        _prepare_property_report(
+            prop,
+            report_date or local_today(prop.timezone, now) - timedelta(days=1),
+            compute_slots,
+        )
+        for prop in properties
+    ))
+    outcomes = [outcome for outcome, _ in rendered]
+    prepared = [(outcome, message) for outcome, message in rendered if message is not None]
+    send_ms = await _send_reports(prepared) if prepared else 0.0
+
+    stage_totals = {}
+    for outcome in outcomes:
+        for stage, ms in outcome.timings_ms.items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + ms
+    logger.info(
+        "Daily report generation finished",
+        report_date=report_date,
+        properties=len(outcomes),
+        sent=sum(1 for o in outcomes if o.status == "sent"),
+        failed=[o.property_name for o in outcomes if o.status == "failed"],
+        elapsed_ms=round((time.perf_counter() - run_started) * 1000, 1),
+        send_ms=send_ms,
+        **{f"{stage}_ms_total": round(ms, 1) for stage, ms in stage_totals.items()},
+    )
+    return outcomes
+
+
+async def delete_old_leads() -> int:
+    """
+    Weekly job: Delete messages, leads and conversations older than
+    settings.retention_days (PDPA/GDPR), in throttled batches.
+    See app.services.retention.
+    """
+    from app.services.retention import run_retention
+
+    report = await run_retention()
+    return report.total
+
+
+async def run_due_daily_reports(fire_time: datetime) -> list[ReportOutcome]:
+    """Send reports for the properties whose local report time is in this dispatch slot."""
+    async with async_session() as db:
+        result = await db.execute(
+            select(Property.timezone)
+            .where(Property.is_active == True, Property.deleted_at.is_(None))
+            .distinct()
+        )
+        timezones = [row[0] for row in result.fetchall()]
+
+    due = due_timezones(timezones, fire_time)
+    if not due:
+        return []
+    return await run_daily_reports(timezones=due)
+
+
+def _daily_reports_job(trigger: CronTrigger):
+    """
+    Scheduled entry point; rows affected = reports delivered. The slot is
+    taken from the trigger's canonical fire time, the same instant the lease
+    was claimed for, so every node agrees on which zones are due.
+    """
+    async def job() -> int:
+        outcomes = await run_due_daily_reports(canonical_fire_time(trigger))
+        return sum(1 for o in outcomes if o.status == "sent")
+    return job
+
+
+async def start_scheduler():
+    """
+    Initialize and start the scheduler.
+    Every process schedules the jobs, but each fire is leased through
+    app.services.job_runs so it runs on exactly one process cluster-wide.
+    """
+    # Dispatch daily reports every few minutes; each fire sends only for the
+    # timezones whose local report time (default 7:30 AM) has just arrived
+    interval = settings.report_dispatch_interval_min
+    if interval <= 0 or 60 % interval:
+        # "*/N" restarts every hour, so uneven slots would leave a gap before :00
+        raise ValueError("report_dispatch_interval_min must divide 60")
+    if settings.job_fire_time_grace_sec >= interval * 60:
+        raise ValueError("job_fire_time_grace_sec must be shorter than report_dispatch_interval_min")
+    trigger = CronTrigger(minute=f"*/{interval}", timezone="UTC")
+
     scheduler.add_job(
-        run_daily_reports,
+        leased("daily_reports", _daily_reports_job(trigger), trigger),
         trigger=trigger,
         id="daily_reports",
+        # A slot that overruns the interval must not make APScheduler drop the next one
+        max_instances=4,
         replace_existing=True
     )
     
     # Schedule data retention cleanup (Weekly on Sunday at 3am)
+    retention_trigger = CronTrigger(day_of_week="sun", hour=3, minute=0, timezone=settings.timezone)
     scheduler.add_job(
-        delete_old_leads,
-        trigger=CronTrigger(day_of_week="sun", hour=3, minute=0, timezone=settings.timezone),
+        leased("data_retention", delete_old_leads, retention_trigger),
+        trigger=retention_trigger,
         id="data_retention",
         replace_existing=True
     )
+
+    # Keep future message partitions created (Daily at 2am)
+    partitions_trigger = CronTrigger(hour=2, minute=0, timezone=settings.timezone)
+    scheduler.add_job(
+        leased("message_partitions", maintain_partitions, partitions_trigger),
+        trigger=partitions_trigger,
+        id="message_partitions",
+        replace_existing=True
+    )
     
     scheduler.start()
     logger.info(
         "Scheduler started", 
-        daily_report_time=f"{settings.daily_report_hour}:{settings.daily_report_minute:02d} {settings.timezone}"
+        daily_report_time=f"{settings.daily_report_hour}:{settings.daily_report_minute:02d} property-local",
+        report_dispatch_interval_min=interval,
     )
 
 async def shutdown_scheduler():
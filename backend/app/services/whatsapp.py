@@ -1,20 +1,25 @@
 
+from typing import Iterator
+
 import structlog
-import httpx
 from app.config import get_settings
-from app.core.normalization import NormalizedMessage
+from app.services.whatsapp_sender import WhatsAppSendError, get_whatsapp_sender
 
 logger = structlog.get_logger()
 
-async def send_whatsapp_message(to_number: str, message_text: str):
+async def send_whatsapp_message(to_number: str, message_text: str, phone_number_id: str | None = None):
     """
-    Sends a WhatsApp message via Meta Cloud API using async HTTP client.
+    Sends a WhatsApp message via Meta Cloud API through the shared, rate-limited
+    sender (app.services.whatsapp_sender). `phone_number_id` is the business
+    number to send from; defaults to settings.whatsapp_phone_number_id.
     """
     settings = get_settings()
+    phone_number_id = phone_number_id or settings.whatsapp_phone_number_id
     
     # Check if we are in production or have a valid token
     # For Sprint 2 Simulator: Trust the log unless configured
-    if not settings.whatsapp_api_token or not settings.whatsapp_phone_number_id:
+    sender = get_whatsapp_sender()
+    if not sender or not phone_number_id:
         if not settings.is_production:
             print(f"\n🚀 [MOCK WHATSAPP] To: {to_number} | Msg: {message_text}\n")
             return {"status": "mock_sent"}
@@ -22,78 +27,106 @@ async def send_whatsapp_message(to_number: str, message_text: str):
         logger.warning("WhatsApp API credentials missing", to=to_number)
         return {"status": "skipped", "reason": "missing_credentials"}
 
-    url = f"https://graph.facebook.com/v18.0/{settings.whatsapp_phone_number_id}/messages"
-    headers = {
-        "Authorization": f"Bearer {settings.whatsapp_api_token}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "messaging_product": "whatsapp",
-        "to": to_number,
-        "type": "text",
-        "text": {"body": message_text}
-    }
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(url, headers=headers, json=payload, timeout=10.0)
-            response.raise_for_status()
-            logger.info("WhatsApp message sent", to=to_number, status=response.status_code)
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error("WhatsApp API error", status=e.response.status_code, response=e.response.text)
-            raise
-        except Exception as e:
-            logger.error("WhatsApp send failed", error=str(e))
-            raise
+    try:
+        result = await sender.send_text(to_number, message_text, phone_number_id)
+        logger.info("WhatsApp message sent", to=to_number, phone_number_id=phone_number_id)
+        return result
+    except WhatsAppSendError as e:
+        logger.error("WhatsApp send failed", to=to_number, error=str(e))
+        raise
+
+# Message types whose guest-visible text we can answer
+TEXT_TYPES = {"text", "button", "interactive"}
+
 
-def normalize_whatsapp_message(payload: dict) -> NormalizedMessage:
+def _message_text(msg: dict) -> str | None:
+    msg_type = msg.get("type")
+    if msg_type == "text":
+        return msg.get("text", {}).get("body")
+    if msg_type == "button":  # Quick-reply button on a template
+        return msg.get("button", {}).get("text")
+    if msg_type == "interactive":  # Reply button or list row
+        interactive = msg.get("interactive", {})
+        reply = interactive.get("button_reply") or interactive.get("list_reply") or {}
+        return reply.get("title")
+    return None
+
+
+def iter_whatsapp_events(payload: dict) -> Iterator[dict]:
     """
-    Parse raw WhatsApp webhook payload into NormalizedMessage.
-    Raises ValueError if payload is invalid or property_id cannot be determined here.
-    Note: property_id relies on phone_number_id mapping which happens at route level.
-    So this function returns a partial structure or dictates how to extract fields.
-    
-    Actually, to keep it clean, we extract the core fields here.
+    Yield one normalized record per event in a webhook delivery.
+
+    Under load Meta batches several entries, each with several changes, each
+    with several messages and/or delivery statuses, into one POST. Every one
+    of them is yielded, in payload order, with `kind` set to:
+      - "text":     a guest message with text we can answer
+      - "non_text": image, audio, location, reaction, ... (content is None)
+      - "status":   sent/delivered/read/failed receipt for an outbound message
+    Malformed parts of the payload are skipped, not fatal to the rest.
     """
-    try:
-        entry = payload.get("entry", [{}])[0]
-        changes = entry.get("changes", [{}])[0]
-        value = changes.get("value", {})
-        messages = value.get("messages", [])
-        
-        if not messages:
-            return None
-            
-        msg = messages[0]
-        from_number = msg.get("from")
-        text_body = msg.get("text", {}).get("body")
-        
-        # Determine guest name
-        contacts = value.get("contacts", [])
-        guest_name = None
-        if contacts:
-            guest_name = contacts[0].get("profile", {}).get("name")
-            
-        # Get phone number ID for property lookup
-        phone_number_id = value.get("metadata", {}).get("phone_number_id")
-        
-        if not from_number or not text_body:
-            return None
-            
-        # We return a dict-like structure or simpler object to be enriched with property_id
-        return {
-            "channel": "whatsapp",
-            "guest_identifier": from_number,
-            "guest_name": guest_name,
-            "content": text_body,
-            "metadata": {
-                "phone_number_id": phone_number_id,
-                "whatsapp_message_id": msg.get("id")
+    for entry in payload.get("entry") or []:
+        if not isinstance(entry, dict):
+            continue
+        for change in entry.get("changes") or []:
+            value = change.get("value") if isinstance(change, dict) else None
+            if not isinstance(value, dict):
+                continue
+            phone_number_id = (value.get("metadata") or {}).get("phone_number_id")
+            names = {
+                contact.get("wa_id"): (contact.get("profile") or {}).get("name")
+                for contact in value.get("contacts") or []
+                if isinstance(contact, dict)
             }
-        }
-        
+
+            for msg in value.get("messages") or []:
+                if not isinstance(msg, dict) or not msg.get("from"):
+                    continue
+                text_body = _message_text(msg)
+                yield {
+                    "channel": "whatsapp",
+                    "kind": "text" if text_body else "non_text",
+                    "guest_identifier": msg["from"],
+                    "guest_name": names.get(msg["from"]),
+                    "content": text_body,
+                    "metadata": {
+                        "phone_number_id": phone_number_id,
+                        "whatsapp_message_id": msg.get("id"),
+                        "message_type": msg.get("type"),
+                    },
+                }
+
+            for status in value.get("statuses") or []:
+                if not isinstance(status, dict):
+                    continue
+                yield {
+                    "channel": "whatsapp",
+                    "kind": "status",
+                    "guest_identifier": status.get("recipient_id"),
+                    "guest_name": None,
+                    "content": None,
+                    "metadata": {
+                        "phone_number_id": phone_number_id,
+                        "whatsapp_message_id": status.get("id"),
+                        "status": status.get("status"),
+                        "timestamp": status.get("timestamp"),
+                        "error": next(
+                            (err.get("title") or err.get("message") for err in status.get("errors") or [] if isinstance(err, dict)),
+                            None,
+                        ),
+                    },
+                }
+
+
+def normalize_whatsapp_message(payload: dict) -> dict | None:
+    """
+    The first text message in a webhook payload, or None.
+    Kept for single-message callers; the webhook uses iter_whatsapp_events.
+    """
+    try:
+        for event in iter_whatsapp_events(payload):
+            if event["kind"] == "text":
+                del event["kind"]
+                return event
     except Exception as e:
         logger.error("Error normalizing WhatsApp payload", error=str(e))
-        return None
+    return None
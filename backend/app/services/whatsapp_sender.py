@@ -0,0 +1,263 @@
+"""
+Outbound WhatsApp sender.
+
+WhatsAppSender talks to the Graph API Cloud messages endpoint over one shared,
+long-lived httpx.AsyncClient (HTTP/2 when settings.whatsapp_http2), so
+replies reuse warm connections instead of paying TLS setup each time.
+
+Meta limits throughput per business phone number, across every process that
+sends for it, so the token bucket for each phone_number_id lives in Redis
+(RedisTokenBucket): settings.whatsapp_rate_per_sec cluster-wide, bursting to
+settings.whatsapp_rate_burst. Each send reserves a slot and sleeps until it
+comes up. If Redis is unreachable the sender falls back to an in-process
+TokenBucket at rate / settings.whatsapp_sender_processes.
+
+The messages POST is not idempotent and the Graph API takes no idempotency
+key, so only failures where Meta cannot have accepted the message are
+retried (exponential backoff with jitter, Retry-After honoured up to
+settings.whatsapp_max_retry_after_sec): connection errors, pool timeouts,
+HTTP 429 and Meta's throughput error codes. A read timeout, dropped
+connection or 5xx after the body was sent is ambiguous; it is raised with
+`maybe_delivered=True` and not retried here, because a retry could send the
+guest the same reply twice. Other 4xx responses fail at once.
+
+For load testing, point settings.whatsapp_api_base_url at
+`python -m scripts.mock_graph_api`.
+"""
+
+import asyncio
+import random
+import time
+
+import httpx
+import structlog
+
+from app.config import get_settings
+from app.core.redis import get_redis
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+RETRYABLE_STATUS = {429}
+# Graph API error codes that mean "slow down", whatever the HTTP status
+RETRYABLE_ERROR_CODES = {
+    4,       # Application request limit reached
+    80007,   # WhatsApp Business Account rate limit
+    130429,  # Cloud API throughput reached
+    131056,  # Pair rate limit (same sender -> recipient)
+}
+# Raised before the request reached Meta, so a retry cannot duplicate it
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+RATE_KEY_PREFIX = "whatsapp:rate:"
+TOKEN_EPSILON = 1e-9
+
+# Reserve one token: the bucket may go negative, and the caller sleeps until
+# its reservation is covered. One round trip per send, FIFO across processes.
+RESERVE_TOKEN_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+if tokens >= 0 then return '0' end
+return tostring(-tokens / rate)
+"""
+
+
+class WhatsAppSendError(Exception):
+    """
+    Delivery failed after all retries, or was rejected outright.
+    `maybe_delivered` is True when Meta may have accepted the message anyway;
+    `retryable` is True when it certainly did not and trying later may work.
+    """
+
+    def __init__(self, message: str, maybe_delivered: bool = False, retryable: bool = False):
+        super().__init__(message)
+        self.maybe_delivered = maybe_delivered
+        self.retryable = retryable
+
+
+class TokenBucket:
+    """
+    In-process bucket: `rate` tokens per second, holding at most `burst`.
+    acquire() waits for a token. `clock` and `sleep` are injectable for tests.
+    """
+
+    def __init__(self, rate: float, burst: float, clock=time.monotonic, sleep=asyncio.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = burst
+        self.updated = clock()
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """Take one token; returns the seconds spent waiting for it."""
+        waited = 0.0
+        async with self.lock:  # FIFO: waiters are served in arrival order
+            while True:
+                self._refill(self.clock())
+                if self.tokens >= 1 - TOKEN_EPSILON:  # Float refill can land a hair under 1
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+                waited += delay
+                await self.sleep(delay)
+
+
+class RedisTokenBucket:
+    """Cluster-wide bucket for one phone_number_id; same acquire() contract as TokenBucket."""
+
+    def __init__(self, redis, phone_number_id: str, rate: float, burst: float, fallback: TokenBucket, sleep=asyncio.sleep):
+        self.redis = redis
+        self.key = RATE_KEY_PREFIX + phone_number_id
+        self.rate = rate
+        self.burst = burst
+        self.fallback = fallback
+        self.sleep = sleep
+
+    async def acquire(self) -> float:
+        try:
+            wait = float(await self.redis.eval(RESERVE_TOKEN_LUA, [self.key], [self.rate, self.burst]))
+        except Exception as e:
+            logger.warning("WhatsApp rate limiter unavailable, using local bucket", key=self.key, error=str(e))
+            return await self.fallback.acquire()
+        if wait > 0:
+            await self.sleep(wait)
+        return wait
+
+
+def _error_code(response: httpx.Response) -> int | None:
+    try:
+        return response.json().get("error", {}).get("code")
+    except (ValueError, AttributeError):
+        return None
+
+
+class WhatsAppSender:
+    def __init__(self, api_token: str, base_url: str | None = None, api_version: str | None = None):
+        self.api_token = api_token
+        self.base_url = base_url or settings.whatsapp_api_base_url
+        self.api_version = api_version or settings.whatsapp_api_version
+        self.client: httpx.AsyncClient | None = None
+        self.redis = None
+        self.buckets: dict[str, RedisTokenBucket] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_token}"},
+                timeout=settings.whatsapp_timeout_sec,
+                http2=settings.whatsapp_http2,
+                limits=httpx.Limits(
+                    max_connections=settings.whatsapp_max_connections,
+                    max_keepalive_connections=settings.whatsapp_max_connections,
+                ),
+            )
+        return self.client
+
+    async def _get_redis(self):
+        if not self.redis:
+            self.redis = await get_redis()
+        return self.redis
+
+    async def bucket(self, phone_number_id: str) -> RedisTokenBucket:
+        if phone_number_id not in self.buckets:
+            rate, burst = settings.whatsapp_rate_per_sec, settings.whatsapp_rate_burst
+            processes = max(1, settings.whatsapp_sender_processes)
+            fallback = TokenBucket(rate / processes, max(1.0, burst / processes))
+            self.buckets[phone_number_id] = RedisTokenBucket(
+                await self._get_redis(), phone_number_id, rate, burst, fallback
+            )
+        return self.buckets[phone_number_id]
+
+    async def _post(self, phone_number_id: str, payload: dict) -> dict:
+        """POST with rate limiting and safe retries; returns the Graph API response body."""
+        client = self._get_client()
+        path = f"/{self.api_version}/{phone_number_id}/messages"
+        attempts = settings.whatsapp_max_retries + 1
+        for attempt in range(attempts):
+            delay = settings.whatsapp_backoff_base_sec * (2 ** attempt) * (1 + random.random())
+            waited = await (await self.bucket(phone_number_id)).acquire()
+            if waited > 1:
+                logger.info("WhatsApp send throttled", phone_number_id=phone_number_id, waited_sec=round(waited, 2))
+            try:
+                response = await client.post(path, json=payload)
+            except NOT_SENT_ERRORS as e:
+                reason = str(e) or type(e).__name__
+            except httpx.TransportError as e:
+                # The request may have reached Meta; retrying could double-send
+                raise WhatsAppSendError(
+                    f"WhatsApp send outcome unknown: {str(e) or type(e).__name__}", maybe_delivered=True
+                )
+            else:
+                code = _error_code(response) if response.status_code >= 400 else None
+                if response.status_code < 400:
+                    return response.json()
+                if response.status_code not in RETRYABLE_STATUS and code not in RETRYABLE_ERROR_CODES:
+                    raise WhatsAppSendError(
+                        f"Graph API {'error' if response.status_code >= 500 else 'rejected the message'} "
+                        f"({response.status_code}): {response.text[:200]}",
+                        maybe_delivered=response.status_code >= 500,
+                    )
+                retry_after = response.headers.get("retry-after")
+                if retry_after and retry_after.isdigit():
+                    delay = min(float(retry_after), settings.whatsapp_max_retry_after_sec)
+                reason = f"HTTP {response.status_code}" + (f" code {code}" if code else "")
+
+            if attempt == attempts - 1:
+                raise WhatsAppSendError(f"WhatsApp send failed after {attempts} attempts: {reason}", retryable=True)
+            logger.warning(
+                "WhatsApp send retrying",
+                phone_number_id=phone_number_id, attempt=attempt + 1, reason=reason, delay_sec=round(delay, 2),
+            )
+            await asyncio.sleep(delay)
+
+    async def send_text(self, to_number: str, message_text: str, phone_number_id: str) -> dict:
+        return await self._post(phone_number_id, {
+            "messaging_product": "whatsapp",
+            "to": to_number,
+            "type": "text",
+            "text": {"body": message_text},
+        })
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+_sender = None
+
+
+def get_whatsapp_sender() -> WhatsAppSender | None:
+    """Process-wide sender, or None when no API token is configured."""
+    global _sender
+    if _sender is None and settings.whatsapp_api_token:
+        _sender = WhatsAppSender(settings.whatsapp_api_token)
+    return _sender
+
+
+def set_whatsapp_sender(sender):
+    """Override the process-wide sender (tests, scripts)."""
+    global _sender
+    _sender = sender
+
+
+async def close_whatsapp_sender():
+    global _sender
+    if _sender is not None:
+        await _sender.close()
+        _sender = None
@@ -0,0 +1,298 @@
+"""
+Guest WebSocket connection registry.
+
+A guest's /ws/chat socket lives on whichever API process accepted it, but
+events for the guest (staff takeover, a staff reply, a handoff) come from any
+process. Each process keeps the sockets it holds in a ConnectionRegistry,
+keyed by conversation, and subscribes to the Redis channel
+`ws:conv:<conversation_id>` only while it holds a socket for that
+conversation. push_to_conversation() publishes to that channel from
+anywhere (API, worker); Redis delivers it only to the processes holding the
+guest, and each sends it to its local sockets.
+
+Presence is kept in Redis as well (`ws:presence:<conversation_id>`, a sorted
+set of connection ids scored by expiry), refreshed on every heartbeat, so
+guest_online() works from any process and a crashed node's sockets age out.
+
+GuestConnection runs the heartbeat: the server sends {"type": "ping"} every
+settings.ws_heartbeat_sec, and any client frame counts as alive. A socket
+with no frame for settings.ws_heartbeat_timeout_sec is closed as dead, and
+one with no guest message for settings.ws_idle_timeout_sec is closed as idle.
+A client that cannot take a frame within settings.ws_send_timeout_sec is
+dropped, so one slow socket never holds up delivery to the others.
+
+Pub/sub is fire-and-forget: an event for a guest who is offline is dropped.
+Anything the guest must see is also stored as a Message.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from typing import AsyncIterator
+
+import structlog
+from starlette.websockets import WebSocketDisconnect, WebSocketState
+
+from app.config import get_settings
+from app.core.redis import get_redis
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+CHANNEL_PREFIX = "ws:conv:"
+PRESENCE_PREFIX = "ws:presence:"
+
+# Add this connection to the conversation's presence set and drop expired entries
+TOUCH_PRESENCE_LUA = """
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+
+def node_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class GuestConnection:
+    """One guest socket: serialized sends, heartbeat and idle timeout."""
+
+    def __init__(self, websocket, clock=time.monotonic):
+        self.id = uuid.uuid4().hex
+        self.websocket = websocket
+        self.clock = clock
+        self.conversation_id: str | None = None
+        self.last_seen = self.last_active = clock()
+        self.send_lock = asyncio.Lock()
+        self.closed = False
+
+    async def send_json(self, event: dict) -> bool:
+        """Send one frame; a client that errors or stalls is closed and False returned."""
+        if self.closed:
+            return False
+        try:
+            async with self.send_lock:
+                await asyncio.wait_for(self.websocket.send_text(json.dumps(event)), settings.ws_send_timeout_sec)
+            return True
+        except Exception as e:
+            logger.info("Guest socket send failed", connection_id=self.id, error=str(e) or type(e).__name__)
+            await self.close(code=1011, reason="send failed")
+            return False
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        if self.closed:
+            return
+        self.closed = True
+        if self.websocket.application_state == WebSocketState.CONNECTED:
+            try:
+                await self.websocket.close(code=code, reason=reason)
+            except Exception:
+                pass
+
+    def check(self) -> str | None:
+        """Why the connection should be closed now, if at all."""
+        now = self.clock()
+        if now - self.last_seen > settings.ws_heartbeat_timeout_sec:
+            return "heartbeat_timeout"
+        if now - self.last_active > settings.ws_idle_timeout_sec:
+            return "idle_timeout"
+        return None
+
+    async def messages(self, registry: "ConnectionRegistry") -> AsyncIterator[dict]:
+        """Guest chat payloads. Heartbeat frames are handled here and never yielded."""
+        heartbeat = asyncio.create_task(self._heartbeat(registry))
+        try:
+            while not self.closed:
+                try:
+                    raw = await self.websocket.receive_text()
+                except (WebSocketDisconnect, RuntimeError):
+                    return
+                self.last_seen = self.clock()
+                try:
+                    payload = json.loads(raw)
+                except ValueError:
+                    continue
+                if not isinstance(payload, dict):
+                    continue
+                if payload.get("type") == "ping":
+                    await self.send_json({"type": "pong"})
+                    continue
+                if payload.get("type") == "pong":
+                    continue
+                self.last_active = self.last_seen
+                yield payload
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, registry: "ConnectionRegistry"):
+        while not self.closed:
+            await asyncio.sleep(settings.ws_heartbeat_sec)
+            reason = self.check()
+            if reason:
+                logger.info("Guest socket closed", connection_id=self.id, reason=reason)
+                await self.send_json({"type": "closing", "reason": reason})
+                await self.close(code=1000 if reason == "idle_timeout" else 1001, reason=reason)
+                return
+            if await self.send_json({"type": "ping"}):
+                await registry.touch(self)
+
+
+class ConnectionRegistry:
+    def __init__(self, node: str | None = None):
+        self.node = node or node_name()
+        self.redis = None
+        self.pubsub = None
+        self.local: dict[str, set[GuestConnection]] = {}
+        self.subscription_lock = asyncio.Lock()
+        self.listener: asyncio.Task | None = None
+
+    async def _get_redis(self):
+        if not self.redis:
+            self.redis = await get_redis()
+        return self.redis
+
+    async def start(self):
+        """Open the pub/sub connection and start delivering events to local sockets."""
+        if self.listener is None:
+            self.pubsub = await (await self._get_redis()).pubsub()
+            if self.local:
+                await self.pubsub.subscribe(*(CHANNEL_PREFIX + cid for cid in self.local))
+            self.listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self.listener is not None:
+            self.listener.cancel()
+            try:
+                await self.listener
+            except asyncio.CancelledError:
+                pass
+            self.listener = None
+        for conns in list(self.local.values()):
+            for conn in list(conns):
+                await conn.close(code=1012, reason="server restart")  # Clients reconnect to another node
+        self.local.clear()
+        if self.pubsub is not None:
+            await self.pubsub.close()
+            self.pubsub = None
+
+    async def register(self, conn: GuestConnection, conversation_id: str):
+        """Route events for `conversation_id` to `conn` (moving it off any previous conversation)."""
+        conversation_id = str(conversation_id)
+        if conn.conversation_id == conversation_id:
+            return
+        if conn.conversation_id is not None:
+            await self.unregister(conn)
+        conn.conversation_id = conversation_id
+        conns = self.local.setdefault(conversation_id, set())
+        conns.add(conn)
+        if len(conns) == 1 and self.pubsub is not None:
+            try:
+                async with self.subscription_lock:
+                    await self.pubsub.subscribe(CHANNEL_PREFIX + conversation_id)
+            except Exception as e:
+                # The socket still gets its own replies; only pushes from other processes are lost
+                logger.warning("Guest socket subscribe failed", conversation_id=conversation_id, error=str(e))
+        await self.touch(conn)
+
+    async def unregister(self, conn: GuestConnection):
+        conversation_id = conn.conversation_id
+        conns = self.local.get(conversation_id) if conversation_id else None
+        if not conns or conn not in conns:
+            return
+        conns.discard(conn)
+        if not conns:
+            del self.local[conversation_id]
+            if self.pubsub is not None:
+                try:
+                    async with self.subscription_lock:
+                        await self.pubsub.unsubscribe(CHANNEL_PREFIX + conversation_id)
+                except Exception as e:
+                    logger.warning("Guest socket unsubscribe failed", conversation_id=conversation_id, error=str(e))
+        try:
+            await (await self._get_redis()).zrem(PRESENCE_PREFIX + conversation_id, conn.id)
+        except Exception as e:
+            logger.warning("Guest presence not cleared", conversation_id=conversation_id, error=str(e))
+
+    async def touch(self, conn: GuestConnection):
+        """Refresh the connection's presence entry (best-effort)."""
+        if conn.conversation_id is None:
+            return
+        now = time.time()
+        ttl = settings.ws_heartbeat_timeout_sec
+        try:
+            await (await self._get_redis()).eval(
+                TOUCH_PRESENCE_LUA,
+                [PRESENCE_PREFIX + conn.conversation_id],
+                [conn.id, now + ttl, now, int(ttl) + 1],
+            )
+        except Exception as e:
+            logger.warning("Guest presence not refreshed", conversation_id=conn.conversation_id, error=str(e))
+
+    async def deliver_local(self, conversation_id: str, event: dict) -> int:
+        """Send to this process's sockets for the conversation; returns how many took it."""
+        conns = list(self.local.get(conversation_id, ()))
+        if not conns:
+            return 0
+        results = await asyncio.gather(*(conn.send_json(event) for conn in conns))
+        return sum(results)
+
+    async def _listen(self):
+        while True:
+            try:
+                if not self.pubsub.subscribed:
+                    await asyncio.sleep(0.1)
+                    continue
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None or message.get("type") != "message":
+                    continue
+                conversation_id = message["channel"].removeprefix(CHANNEL_PREFIX)
+                await self.deliver_local(conversation_id, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Guest socket listener error", node=self.node, error=str(e))
+                await asyncio.sleep(1)
+
+    async def publish(self, conversation_id: str, event: dict) -> int:
+        """Push an event to the conversation's sockets on every process; returns processes reached."""
+        redis = await self._get_redis()
+        return await redis.publish(CHANNEL_PREFIX + str(conversation_id), json.dumps(event))
+
+    async def online(self, conversation_id: str) -> int:
+        """Live guest sockets for the conversation, across all processes."""
+        redis = await self._get_redis()
+        return await redis.zcount(PRESENCE_PREFIX + str(conversation_id), time.time(), "+inf")
+
+    def stats(self) -> dict:
+        return {
+            "node": self.node,
+            "conversations": len(self.local),
+            "connections": sum(len(conns) for conns in self.local.values()),
+        }
+
+
+connection_registry = ConnectionRegistry()
+
+
+async def push_to_conversation(conversation_id, event: dict) -> int:
+    """
+    Best-effort push to the guest's socket(s), wherever they are connected.
+    Returns the number of processes that received it (0 when the guest is offline).
+    """
+    try:
+        return await connection_registry.publish(conversation_id, event)
+    except Exception as e:
+        logger.warning("Guest socket push failed", conversation_id=str(conversation_id), error=str(e))
+        return 0
+
+
+async def guest_online(conversation_id) -> bool:
+    try:
+        return await connection_registry.online(conversation_id) > 0
+    except Exception as e:
+        logger.warning("Guest presence unavailable", conversation_id=str(conversation_id), error=str(e))
+        return False
@@ -1,46 +1,75 @@
 import uuid
-import json
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 import structlog
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db, set_db_context
+from app.models import Conversation
 from app.services.conversation import process_guest_message
+from app.services.ws_registry import GuestConnection, connection_registry
 
 logger = structlog.get_logger()
 router = APIRouter()
 
+
+async def _active_conversation_id(db: AsyncSession, property_id: uuid.UUID, guest_identifier: str) -> str | None:
+    result = await db.execute(
+        select(Conversation.id)
+        .where(
+            Conversation.property_id == property_id,
+            Conversation.guest_identifier == guest_identifier,
+            Conversation.status == "active",
+        )
+        .order_by(Conversation.started_at.desc())
+        .limit(1)
+    )
+    conversation_id = result.scalar_one_or_none()
+    return str(conversation_id) if conversation_id else None
+
+
 @router.websocket("/ws/chat")
 async def websocket_endpoint(websocket: WebSocket, property_id: str, session_id: str):
     """
     WebSocket endpoint for Web Widget chat.
     URl: ws://domain/api/v1/ws/chat?property_id=...&session_id=...
+
+    The socket is registered under the guest's conversation
+    (app.services.ws_registry), so staff takeover and staff replies reach it
+    from any process. Server frames: {"type": "message" | "ping" | "pong" |
+    "staff_joined" | "closing", ...}; the client answers pings with
+    {"type": "pong"} (or anything else) to stay connected.
     """
     await websocket.accept()
-    
-    # We can't use Depends(get_db) easily in generic WebSocket route without a bit of work 
+
+    # We can't use Depends(get_db) easily in generic WebSocket route without a bit of work
     # or using the context manager manually inside the loop.
     # For simplicity/reliability in FastAPi WebSockets, manual session creation is often safer/clearer.
     from app.database import async_session
-    
+
     logger.info("WEBSOCKET_CONNECT", session_id=session_id, property_id=property_id)
-    
+    conn = GuestConnection(websocket)
+
     try:
         pid = uuid.UUID(property_id)
         guest_identifier = f"web:{session_id}"
-        
-        while True:
-            data = await websocket.receive_text()
-            payload = json.loads(data)
-            
+
+        # Returning guest: route events for their open conversation here
+        async with async_session() as db:
+            await set_db_context(db, property_id)
+            conversation_id = await _active_conversation_id(db, pid, guest_identifier)
+        if conversation_id:
+            await connection_registry.register(conn, conversation_id)
+
+        async for payload in conn.messages(connection_registry):
             # Message from User
             user_text = payload.get("text")
             if not user_text:
                 continue
-                
+
             # Process with AI
             async with async_session() as db:
                 await set_db_context(db, property_id)
-                
+
                 result = await process_guest_message(
                     db=db,
                     property_id=pid,
@@ -49,18 +78,23 @@ async def websocket_endpoint(websocket: WebSocket, property_id: str, session_id:
                     message_text=user_text,
                     guest_name="Web Guest" # Could be passed in connection params
                 )
-                
-                response_text = result["response"]
-                
-                # Send AI Reply
-                await websocket.send_text(json.dumps({
-                    "type": "message",
-                    "text": response_text,
-                    "sender": "ai"
-                }))
-                
+                await db.commit()
+
+            # First message opens the conversation; a resolved one may be replaced
+            await connection_registry.register(conn, result["conversation_id"])
+
+            # Send AI Reply
+            await conn.send_json({
+                "type": "message",
+                "text": result["response"],
+                "sender": "ai"
+            })
+
     except WebSocketDisconnect:
-        logger.info("WEBSOCKET_DISCONNECT", session_id=session_id)
+        pass
     except Exception as e:
         logger.error("WEBSOCKET_ERROR", error=str(e), session_id=session_id)
-        await websocket.close()
+    finally:
+        await connection_registry.unregister(conn)
+        await conn.close()
+        logger.info("WEBSOCKET_DISCONNECT", session_id=session_id)
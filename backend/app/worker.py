@@ -0,0 +1,230 @@
+"""
+Inbound message worker.
+Usage:
+    python -m app.worker
+    python -m app.worker --concurrency 32
+
+Consumes the inbound queue (app.services.inbound_queue) written by the
+WhatsApp and email webhooks, runs each guest message through the AI
+conversation engine, and stores the reply in the outbox. Each process also
+runs the outbox dispatcher that sends replies. Run as many worker processes
+as LLM throughput needs; they share the consumer group and the outbox.
+SIGTERM stops reading and lets in-flight messages finish.
+
+One guest's messages are handled one at a time, in stream order: a FIFO
+asyncio lock per (property, guest) orders them within a process, and a
+Postgres transaction advisory lock on the same key serializes them across
+processes, so a burst of messages never races on the conversation.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import signal
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+import structlog
+from sqlalchemy import text
+
+from app.config import get_settings
+from app.core.redis import redis_client
+from app.database import async_session, set_db_context
+from app.services.conversation import process_guest_message
+from app.services.email import notify_staff_handoff_enhanced
+from app.services.email_transport import close_email_transport
+from app.services.idempotency import claim_receipt, inbound_dedupe
+from app.services.inbound_queue import InboundJob, InboundQueue, consumer_name, inbound_queue
+from app.services.outbox import enqueue_reply, run_outbox_dispatcher
+from app.services.whatsapp_sender import close_whatsapp_sender
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+STATS_INTERVAL_SEC = 30
+
+
+def guest_key(job: InboundJob) -> str:
+    return f"{job.property_id}:{job.guest_identifier}"
+
+
+def guest_lock_key(job: InboundJob) -> int:
+    """Stable signed 64-bit advisory lock key for the job's guest."""
+    return int.from_bytes(hashlib.sha1(guest_key(job).encode()).digest()[:8], "big", signed=True)
+
+
+class GuestLocks:
+    """FIFO asyncio lock per guest, dropped once nobody holds or waits for it."""
+
+    def __init__(self):
+        self.locks: dict[str, tuple[asyncio.Lock, int]] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: str):
+        lock, users = self.locks.get(key, (None, 0))
+        lock = lock or asyncio.Lock()
+        self.locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self.locks[key]
+            if users == 1:
+                del self.locks[key]
+            else:
+                self.locks[key] = (lock, users - 1)
+
+
+async def _notify_handoff(job: InboundJob, result: dict):
+    """Alert staff when the AI handed the conversation off. Runs after the commit."""
+    if result.get("mode") != "handoff":
+        return
+    if job.kind == "whatsapp":
+        summary = f"Last message: {job.content}\nAI Reply: {result['response']}"
+    else:
+        summary = f"Message: {job.content}\n\nAI Reply: {result['response']}"
+    await notify_staff_handoff_enhanced(
+        property_id=job.property_id,
+        conversation_id=result["conversation_id"],
+        guest_identifier=job.guest_identifier,
+        channel=job.kind,
+        guest_name=job.guest_name,
+        conversation_summary=summary,
+    )
+
+
+async def handle_job(job: InboundJob):
+    """
+    Process one guest message. Raises if nothing was committed, so the job is
+    retried. The reply goes into the outbox (app.services.outbox) in the same
+    commit as the messages, and the outbox dispatcher sends it; only the staff
+    handoff alert is sent from here, best-effort, because a retry would store
+    the guest message a second time.
+    """
+    property_id = uuid.UUID(job.property_id)
+    async with async_session() as db:
+        # Set RLS context for this property
+        await set_db_context(db, job.property_id)
+        # Held until commit: another worker's message from this guest waits
+        await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": guest_lock_key(job)})
+        if job.message_id and not await claim_receipt(db, job.kind, job.message_id):
+            # Already processed (Redis claim expired, or redelivered after a crash)
+            await inbound_dedupe.record_duplicates(job.kind, "db")
+            logger.info("Duplicate inbound message suppressed", kind=job.kind, message_id=job.message_id)
+            return
+        result = await process_guest_message(
+            db=db,
+            property_id=property_id,
+            guest_identifier=job.guest_identifier,
+            channel=job.kind,
+            message_text=job.content,
+            guest_name=job.guest_name,
+        )
+        enqueue_reply(
+            db,
+            property_id=property_id,
+            conversation_id=uuid.UUID(result["conversation_id"]),
+            message_id=uuid.UUID(result["message_id"]),
+            channel=job.kind,
+            recipient=job.guest_identifier,
+            body=result["response"],
+            subject=f"Re: {job.subject}" if job.kind == "email" else None,
+            sender_id=job.phone_number_id,
+        )
+        await db.commit()
+
+    try:
+        await _notify_handoff(job, result)
+    except Exception as e:
+        logger.error(
+            "Handoff notification failed",
+            kind=job.kind,
+            error=str(e),
+            property_id=job.property_id,
+            guest_identifier=job.guest_identifier,
+        )
+
+
+async def _process(queue: InboundQueue, entry_id: str, job: InboundJob, guest_locks: GuestLocks):
+    try:
+        # First await of the task, so tasks queue on the lock in stream order
+        async with guest_locks.hold(guest_key(job)):
+            started = time.perf_counter()
+            await handle_job(job)
+            await queue.ack(entry_id)
+        logger.info(
+            "Inbound job done",
+            kind=job.kind,
+            property_id=job.property_id,
+            attempt=job.attempt,
+            duration_ms=round((time.perf_counter() - started) * 1000, 1),
+            queue_latency_sec=round(time.time() - job.enqueued_at, 2),
+        )
+    except Exception as e:
+        try:
+            await queue.fail(entry_id, job, str(e))
+        except Exception as fail_error:
+            # Still pending in the stream; reclaimed after inbound_claim_idle_ms
+            logger.error("Inbound job could not be rescheduled", entry_id=entry_id, error=str(fail_error))
+
+
+async def run_worker(concurrency: int | None = None, queue: InboundQueue = inbound_queue, stop: asyncio.Event | None = None):
+    """Read -> process -> ack loop with at most `concurrency` messages in flight."""
+    concurrency = concurrency or settings.inbound_worker_concurrency
+    stop = stop or asyncio.Event()
+    consumer = consumer_name()
+    in_flight: set[asyncio.Task] = set()
+    guest_locks = GuestLocks()
+    last_stats = 0.0
+
+    await queue.ensure_group()
+    logger.info("Inbound worker started", consumer=consumer, stream=queue.stream, concurrency=concurrency)
+
+    while not stop.is_set():
+        if len(in_flight) >= concurrency:
+            await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            continue
+        try:
+            await queue.promote_due_retries()
+            if time.monotonic() - last_stats >= STATS_INTERVAL_SEC:
+                logger.info("Inbound queue stats", **(await queue.stats()))
+                last_stats = time.monotonic()
+
+            # Only take as many jobs as there are free slots; the rest stay
+            # in the stream for other workers
+            jobs = await queue.read(consumer, count=concurrency - len(in_flight), block_ms=2000)
+        except Exception as e:
+            logger.error("Inbound queue read failed", error=str(e))
+            await asyncio.sleep(1)
+            continue
+
+        for entry_id, job in jobs:
+            task = asyncio.create_task(_process(queue, entry_id, job, guest_locks))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+    if in_flight:
+        logger.info("Inbound worker draining", in_flight=len(in_flight))
+        await asyncio.gather(*in_flight, return_exceptions=True)
+    logger.info("Inbound worker stopped", consumer=consumer)
+
+
+async def main(concurrency: int | None = None):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await asyncio.gather(run_worker(concurrency, stop=stop), run_outbox_dispatcher(stop))
+    finally:
+        await close_email_transport()
+        await close_whatsapp_sender()
+        await redis_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process queued inbound guest messages")
+    parser.add_argument("--concurrency", type=int, default=None, help="Messages processed at once (default: settings.inbound_worker_concurrency)")
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency))
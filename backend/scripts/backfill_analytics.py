@@ -0,0 +1,252 @@
+"""
+Recompute AnalyticsDaily (and funnel_daily) for a set of properties over a date range.
+Usage:
+    python -m scripts.backfill_analytics --from 2026-01-01 --to 2026-03-31
+    python -m scripts.backfill_analytics --from 2026-01-01 --to 2026-03-31 \\
+        --property <uuid> --property <uuid> --workers 8 --chunk-days 14
+
+The range is split into (property, chunk) work items that run on a bounded
+pool of workers, each with its own DB session. Finished chunks are recorded
+in a checkpoint file, per property and day, so an interrupted run can be
+resumed (even with a different --chunk-days); pass --restart to ignore the
+checkpoint.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable
+from datetime import date, timedelta
+
+import structlog
+from sqlalchemy import select
+
+from app.database import async_session, set_db_context
+from app.models import Property
+from app.services.analytics import compute_daily_analytics
+from app.services.analytics_cache import analytics_cache
+from app.services.funnel import rebuild_funnel
+
+logger = structlog.get_logger()
+
+DEFAULT_CHECKPOINT = ".analytics_backfill_checkpoint.json"
+
+
+@dataclass(frozen=True)
+class Chunk:
+    property_id: uuid.UUID
+    start: date
+    end: date  # inclusive
+
+    @property
+    def key(self) -> str:
+        return f"{self.property_id}:{self.start.isoformat()}:{self.end.isoformat()}"
+
+    @property
+    def days(self) -> int:
+        return (self.end - self.start).days + 1
+
+    def dates(self) -> list[date]:
+        return [self.start + timedelta(days=i) for i in range(self.days)]
+
+
+def plan_chunks(
+    property_ids: list[uuid.UUID],
+    from_date: date,
+    to_date: date,
+    chunk_days: int,
+    is_done: Callable[[uuid.UUID, date], bool] | None = None,
+) -> list[Chunk]:
+    """
+    Split the property x date range into chunks of at most `chunk_days`
+    consecutive days, leaving out days for which `is_done(property_id, day)`.
+    """
+    chunks = []
+    for pid in property_ids:
+        start = None
+        day = from_date
+        while day <= to_date + timedelta(days=1):
+            pending = day <= to_date and not (is_done and is_done(pid, day))
+            if start is not None and (not pending or (day - start).days == chunk_days):
+                chunks.append(Chunk(pid, start, day - timedelta(days=1)))
+                start = None
+            if pending and start is None:
+                start = day
+            day += timedelta(days=1)
+    return chunks
+
+
+def _ranges(days: set[date]) -> list[list[str]]:
+    """Collapse days into sorted, inclusive [start, end] ranges."""
+    ranges = []
+    for day in sorted(days):
+        if ranges and day - ranges[-1][1] == timedelta(days=1):
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [[start.isoformat(), end.isoformat()] for start, end in ranges]
+
+
+class Checkpoint:
+    """
+    Completed (property, day) pairs persisted as JSON (written atomically).
+    Keyed by day rather than by chunk, so a resumed run skips finished days
+    even with a different --from/--to or --chunk-days. Stored as
+    {"completed": {property_id: [[start, end], ...]}}.
+    """
+
+    def __init__(self, path: str, restart: bool = False):
+        self.path = path
+        self.done: dict[uuid.UUID, set[date]] = {}
+        self._lock = asyncio.Lock()
+        if not restart and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                completed = json.load(f).get("completed", {})
+            if isinstance(completed, list):
+                # Older checkpoints listed "property:start:end" chunk keys
+                completed = self._from_chunk_keys(completed)
+            for pid, ranges in completed.items():
+                for start, end in ranges:
+                    self._add(Chunk(uuid.UUID(pid), date.fromisoformat(start), date.fromisoformat(end)))
+
+    @staticmethod
+    def _from_chunk_keys(keys: list[str]) -> dict[str, list[list[str]]]:
+        completed: dict[str, list[list[str]]] = {}
+        for key in keys:
+            pid, start, end = key.split(":")
+            completed.setdefault(pid, []).append([start, end])
+        return completed
+
+    def _add(self, chunk: Chunk):
+        self.done.setdefault(chunk.property_id, set()).update(chunk.dates())
+
+    def is_done(self, property_id: uuid.UUID, day: date) -> bool:
+        return day in self.done.get(property_id, ())
+
+    async def mark_done(self, chunk: Chunk):
+        async with self._lock:
+            self._add(chunk)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"completed": {str(pid): _ranges(days) for pid, days in sorted(self.done.items())}}, f)
+            os.replace(tmp_path, self.path)
+
+
+async def _resolve_property_ids(raw_ids: list[str] | None) -> list[uuid.UUID]:
+    if raw_ids:
+        return [uuid.UUID(pid) for pid in raw_ids]
+    async with async_session() as db:
+        result = await db.execute(
+            select(Property.id).where(Property.deleted_at.is_(None)).order_by(Property.id)
+        )
+        return [row[0] for row in result.fetchall()]
+
+
+async def _run_chunk(chunk: Chunk):
+    """Recompute every day (and the funnel rows) in the chunk in one session and commit once."""
+    async with async_session() as db:
+        try:
+            await set_db_context(db, str(chunk.property_id))
+            day = chunk.start
+            while day <= chunk.end:
+                await compute_daily_analytics(db, chunk.property_id, day)
+                day += timedelta(days=1)
+            await rebuild_funnel(db, chunk.property_id, chunk.start, chunk.end)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+    await analytics_cache.invalidate(chunk.property_id)
+
+
+async def backfill_analytics(
+    from_date: date,
+    to_date: date,
+    property_ids: list[str] | None = None,
+    workers: int = 4,
+    chunk_days: int = 7,
+    checkpoint_path: str = DEFAULT_CHECKPOINT,
+    restart: bool = False,
+) -> dict:
+    pids = await _resolve_property_ids(property_ids)
+    checkpoint = Checkpoint(checkpoint_path, restart=restart)
+    chunks = plan_chunks(pids, from_date, to_date, chunk_days, is_done=checkpoint.is_done)
+    total_days = sum(c.days for c in chunks)
+    skipped_days = len(pids) * ((to_date - from_date).days + 1) - total_days
+    logger.info(
+        "Starting analytics backfill",
+        properties=len(pids),
+        chunks=len(chunks),
+        days=total_days,
+        workers=workers,
+        skipped_from_checkpoint=skipped_days,
+    )
+
+    queue: asyncio.Queue[Chunk] = asyncio.Queue()
+    for chunk in chunks:
+        queue.put_nowait(chunk)
+
+    started = time.monotonic()
+    stats = {"days_done": 0, "days_skipped": skipped_days, "chunks_done": 0, "chunks_failed": 0}
+
+    async def worker(worker_id: int):
+        while True:
+            try:
+                chunk = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await _run_chunk(chunk)
+                await checkpoint.mark_done(chunk)
+                stats["days_done"] += chunk.days
+                stats["chunks_done"] += 1
+                elapsed = time.monotonic() - started
+                logger.info(
+                    "Backfill chunk complete",
+                    worker=worker_id,
+                    chunk=chunk.key,
+                    progress=f"{stats['days_done']}/{total_days} days",
+                    days_per_sec=round(stats["days_done"] / elapsed, 2) if elapsed else None,
+                )
+            except Exception as e:
+                stats["chunks_failed"] += 1
+                logger.error("Backfill chunk failed", worker=worker_id, chunk=chunk.key, error=str(e))
+
+    await asyncio.gather(*(worker(i) for i in range(max(1, workers))))
+
+    elapsed = time.monotonic() - started
+    stats["elapsed_sec"] = round(elapsed, 2)
+    stats["days_per_sec"] = round(stats["days_done"] / elapsed, 2) if elapsed else 0.0
+    logger.info("Analytics backfill finished", **stats)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute AnalyticsDaily over a date range")
+    parser.add_argument("--from", dest="from_date", required=True, type=date.fromisoformat, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="to_date", required=True, type=date.fromisoformat, help="Last day, inclusive (YYYY-MM-DD)")
+    parser.add_argument("--property", dest="property_ids", action="append", help="Property UUID (repeatable, default: all)")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent chunks (each uses one DB connection)")
+    parser.add_argument("--chunk-days", type=int, default=7, help="Days per work item")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint file for resuming")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    result = asyncio.run(backfill_analytics(
+        from_date=args.from_date,
+        to_date=args.to_date,
+        property_ids=args.property_ids,
+        workers=args.workers,
+        chunk_days=args.chunk_days,
+        checkpoint_path=args.checkpoint,
+        restart=args.restart,
+    ))
+    print(
+        f"Backfilled {result['days_done']} property-days in {result['elapsed_sec']}s "
+        f"({result['days_per_sec']} days/sec), {result['days_skipped']} already done, "
+        f"{result['chunks_failed']} chunk(s) failed"
+    )
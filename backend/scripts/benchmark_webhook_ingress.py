@@ -0,0 +1,129 @@
+"""
+Benchmark WhatsApp webhook ingress throughput for one worker.
+Usage:
+    python -m scripts.benchmark_webhook_ingress
+    python -m scripts.benchmark_webhook_ingress --requests 5000 --messages 50 --rounds 5
+
+Posts a signed, batched WhatsApp delivery to two in-process routes and
+prints requests/sec for each:
+  before: verify_whatsapp_signature + request.json() (stdlib json over the body)
+  after:  whatsapp_webhook_payload (one buffered read, HMAC, orjson.loads)
+Handlers do nothing else, so the numbers isolate ingress cost. No database,
+Redis or network is touched.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import statistics
+import time
+
+import orjson
+from fastapi import Depends, FastAPI, Request
+
+from app import auth
+from app.auth import verify_whatsapp_signature, whatsapp_webhook_payload
+
+SECRET = "benchmark-app-secret"
+
+
+def _delivery(messages: int) -> bytes:
+    return orjson.dumps({
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "WABA",
+            "changes": [{
+                "field": "messages",
+                "value": {
+                    "messaging_product": "whatsapp",
+                    "metadata": {"display_phone_number": "60312345678", "phone_number_id": "PHONE_NUMBER_ID"},
+                    "contacts": [{"wa_id": f"6012{i:07d}", "profile": {"name": f"Guest {i}"}} for i in range(messages)],
+                    "messages": [
+                        {
+                            "from": f"6012{i:07d}",
+                            "id": f"wamid.{i:032d}",
+                            "timestamp": "1760000000",
+                            "type": "text",
+                            "text": {"body": "Hi, do you have a deluxe king room for 2 nights from Friday? " * 3},
+                        }
+                        for i in range(messages)
+                    ],
+                },
+            }],
+        }],
+    })
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/before")
+    async def before(request: Request, _: None = Depends(verify_whatsapp_signature)):
+        body = await request.json()
+        return {"entries": len(body["entry"])}
+
+    @app.post("/after")
+    async def after(body: dict = Depends(whatsapp_webhook_payload)):
+        return {"entries": len(body["entry"])}
+
+    return app
+
+
+async def _run(app: FastAPI, path: str, body: bytes, headers: dict, requests: int) -> float:
+    """Call the ASGI app directly, so client and transport costs don't drown the ingress cost."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+        + [(b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    statuses = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    elapsed = time.perf_counter() - started
+    if any(status != 200 for status in statuses):
+        raise RuntimeError(f"{path}: unexpected statuses {set(statuses)}")
+    return requests / elapsed
+
+
+async def main(requests: int, messages: int, rounds: int):
+    auth.settings.whatsapp_app_secret = SECRET
+    body = _delivery(messages)
+    headers = {
+        "Content-Type": "application/json",
+        "X-Hub-Signature-256": "sha256=" + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest(),
+    }
+    print(f"{requests} requests x {rounds} rounds, {messages} messages per delivery ({len(body) / 1024:.1f} KiB)")
+
+    results: dict[str, list[float]] = {"before": [], "after": []}
+    app = _app()
+    for path in results:  # Warm-up
+        await _run(app, f"/{path}", body, headers, min(requests, 200))
+    for _ in range(rounds):
+        for path in results:
+            results[path].append(await _run(app, f"/{path}", body, headers, requests))
+
+    for path, rates in results.items():
+        print(f"  {path:<7} median {statistics.median(rates):8.0f} req/s  (best {max(rates):.0f})")
+    speedup = statistics.median(results["after"]) / statistics.median(results["before"])
+    print(f"  speedup {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark webhook ingress throughput")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per round")
+    parser.add_argument("--messages", type=int, default=20, help="Messages per batched delivery")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.messages, args.rounds))
@@ -0,0 +1,173 @@
+"""
+Load test guest WebSocket fan-out across processes.
+Usage (needs Redis at REDIS_URL):
+    python -m scripts.load_test_websockets --sockets 4000 --processes 2 --pushes 2000
+
+Starts --processes server processes (uvicorn, ports --port, --port+1, ...)
+that register sockets with the real ConnectionRegistry and GuestConnection
+(heartbeat, presence, per-conversation pub/sub). The conversation lookup is
+replaced by `conversation_id = the socket's query param`, so no database is
+needed. The driver then:
+
+1. opens --sockets sockets spread round-robin over the processes, each on its
+   own conversation (answering server pings like the widget does);
+2. publishes --pushes events to random conversations through
+   push_to_conversation(), from the driver process, so every delivery
+   crosses Redis to whichever server holds the socket;
+3. reports connect time, delivered/expected, push-to-socket latency
+   percentiles and each server's connection count.
+
+Raise `ulimit -n` if connecting thousands of sockets fails with EMFILE.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+import websockets
+
+from app.core.redis import redis_client
+from app.services.ws_registry import push_to_conversation
+
+
+def create_app():
+    from fastapi import FastAPI, WebSocket
+
+    from app.services.ws_registry import GuestConnection, connection_registry
+
+    app = FastAPI(title="WebSocket fan-out load test node")
+
+    @app.on_event("startup")
+    async def startup():
+        await connection_registry.start()
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        await connection_registry.stop()
+
+    @app.websocket("/ws/load")
+    async def load_socket(websocket: WebSocket, conversation_id: str):
+        await websocket.accept()
+        conn = GuestConnection(websocket)
+        try:
+            await connection_registry.register(conn, conversation_id)
+            async for _ in conn.messages(connection_registry):
+                pass
+        finally:
+            await connection_registry.unregister(conn)
+            await conn.close()
+
+    @app.get("/stats")
+    async def stats():
+        return connection_registry.stats()
+
+    return app
+
+
+def serve(port: int):
+    import uvicorn
+
+    uvicorn.run(create_app(), host="127.0.0.1", port=port, log_level="warning", ws_ping_interval=None)
+
+
+async def _wait_ready(ports: list[int], timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        for port in ports:
+            while True:
+                try:
+                    (await client.get(f"http://127.0.0.1:{port}/stats")).raise_for_status()
+                    break
+                except httpx.HTTPError:
+                    if time.monotonic() > deadline:
+                        raise SystemExit(f"Server on port {port} did not start")
+                    await asyncio.sleep(0.2)
+
+
+async def drive(sockets: int, processes: int, port: int, pushes: int, connect_concurrency: int):
+    ports = [port + i for i in range(processes)]
+    servers = [
+        subprocess.Popen([sys.executable, "-m", "scripts.load_test_websockets", "--serve", "--port", str(p)])
+        for p in ports
+    ]
+    try:
+        await _wait_ready(ports)
+        conversations = [str(uuid.uuid4()) for _ in range(sockets)]
+        latencies: list[float] = []
+        received = 0
+        clients = []
+        semaphore = asyncio.Semaphore(connect_concurrency)
+
+        async def client(i: int, ready: asyncio.Event):
+            nonlocal received
+            url = f"ws://127.0.0.1:{ports[i % processes]}/ws/load?conversation_id={conversations[i]}"
+            async with semaphore:
+                ws = await websockets.connect(url, ping_interval=None, max_queue=None)
+            clients.append(ws)
+            ready.set()
+            async for raw in ws:
+                event = json.loads(raw)
+                if event.get("type") == "ping":
+                    await ws.send(json.dumps({"type": "pong"}))
+                elif event.get("type") == "load_test":
+                    received += 1
+                    latencies.append(time.time() - event["sent_at"])
+
+        print(f"Connecting {sockets} sockets across {processes} processes (ports {ports[0]}-{ports[-1]})")
+        started = time.perf_counter()
+        readies = [asyncio.Event() for _ in range(sockets)]
+        tasks = [asyncio.create_task(client(i, readies[i])) for i in range(sockets)]
+        await asyncio.wait_for(asyncio.gather(*(r.wait() for r in readies)), timeout=120)
+        print(f"Connected in {time.perf_counter() - started:.1f}s")
+        await asyncio.sleep(1)  # Let subscriptions settle
+
+        async with httpx.AsyncClient() as http:
+            for p in ports:
+                print(f"  node :{p} {(await http.get(f'http://127.0.0.1:{p}/stats')).json()}")
+
+        started = time.perf_counter()
+        reached = 0
+        for _ in range(pushes):
+            conversation_id = random.choice(conversations)
+            reached += await push_to_conversation(conversation_id, {"type": "load_test", "sent_at": time.time()})
+        publish_sec = time.perf_counter() - started
+        await asyncio.sleep(2)  # Drain in-flight deliveries
+
+        print(f"\nPublished {pushes} pushes in {publish_sec:.2f}s ({pushes / publish_sec:.0f}/s); "
+              f"Redis routed {reached} to a subscribed node")
+        print(f"Delivered {received}/{pushes} to sockets")
+        if len(latencies) >= 2:
+            cuts = statistics.quantiles(latencies, n=100)
+            print(f"Latency p50 {cuts[49] * 1000:.1f}ms  p95 {cuts[94] * 1000:.1f}ms  p99 {cuts[98] * 1000:.1f}ms")
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*(ws.close() for ws in clients), return_exceptions=True)
+    finally:
+        for server in servers:
+            server.terminate()
+        for server in servers:
+            server.wait(timeout=10)
+        await redis_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test guest WebSocket fan-out across processes")
+    parser.add_argument("--serve", action="store_true", help="Run one server node (started by the driver)")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--sockets", type=int, default=2000)
+    parser.add_argument("--pushes", type=int, default=1000)
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.port)
+    else:
+        asyncio.run(drive(args.sockets, args.processes, args.port, args.pushes, args.connect_concurrency))
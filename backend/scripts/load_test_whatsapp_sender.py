@@ -0,0 +1,66 @@
+"""
+Load test the outbound WhatsApp sender.
+Usage:
+    python -m scripts.mock_graph_api &
+    WHATSAPP_API_BASE_URL=http://localhost:8090 WHATSAPP_API_TOKEN=test \\
+        python -m scripts.load_test_whatsapp_sender --messages 5000 --numbers 3 --concurrency 200
+
+Sends --messages replies spread over --numbers business phone numbers through
+one WhatsAppSender (shared client, per-number token buckets, retries) and
+prints throughput, latency percentiles and failures. Point it at the mock
+server; never at the real Graph API.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.config import get_settings
+from app.services.whatsapp_sender import WhatsAppSendError, WhatsAppSender
+
+settings = get_settings()
+
+
+async def main(messages: int, numbers: int, concurrency: int):
+    if "graph.facebook.com" in settings.whatsapp_api_base_url:
+        raise SystemExit("Refusing to load test the real Graph API; set WHATSAPP_API_BASE_URL to the mock server")
+
+    sender = WhatsAppSender(settings.whatsapp_api_token or "load-test")
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    failures: list[str] = []
+
+    async def send_one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await sender.send_text(f"6012{i:07d}", f"Load test reply {i}", f"PHONE_{i % numbers}")
+                latencies.append(time.perf_counter() - started)
+            except WhatsAppSendError as e:
+                failures.append(str(e))
+
+    print(f"Sending {messages} messages over {numbers} numbers to {settings.whatsapp_api_base_url} "
+          f"(rate {settings.whatsapp_rate_per_sec}/s per number, concurrency {concurrency})")
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(send_one(i) for i in range(messages)))
+    finally:
+        await sender.close()
+    elapsed = time.perf_counter() - started
+
+    print(f"\nSent {len(latencies)}/{messages} in {elapsed:.1f}s ({len(latencies) / elapsed:.0f} msg/s)")
+    if latencies:
+        cuts = statistics.quantiles(latencies, n=100)
+        print(f"Latency p50 {cuts[49] * 1000:.0f}ms  p95 {cuts[94] * 1000:.0f}ms  p99 {cuts[98] * 1000:.0f}ms")
+    if failures:
+        print(f"Failures: {len(failures)} (first: {failures[0]})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the WhatsApp sender against the mock Graph API")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--numbers", type=int, default=1, help="Business phone numbers to spread sends over")
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.numbers, args.concurrency))
@@ -0,0 +1,82 @@
+"""
+Local mock of the WhatsApp Cloud API messages endpoint, for load testing.
+Usage:
+    python -m scripts.mock_graph_api
+    python -m scripts.mock_graph_api --port 8090 --latency-ms 80 --error-rate 0.02 --rate-per-sec 80
+
+Then run the sender against it:
+    WHATSAPP_API_BASE_URL=http://localhost:8090 WHATSAPP_API_TOKEN=test \\
+        python -m scripts.load_test_whatsapp_sender --messages 5000
+
+POST /{version}/{phone_number_id}/messages answers like the Graph API after
+--latency-ms (with +/-50% jitter). A random --error-rate of requests get a
+503, and a number that exceeds --rate-per-sec gets a 429 with error code
+130429, just as Meta throttles. GET /stats returns per-number counters.
+Plain HTTP/1.1 via uvicorn; the sender falls back from HTTP/2 automatically.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from collections import Counter, defaultdict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency_ms: float = 50.0, error_rate: float = 0.0, rate_per_sec: float = 80.0) -> FastAPI:
+    app = FastAPI(title="Mock Graph API")
+    counters: dict[str, Counter] = defaultdict(Counter)
+    windows: dict[str, list[float]] = defaultdict(list)  # Send times in the last second, per number
+
+    @app.post("/{version}/{phone_number_id}/messages")
+    async def send_message(version: str, phone_number_id: str, request: Request):
+        payload = await request.json()
+        stats = counters[phone_number_id]
+        stats["requests"] += 1
+
+        now = time.monotonic()
+        window = windows[phone_number_id]
+        while window and window[0] <= now - 1:
+            window.pop(0)
+        if len(window) >= rate_per_sec:
+            stats["throttled"] += 1
+            return JSONResponse(status_code=429, content={"error": {
+                "message": "(#130429) Rate limit hit", "type": "OAuthException", "code": 130429,
+            }})
+        window.append(now)
+
+        await asyncio.sleep(latency_ms / 1000 * random.uniform(0.5, 1.5))
+        if random.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse(status_code=503, content={"error": {"message": "Service unavailable", "code": 2}})
+
+        stats["sent"] += 1
+        return {
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": payload.get("to"), "wa_id": payload.get("to")}],
+            "messages": [{"id": f"wamid.mock{uuid.uuid4().hex}"}],
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return {number: dict(stats) for number, stats in counters.items()}
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock WhatsApp Cloud API for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Mean response latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--rate-per-sec", type=float, default=80.0, help="Per-number limit before 429 / 130429")
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.latency_ms, args.error_rate, args.rate_per_sec),
+        host=args.host, port=args.port, log_level="warning",
+    )
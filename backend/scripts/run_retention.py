@@ -0,0 +1,42 @@
+"""
+Run the data-retention cleanup by hand (the scheduler runs it weekly).
+Usage:
+    python -m scripts.run_retention --dry-run
+    python -m scripts.run_retention --days 730 --batch-size 2000 --sleep 1.0
+
+Deletes messages, then leads, then conversations older than the retention
+window: whole expired message partitions are dropped, the rest is deleted
+in small committed batches. --dry-run only counts the eligible rows
+and estimates how long the real run would take.
+"""
+
+import argparse
+import asyncio
+
+from app.services.retention import run_retention
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete guest data older than the retention window")
+    parser.add_argument("--dry-run", action="store_true", help="Count eligible rows and estimate duration; delete nothing")
+    parser.add_argument("--days", type=int, default=None, help="Retention window in days (default: settings.retention_days)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Rows per delete transaction")
+    parser.add_argument("--sleep", type=float, default=None, help="Seconds to pause between batches")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_retention(
+        dry_run=args.dry_run,
+        retention_days=args.days,
+        batch_size=args.batch_size,
+        sleep_sec=args.sleep,
+    ))
+    verb = "eligible" if report.dry_run else "deleted"
+    print(f"Cutoff: {report.cutoff.isoformat()}")
+    for name in report.dropped_partitions:
+        print(f"partition {name} {'would be dropped' if report.dry_run else 'dropped'}")
+    for table, count in report.counts.items():
+        print(f"{table:<16} {count:>10} rows {verb}  {report.batches[table]:>6} batches")
+    if report.dry_run:
+        print(f"Estimated duration: {report.estimated_sec}s")
+    else:
+        print(f"Elapsed: {report.elapsed_sec}s")
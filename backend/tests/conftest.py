@@ -1,13 +1,26 @@
-import pytest
+import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
 from app.main import app
 from app.database import engine
 from app.models import Base
+from app.services.partitions import ensure_partitions
 
 # Remove manual event_loop fixture to let pytest-asyncio handle it
 
-@pytest.fixture(scope="function")
-async def client():
+@pytest_asyncio.fixture(scope="function")
+async def setup_db():
+    """
+    Ensure database tables exist before running tests.
+    Requested by the fixtures that talk to Postgres; unit tests don't need it.
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await ensure_partitions(conn)
+    yield
+
+
+@pytest_asyncio.fixture(scope="function")
+async def client(setup_db):
     """
     Async HTTP client for testing the FastAPI app.
     Function scope matches the default pytest-asyncio loop scope.
@@ -17,13 +30,3 @@ async def client():
         base_url="http://test",
     ) as ac:
         yield ac
-
-
-@pytest.fixture(scope="function", autouse=True)
-async def setup_db():
-    """
-    Ensure database tables exist before running tests.
-    """
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    yield
@@ -0,0 +1,120 @@
+import json
+import uuid
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from starlette.requests import Request
+
+from app.services.analytics_cache import AnalyticsCache, cached_rollup_response, analytics_cache
+
+PROPERTY_ID = uuid.uuid4()
+VERSION = "1760830000000000001"
+
+
+def _request(headers: dict | None = None) -> Request:
+    raw_headers = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw_headers})
+
+
+@pytest.mark.asyncio
+async def test_rollup_response_is_built_once_then_served_from_cache():
+    store = {}
+    build = AsyncMock(return_value={"totals": {"total_inquiries": 3}})
+
+    async def fake_set(key, value, ttl):
+        store[key] = value
+
+    with patch.object(analytics_cache, "version", new=AsyncMock(return_value=VERSION)), \
+         patch.object(analytics_cache, "get", new=AsyncMock(side_effect=lambda k: store.get(k))), \
+         patch.object(analytics_cache, "set", new=AsyncMock(side_effect=fake_set)):
+        first = await cached_rollup_response(_request(), PROPERTY_ID, "range", "a:b", 60, build)
+        second = await cached_rollup_response(_request(), PROPERTY_ID, "range", "a:b", 60, build)
+
+    assert first.status_code == 200
+    assert json.loads(first.body) == {"totals": {"total_inquiries": 3}}
+    assert second.body == first.body
+    assert first.headers["etag"] == second.headers["etag"]
+    build.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_rollup_response_returns_304_for_matching_etag():
+    build = AsyncMock(return_value={"totals": {}})
+
+    with patch.object(analytics_cache, "version", new=AsyncMock(return_value=VERSION)), \
+         patch.object(analytics_cache, "get", new=AsyncMock(return_value=None)), \
+         patch.object(analytics_cache, "set", new=AsyncMock()):
+        first = await cached_rollup_response(_request(), PROPERTY_ID, "range", "a:b", 60, build)
+        etag = first.headers["etag"]
+        conditional = await cached_rollup_response(
+            _request({"If-None-Match": etag}), PROPERTY_ID, "range", "a:b", 60, build
+        )
+
+    assert conditional.status_code == 304
+    assert build.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_new_rollup_changes_etag():
+    build = AsyncMock(return_value={"totals": {}})
+
+    with patch.object(analytics_cache, "get", new=AsyncMock(return_value=None)), \
+         patch.object(analytics_cache, "set", new=AsyncMock()):
+        with patch.object(analytics_cache, "version", new=AsyncMock(return_value=VERSION)):
+            before = await cached_rollup_response(_request(), PROPERTY_ID, "range", "a:b", 60, build)
+        with patch.object(analytics_cache, "version", new=AsyncMock(return_value="1760830000000000002")):
+            after = await cached_rollup_response(
+                _request({"If-None-Match": before.headers["etag"]}), PROPERTY_ID, "range", "a:b", 60, build
+            )
+
+    assert after.status_code == 200
+    assert after.headers["etag"] != before.headers["etag"]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.keys = {}
+
+    async def get(self, key):
+        return self.keys.get(key)
+
+    async def set_nx(self, key, value, expire=None):
+        return self.keys.setdefault(key, value) == value
+
+    async def incr(self, key):
+        self.keys[key] = str(int(self.keys[key]) + 1)
+        return int(self.keys[key])
+
+
+@pytest.mark.asyncio
+async def test_version_moves_only_on_invalidate_and_never_repeats():
+    cache = AnalyticsCache()
+    cache.redis = FakeRedis()
+
+    first = await cache.version(PROPERTY_ID)
+    assert await cache.version(PROPERTY_ID) == first
+
+    await cache.invalidate(PROPERTY_ID)
+    second = await cache.version(PROPERTY_ID)
+    assert int(second) == int(first) + 1
+
+    # A lost counter restarts from the clock, past every version handed out
+    cache.redis.keys.clear()
+    await cache.invalidate(PROPERTY_ID)
+    assert int(await cache.version(PROPERTY_ID)) > int(second)
+
+
+@pytest.mark.asyncio
+async def test_rollup_response_without_redis_is_uncached():
+    build = AsyncMock(return_value={"totals": {}})
+    set_ = AsyncMock()
+
+    with patch.object(analytics_cache, "version", new=AsyncMock(return_value=None)), \
+         patch.object(analytics_cache, "set", new=set_):
+        response = await cached_rollup_response(
+            _request({"If-None-Match": "*"}), PROPERTY_ID, "range", "a:b", 60, build
+        )
+
+    assert response.status_code == 200
+    assert "etag" not in response.headers and response.headers["cache-control"] == "no-cache"
+    set_.assert_not_awaited()
@@ -41,6 +41,7 @@ async def test_analytics_revenue_calculation(client):
         
         lead1 = Lead(
             property_id=pid, conversation_id=conv1.id, 
+            is_after_hours=True, source_channel="web",
             status="new", estimated_value=Decimal("500.00"),
             captured_at=datetime.now(timezone.utc)
         )
@@ -53,6 +54,7 @@ async def test_analytics_revenue_calculation(client):
         
         lead2 = Lead(
             property_id=pid, conversation_id=conv2.id, 
+            is_after_hours=True, source_channel="web",
             status="new", estimated_value=None, # Should use ADR
             captured_at=datetime.now(timezone.utc)
         )
@@ -65,6 +67,7 @@ async def test_analytics_revenue_calculation(client):
         
         lead3 = Lead(
             property_id=pid, conversation_id=conv3.id, 
+            is_after_hours=False, source_channel="web",
             status="new", estimated_value=Decimal("1000.00"),
             captured_at=datetime.now(timezone.utc)
         )
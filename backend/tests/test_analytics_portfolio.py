@@ -0,0 +1,78 @@
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.auth import accessible_property_ids
+from app.core.histogram import LatencyHistogram, bucket_index
+from app.services.analytics import get_portfolio_stats
+
+HOTEL_A = uuid.uuid4()
+HOTEL_B = uuid.uuid4()
+
+
+class FakeSession:
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = 0
+
+    async def execute(self, stmt):
+        self.calls += 1
+        result = MagicMock()
+        result.fetchall.return_value = self.results.pop(0)
+        return result
+
+
+def _property(pid, name, conversion_rate="0.20", timezone="Asia/Kuala_Lumpur"):
+    return SimpleNamespace(
+        id=pid, name=name, adr=Decimal("230"), conversion_rate=Decimal(conversion_rate), timezone=timezone
+    )
+
+
+@pytest.mark.asyncio
+async def test_portfolio_uses_fixed_number_of_grouped_queries():
+    db = FakeSession([
+        [_property(HOTEL_A, "Alpha"), _property(HOTEL_B, "Bravo", "0.50")],
+        [(HOTEL_A, 10, 6, 5, 3, 1), (HOTEL_B, 4, 4, 4, 2, 0)],
+        [(HOTEL_A, 2, Decimal("460")), (HOTEL_B, 1, Decimal("200"))],
+        [
+            (HOTEL_A, bucket_index(1000), 3, 3000, 1000),
+            (HOTEL_B, bucket_index(9000), 1, 9000, 9000),
+        ],
+    ])
+
+    stats = await get_portfolio_stats(db, [HOTEL_A, HOTEL_B])
+
+    assert db.calls == 4
+    by_name = {p["property_name"]: p for p in stats["properties"]}
+    assert by_name["Alpha"]["estimated_revenue_recovered"] == 92.0
+    assert by_name["Bravo"]["estimated_revenue_recovered"] == 100.0
+    assert by_name["Alpha"]["avg_response_time_sec"] == 1.0
+
+    combined = stats["combined"]
+    assert combined["property_count"] == 2
+    assert combined["total_inquiries"] == 14
+    assert combined["after_hours_responded"] == 9
+    assert combined["leads_captured"] == 3
+    assert combined["estimated_revenue_recovered"] == 192.0
+    assert combined["avg_response_time_sec"] == 3.0  # 12s over 4 replies, not (1 + 9) / 2
+
+
+@pytest.mark.asyncio
+async def test_empty_portfolio_skips_metric_queries():
+    db = FakeSession([[]])
+
+    stats = await get_portfolio_stats(db, [])
+
+    assert db.calls == 1
+    assert stats["properties"] == []
+    assert stats["combined"]["total_inquiries"] == 0
+    assert stats["combined"]["p95_response_time_sec"] == 0.0
+
+
+def test_accessible_property_ids():
+    assert accessible_property_ids({"is_admin": True, "property_ids": ["*"]}) is None
+    assert accessible_property_ids({"property_ids": [str(HOTEL_A), "not-a-uuid"]}) == [HOTEL_A]
+    assert accessible_property_ids({"property_ids": ["*"]}) == []
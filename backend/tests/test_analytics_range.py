@@ -0,0 +1,136 @@
+import uuid
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core.histogram import LatencyHistogram
+from app.services.analytics import get_analytics_range, local_day_window, local_today
+
+PROPERTY_ID = uuid.uuid4()
+
+
+def _sums(**overrides):
+    row = dict(
+        total_inquiries=0, after_hours_inquiries=0, after_hours_responded=0,
+        leads_captured=0, handoffs=0, estimated_revenue_recovered=0,
+        response_count=0, response_sum_ms=0, response_max_ms=0,
+    )
+    row.update(overrides)
+    return SimpleNamespace(**row)
+
+
+class FakeSession:
+    """Answers the range queries in order and keeps the compiled SQL."""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+        result = MagicMock()
+        payload = self.results.pop(0)
+        result.one.return_value = payload
+        result.fetchall.return_value = payload
+        return result
+
+
+@pytest.mark.asyncio
+async def test_range_is_aggregated_in_sql_by_period():
+    hist = LatencyHistogram()
+    for v in (900, 1000, 1100, 20000):
+        hist.record(v)
+    weeks = [date(2026, 9, 28), date(2026, 10, 5)]
+
+    db = FakeSession([
+        _sums(total_inquiries=40, leads_captured=6, estimated_revenue_recovered=1200,
+              response_count=hist.count, response_sum_ms=hist.sum_ms, response_max_ms=hist.max_ms),
+        list(hist.buckets.items()),
+        [],  # No pre-sketch (legacy) rows
+        [
+            _sums(period=weeks[0], total_inquiries=25, response_count=3, response_sum_ms=3000),
+            _sums(period=weeks[1], total_inquiries=15, response_count=1, response_sum_ms=20000),
+        ],
+        [(weeks[0], "whatsapp", 20), (weeks[0], "web", 5), (weeks[1], "email", 15)],
+    ])
+
+    result = await get_analytics_range(db, PROPERTY_ID, date(2026, 9, 28), date(2026, 10, 11), "week")
+
+    totals_sql, buckets_sql, _, series_sql, channels_sql = db.statements
+    assert "GROUP BY" not in totals_sql
+    assert "json_each_text" in buckets_sql and "GROUP BY" in buckets_sql
+    assert "GROUP BY CAST(date_trunc" in series_sql
+    assert "json_each_text" in channels_sql
+
+    assert result["granularity"] == "week"
+    assert "daily" not in result
+    assert result["totals"]["total_inquiries"] == 40
+    assert result["totals"]["avg_response_time_sec"] == round(hist.mean_ms / 1000, 2)
+    assert result["totals"]["p50_response_time_sec"] == hist.percentiles_sec()["p50"]
+    assert [p["date"] for p in result["series"]] == ["2026-09-28", "2026-10-05"]
+    assert result["series"][0]["avg_response_time_sec"] == 1.0
+    assert result["series"][0]["channel_breakdown"] == {"whatsapp": 20, "web": 5}
+    assert result["series"][1]["channel_breakdown"] == {"email": 15}
+
+
+@pytest.mark.asyncio
+async def test_day_granularity_keeps_daily_key():
+    db = FakeSession([_sums(), [], [], [], []])
+
+    result = await get_analytics_range(db, PROPERTY_ID, date(2026, 10, 1), date(2026, 10, 7))
+
+    assert result["daily"] == result["series"] == []
+    assert result["totals"]["avg_response_time_sec"] == 0.0
+
+
+@pytest.mark.asyncio
+async def test_days_without_a_sketch_fall_back_to_their_average():
+    # One day with a sketch (2 replies around 1s), one legacy day: 10 inquiries at 4.0s average
+    hist = LatencyHistogram()
+    hist.record(1000, count=2)
+    legacy = LatencyHistogram()
+    legacy.record(4000, count=10)
+    db = FakeSession([
+        _sums(total_inquiries=12, response_count=12, response_sum_ms=42000, response_max_ms=4000),
+        list(hist.buckets.items()),
+        list(legacy.buckets.items()),
+        [],
+        [],
+    ])
+
+    result = await get_analytics_range(db, PROPERTY_ID, date(2026, 10, 1), date(2026, 10, 7))
+
+    totals_sql, _, legacy_sql, _, _ = db.statements
+    # Sketch-less rows count as total_inquiries replies at avg_response_time_sec
+    assert "analytics_daily.avg_response_time_sec > " in totals_sql
+    assert "width_bucket(CAST(analytics_daily.avg_response_time_sec" in legacy_sql
+    assert result["totals"]["avg_response_time_sec"] == 3.5
+    assert result["totals"]["p50_response_time_sec"] == 4.0
+    assert result["totals"]["p50_response_time_sec"] != 0
+
+
+@pytest.mark.asyncio
+async def test_rejects_unknown_granularity():
+    with pytest.raises(ValueError):
+        await get_analytics_range(FakeSession([]), PROPERTY_ID, date(2026, 10, 1), date(2026, 10, 7), "year")
+
+
+def test_local_day_window_is_property_midnight_in_utc():
+    assert local_day_window(date(2026, 10, 18), "Asia/Kuala_Lumpur") == (
+        datetime(2026, 10, 17, 16, tzinfo=timezone.utc),
+        datetime(2026, 10, 18, 16, tzinfo=timezone.utc),
+    )
+    # DST change day in New York is 23 hours long
+    start, end = local_day_window(date(2026, 3, 8), "America/New_York")
+    assert (end - start).total_seconds() == 23 * 3600
+    # Unknown names fall back to settings.timezone rather than failing the rollup
+    assert local_day_window(date(2026, 10, 18), "Mars/Olympus") == local_day_window(date(2026, 10, 18), None)
+
+
+def test_local_today_follows_property_timezone():
+    now = datetime(2026, 10, 18, 20, 0, tzinfo=timezone.utc)
+    assert local_today("Asia/Kuala_Lumpur", now) == date(2026, 10, 19)
+    assert local_today("America/Los_Angeles", now) == date(2026, 10, 18)
@@ -0,0 +1,85 @@
+import json
+import uuid
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from scripts import backfill_analytics
+from scripts.backfill_analytics import Checkpoint, Chunk, plan_chunks
+
+PROPERTY_A = uuid.UUID("00000000-0000-0000-0000-00000000000a")
+PROPERTY_B = uuid.UUID("00000000-0000-0000-0000-00000000000b")
+
+
+def _spans(chunks):
+    return [(c.property_id, c.start.day, c.end.day) for c in chunks]
+
+
+def test_plan_chunks_splits_each_property_into_bounded_runs():
+    chunks = plan_chunks([PROPERTY_A, PROPERTY_B], date(2026, 1, 1), date(2026, 1, 10), chunk_days=4)
+    assert _spans(chunks) == [
+        (PROPERTY_A, 1, 4), (PROPERTY_A, 5, 8), (PROPERTY_A, 9, 10),
+        (PROPERTY_B, 1, 4), (PROPERTY_B, 5, 8), (PROPERTY_B, 9, 10),
+    ]
+    assert sum(c.days for c in chunks) == 20
+    assert plan_chunks([PROPERTY_A], date(2026, 1, 2), date(2026, 1, 1), chunk_days=7) == []
+
+
+def test_plan_chunks_leaves_out_finished_days():
+    done = {date(2026, 1, d) for d in (1, 2, 5, 10)}
+    chunks = plan_chunks(
+        [PROPERTY_A], date(2026, 1, 1), date(2026, 1, 10), chunk_days=3,
+        is_done=lambda pid, day: day in done,
+    )
+    assert _spans(chunks) == [(PROPERTY_A, 3, 4), (PROPERTY_A, 6, 8), (PROPERTY_A, 9, 9)]
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_round_trips_days_as_ranges(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = Checkpoint(path)
+    await checkpoint.mark_done(Chunk(PROPERTY_A, date(2026, 1, 1), date(2026, 1, 7)))
+    await checkpoint.mark_done(Chunk(PROPERTY_A, date(2026, 1, 8), date(2026, 1, 10)))
+    await checkpoint.mark_done(Chunk(PROPERTY_B, date(2026, 1, 5), date(2026, 1, 5)))
+
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == {"completed": {
+            str(PROPERTY_A): [["2026-01-01", "2026-01-10"]],
+            str(PROPERTY_B): [["2026-01-05", "2026-01-05"]],
+        }}
+
+    resumed = Checkpoint(path)
+    assert resumed.is_done(PROPERTY_A, date(2026, 1, 9))
+    assert not resumed.is_done(PROPERTY_A, date(2026, 1, 11))
+    assert not resumed.is_done(PROPERTY_B, date(2026, 1, 4))
+    assert not Checkpoint(path, restart=True).is_done(PROPERTY_A, date(2026, 1, 1))
+
+
+def test_checkpoint_reads_chunk_keys_from_older_runs(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    path.write_text(json.dumps({"completed": [f"{PROPERTY_A}:2026-01-01:2026-01-07"]}))
+    checkpoint = Checkpoint(str(path))
+    assert checkpoint.is_done(PROPERTY_A, date(2026, 1, 7))
+    assert not checkpoint.is_done(PROPERTY_A, date(2026, 1, 8))
+
+
+@pytest.mark.asyncio
+async def test_resume_with_other_chunk_size_skips_only_finished_days(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    await Checkpoint(path).mark_done(Chunk(PROPERTY_A, date(2026, 1, 1), date(2026, 1, 7)))
+    # Finished days outside the requested range are not "skipped"
+    await Checkpoint(path).mark_done(Chunk(PROPERTY_B, date(2025, 12, 1), date(2025, 12, 31)))
+
+    run_chunk = AsyncMock()
+    with patch.object(backfill_analytics, "_resolve_property_ids", AsyncMock(return_value=[PROPERTY_A, PROPERTY_B])), \
+         patch.object(backfill_analytics, "_run_chunk", run_chunk):
+        stats = await backfill_analytics.backfill_analytics(
+            date(2026, 1, 1), date(2026, 1, 14), workers=2, chunk_days=14, checkpoint_path=path,
+        )
+
+    ran = sorted(_spans(c.args[0] for c in run_chunk.await_args_list))
+    assert ran == [(PROPERTY_A, 8, 14), (PROPERTY_B, 1, 14)]
+    assert stats["days_skipped"] == 7
+    assert stats["days_done"] == 21
+    assert Checkpoint(path).is_done(PROPERTY_B, date(2026, 1, 14))
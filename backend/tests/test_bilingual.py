@@ -8,10 +8,6 @@ import uuid
 MOCK_PROPERTY_ID = uuid.uuid4()
 MOCK_CONVERSATION_ID = uuid.uuid4()
 
-@pytest.fixture
-async def setup_db():
-    pass
-
 @pytest.fixture
 def mock_db_session():
     """Mock database session."""
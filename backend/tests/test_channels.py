@@ -58,8 +58,8 @@ async def test_whatsapp_verification(client: AsyncClient):
 async def test_whatsapp_incoming_message(client: AsyncClient):
     """Test WhatsApp webhook receiving a message (POST)."""
     
-    # Mock the outbound send function to avoid API calls
-    with patch("app.routes.send_whatsapp_message", new_callable=AsyncMock) as mock_send:
+    # The webhook only queues the message; app.worker does the processing
+    with patch("app.routes.inbound_queue.enqueue_many", new_callable=AsyncMock) as mock_enqueue:
         # We also need to ensure a property exists or fallback works.
         # The seed script creates Vivatel. If running against fresh test DB, make sure property exists.
         # Assuming dev DB (seeded) or test DB. 
@@ -92,18 +92,10 @@ async def test_whatsapp_incoming_message(client: AsyncClient):
         )
         assert response.status_code == 200
         assert response.json() == {"status": "processing"}
-        
-        # Wait a bit for background task? 
-        # BackgroundTasks in FastAPI run *after* response. 
-        # In tests with AsyncClient, they might not run automatically unless we await them or test app controls it.
-        # Actually, TestClient/AsyncClient usually executes background tasks if using Starlette's TestClient.
-        # httpx AsyncClient hitting via ASGI: yes, it runs.
-        # But we need to wait/sleep to verify the side effect (mock call).
-        # Or mock `BackgroundTasks.add_task`? No, we want integration test.
-        # Let's verify side effect or sleep.
-        
-        # Note: Testing background tasks with AsyncClient can be tricky if we don't wait.
-        # But for this simple test, we just check 200 OK acceptance.
+
+        ((job,),) = mock_enqueue.await_args.args
+        assert (job.kind, job.property_id, job.guest_identifier) == ("whatsapp", property_id, "60123456789")
+        assert job.content == "Test message via WhatsApp"
 
 
 @pytest.mark.asyncio
@@ -155,7 +147,7 @@ async def test_web_chat_flow(client: AsyncClient):
 async def test_email_webhook(client: AsyncClient):
     """Test SendGrid Inbound Parse webhook (POST /webhook/email)."""
     
-    with patch("app.routes.send_email", new_callable=AsyncMock) as mock_send:
+    with patch("app.routes.inbound_queue.enqueue", new_callable=AsyncMock) as mock_enqueue:
         # Construct multipart form data
         # httpx handles data=dict as form-urlencoded, files=... for multipart.
         # But SendGrid sends fields as multipart form fields.
@@ -0,0 +1,222 @@
+import asyncio
+import json
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services import scheduler
+
+REPORT_DATE = date(2026, 10, 18)
+
+
+def _property(name, tz="Asia/Kuala_Lumpur"):
+    return SimpleNamespace(id=uuid.uuid4(), name=name, notification_email=f"{name}@hotel.test", timezone=tz)
+
+
+def _message(prop, stats):
+    return scheduler.EmailMessage(to=[prop.notification_email], subject="Daily", text="report")
+
+
+def _session_returning(properties):
+    session = MagicMock()
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = properties
+    session.execute = AsyncMock(return_value=result)
+    factory = MagicMock()
+    factory.return_value.__aenter__ = AsyncMock(return_value=session)
+    factory.return_value.__aexit__ = AsyncMock(return_value=False)
+    return factory
+
+
+@pytest.mark.asyncio
+async def test_reports_fan_out_with_bounded_concurrency_and_isolation():
+    properties = [_property(f"hotel{i}") for i in range(10)]
+    in_flight = {"now": 0, "peak": 0}
+
+    async def fake_compute(prop, report_date):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        if prop.name == "hotel3":
+            raise RuntimeError("rollup failed")
+        return SimpleNamespace(property_id=prop.id)
+
+    send = AsyncMock(side_effect=lambda messages: [{"status": "sent"} for _ in messages])
+    with patch.object(scheduler, "async_session", _session_returning(properties)), \
+         patch.object(scheduler, "_compute_report_stats", side_effect=fake_compute), \
+         patch.object(scheduler, "_report_message", side_effect=_message), \
+         patch.object(scheduler, "send_bulk_email", send), \
+         patch.object(scheduler.settings, "report_compute_concurrency", 3):
+        outcomes = await scheduler.run_daily_reports(REPORT_DATE)
+
+    assert in_flight["peak"] == 3
+    # All rendered reports go out in one bulk send
+    (call,) = send.await_args_list
+    assert len(call.args[0]) == 9
+    failed = [o for o in outcomes if o.status == "failed"]
+    assert [(o.property_name, o.stage) for o in failed] == [("hotel3", "compute")]
+    sent = next(o for o in outcomes if o.status == "sent")
+    assert set(sent.timings_ms) == {"compute", "render"}
+
+
+@pytest.mark.asyncio
+async def test_send_failure_does_not_stop_other_reports():
+    properties = [_property("alpha"), _property("bravo")]
+
+    async def flaky_send(messages):
+        return [
+            {"status": "error", "detail": "503"} if m.to[0].startswith("alpha") else {"status": "sent"}
+            for m in messages
+        ]
+
+    with patch.object(scheduler, "async_session", _session_returning(properties)), \
+         patch.object(scheduler, "_compute_report_stats", AsyncMock(return_value=SimpleNamespace())), \
+         patch.object(scheduler, "_report_message", side_effect=_message), \
+         patch.object(scheduler, "send_bulk_email", side_effect=flaky_send):
+        outcomes = await scheduler.run_daily_reports(REPORT_DATE)
+
+    assert {o.property_name: (o.status, o.stage) for o in outcomes} == {
+        "alpha": ("failed", "send"),
+        "bravo": ("sent", None),
+    }
+
+
+@pytest.mark.asyncio
+async def test_failed_bulk_send_marks_reports_failed():
+    with patch.object(scheduler, "async_session", _session_returning([_property("alpha")])), \
+         patch.object(scheduler, "_compute_report_stats", AsyncMock(return_value=SimpleNamespace())), \
+         patch.object(scheduler, "_report_message", side_effect=_message), \
+         patch.object(scheduler, "send_bulk_email", AsyncMock(side_effect=ConnectionError("pool closed"))):
+        (outcome,) = await scheduler.run_daily_reports(REPORT_DATE)
+
+    assert (outcome.status, outcome.stage) == ("failed", "send")
+
+
+def test_each_timezone_is_due_in_exactly_one_slot_per_day():
+    zones = ["Asia/Kuala_Lumpur", "Europe/London", "America/Los_Angeles", "Asia/Kathmandu", None]
+    day_start = datetime(2026, 10, 18, tzinfo=timezone.utc)
+    slots = [day_start + timedelta(minutes=15 * i) for i in range(96)]
+
+    due_at = {}
+    for slot in slots:
+        for name in scheduler.due_timezones(zones, slot):
+            due_at.setdefault(name, []).append(slot)
+
+    assert {name: len(fires) for name, fires in due_at.items()} == {name: 1 for name in zones}
+    # 07:30 local: KL is UTC+8, London is on BST (UTC+1), Kathmandu is UTC+5:45
+    assert due_at["Asia/Kuala_Lumpur"] == [datetime(2026, 10, 18, 23, 30, tzinfo=timezone.utc)]
+    assert due_at["Europe/London"] == [datetime(2026, 10, 18, 6, 30, tzinfo=timezone.utc)]
+    assert due_at["Asia/Kathmandu"] == [datetime(2026, 10, 18, 1, 45, tzinfo=timezone.utc)]
+    # No/unknown timezone falls back to settings.timezone
+    assert due_at[None] == due_at["Asia/Kuala_Lumpur"]
+
+
+@pytest.mark.asyncio
+async def test_reports_default_to_each_property_local_yesterday():
+    properties = [_property("kl"), _property("la", "America/Los_Angeles")]
+    local_days = {"Asia/Kuala_Lumpur": date(2026, 10, 19), "America/Los_Angeles": date(2026, 10, 18)}
+    compute = AsyncMock(return_value=SimpleNamespace())
+
+    with patch.object(scheduler, "async_session", _session_returning(properties)), \
+         patch.object(scheduler, "local_today", side_effect=lambda tz, now: local_days[tz]), \
+         patch.object(scheduler, "_compute_report_stats", compute), \
+         patch.object(scheduler, "_report_message", side_effect=_message), \
+         patch.object(scheduler, "send_bulk_email", AsyncMock(return_value=[{"status": "sent"}] * 2)):
+        await scheduler.run_daily_reports(timezones=["Asia/Kuala_Lumpur", "America/Los_Angeles"])
+
+    report_dates = {call.args[0].name: call.args[1] for call in compute.await_args_list}
+    assert report_dates == {"kl": date(2026, 10, 18), "la": date(2026, 10, 17)}
+
+
+@pytest.mark.asyncio
+async def test_reports_sharing_a_body_are_one_sendgrid_request():
+    from app.services import email_transport
+    from app.services.report_templates import render_daily_report
+
+    stats = SimpleNamespace(
+        report_date=REPORT_DATE, after_hours_inquiries=4, after_hours_responded=4, leads_captured=1,
+        handoffs=1, estimated_revenue_recovered=100, channel_breakdown={"web": 4},
+    )
+    properties = [
+        SimpleNamespace(**vars(_property(f"hotel{i}")), website_url="https://hotel.test", ota_commission_pct=15,
+                        conversion_rate=None, report_locale="en", report_branding=None)
+        for i in range(3)
+    ]
+    bodies = []
+    transport = email_transport.SendGridTransport("test-key")
+    transport.client = email_transport.httpx.AsyncClient(
+        base_url="https://sendgrid.test",
+        transport=email_transport.httpx.MockTransport(lambda r: bodies.append(r.content) or email_transport.httpx.Response(202)),
+    )
+    email_transport.set_email_transport(transport)
+    try:
+        with patch.object(scheduler, "async_session", _session_returning(properties)), \
+             patch.object(scheduler, "_compute_report_stats", AsyncMock(return_value=stats)):
+            outcomes = await scheduler.run_daily_reports(REPORT_DATE)
+    finally:
+        email_transport.set_email_transport(None)
+
+    assert [o.status for o in outcomes] == ["sent"] * 3
+    (body,) = [json.loads(b) for b in bodies]
+    assert [p["to"][0]["email"] for p in body["personalizations"]] == [p.notification_email for p in properties]
+    first = body["personalizations"][0]["substitutions"]
+    text = body["content"][0]["value"]
+    for tag, value in first.items():
+        text = text.replace(tag, value)
+    assert text == render_daily_report(properties[0], stats).text
+
+
+@pytest.mark.asyncio
+async def test_rejected_recipient_fails_only_its_own_report():
+    from app.services import email_transport
+
+    stats = SimpleNamespace(
+        report_date=REPORT_DATE, after_hours_inquiries=4, after_hours_responded=4, leads_captured=1,
+        handoffs=1, estimated_revenue_recovered=100, channel_breakdown={"web": 4},
+    )
+    properties = [
+        SimpleNamespace(**vars(_property(name)), website_url="https://hotel.test", ota_commission_pct=15,
+                        conversion_rate=None, report_locale="en", report_branding=None)
+        for name in ("alpha", "bravo", "charlie")
+    ]
+    properties[1].notification_email = "not-an-address"
+
+    def handler(request):
+        recipients = [p["to"][0]["email"] for p in json.loads(request.content)["personalizations"]]
+        rejected = "not-an-address" in recipients
+        return email_transport.httpx.Response(400 if rejected else 202, text="Invalid email")
+
+    transport = email_transport.SendGridTransport("test-key")
+    transport.client = email_transport.httpx.AsyncClient(
+        base_url="https://sendgrid.test", transport=email_transport.httpx.MockTransport(handler),
+    )
+    email_transport.set_email_transport(transport)
+    try:
+        with patch.object(scheduler, "async_session", _session_returning(properties)), \
+             patch.object(scheduler, "_compute_report_stats", AsyncMock(return_value=stats)):
+            outcomes = await scheduler.run_daily_reports(REPORT_DATE)
+    finally:
+        email_transport.set_email_transport(None)
+
+    assert {o.property_name: (o.status, o.stage) for o in outcomes} == {
+        "alpha": ("sent", None),
+        "bravo": ("failed", "send"),
+        "charlie": ("sent", None),
+    }
+
+
+@pytest.mark.asyncio
+async def test_dispatch_interval_must_divide_the_hour():
+    with patch.object(scheduler, "scheduler", MagicMock()) as jobs:
+        with patch.object(scheduler.settings, "report_dispatch_interval_min", 45), \
+             pytest.raises(ValueError, match="divide 60"):
+            await scheduler.start_scheduler()
+        jobs.start.assert_not_called()
+
+        with patch.object(scheduler.settings, "report_dispatch_interval_min", 20):
+            await scheduler.start_scheduler()
+        jobs.start.assert_called_once()
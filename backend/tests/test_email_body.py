@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from app.core.email_body import extract_reply
+from app.services.email import normalize_email_message
+
+
+def _reply(text=None, html=None, max_chars=2000, scan_limit=512 * 1024):
+    return extract_reply(text, html, max_chars=max_chars, scan_limit=scan_limit)
+
+
+def test_gmail_reply_drops_wrapped_header_and_quoted_thread():
+    body = _reply(
+        "Do you have a sea-view room for 12-14 Dec?\n\n"
+        "On Mon, 19 Oct 2026 at 09:00, Vivatel Reservations <\n"
+        "reservations@vivatel.com.my> wrote:\n"
+        "> Thank you for your enquiry.\n"
+        "> Our deluxe rooms start at RM 280.\n"
+    )
+    assert body.text == "Do you have a sea-view room for 12-14 Dec?"
+    assert body.stopped_at == "boundary"
+    assert body.source == "text"
+
+
+def test_outlook_header_block_and_signature_are_dropped():
+    body = _reply(
+        "Hi,\n\nCan we add an extra bed?\n\n"
+        "Best regards,\nAisha Rahman\nProcurement Manager\n+60 12 345 6789\n\n"
+        "________________________________\n"
+        "From: Vivatel Reservations <reservations@vivatel.com.my>\n"
+        "Sent: Monday, October 19, 2026 9:00 AM\n"
+        "Subject: RE: Booking\n\nOld thread...\n"
+    )
+    assert body.text == "Hi,\n\nCan we add an extra bed?"
+    assert body.stopped_at == "signature"
+
+
+def test_inline_quotes_footers_and_disclaimers():
+    body = _reply(
+        "> Is breakfast included?\nYes please, for two.\n> Parking?\nOne car.\n"
+        "Sent from my iPhone\n\nCONFIDENTIALITY NOTICE: this message is for the addressee only."
+    )
+    assert body.text == "Yes please, for two.\nOne car."
+
+
+def test_text_that_only_looks_like_a_sign_off_or_header_is_kept():
+    text = (
+        "Thanks!\nOne more question: is the airport shuttle free for guests staying three nights or more?\n"
+        "From: 12 Dec\nuntil 14 Dec\nfor two adults\nand a child"
+    )
+    assert _reply(text).text == text
+
+
+def test_html_fallback_when_text_is_empty():
+    html = (
+        "<html><head><style>p{color:red}</style></head><body>"
+        "<div>Is the pool open&nbsp;late?</div><div>We arrive at 10pm.</div>"
+        "<div class=\"gmail_quote\"><div>On Mon, Vivatel wrote:</div><blockquote>Old reply</blockquote></div>"
+        "<script>track()</script></body></html>"
+    )
+    body = _reply(text="  \n", html=html)
+    assert body.text == "Is the pool open late?\nWe arrive at 10pm."
+    assert body.source == "html"
+    assert body.stopped_at == "boundary"
+    assert 0 < body.reduction < 1
+
+
+def test_large_quoted_thread_is_not_scanned_past_the_reply():
+    history = "> " + "quoted line of a very long thread\n> " * 200_000  # ~7 MB
+    started = time.perf_counter()
+    body = _reply("Still available for Friday?\n\nOn Sun, Guest wrote:\n" + history)
+    assert time.perf_counter() - started < 0.05
+    assert body.text == "Still available for Friday?"
+    assert body.reduction > 0.99
+
+    # New text alone is capped, and scanning stops at scan_limit
+    assert _reply("word " * 10_000, max_chars=500).stopped_at == "max_chars"
+    assert len(_reply("word\n" * 10_000, max_chars=500).text) <= 500
+    assert _reply("\n" * 10_000 + "late text", scan_limit=1000).stopped_at == "scan_limit"
+
+
+def test_normalize_email_uses_reduced_body():
+    payload = {
+        "from": "Aisha <aisha@example.com>",
+        "to": "reservations@hotel.com",
+        "subject": "Re: Booking",
+        "text": "",
+        "html": "<p>Can I check in early?</p><blockquote>Earlier thread</blockquote>",
+    }
+    assert normalize_email_message(payload)["content"] == "Subject: Re: Booking\n\nCan I check in early?"
+    payload["html"] = "<blockquote>Only quoted text</blockquote>"
+    assert normalize_email_message(payload) is None
@@ -0,0 +1,150 @@
+import json
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app.services import email_transport
+from app.services.email import send_bulk_email, send_email
+from app.services.email_transport import (
+    EmailMessage,
+    EmailTransportError,
+    MemoryTransport,
+    SendGridTransport,
+    set_email_transport,
+)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff_sleep():
+    with patch.object(email_transport.settings, "email_backoff_base_sec", 0):
+        yield
+
+
+def _sendgrid(handler) -> SendGridTransport:
+    transport = SendGridTransport("test-key")
+    transport.client = httpx.AsyncClient(base_url="https://sendgrid.test", transport=httpx.MockTransport(handler))
+    return transport
+
+
+@pytest.mark.asyncio
+async def test_retries_transient_errors_on_shared_client():
+    statuses = iter([503, 429, 202])
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(next(statuses))
+
+    transport = _sendgrid(handler)
+    client = transport.client
+    result = await transport.send(EmailMessage(to=["gm@hotel.test"], subject="Hi", text="plain", html="<b>hi</b>"))
+
+    assert result == {"status": "sent", "status_code": 202}
+    assert len(calls) == 3
+    assert transport.client is client
+    body = json.loads(calls[0].content)
+    assert [c["type"] for c in body["content"]] == ["text/plain", "text/html"]
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400, text="bad from address")
+
+    with pytest.raises(EmailTransportError):
+        await _sendgrid(handler).send(EmailMessage(to=["gm@hotel.test"], subject="Hi", text="x"))
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_groups_identical_content_into_personalizations():
+    bodies = []
+
+    def handler(request):
+        bodies.append(json.loads(request.content))
+        return httpx.Response(202)
+
+    alert = [EmailMessage(to=[f"staff{i}@hotel.test"], subject="Alert", text="same") for i in range(3)]
+    report = EmailMessage(to=["gm@other.test"], subject="Report", html="<p>x</p>")
+
+    results = await _sendgrid(handler).send_batch(alert + [report])
+
+    assert sorted(len(b["personalizations"]) for b in bodies) == [1, 3]
+    assert sum(r["recipients"] for r in results) == 4
+    assert all(r["status"] == "sent" for r in results)
+
+
+@pytest.mark.asyncio
+async def test_batch_returns_one_result_per_message_in_order():
+    def handler(request):
+        body = json.loads(request.content)
+        return httpx.Response(400 if body["subject"] == "Bad" else 202, text="rejected")
+
+    messages = [
+        EmailMessage(to=["a@hotel.test"], subject="Report", text="-name-", substitutions={"-name-": "A"}),
+        EmailMessage(to=["x@hotel.test", "y@hotel.test"], subject="Bad", text="x"),
+        EmailMessage(to=["b@hotel.test"], subject="Report", text="-name-", substitutions={"-name-": "B"}),
+    ]
+    results = await _sendgrid(handler).send_batch(messages)
+
+    assert [(r["status"], r["recipients"], r["batch_size"]) for r in results] == [
+        ("sent", 1, 2), ("error", 2, 1), ("sent", 1, 2),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_resent_per_message():
+    bodies = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        bodies.append(body)
+        recipients = [p["to"][0]["email"] for p in body["personalizations"]]
+        return httpx.Response(400 if "bad@" in " ".join(recipients) else 202, text="invalid email")
+
+    messages = [EmailMessage(to=[to], subject="Report", text="same") for to in ("a@hotel.test", "bad@", "c@hotel.test")]
+    results = await _sendgrid(handler).send_batch(messages)
+
+    assert [(r["status"], r["batch_size"]) for r in results] == [("sent", 1), ("error", 1), ("sent", 1)]
+    assert sorted(len(b["personalizations"]) for b in bodies) == [1, 1, 1, 3]
+
+
+def test_substitutions_go_on_each_personalization():
+    messages = [
+        EmailMessage(to=["a@hotel.test"], subject="Daily: -name-", text="-name-", substitutions={"-name-": "A"}),
+        EmailMessage(to=["b@hotel.test"], subject="Daily: -name-", text="-name-", substitutions={"-name-": "B"}),
+    ]
+    body = SendGridTransport.build_payload(messages)
+
+    assert body["subject"] == "Daily: -name-"
+    assert body["personalizations"] == [
+        {"to": [{"email": "a@hotel.test"}], "substitutions": {"-name-": "A"}},
+        {"to": [{"email": "b@hotel.test"}], "substitutions": {"-name-": "B"}},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_bulk_send_without_transport_skips_every_message():
+    messages = [EmailMessage(to=[f"gm{i}@hotel.test"], subject="Daily", text="x") for i in range(3)]
+    with patch("app.services.email.get_email_transport", return_value=None):
+        results = await send_bulk_email(messages)
+    assert results == [{"status": "skipped", "reason": "not_configured"}] * 3
+
+
+@pytest.mark.asyncio
+async def test_send_email_uses_configured_transport():
+    outbox = MemoryTransport()
+    set_email_transport(outbox)
+    try:
+        result = await send_email("gm@hotel.test", "Daily", "<p>report</p>", is_html=True, text_content="report")
+    finally:
+        set_email_transport(None)
+
+    assert result["status"] == "sent"
+    (message,) = outbox.outbox
+    assert message.to == ["gm@hotel.test"]
+    assert (message.html, message.text) == ("<p>report</p>", "report")
@@ -0,0 +1,191 @@
+import os
+import time
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models import Lead
+from app.services import export
+from app.services.export import ExportFileStore, export_schema, export_table, rows_to_batch, sweep_staging
+
+PROPERTY_ID = uuid.uuid4()
+
+
+def _lead_row(i: int) -> tuple:
+    values = {
+        "id": uuid.uuid4(),
+        "conversation_id": uuid.uuid4(),
+        "property_id": PROPERTY_ID,
+        "guest_name": f"Guest {i}",
+        "guest_phone": None,
+        "guest_email": f"guest{i}@example.com",
+        "intent": "room_booking",
+        "source_channel": "whatsapp",
+        "is_after_hours": i % 2 == 0,
+        "status": "new",
+        "estimated_value": Decimal("230.00"),
+        "notes": None,
+        "priority": "standard",
+        "flag_reason": None,
+        "captured_at": datetime(2026, 10, 1, 12, tzinfo=timezone.utc),
+        "deleted_at": None,
+    }
+    return tuple(values[c.name] for c in Lead.__table__.columns)
+
+
+class FakeStreamResult:
+    def __init__(self, rows):
+        self.rows = rows
+        self.partition_sizes = []
+
+    async def partitions(self, size):
+        for start in range(0, len(self.rows), size):
+            chunk = self.rows[start:start + size]
+            self.partition_sizes.append(len(chunk))
+            yield chunk
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.result = FakeStreamResult(rows)
+        self.statement = None
+
+    async def stream(self, stmt):
+        self.statement = stmt
+        return self.result
+
+
+def test_rows_to_batch_converts_uuid_json_and_decimal():
+    schema, converters = export_schema(Lead)
+    batch = rows_to_batch([_lead_row(1)], schema, converters)
+
+    assert batch.num_rows == 1
+    assert batch.schema.field("id").type == pa.string()
+    assert batch.schema.field("estimated_value").type == pa.decimal128(10, 2)
+    assert batch.column(batch.schema.get_field_index("property_id"))[0].as_py() == str(PROPERTY_ID)
+
+
+@pytest.mark.asyncio
+async def test_export_table_streams_fixed_size_batches(tmp_path):
+    db = FakeSession([_lead_row(i) for i in range(25)])
+    path = str(tmp_path / "leads.parquet")
+
+    rows = await export_table(db, "leads", PROPERTY_ID, date(2026, 10, 1), date(2026, 10, 31), path, batch_size=10)
+
+    assert rows == 25
+    assert db.result.partition_sizes == [10, 10, 5]
+    assert db.statement.get_execution_options()["yield_per"] == 10
+    sql = str(db.statement.compile(dialect=postgresql.dialect()))
+    assert "leads.captured_at >=" in sql and "leads.captured_at <" in sql
+
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_rows == 25
+    assert parquet.metadata.num_row_groups == 3
+    assert parquet.metadata.row_group(0).column(0).compression == "ZSTD"
+    assert parquet.read().column("guest_name").to_pylist()[24] == "Guest 24"
+
+
+@pytest.mark.asyncio
+async def test_export_table_arrow_ipc(tmp_path):
+    db = FakeSession([_lead_row(i) for i in range(3)])
+    path = str(tmp_path / "leads.arrow")
+
+    await export_table(db, "leads", PROPERTY_ID, date(2026, 10, 1), date(2026, 10, 31), path, fmt="arrow")
+
+    with pa.ipc.open_file(path) as reader:
+        assert reader.read_all().num_rows == 3
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values: dict[str, object] = {}
+        self.expiry: dict[str, int] = {}
+
+    async def set(self, key, value, expire=None):
+        self.values[key], self.expiry[key] = value, expire
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    set_bytes, get_bytes = set, get
+
+    async def exists(self, *keys):
+        return sum(1 for key in keys if key in self.values)
+
+
+@pytest.mark.asyncio
+async def test_file_store_round_trips_in_chunks_with_the_job_ttl(tmp_path):
+    path = tmp_path / "leads.parquet"
+    path.write_bytes(b"0123456789")
+    store = ExportFileStore()
+    store.redis = FakeRedis()
+
+    with patch.object(export, "FILE_CHUNK_BYTES", 4):
+        chunks = await store.put("job1", "leads", str(path))
+
+    assert chunks == 3
+    assert set(store.redis.expiry.values()) == {export.settings.export_job_ttl}
+    assert await store.exists("job1", "leads", chunks)
+    assert b"".join([c async for c in store.stream("job1", "leads", chunks)]) == b"0123456789"
+
+    del store.redis.values["export:file:job1:leads:2"]  # Expired
+    assert not await store.exists("job1", "leads", chunks)
+
+
+@pytest.mark.asyncio
+async def test_export_job_uploads_files_and_removes_staging(tmp_path):
+    redis = FakeRedis()
+    jobs, files = export.ExportJobStore(), ExportFileStore()
+    jobs.redis = files.redis = redis
+
+    async def write_files(db, property_id, from_date, to_date, output_dir, tables, fmt):
+        os.makedirs(output_dir)
+        path = os.path.join(output_dir, "leads.parquet")
+        with open(path, "wb") as f:
+            f.write(b"PAR1 data")
+        return {"leads": {"path": path, "rows": 3, "bytes": 9}}
+
+    session_factory = MagicMock()
+    session_factory.return_value.__aenter__ = AsyncMock(return_value=MagicMock())
+    session_factory.return_value.__aexit__ = AsyncMock(return_value=False)
+
+    with patch.object(export, "export_jobs", jobs), patch.object(export, "export_files", files), \
+         patch.object(export, "export_property_data", write_files), \
+         patch.object(export.settings, "export_dir", str(tmp_path)), \
+         patch("app.database.async_session", session_factory), \
+         patch("app.database.set_db_context", AsyncMock()):
+        job = await export.create_export_job(PROPERTY_ID, date(2026, 10, 1), date(2026, 10, 31), ["leads"], "parquet")
+        await export.run_export_job(job["id"])
+        done = await jobs.get(job["id"])
+
+        assert done["status"] == "completed"
+        assert done["manifest"] == {"leads": {"rows": 3, "bytes": 9, "chunks": 1}}
+        assert redis.values[f"export:file:{job['id']}:leads:0"] == b"PAR1 data"
+        assert os.listdir(tmp_path) == []
+
+        # Too large to keep in Redis: fails, and staging is still cleaned up
+        with patch.object(export.settings, "export_max_bytes", 8):
+            job = await export.create_export_job(PROPERTY_ID, date(2026, 10, 1), date(2026, 10, 31), ["leads"], "parquet")
+            await export.run_export_job(job["id"])
+        failed = await jobs.get(job["id"])
+        assert failed["status"] == "failed" and "byte limit" in failed["error"]
+        assert not any(key.startswith(f"export:file:{job['id']}") for key in redis.values)
+        assert os.listdir(tmp_path) == []
+
+
+def test_sweep_staging_removes_only_expired_directories(tmp_path):
+    (tmp_path / "old").mkdir()
+    (tmp_path / "fresh").mkdir()
+    now = time.time()
+    os.utime(tmp_path / "old", (now - 90_000, now - 90_000))
+
+    with patch.object(export.settings, "export_dir", str(tmp_path)), \
+         patch.object(export.settings, "export_job_ttl", 86400):
+        assert sweep_staging(now) == 1
+    assert os.listdir(tmp_path) == ["fresh"]
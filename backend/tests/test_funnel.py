@@ -0,0 +1,178 @@
+import re
+import uuid
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models import Conversation, LeadEvent
+from app.services.funnel import (
+    UNQUALIFIED,
+    get_funnel,
+    rebuild_funnel,
+    record_inquiry,
+    record_lead_captured,
+    record_lead_status_change,
+)
+
+PROPERTY_ID = uuid.uuid4()
+
+
+class FakeSession:
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.statements = []
+        self.added = []
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def execute(self, stmt):
+        compiled = stmt.compile(dialect=postgresql.dialect())
+        self.statements.append((str(compiled), compiled.params))
+        result = MagicMock()
+        payload = self.results.pop(0) if self.results else []
+        result.first.return_value = payload
+        result.scalar.return_value = payload
+        result.fetchall.return_value = payload
+        return result
+
+
+def _lead(status="contacted"):
+    return SimpleNamespace(
+        id=uuid.uuid4(),
+        property_id=PROPERTY_ID,
+        conversation_id=uuid.uuid4(),
+        intent="room_booking",
+        source_channel="whatsapp",
+        status=status,
+        captured_at=datetime(2026, 10, 2, 9, tzinfo=timezone.utc),
+    )
+
+
+@pytest.mark.asyncio
+async def test_status_change_records_event_and_moves_stage():
+    started_at = datetime(2026, 10, 1, 15, 30, tzinfo=timezone.utc)  # 23:30 in Kuala Lumpur
+    db = FakeSession([SimpleNamespace(started_at=started_at, channel="whatsapp", timezone="Asia/Kuala_Lumpur")])
+
+    await record_lead_status_change(db, _lead(), "contacted", "converted", changed_by="gm@hotel.test")
+
+    (event,) = db.added
+    assert isinstance(event, LeadEvent)
+    assert (event.from_status, event.to_status, event.changed_by) == ("contacted", "converted", "gm@hotel.test")
+
+    upsert_sql, params = db.statements[-1]
+    assert "ON CONFLICT (property_id, report_date, channel, intent) DO UPDATE" in upsert_sql
+    assert "leads_converted = (funnel_daily.leads_converted +" in upsert_sql
+    assert "leads_contacted" not in upsert_sql.split("DO UPDATE")[1]  # still counted as contacted
+    assert params["report_date"] == date(2026, 10, 1)  # cohort = inquiry day
+    assert params["intent"] == "room_booking"
+
+
+@pytest.mark.asyncio
+async def test_reopening_lost_lead_decrements_lost():
+    db = FakeSession([SimpleNamespace(
+        started_at=datetime(2026, 10, 1, tzinfo=timezone.utc), channel="web", timezone="Asia/Kuala_Lumpur",
+    )])
+
+    await record_lead_status_change(db, _lead("lost"), "lost", "contacted")
+
+    upsert_sql, params = db.statements[-1]
+    assert "leads_lost = (funnel_daily.leads_lost +" in upsert_sql
+    assert params["leads_lost"] == -1
+    assert params["leads_contacted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_unchanged_status_is_a_no_op():
+    db = FakeSession()
+    await record_lead_status_change(db, _lead(), "contacted", "contacted")
+    assert db.added == [] and db.statements == []
+
+
+@pytest.mark.asyncio
+async def test_get_funnel_breakdowns_and_rates():
+    def row(channel, intent, inquiries, captured=0, contacted=0, converted=0, lost=0):
+        return SimpleNamespace(
+            channel=channel, intent=intent, inquiries=inquiries, leads_captured=captured,
+            leads_contacted=contacted, leads_converted=converted, leads_lost=lost,
+        )
+
+    db = FakeSession([[
+        row("whatsapp", "unqualified", 6),
+        row("whatsapp", "room_booking", 4, captured=4, contacted=2, converted=1),
+        row("web", "room_booking", 2, captured=2, contacted=2, converted=1, lost=1),
+    ]])
+
+    funnel = await get_funnel(db, PROPERTY_ID, date(2026, 10, 1), date(2026, 10, 31))
+
+    assert funnel["totals"]["inquiries"] == 12
+    assert funnel["totals"]["lead_rate"] == 0.5
+    assert funnel["totals"]["conversion_rate"] == round(2 / 6, 4)
+    assert funnel["by_channel"]["whatsapp"]["inquiries"] == 10
+    assert funnel["by_intent"]["room_booking"]["contact_rate"] == round(4 / 6, 4)
+    assert funnel["by_intent"]["unqualified"]["conversion_rate"] == 0.0
+
+
+@pytest.mark.asyncio
+async def test_inquiry_and_lead_use_the_property_local_start_day():
+    # 01:00 on 2 Oct in Kuala Lumpur, still 1 Oct in UTC
+    conversation = Conversation(
+        id=uuid.uuid4(), property_id=PROPERTY_ID, channel="whatsapp",
+        started_at=datetime(2026, 10, 1, 17, 0, tzinfo=timezone.utc),
+    )
+    db = FakeSession()
+
+    await record_inquiry(db, conversation, "Asia/Kuala_Lumpur")
+    await record_lead_captured(db, _lead("new"), conversation, "Asia/Kuala_Lumpur")
+
+    report_dates = [params["report_date"] for _, params in db.statements]
+    assert report_dates == [date(2026, 10, 2)] * 3  # inquiry, un-qualify, lead
+    assert db.statements[0][1]["intent"] == "unqualified"
+
+    db = FakeSession()
+    await record_inquiry(db, conversation, "UTC")
+    assert db.statements[0][1]["report_date"] == date(2026, 10, 1)
+
+
+@pytest.mark.asyncio
+async def test_rebuild_groups_by_property_local_day():
+    db = FakeSession(["Asia/Kuala_Lumpur"])
+
+    await rebuild_funnel(db, PROPERTY_ID, date(2026, 10, 1), date(2026, 10, 31))
+
+    assert "DELETE FROM funnel_daily" in db.statements[1][0]
+    insert_sql, params = db.statements[2]
+    assert re.search(r"CAST\(timezone\(%\(timezone_\d+\)s, conversations\.started_at\) AS DATE\)", insert_sql)
+    assert {v for k, v in params.items() if k.startswith("timezone_")} == {"Asia/Kuala_Lumpur"}
+    window = sorted(v for v in params.values() if isinstance(v, datetime))
+    assert window == [
+        datetime(2026, 9, 30, 16, 0, tzinfo=timezone.utc),
+        datetime(2026, 10, 31, 16, 0, tzinfo=timezone.utc),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_leads_without_intent_use_the_same_row_as_a_rebuild():
+    lead = _lead("new")
+    lead.intent = None
+    conversation = Conversation(
+        id=lead.conversation_id, property_id=PROPERTY_ID, channel="whatsapp",
+        started_at=datetime(2026, 10, 1, 3, 0, tzinfo=timezone.utc),
+    )
+    db = FakeSession([None, None, SimpleNamespace(
+        started_at=conversation.started_at, channel="whatsapp", timezone="Asia/Kuala_Lumpur",
+    )])
+
+    await record_lead_captured(db, lead, conversation, "Asia/Kuala_Lumpur")
+    await record_lead_status_change(db, lead, "new", "contacted")
+
+    upserts = [params["intent"] for sql, params in db.statements if "INSERT INTO funnel_daily" in sql]
+    assert upserts == [UNQUALIFIED] * 3
+
+    db = FakeSession(["Asia/Kuala_Lumpur"])
+    await rebuild_funnel(db, PROPERTY_ID, date(2026, 10, 1), date(2026, 10, 31))
+    insert_sql, params = db.statements[2]
+    assert "coalesce(leads.intent" in insert_sql and UNQUALIFIED in params.values()
@@ -0,0 +1,135 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from starlette.requests import Request
+
+from app import routes, worker
+from app.services.idempotency import InboundDedupe, claim_receipt, dedupe_key
+from app.services.inbound_queue import InboundJob
+
+
+class FakeRedis:
+    def __init__(self):
+        self.keys: dict[str, str] = {}
+        self.hashes: dict[str, dict] = {}
+
+    async def set_many_nx(self, keys, expire, value="1"):
+        results = []
+        for key in keys:
+            results.append(key not in self.keys)
+            self.keys.setdefault(key, value)
+        return results
+
+    async def delete(self, *keys):
+        return sum(1 for key in keys if self.keys.pop(key, None) is not None)
+
+    async def hincrby(self, key, field, amount=1):
+        bucket = self.hashes.setdefault(key, {})
+        bucket[field] = bucket.get(field, 0) + amount
+        return bucket[field]
+
+    async def hgetall(self, key):
+        return {field: str(value) for field, value in self.hashes.get(key, {}).items()}
+
+
+def _dedupe():
+    dedupe = InboundDedupe()
+    dedupe.redis = FakeRedis()
+    return dedupe
+
+
+@pytest.mark.asyncio
+async def test_claim_drops_retries_and_repeats_within_a_delivery():
+    dedupe = _dedupe()
+    assert await dedupe.claim("whatsapp", ["wamid.1", "wamid.2"]) == [True, True]
+
+    # Meta retries the delivery with a new message appended; one id is repeated
+    assert await dedupe.claim("whatsapp", ["wamid.1", "wamid.2", "wamid.3", "wamid.3", None]) == [
+        False, False, True, False, True,
+    ]
+    # Ids are scoped per channel
+    assert await dedupe.claim("email", ["wamid.1"]) == [True]
+    assert await dedupe.counters() == {"whatsapp:redis": 3}
+
+
+@pytest.mark.asyncio
+async def test_release_lets_the_provider_retry_through():
+    dedupe = _dedupe()
+    await dedupe.claim("email", ["<abc@mail.example.com>"])
+    await dedupe.release("email", ["<abc@mail.example.com>", None])
+    assert dedupe_key("email", "<abc@mail.example.com>") not in dedupe.redis.keys
+    assert await dedupe.claim("email", ["<abc@mail.example.com>"]) == [True]
+
+
+@pytest.mark.asyncio
+async def test_claim_fails_open_when_redis_is_down():
+    dedupe = InboundDedupe()
+    dedupe.redis = MagicMock(set_many_nx=AsyncMock(side_effect=ConnectionError("redis down")))
+    assert await dedupe.claim("whatsapp", ["wamid.1", "wamid.1"]) == [True, False]
+
+
+@pytest.mark.asyncio
+async def test_claim_receipt_inserts_on_conflict_do_nothing():
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = None
+    db = MagicMock(execute=AsyncMock(return_value=result))
+    assert await claim_receipt(db, "whatsapp", "wamid.1") is False
+
+    sql = str(db.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+    assert sql.startswith("INSERT INTO inbound_receipts")
+    assert "ON CONFLICT (channel, provider_message_id) DO NOTHING RETURNING inbound_receipts.id" in sql
+
+
+@pytest.mark.asyncio
+async def test_worker_skips_message_already_receipted():
+    session = AsyncMock()
+    factory = MagicMock()
+    factory.return_value.__aenter__ = AsyncMock(return_value=session)
+    factory.return_value.__aexit__ = AsyncMock(return_value=False)
+    job = InboundJob(kind="whatsapp", property_id="6f1c0d4e-0000-4000-8000-000000000001",
+                     guest_identifier="60123456789", content="Hi", message_id="wamid.1")
+    process = AsyncMock()
+    with patch.object(worker, "async_session", factory), \
+         patch.object(worker, "set_db_context", AsyncMock()), \
+         patch.object(worker, "claim_receipt", AsyncMock(return_value=False)), \
+         patch.object(worker.inbound_dedupe, "record_duplicates", AsyncMock()) as record, \
+         patch.object(worker, "process_guest_message", process):
+        await worker.handle_job(job)
+
+    process.assert_not_awaited()
+    session.commit.assert_not_awaited()
+    record.assert_awaited_once_with("whatsapp", "db")
+
+
+def _request():
+    return Request({"type": "http", "method": "POST", "path": "/webhook", "headers": [], "client": ("127.0.0.1", 1)})
+
+
+def _failing_db():
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=ConnectionError("db down"))
+    return db
+
+
+@pytest.mark.asyncio
+async def test_webhook_failure_after_the_claim_releases_it():
+    dedupe = _dedupe()
+    payload = {"entry": [{"changes": [{"field": "messages", "value": {
+        "metadata": {"phone_number_id": "PHONE_A"},
+        "contacts": [{"profile": {"name": "Aisha"}, "wa_id": "60123456789"}],
+        "messages": [{"from": "60123456789", "id": "wamid.1", "type": "text", "text": {"body": "Rooms?"}}],
+    }}]}]}
+    form = {"from": "Aisha <aisha@example.com>", "to": "frontdesk@hotel.test", "subject": "Rooms",
+            "text": "Any rooms?", "headers": "Message-ID: <abc@mail.example.com>"}
+
+    with patch.object(routes, "inbound_dedupe", dedupe), patch.object(routes.limiter, "enabled", False):
+        # Property lookup fails: the retry must not be dropped as a duplicate
+        with pytest.raises(ConnectionError):
+            await routes.whatsapp_webhook(_request(), db=_failing_db(), body=payload)
+        with pytest.raises(ConnectionError):
+            await routes.email_webhook(_request(), form_data=form, db=_failing_db())
+
+        assert dedupe.redis.keys == {}
+        assert await dedupe.claim("whatsapp", ["wamid.1"]) == [True]
+        assert await dedupe.claim("email", ["<abc@mail.example.com>"]) == [True]
@@ -0,0 +1,259 @@
+import asyncio
+import itertools
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app import worker
+from app.services import inbound_queue as queue_module
+from app.services.inbound_queue import InboundJob, InboundQueue
+
+
+class FakeStreams:
+    """The stream / sorted-set subset of RedisClient, in memory, one consumer group."""
+
+    def __init__(self):
+        self.streams: dict[str, list] = {}
+        self.pending: dict[str, str] = {}  # entry id -> consumer
+        self.zsets: dict[str, dict] = {}
+        self.ids = itertools.count(1)
+
+    async def xadd_many(self, stream, entries, maxlen=None):
+        return [await self.xadd(stream, fields, maxlen) for fields in entries]
+
+    async def xgroup_create(self, stream, group, id="0"):
+        self.streams.setdefault(stream, [])
+
+    async def xadd(self, stream, fields, maxlen=None):
+        entry_id = f"{1_700_000_000_000 + next(self.ids)}-0"
+        self.streams.setdefault(stream, []).append((entry_id, dict(fields)))
+        return entry_id
+
+    async def xreadgroup(self, group, consumer, streams, count, block):
+        (stream, _), = streams.items()
+        fresh = [e for e in self.streams.get(stream, []) if e[0] not in self.pending]
+        batch = fresh[:count]
+        for entry_id, _ in batch:
+            self.pending[entry_id] = consumer
+        if not batch:
+            await asyncio.sleep(0.001)  # Redis blocks for up to `block` ms
+        return [(stream, batch)] if batch else []
+
+    async def xautoclaim(self, stream, group, consumer, min_idle_time, count):
+        return ["0-0", [], []]
+
+    async def xack_del(self, stream, group, entry_id):
+        self.pending.pop(entry_id, None)
+        self.streams[stream] = [e for e in self.streams[stream] if e[0] != entry_id]
+        return [1, 1]
+
+    async def xlen(self, stream):
+        return len(self.streams.get(stream, []))
+
+    async def xrange(self, stream, min="-", max="+", count=None):
+        return self.streams.get(stream, [])[:count]
+
+    async def xpending(self, stream, group):
+        return {"pending": len(self.pending)}
+
+    async def xinfo_groups(self, stream):
+        return [{"name": "inbound-workers", "lag": 0}]
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    async def zrangebyscore(self, key, min, max, count=None):
+        due = sorted((score, member) for member, score in self.zsets.get(key, {}).items() if min <= score <= max)
+        return [member for _, member in due][:count]
+
+    async def zrem(self, key, *members):
+        return sum(1 for m in members if self.zsets.get(key, {}).pop(m, None) is not None)
+
+    async def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    async def eval(self, script, keys, args):
+        # PROMOTE_RETRIES_LUA; a Lua script runs without interleaving, like this coroutine
+        assert script == queue_module.PROMOTE_RETRIES_LUA
+        retry_key, stream = keys
+        now, limit, maxlen = args
+        due = await self.zrangebyscore(retry_key, 0, now, count=limit)
+        for raw in due:
+            await self.zrem(retry_key, raw)
+            await self.xadd(stream, {"job": raw}, maxlen)
+        return len(due)
+
+
+def _queue():
+    queue = InboundQueue(stream="inbound:test", group="inbound-workers")
+    queue.redis = FakeStreams()
+    return queue
+
+
+def _job(content="Hi, any rooms?", guest_identifier="60123456789"):
+    return InboundJob(kind="whatsapp", property_id="6f1c0d4e-0000-4000-8000-000000000001",
+                      guest_identifier=guest_identifier, content=content)
+
+
+@pytest.mark.asyncio
+async def test_job_stays_in_stream_until_acked():
+    queue = _queue()
+    await queue.ensure_group()
+    await queue.enqueue(_job())
+
+    ((entry_id, job),) = await queue.read("worker-1", count=10)
+    assert job.content == "Hi, any rooms?"
+    stats = await queue.stats()
+    assert (stats["depth"], stats["pending"]) == (1, 1)
+
+    await queue.ack(entry_id)
+    stats = await queue.stats()
+    assert (stats["depth"], stats["pending"]) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_enqueue_many_queues_a_batch_in_order():
+    queue = _queue()
+    await queue.ensure_group()
+    assert await queue.enqueue_many([]) == []
+
+    entry_ids = await queue.enqueue_many([_job(f"message {i}") for i in range(3)])
+    assert len(entry_ids) == 3
+    jobs = await queue.read("worker-1", count=10)
+    assert [entry_id for entry_id, _ in jobs] == entry_ids
+    assert [job.content for _, job in jobs] == ["message 0", "message 1", "message 2"]
+
+
+@pytest.mark.asyncio
+async def test_failed_job_retries_with_backoff_then_dead_letters():
+    queue = _queue()
+    await queue.ensure_group()
+    await queue.enqueue(_job())
+    clock = [1000.0]
+
+    with patch.object(queue_module.time, "time", side_effect=lambda: clock[0]), \
+         patch.object(queue_module.settings, "inbound_max_attempts", 3), \
+         patch.object(queue_module.settings, "inbound_retry_base_sec", 2.0):
+        ((entry_id, job),) = await queue.read("worker-1", count=1)
+        await queue.fail(entry_id, job, "llm timeout")
+        assert (await queue.stats())["retry_scheduled"] == 1
+
+        # Not due yet: 2s backoff after the first failure
+        clock[0] += 1.9
+        assert await queue.promote_due_retries() == 0
+        clock[0] += 0.2
+        assert await queue.promote_due_retries() == 1
+
+        ((entry_id, job),) = await queue.read("worker-1", count=1)
+        assert job.attempt == 1
+        await queue.fail(entry_id, job, "llm timeout")
+        clock[0] += 4.1  # 4s backoff after the second failure
+        await queue.promote_due_retries()
+
+        ((entry_id, job),) = await queue.read("worker-1", count=1)
+        await queue.fail(entry_id, job, "llm timeout")
+
+    stats = await queue.stats()
+    assert (stats["depth"], stats["retry_scheduled"], stats["dead_letter"]) == (0, 0, 1)
+    (_, dead), = queue.redis.streams[queue.dead_stream]
+    assert dead["error"] == "llm timeout"
+    assert InboundJob.loads(dead["job"]).attempt == 3
+
+
+@pytest.mark.asyncio
+async def test_worker_bounds_concurrency_and_acks_only_on_success():
+    queue = _queue()
+    await queue.ensure_group()
+    for i in range(6):
+        await queue.enqueue(_job(f"message {i}", guest_identifier=f"6012345678{i}"))
+
+    in_flight = {"now": 0, "peak": 0}
+    stop = asyncio.Event()
+    handled = []
+
+    async def fake_handle(job):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        handled.append(job.content)
+        if job.content == "message 2":
+            raise RuntimeError("db down")
+        if len(handled) == 6:
+            stop.set()
+
+    with patch.object(worker, "handle_job", side_effect=fake_handle):
+        await asyncio.wait_for(worker.run_worker(concurrency=2, queue=queue, stop=stop), timeout=5)
+
+    assert in_flight["peak"] == 2
+    assert sorted(handled) == [f"message {i}" for i in range(6)]
+    # Five acked and gone; the failure waits in the retry set
+    stats = await queue.stats()
+    assert (stats["depth"], stats["pending"], stats["retry_scheduled"]) == (0, 0, 1)
+
+
+@pytest.mark.asyncio
+async def test_reply_is_queued_in_the_same_commit_and_handoff_failure_does_not_retry():
+    session = MagicMock(commit=AsyncMock(), execute=AsyncMock())
+    factory = MagicMock()
+    factory.return_value.__aenter__ = AsyncMock(return_value=session)
+    factory.return_value.__aexit__ = AsyncMock(return_value=False)
+    calls = []
+    session.add.side_effect = lambda row: calls.append(("add", row))
+    session.commit.side_effect = lambda: calls.append(("commit", None))
+    result = {
+        "response": "Yes!", "mode": "handoff",
+        "conversation_id": "6f1c0d4e-0000-4000-8000-0000000000aa",
+        "message_id": "6f1c0d4e-0000-4000-8000-0000000000bb",
+    }
+    job = _job()
+    job.phone_number_id = "PHONE_A"
+    with patch.object(worker, "async_session", factory), \
+         patch.object(worker, "set_db_context", AsyncMock()), \
+         patch.object(worker, "process_guest_message", AsyncMock(return_value=result)), \
+         patch.object(worker, "notify_staff_handoff_enhanced", AsyncMock(side_effect=ConnectionError("smtp down"))):
+        await worker.handle_job(job)
+
+    (_, row), (step, _) = calls
+    assert step == "commit"
+    lock, params = session.execute.await_args.args
+    assert "pg_advisory_xact_lock" in str(lock)
+    assert params == {"key": worker.guest_lock_key(job)}
+    assert (row.channel, row.recipient, row.body, row.sender_id) == ("whatsapp", "60123456789", "Yes!", "PHONE_A")
+    assert str(row.message_id) == result["message_id"] and row.status == "pending"
+
+
+@pytest.mark.asyncio
+async def test_one_guests_messages_run_one_at_a_time_in_order():
+    queue = _queue()
+    await queue.ensure_group()
+    for content, guest in [("a1", "guest-a"), ("a2", "guest-a"), ("b1", "guest-b"), ("a3", "guest-a")]:
+        await queue.enqueue(_job(content, guest_identifier=guest))
+
+    events = []
+    stop = asyncio.Event()
+
+    async def fake_handle(job):
+        events.append(("start", job.content))
+        await asyncio.sleep(0.01)
+        events.append(("end", job.content))
+        if sum(1 for kind, _ in events if kind == "end") == 4:
+            stop.set()
+
+    with patch.object(worker, "handle_job", side_effect=fake_handle):
+        await asyncio.wait_for(worker.run_worker(concurrency=4, queue=queue, stop=stop), timeout=5)
+
+    guest_a = [e for e in events if e[1].startswith("a")]
+    assert guest_a == [("start", "a1"), ("end", "a1"), ("start", "a2"), ("end", "a2"), ("start", "a3"), ("end", "a3")]
+    # Other guests are not held up behind guest-a
+    assert events.index(("start", "b1")) < events.index(("end", "a1"))
+
+
+def test_guest_lock_key_is_per_property_and_guest():
+    job = _job()
+    other_property = InboundJob(kind="email", property_id="6f1c0d4e-0000-4000-8000-000000000002",
+                                guest_identifier=job.guest_identifier, content="x")
+    assert worker.guest_lock_key(job) == worker.guest_lock_key(_job("another message"))
+    assert worker.guest_lock_key(job) != worker.guest_lock_key(_job(guest_identifier="60999"))
+    assert worker.guest_lock_key(job) != worker.guest_lock_key(other_property)
+    assert -(2 ** 63) <= worker.guest_lock_key(job) < 2 ** 63
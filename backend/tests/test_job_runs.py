@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from apscheduler.triggers.cron import CronTrigger
+
+from app.services import job_runs
+from app.services.job_runs import canonical_fire_time, lock_key, run_leased_job
+
+FIRE = datetime(2026, 10, 19, 23, 30, tzinfo=timezone.utc)
+
+
+class FakeLockConnection:
+    """Advisory locks shared by all 'processes' in the test."""
+
+    held: set = set()
+
+    def __init__(self):
+        self.executed = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt, params):
+        self.executed.append(str(stmt))
+        result = MagicMock()
+        if "pg_try_advisory_lock" in str(stmt):
+            acquired = params["key"] not in FakeLockConnection.held
+            FakeLockConnection.held.add(params["key"])
+            result.scalar.return_value = acquired
+        else:
+            FakeLockConnection.held.discard(params["key"])
+        return result
+
+    async def commit(self):
+        pass
+
+
+@pytest.fixture
+def cluster():
+    """In-memory stand-in for the job_runs unique index."""
+    FakeLockConnection.held = set()
+    claimed, finished = set(), []
+
+    async def claim(job_name, scheduled_for):
+        if (job_name, scheduled_for) in claimed:
+            return None
+        claimed.add((job_name, scheduled_for))
+        return f"run-{len(claimed)}"
+
+    async def finish(run_id, status, duration_ms, rows_affected=None, error=None):
+        finished.append((run_id, status, rows_affected, error))
+
+    engine = MagicMock()
+    engine.connect.side_effect = FakeLockConnection
+    with patch.object(job_runs, "engine", engine), \
+         patch.object(job_runs, "_claim", side_effect=claim), \
+         patch.object(job_runs, "_finish", side_effect=finish):
+        yield finished
+
+
+def test_canonical_fire_time_is_shared_across_nodes():
+    trigger = CronTrigger(hour=7, minute=30, timezone="Asia/Kuala_Lumpur")
+    early = datetime(2026, 10, 19, 23, 30, 0, 400000, tzinfo=timezone.utc)
+    late = datetime(2026, 10, 19, 23, 31, 10, tzinfo=timezone.utc)
+
+    assert canonical_fire_time(trigger, early) == canonical_fire_time(trigger, late) == FIRE
+
+
+def test_lock_key_is_stable_bigint():
+    assert lock_key("daily_reports", FIRE) == lock_key("daily_reports", FIRE.astimezone(timezone(timedelta(hours=8))))
+    assert lock_key("daily_reports", FIRE) != lock_key("data_retention", FIRE)
+    assert lock_key("daily_reports", FIRE) != lock_key("daily_reports", FIRE + timedelta(minutes=15))
+    assert -(2 ** 63) <= lock_key("daily_reports", FIRE) < 2 ** 63
+
+
+@pytest.mark.asyncio
+async def test_fire_runs_once_across_processes(cluster):
+    job = AsyncMock(return_value=12)
+
+    await asyncio.gather(*(run_leased_job("daily_reports", job, FIRE) for _ in range(5)))
+    await run_leased_job("daily_reports", job, FIRE)  # a late node
+
+    job.assert_awaited_once()
+    assert cluster == [("run-1", "succeeded", 12, None)]
+
+
+@pytest.mark.asyncio
+async def test_failed_run_is_recorded_and_lock_released(cluster):
+    async def boom():
+        raise RuntimeError("smtp down")
+
+    run_id = await run_leased_job("daily_reports", boom, FIRE)
+
+    assert run_id == "run-1"
+    assert cluster[0][1] == "failed" and "smtp down" in cluster[0][3]
+    assert FakeLockConnection.held == set()
+
+
+@pytest.mark.asyncio
+async def test_overlapping_run_is_skipped_while_lock_held(cluster):
+    FakeLockConnection.held.add(lock_key("data_retention", FIRE))
+    job = AsyncMock()
+
+    assert await run_leased_job("data_retention", job, FIRE) is None
+    job.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_slow_run_does_not_block_the_next_fire(cluster):
+    next_fire = FIRE + timedelta(minutes=15)
+    release = asyncio.Event()
+    ran = []
+
+    async def job_for(fire):
+        ran.append(fire)
+        if fire == FIRE:
+            await release.wait()  # Still running when the next slot fires
+
+    slow = asyncio.create_task(run_leased_job("daily_reports", lambda: job_for(FIRE), FIRE))
+    await asyncio.sleep(0)
+    assert await run_leased_job("daily_reports", lambda: job_for(next_fire), next_fire) == "run-2"
+    release.set()
+    assert await slow == "run-1"
+    assert ran == [FIRE, next_fire]
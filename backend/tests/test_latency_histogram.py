@@ -0,0 +1,63 @@
+import random
+
+from app.core.histogram import LatencyHistogram, BUCKET_BOUNDS, SUB_BUCKETS, bucket_index
+
+
+def test_bucket_bounds_are_sorted_and_unique():
+    assert BUCKET_BOUNDS == sorted(set(BUCKET_BOUNDS))
+    assert bucket_index(0) == 0
+    assert bucket_index(BUCKET_BOUNDS[-1] * 10) == len(BUCKET_BOUNDS)
+
+
+def test_percentiles_within_bucket_error():
+    rng = random.Random(42)
+    values = [rng.lognormvariate(7, 0.8) for _ in range(5000)]  # ~1.1s median
+    hist = LatencyHistogram()
+    for v in values:
+        hist.record(v)
+
+    values.sort()
+    for q in (0.5, 0.9, 0.95, 0.99):
+        exact = values[int(q * len(values)) - 1]
+        estimate = hist.quantile(q)
+        assert abs(estimate - exact) / exact <= 1.0 / SUB_BUCKETS + 0.01
+
+    assert abs(hist.mean_ms - sum(values) / len(values)) < 1e-6 * hist.mean_ms + 1e-3
+
+
+def test_merge_matches_single_sketch():
+    rng = random.Random(7)
+    days = [[rng.uniform(200, 8000) for _ in range(rng.randint(0, 300))] for _ in range(30)]
+
+    combined = LatencyHistogram()
+    sketches = []
+    for day in days:
+        daily = LatencyHistogram()
+        for v in day:
+            daily.record(v)
+            combined.record(v)
+        sketches.append(daily.to_dict())
+
+    merged = LatencyHistogram.merge_all(sketches + [None])
+    assert merged.count == combined.count
+    assert merged.buckets == combined.buckets
+    assert merged.percentiles_sec() == combined.percentiles_sec()
+
+
+def test_mean_is_weighted_not_mean_of_means():
+    busy = LatencyHistogram()
+    for _ in range(99):
+        busy.record(1000)
+    quiet = LatencyHistogram()
+    quiet.record(10000)
+
+    merged = LatencyHistogram.merge_all([busy.to_dict(), quiet.to_dict()])
+    assert merged.mean_ms == 1090.0
+    assert merged.quantile(0.99) <= 1000 * (1 + 1.0 / SUB_BUCKETS)
+
+
+def test_empty_histogram():
+    hist = LatencyHistogram.from_dict(None)
+    assert hist.count == 0
+    assert hist.mean_ms == 0.0
+    assert hist.percentiles_sec() == {"p50": 0.0, "p90": 0.0, "p95": 0.0, "p99": 0.0}
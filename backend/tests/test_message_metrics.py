@@ -0,0 +1,103 @@
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.dml import Update
+
+from app.config import get_settings
+from app.core.histogram import BUCKET_BOUNDS, LatencyHistogram, bucket_index
+from app.models import Conversation, Message, Property
+from app.services.analytics import _response_time_histogram_query
+from app.services.conversation import process_guest_message
+
+PROPERTY_ID = uuid.uuid4()
+
+
+def _stamp_sent_at(session):
+    """Stand-in for the INSERT ... RETURNING that fills Message.sent_at on flush."""
+    async def flush():
+        for call in session.add.call_args_list:
+            if isinstance(call.args[0], Message) and call.args[0].sent_at is None:
+                call.args[0].sent_at = datetime.now(timezone.utc)
+    return flush
+
+
+def _session():
+    prop = Property(id=PROPERTY_ID, name="Hotel A", operating_hours={"start": "00:00", "end": "23:59"})
+    result = MagicMock()
+    result.scalar_one.return_value = prop
+    result.scalar_one_or_none.return_value = prop
+    result.scalars.return_value.all.return_value = []
+    session = AsyncMock()
+    session.execute.return_value = result
+    session.add = MagicMock()
+    session.flush.side_effect = _stamp_sent_at(session)
+    return session
+
+
+@pytest.mark.asyncio
+async def test_ai_reply_metrics_go_to_typed_columns():
+    session = _session()
+    conversation = Conversation(
+        id=uuid.uuid4(), property_id=PROPERTY_ID, guest_identifier="60123456789",
+        channel="whatsapp", status="active", ai_mode="concierge", message_count=1,
+        is_after_hours=False,
+    )
+    llm = MagicMock()
+    llm.choices = [MagicMock(message=MagicMock(content="We have rooms tonight."))]
+    llm.usage.prompt_tokens, llm.usage.completion_tokens, llm.usage.total_tokens = 120, 30, 150
+
+    with patch("app.services.conversation.get_or_create_conversation", AsyncMock(return_value=conversation)), \
+         patch("app.services.conversation.search_knowledge_base", AsyncMock(return_value=[])), \
+         patch("app.services.conversation.openai_client.chat.completions.create", AsyncMock(return_value=llm)):
+        result = await process_guest_message(
+            db=session, property_id=PROPERTY_ID, guest_identifier="60123456789",
+            channel="whatsapp", message_text="Any rooms tonight?",
+        )
+
+    ai_msg = next(c.args[0] for c in session.add.call_args_list
+                  if isinstance(c.args[0], Message) and c.args[0].role == "ai")
+    assert ai_msg.response_time_ms == result["response_time_ms"]
+    assert (ai_msg.prompt_tokens, ai_msg.completion_tokens, ai_msg.total_tokens) == (120, 30, 150)
+    assert ai_msg.model == get_settings().openai_model
+    # Nothing we aggregate on is left in the free-form metadata
+    assert ai_msg.metadata_ == {"mode": "concierge"}
+
+    # The first-response marker is the reply's own (database) timestamp
+    assert ai_msg.sent_at is not None
+    update = next(c.args[0] for c in session.execute.call_args_list if isinstance(c.args[0], Update))
+    assert ai_msg.sent_at in update.compile(dialect=postgresql.dialect()).params.values()
+
+
+def test_histogram_query_buckets_typed_column_in_sql():
+    window_start = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    query = _response_time_histogram_query(PROPERTY_ID, window_start)
+    compiled = query.compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+
+    assert "width_bucket(messages.response_time_ms" in sql
+    assert "GROUP BY width_bucket(messages.response_time_ms" in sql
+    assert "messages.role =" in sql
+    assert "messages.sent_at >=" in sql  # Lets Postgres prune message partitions
+    assert "metadata" not in sql
+    assert BUCKET_BOUNDS in compiled.params.values()
+
+
+def test_sql_bucket_rows_rebuild_the_python_sketch():
+    values = [0, 0.4, 1, 1.9, 2, 7, 99, 100, 101, 950, 1200, 3000, 3000, 45_000, 10**9]
+
+    # What GROUP BY width_bucket(response_time_ms, BUCKET_BOUNDS) returns
+    groups = defaultdict(list)
+    for value in values:
+        width_bucket = sum(1 for bound in BUCKET_BOUNDS if bound <= value)
+        assert width_bucket == bucket_index(value)
+        groups[width_bucket].append(value)
+    rows = [(idx, len(vs), sum(vs), max(vs)) for idx, vs in groups.items()]
+
+    expected = LatencyHistogram()
+    for value in values:
+        expected.record(value)
+    assert LatencyHistogram.from_bucket_rows(rows).to_dict() == expected.to_dict()
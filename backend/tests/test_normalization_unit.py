@@ -1,6 +1,6 @@
 
 import pytest
-from app.services.whatsapp import normalize_whatsapp_message
+from app.services.whatsapp import iter_whatsapp_events, normalize_whatsapp_message
 from app.services.email import normalize_email_message
 
 def test_normalize_whatsapp():
@@ -40,6 +40,63 @@ def test_normalize_whatsapp():
     assert normalized["content"] == "Hello world"
     assert normalized["metadata"]["phone_number_id"] == "PHONE_NUMBER_ID"
 
+def _change(phone_number_id, messages=(), statuses=(), contacts=()):
+    return {
+        "field": "messages",
+        "value": {
+            "messaging_product": "whatsapp",
+            "metadata": {"phone_number_id": phone_number_id},
+            "contacts": list(contacts),
+            "messages": list(messages),
+            "statuses": list(statuses),
+        },
+    }
+
+def _text(sender, body, msg_id):
+    return {"from": sender, "id": msg_id, "type": "text", "text": {"body": body}}
+
+def test_iter_whatsapp_events_covers_every_entry_change_and_message():
+    payload = {
+        "object": "whatsapp_business_account",
+        "entry": [
+            {"id": "WABA_1", "changes": [
+                _change(
+                    "PHONE_A",
+                    messages=[_text("601111", "First", "wamid.1"), _text("602222", "Second", "wamid.2")],
+                    contacts=[{"wa_id": "602222", "profile": {"name": "Bob"}},
+                              {"wa_id": "601111", "profile": {"name": "Alice"}}],
+                ),
+                _change("PHONE_B", messages=[
+                    {"from": "603333", "id": "wamid.3", "type": "image", "image": {"id": "media-1"}},
+                    {"from": "603333", "id": "wamid.4", "type": "interactive",
+                     "interactive": {"type": "button_reply", "button_reply": {"id": "b1", "title": "Book now"}}},
+                ]),
+            ]},
+            {"id": "WABA_2", "changes": [
+                _change("PHONE_B", statuses=[{"id": "wamid.out", "status": "delivered", "recipient_id": "603333"}]),
+                _change("PHONE_C", messages=[_text("604444", "Third", "wamid.5")]),
+            ]},
+        ],
+    }
+
+    events = list(iter_whatsapp_events(payload))
+    assert [(e["kind"], e["metadata"]["whatsapp_message_id"]) for e in events] == [
+        ("text", "wamid.1"), ("text", "wamid.2"), ("non_text", "wamid.3"),
+        ("text", "wamid.4"), ("status", "wamid.out"), ("text", "wamid.5"),
+    ]
+    # Names are matched by wa_id, not position
+    assert [e["guest_name"] for e in events[:2]] == ["Alice", "Bob"]
+    assert events[2]["content"] is None and events[2]["metadata"]["message_type"] == "image"
+    assert events[3]["content"] == "Book now"
+    assert events[4]["metadata"]["status"] == "delivered"
+    assert events[5]["metadata"]["phone_number_id"] == "PHONE_C"
+
+def test_iter_whatsapp_events_skips_malformed_parts():
+    payload = {"entry": [None, {"changes": [{"value": None}, _change("PHONE_A", messages=[{"type": "text"}, _text("601111", "Hi", "wamid.1")])]}]}
+    assert [e["content"] for e in iter_whatsapp_events(payload)] == ["Hi"]
+    assert list(iter_whatsapp_events({})) == []
+    assert normalize_whatsapp_message({"entry": [{"changes": [_change("PHONE_A", statuses=[{"id": "x", "status": "read"}])]}]}) is None
+
 def test_normalize_email():
     payload = {
         "from": "John Doe <john@example.com>",
@@ -55,3 +112,15 @@ def test_normalize_email():
     assert normalized["guest_name"] == "John Doe"
     assert "Subject: Booking Inquiry" in normalized["content"]
     assert "I would like to book a room" in normalized["content"]
+
+def test_normalize_email_message_id_from_headers():
+    payload = {
+        "from": "john@example.com",
+        "to": "reservations@hotel.com",
+        "subject": "Booking",
+        "text": "Room for two?",
+        "headers": "Received: by mx.example.com\nmessage-id: <CAF123@mail.example.com>\nSubject: Booking\n",
+    }
+    assert normalize_email_message(payload)["metadata"]["message_id"] == "<CAF123@mail.example.com>"
+    del payload["headers"]
+    assert normalize_email_message(payload)["metadata"]["message_id"] is None
@@ -0,0 +1,165 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models import OutboundMessage, OutboundStatusEvent
+from app.services import outbox
+from app.services.outbox import fold_status, record_status_events
+from app.services.whatsapp import iter_whatsapp_events
+from app.services.whatsapp_sender import WhatsAppSendError
+
+
+T0 = datetime(2026, 10, 19, 9, 0, tzinfo=timezone.utc)
+
+
+def _row(**fields) -> OutboundMessage:
+    defaults = dict(
+        id=uuid.uuid4(), channel="whatsapp", recipient="60123456789", body="Yes, we have rooms",
+        sender_id="PHONE_A", status="sending", attempts=1,
+    )
+    return OutboundMessage(**{**defaults, **fields})
+
+
+def _event(status, minutes, error=None) -> OutboundStatusEvent:
+    return OutboundStatusEvent(
+        provider_message_id="wamid.1", status=status, occurred_at=T0 + timedelta(minutes=minutes), error=error,
+    )
+
+
+def _session_factory(session):
+    factory = MagicMock()
+    factory.return_value.__aenter__ = AsyncMock(return_value=session)
+    factory.return_value.__aexit__ = AsyncMock(return_value=False)
+    return factory
+
+
+def test_status_events_fold_forward_regardless_of_order():
+    row = _row(status="sent", provider_message_id="wamid.1")
+    fold_status(row, [_event("read", 5), _event("sent", 0), _event("delivered", 1), _event("delivered", 1)])
+    assert row.status == "read"
+    assert (row.delivered_at, row.read_at) == (T0 + timedelta(minutes=1), T0 + timedelta(minutes=5))
+
+    # A late "sent" never moves it back
+    fold_status(row, [_event("sent", 9)])
+    assert row.status == "read"
+
+
+def test_failed_status_is_final():
+    row = _row(status="sent", provider_message_id="wamid.1")
+    fold_status(row, [_event("sent", 0), _event("failed", 1, error="Message undeliverable"), _event("read", 2)])
+    assert (row.status, row.last_error, row.read_at) == ("failed", "Message undeliverable", None)
+
+
+@pytest.mark.asyncio
+async def test_status_webhook_events_are_stored_and_folded():
+    payload = {"entry": [{"changes": [{"value": {
+        "metadata": {"phone_number_id": "PHONE_A"},
+        "statuses": [
+            {"id": "wamid.1", "status": "delivered", "timestamp": "1792400000"},
+            {"id": "wamid.2", "status": "failed", "timestamp": "1792400001",
+             "errors": [{"code": 131026, "title": "Message undeliverable"}]},
+        ],
+    }}]}]}
+    statuses = [e for e in iter_whatsapp_events(payload) if e["kind"] == "status"]
+    db = MagicMock(flush=AsyncMock())
+    with patch.object(outbox, "apply_status_events", AsyncMock(return_value=2)) as apply:
+        assert await record_status_events(db, statuses) == 2
+
+    (events,), _ = db.add_all.call_args
+    assert [(e.provider_message_id, e.status, e.error) for e in events] == [
+        ("wamid.1", "delivered", None), ("wamid.2", "failed", "Message undeliverable"),
+    ]
+    assert events[0].occurred_at == datetime.fromtimestamp(1792400000, tz=timezone.utc)
+    db.flush.assert_awaited_once()
+    assert apply.await_args.args[1] == {"wamid.1", "wamid.2"}
+
+
+@pytest.mark.asyncio
+async def test_claim_leases_due_rows_with_skip_locked():
+    due = [_row(status="pending", attempts=0), _row(status="sending", attempts=2)]
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = due
+    session = MagicMock(execute=AsyncMock(return_value=result), commit=AsyncMock())
+    with patch.object(outbox, "async_session", _session_factory(session)):
+        claimed = await outbox.claim_batch(limit=10)
+
+    sql = str(session.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert "outbound_messages.next_attempt_at <= now()" in sql
+    assert [(row.status, row.attempts) for row in claimed] == [("sending", 1), ("sending", 3)]
+    assert all(row.next_attempt_at > datetime.now(timezone.utc) for row in claimed)
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.parametrize("outcome, expected", [
+    ({"messages": [{"id": "wamid.9"}]}, ("sent", "wamid.9", None)),
+    ({"status": "skipped", "reason": "missing_credentials"}, ("failed", None, "missing_credentials")),
+    (WhatsAppSendError("timed out", maybe_delivered=True), ("unknown", None, "timed out")),
+    (WhatsAppSendError("throttled", retryable=True), ("retry", None, "throttled")),
+    (WhatsAppSendError("rejected (400)"), ("failed", None, "rejected (400)")),
+])
+@pytest.mark.asyncio
+async def test_whatsapp_send_outcomes(outcome, expected):
+    mock = AsyncMock(side_effect=outcome) if isinstance(outcome, Exception) else AsyncMock(return_value=outcome)
+    with patch.object(outbox, "send_whatsapp_message", mock):
+        assert await outbox._send(_row()) == expected
+    mock.assert_awaited_once_with("60123456789", "Yes, we have rooms", phone_number_id="PHONE_A")
+
+
+@pytest.mark.asyncio
+async def test_email_transport_errors_are_retried():
+    row = _row(channel="email", recipient="guest@example.com", subject="Re: Booking", sender_id=None)
+    with patch.object(outbox, "send_email", AsyncMock(return_value={"status": "error", "detail": "HTTP 503"})):
+        assert await outbox._send(row) == ("retry", None, "HTTP 503")
+
+
+@pytest.mark.asyncio
+async def test_outcomes_are_recorded_with_backoff_and_give_up():
+    sent, retry, exhausted, unknown, releases = (_row() for _ in range(5))
+    exhausted.attempts = 6
+    stored = {row.id: _row(id=row.id, attempts=row.attempts) for row in (sent, retry, exhausted, unknown, releases)}
+    stored[releases.id].attempts = 2  # Lease expired and another dispatcher took it
+    result = MagicMock()
+    result.scalars.return_value = list(stored.values())
+    session = MagicMock(execute=AsyncMock(return_value=result), flush=AsyncMock(), commit=AsyncMock())
+
+    with patch.object(outbox, "async_session", _session_factory(session)), \
+         patch.object(outbox, "apply_status_events", AsyncMock()) as apply, \
+         patch.object(outbox.settings, "outbox_max_attempts", 6), \
+         patch.object(outbox.settings, "outbox_retry_base_sec", 5.0):
+        await outbox._record([
+            (sent, "sent", "wamid.1", None),
+            (retry, "retry", None, "HTTP 503"),
+            (exhausted, "retry", None, "HTTP 503"),
+            (unknown, "unknown", None, "timed out"),
+            (releases, "sent", "wamid.2", None),
+        ])
+
+    assert (stored[sent.id].status, stored[sent.id].provider_message_id) == ("sent", "wamid.1")
+    assert stored[retry.id].status == "pending"
+    delay = (stored[retry.id].next_attempt_at - datetime.now(timezone.utc)).total_seconds()
+    assert 4 < delay <= 5
+    assert (stored[exhausted.id].status, stored[exhausted.id].last_error) == ("failed", "HTTP 503")
+    assert stored[unknown.id].status == "unknown"
+    assert (stored[releases.id].status, stored[releases.id].provider_message_id) == ("sending", None)
+    # Early status events for the new ids are folded in the same transaction
+    assert apply.await_args.args[1] == ["wamid.1", "wamid.2"]
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_dispatch_sends_batch_concurrently_and_counts_outcomes():
+    rows = [_row(), _row()]
+    with patch.object(outbox, "claim_batch", AsyncMock(return_value=rows)), \
+         patch.object(outbox, "_send", AsyncMock(side_effect=[("sent", "wamid.1", None), ("retry", None, "boom")])), \
+         patch.object(outbox, "_record", AsyncMock()) as record:
+        counts = await outbox.dispatch_once()
+
+    assert counts == {"sent": 1, "retry": 1}
+    assert [r[0] for r in record.await_args.args[0]] == rows
+
+    with patch.object(outbox, "claim_batch", AsyncMock(return_value=[])):
+        assert not await outbox.dispatch_once()
@@ -0,0 +1,202 @@
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.database import engine
+from app.models import Base, Conversation
+from app.services.analytics import _response_time_histogram_query
+from app.services.conversation import history_query
+from app.services import partitions
+from app.services.partitions import (
+    add_months,
+    create_partition_sql,
+    drop_expired_partitions,
+    ensure_partitions,
+    expired_partitions,
+    is_partitioned,
+    month_floor,
+    partition_name,
+)
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_month_arithmetic_and_names():
+    assert month_floor(datetime(2026, 1, 31, 23, 0, tzinfo=timezone.utc)) == date(2026, 1, 1)
+    # Bounds are UTC: 07:00 on the 1st in Kuala Lumpur is still the previous month
+    assert month_floor(datetime(2026, 3, 1, 7, 0, tzinfo=timezone(timedelta(hours=8)))) == date(2026, 2, 1)
+    assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert partition_name("messages", date(2026, 2, 1)) == "messages_p2026_02"
+    assert create_partition_sql("messages", date(2026, 12, 1)) == (
+        "CREATE TABLE IF NOT EXISTS messages_p2026_12 PARTITION OF messages "
+        "FOR VALUES FROM ('2026-12-01 00:00:00+00') TO ('2027-01-01 00:00:00+00')"
+    )
+
+
+def test_expired_partitions_only_whole_months_before_cutoff():
+    names = ["messages_p2024_09", "messages_p2024_10", "messages_p2024_11", "messages_archive"]
+    cutoff = datetime(2024, 11, 15, tzinfo=timezone.utc)
+    # November is only half expired; its rows are left to the batched deletes
+    assert expired_partitions(names, cutoff) == ["messages_p2024_09", "messages_p2024_10"]
+
+
+class FakeConnection:
+    def __init__(self, partitioned=True, existing=(), detach_pending=()):
+        self.partitioned = partitioned
+        self.existing = list(existing)
+        self.detach_pending = list(detach_pending)
+        self.created = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execution_options(self, **options):
+        return self
+
+    async def execute(self, stmt, params=None):
+        sql = str(stmt)
+        result = MagicMock()
+        if "relkind = 'p'" in sql:
+            result.scalar.return_value = self.partitioned
+        elif "inhdetachpending" in sql:
+            result.fetchall.return_value = [(name,) for name in self.detach_pending]
+        elif "pg_inherits" in sql:
+            result.fetchall.return_value = [(name,) for name in self.existing]
+        else:
+            self.created.append(sql)
+        return result
+
+
+@pytest.mark.asyncio
+async def test_ensure_partitions_creates_only_missing_months():
+    conn = FakeConnection(existing=["messages_p2026_10", "messages_p2026_11"])
+    created = await ensure_partitions(conn, "messages", months_ahead=3, today=date(2026, 10, 19))
+    assert created == ["messages_p2026_12", "messages_p2027_01"]
+    assert all(sql.startswith("CREATE TABLE IF NOT EXISTS") for sql in conn.created)
+
+
+@pytest.mark.asyncio
+async def test_ensure_partitions_skips_unpartitioned_table():
+    conn = FakeConnection(partitioned=False)
+    assert await ensure_partitions(conn, "messages", months_ahead=3) == []
+    assert conn.created == []
+
+
+@pytest.mark.asyncio
+async def test_interrupted_detach_is_finalized_then_dropped():
+    conn = FakeConnection(
+        existing=["messages_p2024_08", "messages_p2024_09", "messages_p2024_10"],
+        detach_pending=["messages_p2024_08"],
+    )
+    engine_ = MagicMock()
+    engine_.connect.return_value = conn
+    cutoff = datetime(2024, 10, 15, tzinfo=timezone.utc)
+
+    with patch.object(partitions, "engine", engine_):
+        assert await drop_expired_partitions("messages", cutoff, dry_run=True) == [
+            "messages_p2024_08", "messages_p2024_09",
+        ]
+        assert conn.created == []
+        dropped = await drop_expired_partitions("messages", cutoff)
+
+    assert dropped == ["messages_p2024_08", "messages_p2024_09"]
+    assert conn.created == [
+        "ALTER TABLE messages DETACH PARTITION messages_p2024_08 FINALIZE",
+        "DROP TABLE messages_p2024_08",
+        "ALTER TABLE messages DETACH PARTITION messages_p2024_09 CONCURRENTLY",
+        "DROP TABLE messages_p2024_09",
+    ]
+
+
+def test_hot_queries_bound_sent_at_for_pruning():
+    start = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    assert "messages.sent_at >=" in _sql(_response_time_histogram_query(uuid.uuid4(), start))
+
+    conv = Conversation(id=uuid.uuid4(), started_at=start)
+    sql = _sql(history_query(conv, limit=10))
+    assert "messages.sent_at >=" in sql
+    assert "ORDER BY messages.sent_at DESC" in sql
+
+
+# ── EXPLAIN-based pruning checks (need a live Postgres) ─────────────────
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def _relations(plan) -> set[str]:
+    found = set()
+    if isinstance(plan, dict):
+        if "Relation Name" in plan:
+            found.add(plan["Relation Name"])
+        for value in plan.values():
+            found |= _relations(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            found |= _relations(value)
+    return found
+
+
+OLD_MONTH = add_months(month_floor(datetime.now(timezone.utc)), -24)
+
+
+@pytest_asyncio.fixture
+async def partitioned_db():
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            if not await is_partitioned(conn, "messages"):
+                pytest.skip("messages is not partitioned in this database (run alembic upgrade)")
+            await ensure_partitions(conn)
+            await conn.exec_driver_sql(create_partition_sql("messages", OLD_MONTH))
+    except (OSError, SQLAlchemyError) as e:
+        pytest.skip(f"Postgres not available: {e}")
+    yield
+    await engine.dispose()
+
+
+async def _explain(stmt) -> set[str]:
+    async with engine.connect() as conn:
+        result = await conn.execute(Explain(stmt))
+        return _relations(result.scalar())
+
+
+@pytest.mark.asyncio
+async def test_explain_histogram_prunes_old_partitions(partitioned_db):
+    window_start = datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    relations = await _explain(_response_time_histogram_query(uuid.uuid4(), window_start))
+
+    message_partitions = {r for r in relations if r.startswith("messages_p")}
+    assert partition_name("messages", month_floor(window_start)) in message_partitions
+    assert partition_name("messages", OLD_MONTH) not in message_partitions
+
+
+@pytest.mark.asyncio
+async def test_explain_history_prunes_partitions_before_conversation(partitioned_db):
+    conv = Conversation(id=uuid.uuid4(), started_at=datetime.now(timezone.utc) - timedelta(hours=1))
+    relations = await _explain(history_query(conv, limit=10))
+
+    message_partitions = {r for r in relations if r.startswith("messages_p")}
+    assert message_partitions
+    assert partition_name("messages", OLD_MONTH) not in message_partitions
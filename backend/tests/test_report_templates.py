@@ -0,0 +1,95 @@
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+from app.services import report_templates
+from app.services.email_transport import EmailMessage
+from app.services.report_templates import load_report_templates, render_daily_report, render_report_template
+
+
+def _property(**overrides):
+    values = dict(
+        name="Vivatel <KL>",
+        website_url="https://vivatel.test",
+        ota_commission_pct=Decimal("18.00"),
+        conversion_rate=Decimal("0.35"),
+        report_locale="en",
+        report_branding=None,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+STATS = SimpleNamespace(
+    report_date=date(2026, 10, 18),
+    after_hours_inquiries=10,
+    after_hours_responded=9,
+    leads_captured=4,
+    handoffs=2,
+    estimated_revenue_recovered=Decimal("1610.00"),
+    channel_breakdown={"whatsapp": 7, "web": 3},
+)
+
+
+def test_templates_compile_once():
+    first = load_report_templates()
+    assert load_report_templates()["html"] is first["html"]
+    render_daily_report(_property(), STATS)
+    assert report_templates._templates["html"] is first["html"]
+
+
+def test_report_uses_property_conversion_rate_and_escapes_html():
+    report = render_daily_report(_property(), STATS)
+
+    assert "conversion rate of 35%" in report.html
+    assert "20%" not in report.html
+    assert "Vivatel &lt;KL&gt;" in report.html
+    assert "RM 1,610.00" in report.html and "RM 289.80" in report.html
+    assert "Sunday, 18 Oct 2026" in report.html
+    assert "2 conversation(s)" in report.html
+
+
+def test_text_part_is_rendered_from_same_data():
+    report = render_daily_report(_property(), STATS)
+
+    assert "<" not in report.text.replace("Vivatel <KL>", "")
+    assert "Revenue Recovered: RM 1,610.00" in report.text
+    assert "- WhatsApp: 7" in report.text
+    assert "Auto-Response Rate: 90%" in report.text
+
+
+def test_bm_locale_and_branding():
+    prop = _property(report_locale="ms", report_branding={"primary_color": "#7c2d12", "footer": "Vivatel KL"})
+    report = render_daily_report(prop, STATS)
+
+    assert report.subject.startswith("📊 Laporan Harian: Vivatel <KL> - 18 Okt 2026")
+    assert "Ahad, 18 Okt 2026" in report.html
+    assert "Hasil Diperoleh Semula" in report.text
+    assert "background-color: #7c2d12" in report.html
+    assert "Vivatel KL" in report.text
+
+
+def test_template_with_substitutions_matches_direct_render():
+    for prop in (_property(), _property(report_locale="ms", report_branding={"footer": "Vivatel KL"})):
+        shell, substitutions = render_report_template(prop, STATS)
+        delivered = EmailMessage(
+            to=["gm@hotel.test"], subject=shell.subject, text=shell.text, html=shell.html,
+            substitutions=substitutions,
+        ).substituted()
+        direct = render_daily_report(prop, STATS)
+        assert (delivered.subject, delivered.html, delivered.text) == (direct.subject, direct.html, direct.text)
+
+
+def test_properties_with_same_locale_and_branding_share_one_body():
+    other = SimpleNamespace(**{**vars(STATS), "after_hours_inquiries": 3, "handoffs": 1,
+                               "estimated_revenue_recovered": Decimal("99.00")})
+    first, first_values = render_report_template(_property(), STATS)
+    second, second_values = render_report_template(_property(name="Hotel B", website_url="https://b.test"), other)
+
+    assert first == second
+    assert first_values["-property_name:html-"] == "Vivatel &lt;KL&gt;"
+    assert first_values["-property_name-"] == "Vivatel <KL>"
+    assert second_values["-revenue-"] == "RM 99.00"
+    # No handoffs is a different body (the alert block is left out)
+    quiet, _ = render_report_template(_property(), SimpleNamespace(**{**vars(STATS), "handoffs": 0}))
+    assert quiet.html != first.html
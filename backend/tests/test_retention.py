@@ -0,0 +1,121 @@
+import uuid
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services import retention
+from app.services.retention import run_retention
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+class FakeSession:
+    """Deletes up to LIMIT ids from an in-memory table per statement."""
+
+    def __init__(self, tables, log):
+        self.tables = tables
+        self.log = log
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt):
+        sql = _sql(stmt)
+        self.log.append(sql)
+        result = MagicMock()
+        table = sql.split("FROM ", 1)[1].split()[0]
+        if sql.startswith("DELETE"):
+            limit = stmt.compile().params["param_1"]
+            ids, self.tables[table] = self.tables[table][:limit], self.tables[table][limit:]
+            result.scalars.return_value.all.return_value = ids
+        elif "count(*)" in sql:
+            result.scalar.return_value = len(self.tables[table])
+        return result
+
+    async def commit(self):
+        self.log.append("COMMIT")
+
+
+def _fake_db(counts):
+    tables = {name: sorted(uuid.uuid4() for _ in range(n)) for name, n in counts.items()}
+    log = []
+    return tables, log, (lambda: FakeSession(tables, log))
+
+
+@pytest.mark.asyncio
+async def test_retention_deletes_children_first_in_committed_batches():
+    tables, log, session = _fake_db({
+        "messages": 5, "leads": 2, "outbound_messages": 1, "conversations": 3,
+        "inbound_receipts": 1, "outbound_status_events": 2,
+    })
+    with patch.object(retention, "async_session", session), \
+         patch.object(retention, "drop_expired_partitions", new=AsyncMock(return_value=["messages_p2024_01"])) as drop, \
+         patch.object(retention.asyncio, "sleep", new=AsyncMock()) as sleep:
+        report = await run_retention(batch_size=2, sleep_sec=0.25)
+
+    # Whole expired months go first, without row deletes
+    assert drop.await_args.args[0] == "messages"
+    assert drop.await_args.kwargs == {"dry_run": False}
+    assert report.dropped_partitions == ["messages_p2024_01"]
+
+    assert report.counts == {
+        "messages": 5, "leads": 2, "outbound_messages": 1, "conversations": 3,
+        "inbound_receipts": 1, "outbound_status_events": 2,
+    }
+    assert report.batches == {
+        "messages": 3, "leads": 1, "outbound_messages": 1, "conversations": 2,
+        "inbound_receipts": 1, "outbound_status_events": 1,
+    }
+    assert report.total == 14
+    assert all(not rows for rows in tables.values())
+
+    deletes = [sql for sql in log if sql.startswith("DELETE")]
+    order = [sql.split()[2] for sql in deletes]
+    assert order == (
+        ["messages"] * 3 + ["leads"] * 2 + ["outbound_messages"] + ["conversations"] * 2
+        + ["inbound_receipts"] + ["outbound_status_events"] * 2
+    )
+    # Every batch is its own transaction
+    assert log.count("COMMIT") == len(deletes)
+    # Keyset: batches after the first continue from the last id seen
+    assert "messages.id >" not in deletes[0]
+    assert "messages.id >" in deletes[1]
+    # Conversations still holding children are left for the next run
+    conversation_batch = next(sql for sql in deletes if sql.startswith("DELETE FROM conversations"))
+    assert conversation_batch.count("NOT (EXISTS") == 3
+    # Sleep only after full batches (2+2 messages, 2 leads, 2 conversations, 2 status events)
+    assert sleep.await_count == 5
+    sleep.assert_awaited_with(0.25)
+
+
+@pytest.mark.asyncio
+async def test_retention_dry_run_counts_without_deleting():
+    tables, log, session = _fake_db({
+        "messages": 12000, "leads": 30, "outbound_messages": 0, "conversations": 900,
+        "inbound_receipts": 0, "outbound_status_events": 0,
+    })
+    with patch.object(retention, "async_session", session), \
+         patch.object(retention, "drop_expired_partitions", new=AsyncMock(return_value=["messages_p2024_09"])) as drop:
+        report = await run_retention(dry_run=True, batch_size=5000, sleep_sec=1.0)
+
+    assert drop.await_args.kwargs == {"dry_run": True}
+    assert not any(sql.startswith("DELETE") for sql in log)
+    # Rows in partitions that would be dropped are not counted as batch work
+    message_count = next(sql for sql in log if "count(*)" in sql and "FROM messages" in sql)
+    assert "messages.sent_at >=" in message_count
+    assert len(tables["messages"]) == 12000
+    assert report.counts == {
+        "messages": 12000, "leads": 30, "outbound_messages": 0, "conversations": 900,
+        "inbound_receipts": 0, "outbound_status_events": 0,
+    }
+    assert report.batches == {
+        "messages": 3, "leads": 1, "outbound_messages": 0, "conversations": 1,
+        "inbound_receipts": 0, "outbound_status_events": 0,
+    }
+    assert report.estimated_sec >= 5.0  # 5 batches x 1s sleep, plus query time
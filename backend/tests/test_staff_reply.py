@@ -0,0 +1,172 @@
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.dml import Update
+
+from app import routes
+from app.models import Conversation, Message, OutboundMessage
+from app.schemas import StaffReplyRequest
+from app.services.conversation import add_staff_message
+
+
+def _conversation(channel="web", status="active", guest_identifier="web:abc"):
+    return Conversation(
+        id=uuid.uuid4(), property_id=uuid.uuid4(), guest_identifier=guest_identifier,
+        channel=channel, status=status, ai_mode="concierge", message_count=3,
+        started_at=datetime(2026, 10, 19, 8, 0, tzinfo=timezone.utc),
+    )
+
+
+def _stamp_sent_at(session):
+    """Stand-in for the INSERT ... RETURNING that fills Message.sent_at on flush."""
+    async def flush():
+        for call in session.add.call_args_list:
+            if isinstance(call.args[0], Message) and call.args[0].sent_at is None:
+                call.args[0].sent_at = datetime.now(timezone.utc)
+    return flush
+
+
+def _session(conv, last_guest_content=None):
+    conv_result = MagicMock()
+    conv_result.scalar_one_or_none.return_value = conv
+    history_result = MagicMock()
+    history_result.scalars.return_value.first.return_value = (
+        Message(role="guest", content=last_guest_content) if last_guest_content else None
+    )
+
+    async def execute(statement):
+        if isinstance(statement, Update):
+            return MagicMock()
+        if statement.column_descriptions[0]["entity"] is Message:
+            return history_result
+        return conv_result
+
+    session = AsyncMock()
+    session.execute.side_effect = execute
+    session.add = MagicMock()
+    session.flush.side_effect = _stamp_sent_at(session)
+    return session
+
+
+def _token(conv, sub="admin"):
+    return {"sub": sub, "property_ids": [str(conv.property_id)]}
+
+
+def _first_response_update(session):
+    update = next(c.args[0] for c in session.execute.call_args_list if isinstance(c.args[0], Update))
+    return update.compile(dialect=postgresql.dialect())
+
+
+def _added(session, model):
+    return [c.args[0] for c in session.add.call_args_list if isinstance(c.args[0], model)]
+
+
+@pytest.mark.asyncio
+async def test_staff_message_stamps_first_staff_response_with_its_sent_at():
+    conv = _conversation()
+    session = _session(conv)
+
+    msg = await add_staff_message(session, conv, "Hi, this is Aisha from the front desk.", sender="admin")
+
+    assert msg.role == "staff" and msg.metadata_ == {"sender": "admin"}
+    assert _added(session, Message) == [msg]
+    assert msg.sent_at is not None
+    update = _first_response_update(session)
+    assert "first_staff_response_at=coalesce(conversations.first_staff_response_at" in str(update)
+    assert msg.sent_at in update.params.values()
+    assert conv.ai_mode == "staff"
+    assert conv.last_message_at == msg.sent_at
+    assert conv.message_count == 4
+
+
+@pytest.mark.asyncio
+async def test_web_reply_is_committed_then_pushed_to_the_socket():
+    conv = _conversation()
+    session = _session(conv)
+    calls = []
+    session.commit.side_effect = lambda: calls.append("commit")
+
+    async def push(conversation_id, event):
+        calls.append(("push", conversation_id, event))
+        return 1
+
+    with patch.object(routes, "push_to_conversation", push):
+        response = await routes.staff_reply(
+            str(conv.id), StaffReplyRequest(message="Your room is ready."), db=session, token=_token(conv),
+        )
+
+    assert calls == ["commit", ("push", str(conv.id), {"type": "message", "text": "Your room is ready.", "sender": "staff"})]
+    assert response["delivery"] == "pushed"
+    assert _added(session, OutboundMessage) == []
+    msg = _added(session, Message)[0]
+    assert response["message_id"] == str(msg.id)
+    assert response["sent_at"] == msg.sent_at.isoformat()
+
+
+@pytest.mark.asyncio
+async def test_web_reply_reports_an_offline_guest():
+    conv = _conversation()
+    with patch.object(routes, "push_to_conversation", AsyncMock(return_value=0)):
+        response = await routes.staff_reply(
+            str(conv.id), StaffReplyRequest(message="Still there?"), db=_session(conv), token=_token(conv),
+        )
+    assert response["delivery"] == "guest_offline"
+
+
+@pytest.mark.asyncio
+async def test_whatsapp_and_email_replies_go_through_the_outbox():
+    conv = _conversation(channel="whatsapp", guest_identifier="60123456789")
+    session = _session(conv)
+    push = AsyncMock()
+    with patch.object(routes, "push_to_conversation", push):
+        response = await routes.staff_reply(
+            str(conv.id), StaffReplyRequest(message="Yes, parking is free."), db=session, token=_token(conv),
+        )
+    [row] = _added(session, OutboundMessage)
+    msg = _added(session, Message)[0]
+    assert (row.channel, row.recipient, row.body, row.subject) == ("whatsapp", "60123456789", "Yes, parking is free.", None)
+    assert row.message_id == msg.id and row.status == "pending"
+    assert response["delivery"] == "queued"
+    push.assert_not_awaited()
+
+    conv = _conversation(channel="email", guest_identifier="aisha@example.com")
+    session = _session(conv, last_guest_content="Subject: Group booking\n\nRooms for 20 people?")
+    await routes.staff_reply(str(conv.id), StaffReplyRequest(message="Yes."), db=session, token=_token(conv))
+    [row] = _added(session, OutboundMessage)
+    assert (row.recipient, row.subject) == ("aisha@example.com", "Re: Group booking")
+
+
+@pytest.mark.asyncio
+async def test_reply_to_missing_or_resolved_conversation_is_rejected():
+    conv = _conversation(status="resolved")
+    with pytest.raises(HTTPException) as resolved:
+        await routes.staff_reply(str(conv.id), StaffReplyRequest(message="Hi"), db=_session(conv), token=_token(conv))
+    assert resolved.value.status_code == 409
+
+    with pytest.raises(HTTPException) as missing:
+        await routes.staff_reply(str(uuid.uuid4()), StaffReplyRequest(message="Hi"), db=_session(None), token={"property_ids": ["*"], "is_admin": True})
+    assert missing.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_reply_to_another_propertys_conversation_is_forbidden():
+    conv = _conversation(channel="whatsapp", guest_identifier="60123456789")
+    session = _session(conv)
+    other_property = {"sub": "staff-b", "property_ids": [str(uuid.uuid4())]}
+
+    with pytest.raises(HTTPException) as forbidden:
+        await routes.staff_reply(str(conv.id), StaffReplyRequest(message="Hi"), db=session, token=other_property)
+
+    assert forbidden.value.status_code == 403
+    assert session.add.call_args_list == []
+    session.commit.assert_not_awaited()
+
+    # Super admins can reply anywhere
+    response = await routes.staff_reply(
+        str(conv.id), StaffReplyRequest(message="Hi"), db=session, token={"is_admin": True, "property_ids": ["*"]},
+    )
+    assert response["delivery"] == "queued"
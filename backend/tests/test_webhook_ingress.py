@@ -0,0 +1,89 @@
+import base64
+import hashlib
+import hmac
+from unittest.mock import patch
+
+import orjson
+import pytest
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+from fastapi import Depends, FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app import auth
+from app.auth import sendgrid_webhook_form, whatsapp_webhook_payload
+
+SECRET = "app-secret"
+
+
+def _app():
+    app = FastAPI()
+
+    @app.post("/whatsapp")
+    async def whatsapp(body: dict = Depends(whatsapp_webhook_payload)):
+        return {"entries": len(body["entry"])}
+
+    @app.post("/email")
+    async def email(form: dict = Depends(sendgrid_webhook_form)):
+        return {"from": form["from"], "subject": form["subject"]}
+
+    return app
+
+
+async def _post(path, **kwargs):
+    async with AsyncClient(transport=ASGITransport(app=_app()), base_url="http://test") as client:
+        return await client.post(path, **kwargs)
+
+
+def _signed(body: bytes) -> dict:
+    digest = hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+    return {"X-Hub-Signature-256": f"sha256={digest}", "Content-Type": "application/json"}
+
+
+@pytest.mark.asyncio
+async def test_whatsapp_payload_verified_and_parsed_from_one_read():
+    body = orjson.dumps({"object": "whatsapp_business_account", "entry": [{"id": "1"}, {"id": "2"}]})
+    with patch.object(auth.settings, "whatsapp_app_secret", SECRET), \
+         patch("starlette.requests.Request.json", side_effect=AssertionError("parsed twice")):
+        response = await _post("/whatsapp", content=body, headers=_signed(body))
+    assert response.status_code == 200
+    assert response.json() == {"entries": 2}
+
+
+@pytest.mark.asyncio
+async def test_whatsapp_payload_rejects_bad_signature_and_bad_json():
+    body = b'{"entry": []}'
+    with patch.object(auth.settings, "whatsapp_app_secret", SECRET):
+        forged = await _post("/whatsapp", content=body, headers=_signed(b'{"entry": [1]}'))
+        not_json = await _post("/whatsapp", content=b"{nope", headers=_signed(b"{nope"))
+        not_object = await _post("/whatsapp", content=b"[]", headers=_signed(b"[]"))
+    assert forged.status_code == 403
+    assert (not_json.status_code, not_object.status_code) == (400, 400)
+
+
+@pytest.mark.asyncio
+async def test_sendgrid_form_parsed_from_the_verified_body():
+    private_key = Ed25519PrivateKey.generate()
+    public_key = private_key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+    fields = {"from": "Guest <guest@example.com>", "subject": "Booking"}
+    boundary = "sheerssoftboundary"
+    body = b"".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    ) + f"--{boundary}--\r\n".encode()
+    timestamp = "1760000000"
+    headers = {
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+        "X-Twilio-Email-Event-Webhook-Timestamp": timestamp,
+        "X-Twilio-Email-Event-Webhook-Signature": base64.b64encode(
+            private_key.sign(timestamp.encode() + body)
+        ).decode(),
+    }
+
+    with patch.object(auth.settings, "sendgrid_webhook_public_key", base64.b64encode(public_key).decode()):
+        response = await _post("/email", content=body, headers=headers)
+        tampered = await _post("/email", content=body.replace(b"Booking", b"Bookinh"), headers=headers)
+
+    assert response.status_code == 200
+    assert response.json() == {"from": "Guest <guest@example.com>", "subject": "Booking"}
+    assert tampered.status_code == 403
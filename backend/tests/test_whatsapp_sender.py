@@ -0,0 +1,171 @@
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from app.services import whatsapp_sender
+from app.services.whatsapp import send_whatsapp_message
+from app.services.whatsapp_sender import (
+    RedisTokenBucket,
+    TokenBucket,
+    WhatsAppSendError,
+    WhatsAppSender,
+    set_whatsapp_sender,
+)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff_sleep():
+    with patch.object(whatsapp_sender.settings, "whatsapp_backoff_base_sec", 0):
+        yield
+
+
+def _sender(handler) -> WhatsAppSender:
+    sender = WhatsAppSender("test-token", base_url="https://graph.test", api_version="v18.0")
+    sender.client = httpx.AsyncClient(base_url="https://graph.test", transport=httpx.MockTransport(handler))
+    sender.redis = MagicMock(eval=AsyncMock(return_value="0"))  # Rate limiter always grants
+    return sender
+
+
+def _throttled(code):
+    return httpx.Response(400, json={"error": {"message": "Rate limit hit", "code": code}})
+
+
+@pytest.mark.asyncio
+async def test_retries_throttling_on_shared_client():
+    responses = iter([httpx.Response(429), _throttled(130429), httpx.Response(200, json={"messages": [{"id": "wamid.1"}]})])
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return next(responses)
+
+    sender = _sender(handler)
+    client = sender.client
+    result = await sender.send_text("60123456789", "Yes, we have rooms", "PHONE_A")
+
+    assert result == {"messages": [{"id": "wamid.1"}]}
+    assert len(calls) == 3
+    assert sender.client is client
+    assert calls[0].url.path == "/v18.0/PHONE_A/messages"
+    assert json.loads(calls[0].content)["text"] == {"body": "Yes, we have rooms"}
+
+
+@pytest.mark.asyncio
+async def test_connect_errors_retry_until_exhausted():
+    calls = []
+
+    def down(request):
+        calls.append(request)
+        raise httpx.ConnectError("connection refused")
+
+    with patch.object(whatsapp_sender.settings, "whatsapp_max_retries", 2), \
+         pytest.raises(WhatsAppSendError, match="after 3 attempts") as exc:
+        await _sender(down).send_text("60123456789", "Hi", "PHONE_A")
+    assert len(calls) == 3
+    assert exc.value.maybe_delivered is False
+    assert exc.value.retryable is True
+
+
+@pytest.mark.parametrize("failure", [
+    httpx.Response(500),
+    httpx.Response(502),
+    httpx.ReadTimeout("read timed out"),
+    httpx.RemoteProtocolError("server disconnected"),
+])
+@pytest.mark.asyncio
+async def test_ambiguous_failures_are_not_retried(failure):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if isinstance(failure, Exception):
+            raise failure
+        return failure
+
+    with pytest.raises(WhatsAppSendError) as exc:
+        await _sender(handler).send_text("60123456789", "Hi", "PHONE_A")
+    # Meta may have accepted the first POST; a retry could double-send
+    assert len(calls) == 1
+    assert exc.value.maybe_delivered is True
+
+
+@pytest.mark.asyncio
+async def test_rejections_are_not_retried():
+    calls = []
+
+    def rejected(request):
+        calls.append(request)
+        return httpx.Response(400, json={"error": {"message": "Invalid parameter", "code": 100}})
+
+    with pytest.raises(WhatsAppSendError, match="rejected") as exc:
+        await _sender(rejected).send_text("60123456789", "Hi", "PHONE_A")
+    assert len(calls) == 1
+    assert exc.value.maybe_delivered is False
+    assert exc.value.retryable is False
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_capped():
+    responses = iter([httpx.Response(429, headers={"retry-after": "3600"}), httpx.Response(200, json={})])
+    sleep = AsyncMock()
+    with patch.object(whatsapp_sender.settings, "whatsapp_max_retry_after_sec", 30.0), \
+         patch.object(whatsapp_sender.asyncio, "sleep", sleep):
+        await _sender(lambda request: next(responses)).send_text("60123456789", "Hi", "PHONE_A")
+    sleep.assert_awaited_once_with(30.0)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_once_burst_is_spent():
+    clock = [100.0]
+    slept = []
+
+    async def fake_sleep(delay):
+        slept.append(delay)
+        clock[0] += delay
+
+    bucket = TokenBucket(rate=10, burst=2, clock=lambda: clock[0], sleep=fake_sleep)
+    waits = [await bucket.acquire() for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.1) and waits[3] == pytest.approx(0.1)
+    assert clock[0] == pytest.approx(100.2)
+
+
+@pytest.mark.asyncio
+async def test_redis_bucket_is_shared_per_number_and_sleeps_for_its_reservation():
+    redis = MagicMock(eval=AsyncMock(return_value="0.25"))
+    sleep = AsyncMock()
+    bucket = RedisTokenBucket(redis, "PHONE_A", rate=70, burst=10, fallback=MagicMock(), sleep=sleep)
+
+    assert await bucket.acquire() == 0.25
+    sleep.assert_awaited_once_with(0.25)
+    script, keys, args = redis.eval.await_args.args
+    assert keys == ["whatsapp:rate:PHONE_A"] and args == [70, 10]
+
+
+@pytest.mark.asyncio
+async def test_redis_bucket_falls_back_to_local_share_of_the_rate():
+    sender = WhatsAppSender("test-token")
+    sender.redis = MagicMock(eval=AsyncMock(side_effect=ConnectionError("redis down")))
+    with patch.object(whatsapp_sender.settings, "whatsapp_rate_per_sec", 80.0), \
+         patch.object(whatsapp_sender.settings, "whatsapp_sender_processes", 4):
+        bucket = await sender.bucket("PHONE_A")
+        assert await bucket.acquire() == 0.0
+
+    assert bucket.fallback.rate == 20.0
+    assert await sender.bucket("PHONE_A") is bucket
+    assert await sender.bucket("PHONE_B") is not bucket
+
+
+@pytest.mark.asyncio
+async def test_send_whatsapp_message_uses_shared_sender_and_reply_number():
+    sender = AsyncMock()
+    sender.send_text.return_value = {"messages": [{"id": "wamid.1"}]}
+    set_whatsapp_sender(sender)
+    try:
+        await send_whatsapp_message("60123456789", "Hello", phone_number_id="PHONE_B")
+    finally:
+        set_whatsapp_sender(None)
+    sender.send_text.assert_awaited_once_with("60123456789", "Hello", "PHONE_B")
@@ -0,0 +1,209 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+from starlette.websockets import WebSocketDisconnect, WebSocketState
+
+from app.services import ws_registry
+from app.services.ws_registry import ConnectionRegistry, GuestConnection
+
+
+class FakeBroker:
+    """Redis pub/sub and presence shared by several in-process "nodes"."""
+
+    def __init__(self):
+        self.subscribers: dict[str, set] = {}
+        self.presence: dict[str, dict] = {}
+
+
+class FakePubSub:
+    def __init__(self, broker):
+        self.broker = broker
+        self.channels: set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.commands: list = []
+
+    @property
+    def subscribed(self):
+        return bool(self.channels)
+
+    async def subscribe(self, *channels):
+        self.commands += [("subscribe", c) for c in channels]
+        for channel in channels:
+            self.channels.add(channel)
+            self.broker.subscribers.setdefault(channel, set()).add(self)
+
+    async def unsubscribe(self, *channels):
+        self.commands += [("unsubscribe", c) for c in channels]
+        for channel in channels:
+            self.channels.discard(channel)
+            self.broker.subscribers.get(channel, set()).discard(self)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        await self.unsubscribe(*list(self.channels))
+
+
+class FakeRedis:
+    def __init__(self, broker):
+        self.broker = broker
+
+    async def pubsub(self):
+        return FakePubSub(self.broker)
+
+    async def publish(self, channel, message):
+        subscribers = self.broker.subscribers.get(channel, set())
+        for pubsub in subscribers:
+            pubsub.queue.put_nowait({"type": "message", "channel": channel, "data": message})
+        return len(subscribers)
+
+    async def eval(self, script, keys, args):
+        member, expires_at, now, _ = args
+        entries = self.broker.presence.setdefault(keys[0], {})
+        entries[member] = expires_at
+        for key in [m for m, exp in entries.items() if exp <= now]:
+            del entries[key]
+
+    async def zrem(self, key, *members):
+        for member in members:
+            self.broker.presence.get(key, {}).pop(member, None)
+
+    async def zcount(self, key, min, max):
+        return sum(1 for exp in self.broker.presence.get(key, {}).values() if exp >= min)
+
+
+class FakeSocket:
+    def __init__(self, incoming=(), stall=False):
+        self.sent: list[dict] = []
+        self.incoming = list(incoming)
+        self.stall = stall
+        self.application_state = WebSocketState.CONNECTED
+        self.close_code = None
+
+    async def send_text(self, text):
+        if self.stall:
+            await asyncio.sleep(10)
+        self.sent.append(json.loads(text))
+
+    async def receive_text(self):
+        if not self.incoming:
+            raise WebSocketDisconnect(1000)
+        return self.incoming.pop(0)
+
+    async def close(self, code=1000, reason=""):
+        self.application_state = WebSocketState.DISCONNECTED
+        self.close_code = (code, reason)
+
+
+async def _node(broker, name):
+    registry = ConnectionRegistry(node=name)
+    registry.redis = FakeRedis(broker)
+    await registry.start()
+    return registry
+
+
+async def _until(condition, timeout=1.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_push_from_any_node_reaches_the_node_holding_the_socket():
+    broker = FakeBroker()
+    node_a, node_b = await _node(broker, "a"), await _node(broker, "b")
+    try:
+        guest, other = GuestConnection(FakeSocket()), GuestConnection(FakeSocket())
+        await node_b.register(guest, "conv-1")
+        await node_a.register(other, "conv-2")
+
+        # Published on A (e.g. the staff takeover request landed there)
+        assert await node_a.publish("conv-1", {"type": "staff_joined"}) == 1
+        await _until(lambda: guest.websocket.sent)
+        assert guest.websocket.sent == [{"type": "staff_joined"}]
+        assert other.websocket.sent == []
+
+        assert await node_a.online("conv-1") == 1
+        assert await node_a.publish("conv-unknown", {"type": "staff_joined"}) == 0
+    finally:
+        await node_a.stop()
+        await node_b.stop()
+
+
+@pytest.mark.asyncio
+async def test_node_subscribes_once_per_conversation_and_leaves_with_the_last_socket():
+    broker = FakeBroker()
+    registry = await _node(broker, "a")
+    try:
+        tab_1, tab_2 = GuestConnection(FakeSocket()), GuestConnection(FakeSocket())
+        await registry.register(tab_1, "conv-1")
+        await registry.register(tab_2, "conv-1")
+        assert registry.pubsub.commands == [("subscribe", "ws:conv:conv-1")]
+        assert registry.stats()["connections"] == 2
+
+        # Both tabs get the push
+        await registry.publish("conv-1", {"type": "message", "text": "Hi", "sender": "staff"})
+        await _until(lambda: tab_1.websocket.sent and tab_2.websocket.sent)
+
+        await registry.unregister(tab_1)
+        assert ("unsubscribe", "ws:conv:conv-1") not in registry.pubsub.commands
+        await registry.unregister(tab_2)
+        assert registry.pubsub.commands[-1] == ("unsubscribe", "ws:conv:conv-1")
+        assert await registry.online("conv-1") == 0
+        assert registry.local == {}
+    finally:
+        await registry.stop()
+
+
+@pytest.mark.asyncio
+async def test_slow_socket_is_dropped_without_holding_up_the_others():
+    registry = ConnectionRegistry(node="a")
+    registry.redis = FakeRedis(FakeBroker())
+    slow, fast = GuestConnection(FakeSocket(stall=True)), GuestConnection(FakeSocket())
+    await registry.register(slow, "conv-1")
+    await registry.register(fast, "conv-1")
+
+    with patch.object(ws_registry.settings, "ws_send_timeout_sec", 0.05):
+        assert await registry.deliver_local("conv-1", {"type": "staff_joined"}) == 1
+    assert fast.websocket.sent == [{"type": "staff_joined"}]
+    assert slow.closed and slow.websocket.close_code[0] == 1011
+
+
+def test_heartbeat_and_idle_timeouts():
+    clock = [0.0]
+    conn = GuestConnection(FakeSocket(), clock=lambda: clock[0])
+    with patch.object(ws_registry.settings, "ws_heartbeat_timeout_sec", 75.0), \
+         patch.object(ws_registry.settings, "ws_idle_timeout_sec", 600.0):
+        clock[0] = 70.0
+        assert conn.check() is None
+        clock[0] = 80.0
+        assert conn.check() == "heartbeat_timeout"
+
+        # Pongs keep it alive but are not guest activity
+        conn.last_seen = 599.0
+        clock[0] = 601.0
+        assert conn.check() == "idle_timeout"
+
+
+@pytest.mark.asyncio
+async def test_messages_answer_pings_and_only_yield_guest_payloads():
+    socket = FakeSocket(incoming=[
+        json.dumps({"type": "ping"}),
+        json.dumps({"type": "pong"}),
+        "not json",
+        json.dumps({"text": "Any rooms tonight?"}),
+    ])
+    conn = GuestConnection(socket)
+    registry = ConnectionRegistry(node="a")
+    registry.redis = FakeRedis(FakeBroker())
+    payloads = [payload async for payload in conn.messages(registry)]
+
+    assert payloads == [{"text": "Any rooms tonight?"}]
+    assert socket.sent == [{"type": "pong"}]